@@ -0,0 +1,5 @@
+"""Load tests and benchmarks for the Bestellsystem API.
+
+Run ``python -m benchmarks`` from backend/ (or ``make bench``) to measure the
+API in-process and against a local Gunicorn; see README.md.
+"""
@@ -0,0 +1,183 @@
+"""Run the API benchmarks.
+
+Usage (from backend/):
+    python -m benchmarks [--mode inprocess gunicorn] [--output results.json]
+                         [--baseline previous.json] [--postgres-url URL]
+
+``inprocess`` drives create_app() through the Flask test client, which
+isolates the framework and application overhead; ``gunicorn`` starts a local
+Gunicorn with sync workers and sends real HTTP requests. Every scenario runs
+against SQLite and, if a URL is given, PostgreSQL. The PostgreSQL database
+must be dedicated to benchmarks: its order tables are emptied.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.compare import find_regressions, load_results
+from benchmarks.harness import Result, Scenario, run_http, run_inprocess
+from benchmarks.scenarios import scenarios, seed_database
+from benchmarks.server import gunicorn_command, running_server
+
+# Settings of the benchmarked application: no request logging, and no
+# response cache so the database-backed scenarios hit the database
+APP_ENV = {
+    "LOG_LEVEL": "WARNING",
+    "LOG_REQUESTS": "False",
+    "RESPONSE_CACHE_BACKEND": "none",
+}
+
+GUNICORN_PORT = 8100
+
+WARMUP_REQUESTS = 20
+
+
+def _print_result(result: Result) -> None:
+    """Print one result line."""
+    print(
+        f"{result.key:45} {result.requests_per_second:9.1f} req/s  "
+        f"p50 {result.p50_ms:8.2f}  p95 {result.p95_ms:8.2f}  p99 {result.p99_ms:8.2f} ms"
+        + (f"  {result.errors} errors" if result.errors else "")
+    )
+
+
+def run_inprocess_suite(
+    url: str, database: str, cases: list[Scenario], args: argparse.Namespace
+) -> list[Result]:
+    """Run all scenarios through the Flask test client."""
+    from bestellsystem.app import create_app
+    from bestellsystem.db import SessionLocal, create_db_engine
+
+    engine = create_db_engine(url)
+    original_bind = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=engine)
+    try:
+        app = create_app()
+        results = []
+        for scenario in cases:
+            run_inprocess(app, scenario, WARMUP_REQUESTS)
+            result = run_inprocess(
+                app, scenario, args.requests, args.inprocess_concurrency, database
+            )
+            _print_result(result)
+            results.append(result)
+        return results
+    finally:
+        SessionLocal.configure(bind=original_bind)
+        engine.dispose()
+
+
+def run_gunicorn_suite(
+    url: str, database: str, cases: list[Scenario], args: argparse.Namespace
+) -> list[Result]:
+    """Run all scenarios against a local Gunicorn."""
+    command = gunicorn_command(GUNICORN_PORT, args.workers)
+    results = []
+    with running_server(command, GUNICORN_PORT, {**APP_ENV, "DATABASE_URL": url}) as base_url:
+        for scenario in cases:
+            run_http(base_url, scenario, WARMUP_REQUESTS, args.concurrency)
+            result = run_http(base_url, scenario, args.requests, args.concurrency, database)
+            _print_result(result)
+            results.append(result)
+    return results
+
+
+def main() -> int:
+    """Run the benchmarks and write the results.
+
+    Returns:
+        Exit status: 1 if a regression against the baseline was found
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--mode",
+        nargs="+",
+        choices=("inprocess", "gunicorn"),
+        default=["inprocess", "gunicorn"],
+        help="drivers to run",
+    )
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="client connections against Gunicorn"
+    )
+    parser.add_argument(
+        "--inprocess-concurrency", type=int, default=1, help="client threads in-process"
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers")
+    parser.add_argument(
+        "--postgres-url",
+        default=os.getenv("BENCH_POSTGRES_URL", ""),
+        help="dedicated PostgreSQL database (default: $BENCH_POSTGRES_URL)",
+    )
+    parser.add_argument("--scenario", nargs="+", help="run only these scenarios")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="tolerated relative slowdown (default: 0.2)"
+    )
+    args = parser.parse_args()
+
+    # Configuration is read when bestellsystem is imported
+    os.environ.update(APP_ENV)
+    from bestellsystem.db import create_db_engine
+
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = {"sqlite": f"sqlite:///{tmp}/bench.db"}
+        if args.postgres_url:
+            databases["postgres"] = args.postgres_url
+
+        for database, url in databases.items():
+            engine = create_db_engine(url)
+            order_id = seed_database(engine)
+            engine.dispose()
+            cases = [
+                case
+                for case in scenarios(order_id)
+                if not args.scenario or case.name in args.scenario
+            ]
+            if "inprocess" in args.mode:
+                results += run_inprocess_suite(url, database, cases, args)
+            if "gunicorn" in args.mode:
+                results += run_gunicorn_suite(url, database, cases, args)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "inprocess_concurrency": args.inprocess_concurrency,
+                "workers": args.workers,
+            },
+            "results": [result.to_dict() for result in results],
+        }
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {output}")
+
+    if args.baseline:
+        regressions = find_regressions(load_results(args.baseline), results, args.threshold)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['key']} {regression['metric']}: "
+                f"{regression['baseline']} -> {regression['current']}"
+            )
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
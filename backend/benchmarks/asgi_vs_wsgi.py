@@ -0,0 +1,157 @@
+"""Compare the WSGI (gunicorn sync workers) and ASGI (uvicorn) serving modes.
+
+Starts each server against a temporary SQLite database and measures:
+
+* health: throughput and latency of GET /api/v1/health with concurrent clients
+* long-poll: GET /api/v1/health latency while clients hold order status
+  long-polls open (the situation that pins sync workers)
+
+Usage (from backend/):
+    python -m benchmarks.asgi_vs_wsgi [--workers 2] [--clients 16] [--polls 32]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.server import (
+    BACKEND_DIR,
+    gunicorn_command,
+    running_server,
+    staff_authorization,
+    uvicorn_command,
+)
+
+# Long-polls queued behind busy sync workers take a multiple of their wait
+POLL_TIMEOUT = 300.0
+
+
+def _get(url: str, timeout: float = 30.0, authorization: str | None = None) -> float:
+    """Fetch a URL and return the latency in seconds."""
+    headers = {"Authorization": authorization} if authorization else {}
+    start = time.perf_counter()
+    with urllib.request.urlopen(
+        urllib.request.Request(url, headers=headers), timeout=timeout
+    ) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def _seed_order(base_url: str, authorization: str) -> int:
+    """Create an order and return its ID."""
+    body = json.dumps(
+        [{"source": "bench", "items": [{"sku": "A", "quantity": 1, "unit_price_cents": 100}]}]
+    ).encode()
+    request = urllib.request.Request(
+        f"{base_url}/api/v1/orders/bulk",
+        data=body,
+        headers={"Content-Type": "application/json", "Authorization": authorization},
+    )
+    urllib.request.urlopen(request).read()
+    request = urllib.request.Request(
+        f"{base_url}/api/v1/orders?limit=1", headers={"Authorization": authorization}
+    )
+    with urllib.request.urlopen(request) as response:
+        return int(json.loads(response.read())["data"][0]["id"])
+
+
+def _summary(latencies: list[float]) -> str:
+    """Format latency percentiles in milliseconds."""
+    if not latencies:
+        return "no requests completed"
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {statistics.median(ordered) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+
+
+def bench_health(base_url: str, clients: int, requests: int) -> None:
+    """Measure health check throughput and latency."""
+    url = f"{base_url}/api/v1/health"
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(lambda _: _get(url), range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"  health     {requests / elapsed:8.0f} req/s  {_summary(latencies)}")
+
+
+def bench_long_poll(
+    base_url: str, order_id: int, polls: int, wait: float, authorization: str
+) -> None:
+    """Measure health latency while long-polls are waiting."""
+    poll_url = f"{base_url}/api/v1/orders/{order_id}/status?known=received&wait={wait}"
+    health_url = f"{base_url}/api/v1/health"
+    start = time.perf_counter()
+    with ThreadPoolExecutor(polls + 1) as pool:
+        pending = [pool.submit(_get, poll_url, POLL_TIMEOUT, authorization) for _ in range(polls)]
+        time.sleep(min(0.5, wait / 4))
+        # Health checks issued while the polls wait; with every worker
+        # occupied they queue until a poll returns
+        health = [_get(health_url, POLL_TIMEOUT) for _ in range(5)]
+        for future in pending:
+            future.result()
+    elapsed = time.perf_counter() - start
+    print(f"  long-poll  {polls} polls of {wait:g} s done after {elapsed:5.1f} s")
+    print(f"  health during long-poll:          {_summary(health)}")
+
+
+def run_mode(name: str, command: list[str], port: int, args: argparse.Namespace) -> None:
+    """Start a server, run the scenarios and stop it."""
+    env = {
+        "DATABASE_URL": args.database_url,
+        "LOG_LEVEL": "WARNING",
+        "RESPONSE_CACHE_BACKEND": "none",
+        "ORDER_STATUS_POLL_INTERVAL": "0.5",
+        # Let sync workers long-poll too, to show what it costs them
+        "ORDER_STATUS_WSGI_MAX_WAIT": str(args.wait),
+    }
+    with running_server(command, port, env) as base_url:
+        authorization = staff_authorization()
+        order_id = _seed_order(base_url, authorization)
+        print(name)
+        bench_health(base_url, args.clients, args.requests)
+        bench_long_poll(base_url, order_id, args.polls, args.wait, authorization)
+
+
+def main() -> None:
+    """Run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2, help="server worker processes")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent health clients")
+    parser.add_argument("--requests", type=int, default=2000, help="health requests")
+    parser.add_argument("--polls", type=int, default=32, help="concurrent status long-polls")
+    parser.add_argument("--wait", type=float, default=3.0, help="long-poll wait in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.database_url = f"sqlite:///{tmp}/bench.db"
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "DATABASE_URL": args.database_url},
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        run_mode(
+            f"WSGI: gunicorn, {args.workers} sync workers",
+            gunicorn_command(8101, args.workers, timeout=int(POLL_TIMEOUT)),
+            8101,
+            args,
+        )
+        run_mode(
+            f"ASGI: uvicorn, {args.workers} workers",
+            uvicorn_command(8102, args.workers),
+            8102,
+            args,
+        )
+
+
+if __name__ == "__main__":
+    main()
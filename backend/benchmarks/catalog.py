@@ -0,0 +1,266 @@
+"""Measure building, updating and searching the in-memory product catalog.
+
+Generates a synthetic catalog of categories and products, builds a
+CatalogSnapshot from it and reports
+
+* the build time and the memory held by the snapshot
+* search latency percentiles per kind of query, from one typed letter to
+  queries with typos
+* the cost of incremental updates that keep the index (price changes) and
+  that rebuild it (renamed products)
+
+Usage (from backend/):
+    python -m benchmarks.catalog [--products 100000] [--queries 2000]
+"""
+
+import argparse
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+
+from bestellsystem.products.search import CatalogSnapshot, CategoryRecord, ProductRecord
+
+_GROUPS = ("Pizza", "Pasta", "Salat", "Suppe", "Getränke", "Dessert", "Snacks", "Frühstück")
+_WORDS = (
+    "Margherita Salami Funghi Tonno Hawaii Spinaci Diavola Quattro Stagioni Formaggi "
+    "Spaghetti Penne Tagliatelle Bolognese Carbonara Arrabbiata Pesto Lasagne Gnocchi "
+    "Caesar Griechischer Bauernsalat Rucola Tomate Mozzarella Büffel Burrata Oliven "
+    "Tomatensuppe Kürbissuppe Gulasch Minestrone Linsen Apfelschorle Orangensaft Wasser "
+    "Limonade Espresso Cappuccino Tiramisu Panna Cotta Käsekuchen Brownie Eis Vanille "
+    "Schokolade Erdbeer Pommes Wedges Nuggets Brezel Croissant Müsli Rührei Speck "
+    "Käse Spätzle Schnitzel Wiener Art Hähnchen Rind Lachs Garnelen Vegan Vegetarisch "
+    "Knoblauch Chili Trüffel Parmesan Basilikum Rosmarin Zitrone Ingwer Honig Senf"
+).split()
+_SIZES = ("klein", "mittel", "groß", "0,33l", "0,5l", "Familie")
+
+
+def generate_catalog(
+    products: int, categories: int = 100, seed: int = 1
+) -> tuple[list[ProductRecord], list[CategoryRecord]]:
+    """Generate a synthetic catalog.
+
+    Categories form two levels below a few groups; products get names of
+    two to four menu words and a size, and SKUs like "PIZ-000042".
+
+    Args:
+        products: Number of products
+        categories: Number of categories below the groups
+        seed: Seed of the random generator
+
+    Returns:
+        Products and categories
+    """
+    rng = random.Random(seed)
+    category_records = [
+        CategoryRecord(index + 1, None, name, index) for index, name in enumerate(_GROUPS)
+    ]
+    for index in range(categories):
+        parent = category_records[index % len(_GROUPS)]
+        name = f"{parent.name} {rng.choice(_WORDS)} {index}"
+        category_records.append(CategoryRecord(len(_GROUPS) + index + 1, parent.id, name, index))
+    leaves = category_records[len(_GROUPS) :] or category_records
+
+    product_records = []
+    for index in range(products):
+        category = rng.choice(leaves)
+        words = rng.sample(_WORDS, rng.randint(2, 4))
+        name = " ".join(words) + " " + rng.choice(_SIZES)
+        sku = f"{category.name[:3].upper()}-{index:06d}"
+        price = rng.randint(150, 3500)
+        product_records.append(
+            ProductRecord.create(index + 1, sku, name, category.id, price, "EUR")
+        )
+    return product_records, category_records
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    """Swap two neighbouring letters of a word."""
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+def query_sets(rng: random.Random, count: int) -> dict[str, list[str]]:
+    """Create the queries of each kind.
+
+    Args:
+        rng: Random generator
+        count: Queries per kind
+
+    Returns:
+        Queries by kind
+    """
+    long_words = [word for word in _WORDS if len(word) >= 6]
+    return {
+        "1 letter": [rng.choice(_WORDS)[:1] for _ in range(count)],
+        "3 letters": [rng.choice(_WORDS)[:3] for _ in range(count)],
+        "full word": [rng.choice(_WORDS) for _ in range(count)],
+        "two words": [f"{rng.choice(_WORDS)} {rng.choice(_WORDS)[:3]}" for _ in range(count)],
+        "typo": [_typo(rng.choice(long_words), rng) for _ in range(count)],
+        "inside word": [rng.choice(long_words)[2:] for _ in range(count)],
+        "sku": [f"{rng.choice(_GROUPS)[:3]}-{rng.randrange(1000):03d}" for _ in range(count)],
+        "no match": [f"xq{rng.randrange(1000)}" for _ in range(count)],
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Latency:
+    """Search latencies of one kind of query."""
+
+    kind: str
+    queries: int
+    p50_us: float
+    p99_us: float
+    max_us: float
+    mean_results: float
+
+
+def measure_search(
+    snapshot: CatalogSnapshot,
+    kind: str,
+    queries: list[str],
+    limit: int = 20,
+    category_id: int | None = None,
+) -> Latency:
+    """Time searches of one kind.
+
+    Args:
+        snapshot: Snapshot to search
+        kind: Name of the kind of query
+        queries: Queries to run
+        limit: Maximum number of results
+        category_id: Category to search in
+
+    Returns:
+        Latency percentiles in microseconds
+    """
+    durations = []
+    results = 0
+    for query in queries:
+        start = time.perf_counter()
+        found = snapshot.search(query, limit, category_id)
+        durations.append((time.perf_counter() - start) * 1e6)
+        results += len(found)
+    durations.sort()
+    return Latency(
+        kind=kind,
+        queries=len(queries),
+        p50_us=statistics.median(durations),
+        p99_us=durations[min(len(durations) - 1, int(len(durations) * 0.99))],
+        max_us=durations[-1],
+        mean_results=results / len(queries),
+    )
+
+
+def measure_build(
+    products: list[ProductRecord], categories: list[CategoryRecord]
+) -> tuple[CatalogSnapshot, float, int]:
+    """Build a snapshot, measuring time and retained memory.
+
+    Args:
+        products: Product records
+        categories: Category records
+
+    Returns:
+        Snapshot, build seconds and bytes allocated by the build still held
+    """
+    gc.collect()
+    start = time.perf_counter()
+    CatalogSnapshot(0, products, categories)
+    seconds = time.perf_counter() - start
+
+    # Measure memory in a second build; tracing slows it down
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    snapshot = CatalogSnapshot(0, products, categories)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return snapshot, seconds, retained
+
+
+def _time(function: Callable[[], object], repeat: int) -> float:
+    """Return the median seconds of calls to a function."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def measure_updates(
+    snapshot: CatalogSnapshot, changes: int, rng: random.Random, repeat: int = 3
+) -> dict[str, float]:
+    """Time incremental updates of a snapshot.
+
+    Args:
+        snapshot: Current snapshot
+        changes: Products changed per update
+        rng: Random generator
+        repeat: Runs per kind of update
+
+    Returns:
+        Median seconds per kind of update
+    """
+    changed = rng.sample(snapshot.products, min(changes, len(snapshot.products)))
+    repriced = [replace(product, price_cents=product.price_cents + 10) for product in changed]
+    renamed = [
+        ProductRecord.create(
+            product.id,
+            product.sku,
+            product.name + " " + rng.choice(_WORDS),
+            product.category_id,
+            product.price_cents,
+            product.currency,
+        )
+        for product in changed
+    ]
+    version = snapshot.version + 1
+    return {
+        "price change": _time(lambda: snapshot.updated(version, repriced), repeat),
+        "rename": _time(lambda: snapshot.updated(version, renamed), repeat),
+    }
+
+
+def main() -> None:
+    """Print build, memory, search and update measurements."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.catalog")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=2000, help="queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=10, help="products per update")
+    args = parser.parse_args()
+
+    rng = random.Random(2)
+    products, categories = generate_catalog(args.products, args.categories)
+    snapshot, seconds, retained = measure_build(products, categories)
+    print(
+        f"build      {len(snapshot.products):8} products  {seconds * 1000:9.1f} ms  "
+        f"{retained / 2**20:7.1f} MiB held by the snapshot"
+    )
+
+    category_id = next(iter(snapshot.categories[snapshot.roots[0]].children))
+    print(f"{'query':22} {'p50 µs':>9} {'p99 µs':>9} {'max µs':>9} {'results':>8}")
+    for kind, queries in query_sets(rng, args.queries).items():
+        latencies = [measure_search(snapshot, kind, queries, args.limit)]
+        if kind in ("3 letters", "typo"):
+            latencies.append(
+                measure_search(snapshot, f"{kind} in category", queries, args.limit, category_id)
+            )
+        for latency in latencies:
+            print(
+                f"{latency.kind:22} {latency.p50_us:9.1f} {latency.p99_us:9.1f} "
+                f"{latency.max_us:9.1f} {latency.mean_results:8.1f}"
+            )
+
+    for kind, update_seconds in measure_updates(snapshot, args.changes, rng).items():
+        print(f"update     {args.changes:5} x {kind:13} {update_seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
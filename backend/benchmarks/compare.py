@@ -0,0 +1,66 @@
+"""Compare benchmark results against a baseline run."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from benchmarks.harness import Result
+
+
+def load_results(path: str | Path) -> dict[str, Result]:
+    """Load the results of a run written by ``python -m benchmarks``.
+
+    Args:
+        path: JSON file
+
+    Returns:
+        Results by key (mode/database/scenario)
+    """
+    data = json.loads(Path(path).read_text())
+    results = [Result(**entry) for entry in data["results"]]
+    return {result.key: result for result in results}
+
+
+def find_regressions(
+    baseline: dict[str, Result], current: list[Result], threshold: float
+) -> list[dict[str, Any]]:
+    """Flag results that got slower than the baseline by more than ``threshold``.
+
+    A result regressed if its p95 latency grew or its throughput shrank by
+    more than the threshold, or if it had errors the baseline did not have.
+    Results without a baseline counterpart are ignored.
+
+    Args:
+        baseline: Results of the baseline run by key
+        current: Results of this run
+        threshold: Tolerated relative change, e.g. 0.2 for 20 %
+
+    Returns:
+        One entry per regressed metric
+    """
+    regressions = []
+    for result in current:
+        before = baseline.get(result.key)
+        if before is None:
+            continue
+        checks = (
+            (
+                "p95_ms",
+                before.p95_ms,
+                result.p95_ms,
+                result.p95_ms > before.p95_ms * (1 + threshold),
+            ),
+            (
+                "requests_per_second",
+                before.requests_per_second,
+                result.requests_per_second,
+                result.requests_per_second < before.requests_per_second * (1 - threshold),
+            ),
+            ("errors", before.errors, result.errors, result.errors > 0 and before.errors == 0),
+        )
+        for metric, old, new, regressed in checks:
+            if regressed:
+                regressions.append(
+                    {"key": result.key, "metric": metric, "baseline": old, "current": new}
+                )
+    return regressions
@@ -0,0 +1,222 @@
+"""Request drivers and latency statistics."""
+
+import http.client
+import math
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+from flask import Flask
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """Request sent repeatedly by a benchmark."""
+
+    name: str
+    method: str
+    path: str
+    expected_status: int
+    body: bytes | None = None
+    content_type: str | None = None
+    authorization: str | None = None
+
+    def headers(self) -> dict[str, str]:
+        """Return the headers sent with every request."""
+        headers = {"Content-Type": self.content_type} if self.content_type else {}
+        if self.authorization:
+            headers["Authorization"] = self.authorization
+        return headers
+
+
+@dataclass(frozen=True, slots=True)
+class Result:
+    """Outcome of running a scenario."""
+
+    scenario: str
+    mode: str
+    database: str
+    requests: int
+    errors: int
+    requests_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @property
+    def key(self) -> str:
+        """Identify the measurement across runs."""
+        return f"{self.mode}/{self.database}/{self.scenario}"
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the result as a JSON-serializable dictionary."""
+        return asdict(self)
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Return the nearest-rank percentile of sorted values.
+
+    Args:
+        ordered: Values in ascending order
+        q: Percentile between 0 and 100
+
+    Returns:
+        Percentile, or 0.0 for no values
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(
+    scenario: Scenario,
+    mode: str,
+    database: str,
+    latencies: list[float],
+    errors: int,
+    elapsed: float,
+) -> Result:
+    """Aggregate the latencies of a run.
+
+    Args:
+        scenario: Scenario that was run
+        mode: "inprocess" or "gunicorn"
+        database: Database name, e.g. "sqlite"
+        latencies: Latency of every request in seconds
+        errors: Requests with an unexpected status or a transport error
+        elapsed: Wall-clock duration of the run in seconds
+
+    Returns:
+        Result with throughput and latency percentiles
+    """
+    ordered = sorted(latencies)
+    return Result(
+        scenario=scenario.name,
+        mode=mode,
+        database=database,
+        requests=len(latencies),
+        errors=errors,
+        requests_per_second=round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        p50_ms=round(percentile(ordered, 50) * 1000, 3),
+        p95_ms=round(percentile(ordered, 95) * 1000, 3),
+        p99_ms=round(percentile(ordered, 99) * 1000, 3),
+    )
+
+
+def _run(
+    send_factory: Callable[[], Callable[[], int]],
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+) -> tuple[list[float], int, float]:
+    """Send requests from ``concurrency`` threads, each with its own sender."""
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def worker(count: int) -> None:
+        nonlocal errors
+        send = send_factory()
+        local: list[float] = []
+        failed = 0
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                ok = send() == scenario.expected_status
+            except OSError:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, counts))
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_inprocess(
+    app: Flask, scenario: Scenario, requests: int, concurrency: int = 1, database: str = "sqlite"
+) -> Result:
+    """Run a scenario through the Flask test client, without network or server.
+
+    Args:
+        app: Application to benchmark
+        scenario: Scenario to run
+        requests: Number of requests
+        concurrency: Client threads
+        database: Database name for the result
+
+    Returns:
+        Benchmark result
+    """
+
+    def send_factory() -> Callable[[], int]:
+        client = app.test_client()
+        headers = scenario.headers()
+
+        def send() -> int:
+            response = client.open(
+                scenario.path, method=scenario.method, data=scenario.body, headers=headers
+            )
+            response.close()
+            return response.status_code
+
+        return send
+
+    latencies, errors, elapsed = _run(send_factory, scenario, requests, concurrency)
+    return summarize(scenario, "inprocess", database, latencies, errors, elapsed)
+
+
+def run_http(
+    base_url: str,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    database: str = "sqlite",
+    mode: str = "gunicorn",
+) -> Result:
+    """Run a scenario against a server over HTTP with keep-alive connections.
+
+    Args:
+        base_url: Server URL, e.g. "http://127.0.0.1:8100"
+        scenario: Scenario to run
+        requests: Number of requests
+        concurrency: Client threads, one connection each
+        database: Database name for the result
+        mode: Server name for the result
+
+    Returns:
+        Benchmark result
+    """
+    url = urlsplit(base_url)
+
+    def send_factory() -> Callable[[], int]:
+        connection = http.client.HTTPConnection(url.hostname or "127.0.0.1", url.port, timeout=30)
+        headers = scenario.headers()
+
+        def send() -> int:
+            try:
+                connection.request(scenario.method, scenario.path, scenario.body, headers)
+                response = connection.getresponse()
+                response.read()
+            except (http.client.HTTPException, OSError):
+                # Sync workers close the connection; reconnect on the next request
+                connection.close()
+                raise OSError("request failed") from None
+            if response.will_close:
+                connection.close()
+            return response.status
+
+        return send
+
+    latencies, errors, elapsed = _run(send_factory, scenario, requests, concurrency)
+    return summarize(scenario, mode, database, latencies, errors, elapsed)
@@ -0,0 +1,192 @@
+"""Measure the throughput of the order ID generator and check uniqueness.
+
+Runs the generator of bestellsystem.utils.ids
+
+* in threads sharing one generator, taking one ID or a batch per call
+* in forked processes, each claiming its own node like Gunicorn workers do
+
+and reports IDs per second together with the number of duplicates across all
+generated IDs, which must be zero.
+
+Usage (from backend/):
+    python -m benchmarks.ids [--ids 200000] [--threads 1 4] [--processes 4] [--batch 1 1000]
+"""
+
+import argparse
+import array
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from bestellsystem.utils.ids import IdGenerator, NodeLease
+
+
+@dataclass(frozen=True, slots=True)
+class Throughput:
+    """Result of one run."""
+
+    workers: int
+    batch: int
+    ids: int
+    seconds: float
+    duplicates: int
+    unordered: int
+
+    @property
+    def ids_per_second(self) -> float:
+        """Generated IDs per second over all workers."""
+        return self.ids / self.seconds
+
+
+def _generate(generator: IdGenerator, count: int, batch: int) -> array.array:
+    """Take ``count`` IDs from the generator, ``batch`` per call."""
+    ids = array.array("q")
+    if batch == 1:
+        ids.extend(generator.next_id() for _ in range(count))
+    else:
+        for start in range(0, count, batch):
+            ids.extend(generator.next_ids(min(batch, count - start)))
+    return ids
+
+
+def _unordered(ids: array.array) -> int:
+    """Count IDs not greater than their predecessor."""
+    return sum(1 for previous, current in zip(ids, ids[1:], strict=False) if current <= previous)
+
+
+def measure_threads(threads: int, per_thread: int, batch: int = 1) -> Throughput:
+    """Generate IDs in threads sharing one generator.
+
+    Args:
+        threads: Number of threads
+        per_thread: IDs taken by each thread
+        batch: IDs taken per call
+
+    Returns:
+        Throughput and duplicates over all threads
+    """
+    generator = IdGenerator(0)
+    results: list[array.array] = [array.array("q") for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def run(index: int) -> None:
+        barrier.wait()
+        results[index] = _generate(generator, per_thread, batch)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+
+    all_ids = [value for ids in results for value in ids]
+    return Throughput(
+        workers=threads,
+        batch=batch,
+        ids=len(all_ids),
+        seconds=seconds,
+        duplicates=len(all_ids) - len(set(all_ids)),
+        unordered=sum(_unordered(ids) for ids in results),
+    )
+
+
+def measure_processes(
+    processes: int, per_process: int, batch: int = 1, node_dir: str | None = None
+) -> Throughput:
+    """Generate IDs in forked processes, each with the node it claimed.
+
+    Args:
+        processes: Number of processes
+        per_process: IDs taken by each process
+        batch: IDs taken per call
+        node_dir: Directory of the node files (default: a new temporary directory)
+
+    Returns:
+        Throughput and duplicates over all processes
+    """
+    directory = node_dir or tempfile.mkdtemp(prefix="bestellsystem-id-bench-")
+    output = tempfile.mkdtemp(prefix="bestellsystem-id-output-")
+    go_read, go_write = os.pipe()
+    pids = []
+    for index in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.close(go_write)
+                lease = NodeLease.claim(directory, 0, processes, preferred=index)
+                generator = IdGenerator(lease.node, lease=lease)
+                os.read(go_read, 1)
+                ids = _generate(generator, per_process, batch)
+                with open(os.path.join(output, str(index)), "wb") as file:
+                    ids.tofile(file)
+                status = 0
+            finally:
+                os._exit(status)
+        pids.append(pid)
+
+    os.close(go_read)
+    start = time.perf_counter()
+    os.write(go_write, b"x" * processes)
+    failed = 0
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        failed += os.waitstatus_to_exitcode(status) != 0
+    seconds = time.perf_counter() - start
+    os.close(go_write)
+    if failed:
+        raise RuntimeError(f"{failed} of {processes} benchmark processes failed")
+
+    results = []
+    for index in range(processes):
+        ids = array.array("q")
+        path = os.path.join(output, str(index))
+        with open(path, "rb") as file:
+            ids.frombytes(file.read())
+        os.unlink(path)
+        results.append(ids)
+    os.rmdir(output)
+
+    all_ids = [value for ids in results for value in ids]
+    return Throughput(
+        workers=processes,
+        batch=batch,
+        ids=len(all_ids),
+        seconds=seconds,
+        duplicates=len(all_ids) - len(set(all_ids)),
+        unordered=sum(_unordered(ids) for ids in results),
+    )
+
+
+def _print_result(kind: str, result: Throughput) -> None:
+    """Print one result line."""
+    print(
+        f"{kind:10} {result.workers:3} x batch {result.batch:5}: "
+        f"{result.ids_per_second / 1e6:7.2f} M IDs/s  "
+        f"{result.duplicates} duplicates  {result.unordered} unordered"
+    )
+
+
+def main() -> None:
+    """Print the generator throughput per configuration."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ids")
+    parser.add_argument("--ids", type=int, default=200_000, help="IDs per thread or process")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--processes", type=int, nargs="+", default=[4])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 1000])
+    args = parser.parse_args()
+
+    for batch in args.batch:
+        for threads in args.threads:
+            _print_result("threads", measure_threads(threads, args.ids, batch))
+        for processes in args.processes:
+            _print_result("processes", measure_processes(processes, args.ids, batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark scenarios and the data they run against."""
+
+import json
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+
+from benchmarks.harness import Scenario
+from benchmarks.server import staff_authorization
+
+# Orders created before a run; the list and detail scenarios read them
+SEED_ORDERS = 500
+
+# Orders per request of the bulk upload scenario
+BULK_ORDERS = 20
+
+
+def _order(index: int) -> dict[str, object]:
+    """Build an order payload."""
+    return {
+        "external_id": f"bench-{index}",
+        "source": "bench",
+        "items": [
+            {"sku": "PIZZA-1", "quantity": 2, "unit_price_cents": 850},
+            {"sku": "COLA-05", "quantity": 1, "unit_price_cents": 250},
+        ],
+    }
+
+
+def seed_database(engine: Engine, orders: int = SEED_ORDERS) -> int:
+    """Create the schema and replace all orders with ``orders`` new ones.
+
+    Args:
+        engine: Engine of a database dedicated to benchmarks
+        orders: Number of orders to create
+
+    Returns:
+        ID of an order in the middle of the data set
+    """
+    from bestellsystem.db import Base
+    from bestellsystem.models import Order, OrderItem
+    from bestellsystem.orders.ingest import ingest_orders
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(delete(OrderItem))
+        connection.execute(delete(Order))
+        ingest_orders(
+            connection,
+            iter(_order(i) for i in range(orders)),
+            batch_size=1000,
+            max_orders=orders,
+        )
+    with engine.connect() as connection:
+        ids = connection.scalars(select(Order.id)).all()
+    return sorted(ids)[len(ids) // 2]
+
+
+def scenarios(order_id: int) -> list[Scenario]:
+    """Return the benchmark scenarios.
+
+    Args:
+        order_id: ID of an existing order
+
+    Returns:
+        Framework-only, error path and database-backed scenarios
+    """
+    bulk = json.dumps([_order(i) for i in range(BULK_ORDERS)]).encode()
+    token = staff_authorization()
+    return [
+        Scenario("health", "GET", "/api/v1/health", 200),
+        Scenario("not_found", "GET", "/api/v1/does-not-exist", 404),
+        Scenario("unauthorized", "GET", "/api/v1/auth/me", 401),
+        Scenario(
+            "validation_error",
+            "POST",
+            "/api/v1/orders/bulk",
+            400,
+            body=b"not json",
+            content_type="text/plain",
+            authorization=token,
+        ),
+        Scenario("order_detail", "GET", f"/api/v1/orders/{order_id}", 200, authorization=token),
+        Scenario(
+            "order_status", "GET", f"/api/v1/orders/{order_id}/status", 200, authorization=token
+        ),
+        Scenario("order_list", "GET", "/api/v1/orders?limit=50", 200, authorization=token),
+        Scenario(
+            "bulk_create",
+            "POST",
+            "/api/v1/orders/bulk",
+            201,
+            body=bulk,
+            content_type="application/json",
+            authorization=token,
+        ),
+    ]
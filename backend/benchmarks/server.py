@@ -0,0 +1,103 @@
+"""Start application servers for HTTP benchmarks."""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def gunicorn_command(port: int, workers: int, timeout: int = 30) -> list[str]:
+    """Return the command starting Gunicorn with sync workers."""
+    return [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--workers",
+        str(workers),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--timeout",
+        str(timeout),
+        "bestellsystem.app:create_app()",
+    ]
+
+
+def uvicorn_command(port: int, workers: int) -> list[str]:
+    """Return the command starting Uvicorn with the ASGI application."""
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "--factory",
+        "--workers",
+        str(workers),
+        "--port",
+        str(port),
+        "--no-access-log",
+        "bestellsystem.asgi:create_asgi_app",
+    ]
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen[bytes], timeout: float = 30) -> None:
+    """Wait until the server answers health checks.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer in time
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/v1/health", timeout=1) as response:
+                response.read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+@contextmanager
+def running_server(command: list[str], port: int, env: dict[str, str]) -> Iterator[str]:
+    """Run a server for the duration of the block.
+
+    Args:
+        command: Server command line
+        port: Port the server listens on
+        env: Environment variables added to the current environment
+
+    Yields:
+        Base URL of the server
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base_url, process)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def staff_authorization() -> str:
+    """Return an Authorization header value the benchmark servers accept.
+
+    Servers inherit the environment of this process, so they verify the
+    token with the same SECRET_KEY.
+    """
+    from bestellsystem.auth.tokens import token_service
+    from bestellsystem.models import User
+
+    return f"Bearer {token_service.issue(User(id=1, role='staff'))}"
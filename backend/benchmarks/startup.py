@@ -0,0 +1,172 @@
+"""Measure application startup: import time and worker boot.
+
+Each measurement runs in a fresh interpreter, since imports are cached per
+process:
+
+* import profile: ``python -X importtime`` of a module, summarized by the
+  modules with the largest cumulative import time
+* cold boot: importing the app factory and calling create_app(), what every
+  Gunicorn worker does without ``preload_app``
+* forked boot: time from fork() until a worker forked from a process that
+  already created the app has answered its first request, what every worker
+  does with ``preload_app``
+
+Usage (from backend/):
+    python -m benchmarks.startup [--runs 5] [--module bestellsystem.app] [--top 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+
+from benchmarks.server import BACKEND_DIR
+
+# Environment of the measured interpreters: quiet, and no database file
+# created in the working directory
+STARTUP_ENV = {
+    "LOG_LEVEL": "WARNING",
+    "DATABASE_URL": "sqlite://",
+    "EVENTS_BACKEND": "local",
+    "RESPONSE_CACHE_BACKEND": "memory",
+}
+
+COLD_BOOT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from bestellsystem.app import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000,
+                  "create_app_ms": (done - imported) * 1000}))
+"""
+
+FORKED_BOOT_SCRIPT = """
+import json, os, tempfile, time
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/startup.db"
+from bestellsystem.app import create_app
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.db import Base, get_engine
+from bestellsystem.models import User
+app = create_app()
+Base.metadata.create_all(get_engine())
+headers = {"Authorization": "Bearer " + token_service.issue(User(id=1, role="staff"))}
+read_end, write_end = os.pipe()
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    status = app.test_client().get("/api/v1/orders?limit=1", headers=headers).status_code
+    os.write(write_end, str(time.perf_counter()).encode() if status == 200 else b"0")
+    os._exit(0)
+os.close(write_end)
+first_response = float(os.read(read_end, 64) or 0)
+os.waitpid(pid, 0)
+print(json.dumps({"first_response_ms": (first_response - start) * 1000 if first_response else -1}))
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ImportEntry:
+    """Import time of one module, in milliseconds."""
+
+    module: str
+    self_ms: float
+    cumulative_ms: float
+
+
+def _run_python(args: list[str]) -> subprocess.CompletedProcess[str]:
+    """Run the interpreter from backend/ with STARTUP_ENV."""
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **STARTUP_ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(output: str) -> list[ImportEntry]:
+    """Parse the ``-X importtime`` report.
+
+    Args:
+        output: stderr of the interpreter
+
+    Returns:
+        One entry per imported module, in import order
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        entries.append(ImportEntry(module.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return entries
+
+
+def import_profile(module: str) -> list[ImportEntry]:
+    """Import a module in a fresh interpreter and return its import times.
+
+    Args:
+        module: Dotted module name
+
+    Returns:
+        Import time of every module loaded on the way
+    """
+    result = _run_python(["-X", "importtime", "-c", f"import {module}"])
+    return parse_importtime(result.stderr)
+
+
+def measure_cold_boot() -> dict[str, float]:
+    """Import the app factory and create the app in a fresh interpreter.
+
+    Returns:
+        Milliseconds spent importing (import_ms) and in create_app() (create_app_ms)
+    """
+    result: dict[str, float] = json.loads(_run_python(["-c", COLD_BOOT_SCRIPT]).stdout)
+    return result
+
+
+def measure_forked_boot() -> float:
+    """Fork a worker from a process that created the app.
+
+    Returns:
+        Milliseconds from fork() until the worker answered a database-backed
+        request, -1 if the request failed
+    """
+    result = json.loads(_run_python(["-c", FORKED_BOOT_SCRIPT]).stdout)
+    return float(result["first_response_ms"])
+
+
+def main() -> None:
+    """Print the import profile and boot times."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=5, help="boots measured per mode")
+    parser.add_argument("--module", default="bestellsystem.app", help="module to profile")
+    parser.add_argument("--top", type=int, default=20, help="modules listed in the profile")
+    args = parser.parse_args()
+
+    entries = import_profile(args.module)
+    total = next(e.cumulative_ms for e in reversed(entries) if e.module == args.module)
+    print(f"import {args.module}: {total:.1f} ms, {len(entries)} modules")
+    print(f"{'module':50} {'self ms':>9} {'cumul. ms':>10}")
+    for entry in sorted(entries, key=lambda e: e.self_ms, reverse=True)[: args.top]:
+        print(f"{entry.module:50} {entry.self_ms:9.1f} {entry.cumulative_ms:10.1f}")
+
+    cold = [measure_cold_boot() for _ in range(args.runs)]
+    forked = [measure_forked_boot() for _ in range(args.runs)]
+    import_ms = statistics.median(c["import_ms"] for c in cold)
+    create_app_ms = statistics.median(c["create_app_ms"] for c in cold)
+    print()
+    print(
+        f"cold boot (no preload):   import {import_ms:7.1f} ms  create_app {create_app_ms:6.1f} ms"
+    )
+    print(f"forked boot (preload):    first response {statistics.median(forked):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
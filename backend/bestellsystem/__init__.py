@@ -1,5 +1,18 @@
 """Bestellsystem package initialization."""
 
-from bestellsystem.app import create_app
+from typing import Any
 
 __all__ = ["create_app"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import the application factory on first access.
+
+    Importing ``bestellsystem.models`` or ``bestellsystem.db`` (migrations,
+    scripts, tests) then no longer loads the blueprints and every subsystem.
+    """
+    if name == "create_app":
+        from bestellsystem.app import create_app
+
+        return create_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,28 @@
 """Flask application factory."""
 
-from flask import Flask
+import hmac
+from typing import Any
+
+from flask import Flask, Response, current_app, request
+from sqlalchemy.orm import configure_mappers
 
 from bestellsystem.config import get_config
-from bestellsystem.utils.errors import register_error_handlers
+from bestellsystem.db import register_session_handling
+from bestellsystem.outbox import configure_webhooks
+from bestellsystem.products.catalog import register_catalog
+from bestellsystem.utils.admission import register_admission_control
+from bestellsystem.utils.compression import register_compression
+from bestellsystem.utils.errors import NotFoundError, UnauthorizedError, register_error_handlers
+from bestellsystem.utils.events import register_events
+from bestellsystem.utils.idempotency import register_idempotency
 from bestellsystem.utils.logging import get_logger, setup_logging
+from bestellsystem.utils.metrics import configure_metrics, render_prometheus
+from bestellsystem.utils.query_stats import register_query_instrumentation
+from bestellsystem.utils.response_cache import register_response_cache
+from bestellsystem.utils.timing import register_request_timing
+
+# Body of the health check response, serialized once
+HEALTH_OK = b'{"status":"ok"}\n'
 
 
 def create_app() -> Flask:
@@ -25,17 +43,74 @@ def create_app() -> Flask:
     setup_logging(
         level=app.config.get("LOG_LEVEL", "INFO"),
         log_format=app.config.get("LOG_FORMAT", "json"),
+        async_mode=app.config.get("LOG_ASYNC", False),
+        queue_size=app.config.get("LOG_QUEUE_SIZE", 10000),
+        overflow_policy=app.config.get("LOG_QUEUE_POLICY", "drop"),
+        batch_size=app.config.get("LOG_BATCH_SIZE", 100),
+        flush_interval=app.config.get("LOG_FLUSH_INTERVAL", 0.2),
+        sampling=app.config.get("LOG_SAMPLING", ""),
     )
 
     logger = get_logger(__name__)
     logger.info("Initializing Flask application")
 
+    # Aggregate metrics across worker processes when a directory is configured
+    configure_metrics(app.config.get("METRICS_DIR") or None)
+
     # Register error handlers
     register_error_handlers(app)
 
     # Register blueprints
     register_blueprints(app)
 
+    # Instrument requests (wraps the views registered above)
+    register_request_timing(app)
+
+    # Reject requests over the rate limits or while the worker is overloaded
+    register_admission_control(app)
+
+    # Opt-in profiling of sampled and slow requests (cProfile is only
+    # imported when enabled)
+    if app.config.get("PROFILING_ENABLED"):
+        from bestellsystem.utils.profiling import register_profiling
+
+        register_profiling(app)
+
+    # Count and time SQL queries per request
+    register_query_instrumentation(app)
+
+    # Request-scoped database sessions
+    register_session_handling(app)
+
+    # Cache GET responses, invalidated by ORM commits
+    register_response_cache(app)
+
+    # Publish events of committed transactions to event streams
+    register_events(app)
+
+    # Compress responses (runs before the request duration is taken)
+    register_compression(app)
+
+    # Replay stored responses of retried POST requests (stores responses
+    # before they are committed and compressed)
+    register_idempotency(app)
+
+    # Partner webhooks receiving outbox messages of order changes
+    configure_webhooks(
+        app.config.get("OUTBOX_WEBHOOK_URLS", ""),
+        app.config.get("OUTBOX_WEBHOOK_TOPICS", ""),
+        app.config.get("OUTBOX_WEBHOOK_SECRET", ""),
+        app.config.get("OUTBOX_WEBHOOK_TIMEOUT", 10),
+    )
+
+    # Serve the product catalog from a snapshot of this worker, kept current
+    # through the catalog version stamped on writes
+    register_catalog(app)
+
+    # Configure the ORM mappers now rather than on the first query, so a
+    # preloading Gunicorn master does it once for all workers
+    configure_mappers()
+
     logger.info("Flask application initialized successfully")
 
     return app
@@ -49,20 +124,81 @@ def register_blueprints(app: Flask) -> None:
     """
     from flask import Blueprint
 
+    from bestellsystem.auth import auth_bp
+    from bestellsystem.orders import orders_bp
+    from bestellsystem.products import products_bp
+
     # Create API v1 blueprint
     api_v1 = Blueprint("api_v1", __name__, url_prefix="/api/v1")
 
     @api_v1.route("/health", methods=["GET"])
-    def health() -> tuple[dict[str, str], int]:
+    def health() -> tuple[Any, int]:
         """Health check endpoint.
 
+        With HEALTH_CHECK_DB enabled the response includes the cached result
+        of a database readiness probe and the status code is 503 while the
+        database is unavailable.
+
         Returns:
             JSON response with status and HTTP status code
         """
         logger = get_logger(__name__)
         logger.info("Health check endpoint called")
-        return {"status": "ok"}, 200
-
+        if not current_app.config.get("HEALTH_CHECK_DB"):
+            return Response(HEALTH_OK, mimetype="application/json"), 200
+
+        from bestellsystem.db import database_probe
+
+        database = database_probe.check()
+        if database["status"] == "unavailable":
+            return {"status": "unavailable", "database": database}, 503
+        return {"status": "ok", "database": database}, 200
+
+    if app.config.get("METRICS_ENABLED", True):
+
+        @api_v1.route("/metrics", methods=["GET"])
+        def metrics() -> Response:
+            """Prometheus metrics endpoint.
+
+            Returns:
+                Metrics of all worker processes in the text exposition format
+            """
+            token = current_app.config.get("METRICS_TOKEN")
+            authorization = request.headers.get("Authorization", "")
+            if token and not hmac.compare_digest(authorization, f"Bearer {token}"):
+                raise UnauthorizedError("Invalid metrics token")
+            return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    if app.config.get("PROFILING_ENABLED") and app.config.get("PROFILING_TOKEN"):
+
+        @api_v1.route("/debug/profiles", methods=["GET"])
+        @api_v1.route("/debug/profiles/<profile_id>", methods=["GET"])
+        def profiles(profile_id: str | None = None) -> tuple[Any, int]:
+            """Captured request profiles of this worker.
+
+            Args:
+                profile_id: Request ID of a profile to return in full
+
+            Returns:
+                JSON response with profile summaries, slowest first, or one
+                profile, and HTTP status code
+            """
+            from bestellsystem.utils import profiling
+
+            token = current_app.config["PROFILING_TOKEN"]
+            authorization = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(authorization, f"Bearer {token}"):
+                raise UnauthorizedError("Invalid profiling token")
+            if profile_id is None:
+                return {"data": [p.summary() for p in profiling.profile_store.list()]}, 200
+            profile = profiling.profile_store.get(profile_id)
+            if profile is None:
+                raise NotFoundError("Profile not found")
+            return profile.to_dict(), 200
+
+    api_v1.register_blueprint(auth_bp)
+    api_v1.register_blueprint(orders_bp)
+    api_v1.register_blueprint(products_bp)
     app.register_blueprint(api_v1)
 
     logger = get_logger(__name__)
@@ -0,0 +1,408 @@
+"""ASGI entry point serving native async routes next to the Flask app.
+
+Usage:
+    uvicorn --factory bestellsystem.asgi:create_asgi_app
+
+Requests matching a route registered with AsgiApplication.route() are
+handled by a coroutine on the event loop, so waiting (long-polling, slow
+upstream calls) costs no thread. Everything else is passed to the regular
+Flask app, which runs on a thread pool; both share configuration, logging,
+metrics, admission control and the error envelope.
+"""
+
+import asyncio
+import json
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Awaitable, Callable, Coroutine, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any
+from urllib.parse import parse_qsl
+
+from flask import Flask
+
+from bestellsystem.app import create_app
+from bestellsystem.utils.admission import admit
+from bestellsystem.utils.errors import APIError, serialize_api_error, serialize_internal_error
+from bestellsystem.utils.logging import get_logger, shutdown_logging
+from bestellsystem.utils.timing import record_request, request_id_from_header
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Coroutine[Any, Any, None]]
+
+# Request bodies larger than this are spooled to a temporary file
+MAX_BODY_IN_MEMORY = 1024 * 1024
+
+logger = get_logger(__name__)
+
+
+class AsyncRequest:
+    """Request passed to async route handlers."""
+
+    __slots__ = ("method", "path", "path_params", "query", "headers", "remote_addr", "request_id")
+
+    def __init__(self, scope: Scope, path_params: dict[str, Any], request_id: str) -> None:
+        """Initialize request from an ASGI scope.
+
+        Args:
+            scope: ASGI HTTP scope
+            path_params: Values of the route's path parameters
+            request_id: ID of the request
+        """
+        self.method: str = scope["method"]
+        self.path: str = scope["path"]
+        self.path_params = path_params
+        self.query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        client = scope.get("client")
+        self.remote_addr: str | None = client[0] if client else None
+        self.request_id = request_id
+
+    def header(self, name: str) -> str | None:
+        """Return a request header, matching its name case-insensitively."""
+        return self.headers.get(name.lower())
+
+
+AsyncHandler = Callable[[AsyncRequest], Awaitable[tuple[dict[str, Any], int]]]
+
+_CONVERTERS: dict[str, tuple[str, Callable[[str], Any]]] = {
+    "int": (r"\d+", int),
+    "string": (r"[^/]+", str),
+}
+
+
+class _Route:
+    """Native async route."""
+
+    def __init__(self, path: str, endpoint: str, methods: tuple[str, ...], handler: AsyncHandler):
+        """Compile a Flask-style path like "/orders/<int:order_id>"."""
+        self.endpoint = endpoint
+        self.methods = methods
+        self.handler = handler
+        self.converters: dict[str, Callable[[str], Any]] = {}
+        pattern = ""
+        for part in re.split(r"(<[^>]+>)", path):
+            if part.startswith("<"):
+                converter, _, name = part[1:-1].rpartition(":")
+                regex, convert = _CONVERTERS[converter or "string"]
+                self.converters[name] = convert
+                pattern += f"(?P<{name}>{regex})"
+            else:
+                pattern += re.escape(part)
+        self.regex = re.compile(f"^{pattern}$")
+
+    def match(self, method: str, path: str) -> dict[str, Any] | None:
+        """Return the path parameters if the route matches."""
+        if method not in self.methods:
+            return None
+        match = self.regex.match(path)
+        if match is None:
+            return None
+        return {name: self.converters[name](value) for name, value in match.groupdict().items()}
+
+
+class WsgiBridge:
+    """Run a WSGI application on a thread pool for an ASGI server.
+
+    Unlike a single-threaded adapter, up to ``threads`` WSGI requests run
+    concurrently; response chunks are sent as the application yields them.
+    While a response is streamed, the connection is watched for
+    ``http.disconnect``; once the client is gone the WSGI iterable is closed
+    after its current chunk, so streams (e.g. Server-Sent Events) release
+    their pool thread instead of running until the next write fails.
+    """
+
+    def __init__(self, wsgi_app: Callable[..., Any], threads: int) -> None:
+        """Initialize bridge.
+
+        Args:
+            wsgi_app: WSGI application
+            threads: Maximum number of concurrently running WSGI requests
+        """
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle an HTTP request with the WSGI application."""
+        body: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=MAX_BODY_IN_MEMORY)
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            disconnected = threading.Event()
+            watcher = asyncio.create_task(_watch_disconnect(receive, disconnected))
+            try:
+                await loop.run_in_executor(
+                    self.executor, self._run, scope, body, loop, send, disconnected
+                )
+            finally:
+                # Also stops the thread if this task is cancelled
+                disconnected.set()
+                watcher.cancel()
+        finally:
+            body.close()
+
+    def _run(
+        self,
+        scope: Scope,
+        body: IO[bytes],
+        loop: asyncio.AbstractEventLoop,
+        send: Send,
+        disconnected: threading.Event,
+    ) -> None:
+        """Call the WSGI application on a pool thread."""
+
+        def sync_send(message: Message) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start: dict[str, Any] = {}
+
+        def start_response(
+            status: str, headers: list[tuple[str, str]], exc_info: Any = None
+        ) -> Any:
+            response_start.update(
+                type="http.response.start",
+                status=int(status.split(" ", 1)[0]),
+                headers=[
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers
+                ],
+            )
+            return lambda data: None
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        started = False
+        try:
+            for chunk in result:
+                if disconnected.is_set():
+                    return
+                if not chunk:
+                    continue
+                if not started:
+                    sync_send(response_start)
+                    started = True
+                sync_send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+        if disconnected.is_set():
+            return
+        if not started:
+            sync_send(response_start)
+        sync_send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    def shutdown(self) -> None:
+        """Stop the thread pool."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _watch_disconnect(receive: Receive, disconnected: threading.Event) -> None:
+    """Set ``disconnected`` once the client has closed the connection."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+def build_environ(scope: Scope, body: IO[bytes]) -> dict[str, Any]:
+    """Translate an ASGI HTTP scope into a WSGI environ.
+
+    Args:
+        scope: ASGI HTTP scope
+        body: Request body
+
+    Returns:
+        WSGI environ
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ: dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # The body is read completely, so it may be consumed without a
+        # Content-Length (chunked requests)
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            key = name
+        else:
+            key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsgiApplication:
+    """ASGI application combining async routes with the Flask app."""
+
+    def __init__(self, flask_app: Flask, wsgi_threads: int = 16) -> None:
+        """Initialize application.
+
+        Args:
+            flask_app: Application created by create_app()
+            wsgi_threads: Threads running requests handled by Flask
+        """
+        self.flask_app = flask_app
+        self.wsgi = WsgiBridge(flask_app, wsgi_threads)
+        self.routes: list[_Route] = []
+
+    def route(
+        self, path: str, endpoint: str, methods: tuple[str, ...] = ("GET",)
+    ) -> Callable[[AsyncHandler], AsyncHandler]:
+        """Register a native async route, taking precedence over Flask routes.
+
+        Args:
+            path: Flask-style path, e.g. "/api/v1/orders/<int:order_id>/status"
+            endpoint: Endpoint name used in metrics and logs
+            methods: Accepted HTTP methods
+
+        Returns:
+            Decorator registering the handler
+        """
+
+        def decorator(handler: AsyncHandler) -> AsyncHandler:
+            self.routes.append(_Route(path, endpoint, methods, handler))
+            return handler
+
+        return decorator
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Dispatch an ASGI connection."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        for route in self.routes:
+            path_params = route.match(scope["method"], scope["path"])
+            if path_params is not None:
+                await self._handle(route, path_params, scope, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        """Handle server startup and shutdown."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.wsgi.shutdown()
+                shutdown_logging()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(
+        self, route: _Route, path_params: dict[str, Any], scope: Scope, send: Send
+    ) -> None:
+        """Run an async handler and send its JSON response.
+
+        The request passes admission control first, like requests to Flask
+        views; a concurrency slot is held until the handler returns.
+        """
+        start = time.perf_counter()
+        request = AsyncRequest(
+            scope, path_params, request_id_from_header(_header(scope, b"x-request-id"))
+        )
+        extra_headers: dict[str, str] = {}
+        try:
+            # Waiting for a concurrency slot blocks, so it runs on a thread
+            slot = await asyncio.to_thread(
+                admit, route.endpoint, request.header, request.remote_addr
+            )
+            try:
+                payload, status = await route.handler(request)
+            finally:
+                if slot is not None:
+                    slot.release()
+            body = json.dumps(payload, separators=(",", ":")).encode() + b"\n"
+        except APIError as e:
+            status = e.status_code
+            body, extra_headers = serialize_api_error(e)
+        except Exception:
+            logger.exception(
+                "Unhandled exception in async handler",
+                extra={"request_id": request.request_id, "endpoint": route.endpoint},
+            )
+            status = 500
+            body = serialize_internal_error()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-request-id", request.request_id.encode()),
+                    *(
+                        (name.lower().encode(), value.encode())
+                        for name, value in extra_headers.items()
+                    ),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+        record_request(
+            route.endpoint,
+            request.method,
+            request.path,
+            status,
+            time.perf_counter() - start,
+            log=self.flask_app.config.get("LOG_REQUESTS", False),
+            request_id=request.request_id,
+        )
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    """Return a request header from an ASGI scope."""
+    for header_name, value in scope.get("headers", []):
+        if header_name.lower() == name:
+            return str(value.decode("latin-1"))
+    return None
+
+
+def create_asgi_app() -> AsgiApplication:
+    """Create the ASGI application.
+
+    Returns:
+        ASGI application wrapping create_app() with the async routes registered
+    """
+    from bestellsystem.orders.async_routes import register_async_routes
+
+    flask_app = create_app()
+    app = AsgiApplication(flask_app, wsgi_threads=flask_app.config.get("ASGI_WSGI_THREADS", 16))
+    register_async_routes(app)
+    return app
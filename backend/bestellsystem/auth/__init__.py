@@ -0,0 +1,5 @@
+"""Authentication package."""
+
+from bestellsystem.auth.routes import auth_bp
+
+__all__ = ["auth_bp"]
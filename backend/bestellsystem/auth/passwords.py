@@ -0,0 +1,197 @@
+"""Password hashing on a bounded worker pool."""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TypeVar
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from bestellsystem.config import Config
+from bestellsystem.utils.errors import ServiceUnavailableError
+from bestellsystem.utils.metrics import Counter, Gauge, Histogram
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds",
+    "Time spent hashing or verifying a password, including queueing",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password operations rejected because the pool was saturated or too slow",
+    ("reason",),
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "Password operations running or queued in this worker"
+)
+
+T = TypeVar("T")
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded thread pool.
+
+    scrypt and PBKDF2 run inside OpenSSL without holding the GIL, so hashing
+    on a few threads keeps the request threads of a worker responsive and
+    uses more than one core. At most ``workers + queue_depth`` operations may
+    be running or waiting at a time; beyond that, callers fail fast with a 503
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(
+        self,
+        method: str,
+        workers: int = 2,
+        queue_depth: int = 8,
+        timeout: float = 10.0,
+    ) -> None:
+        """Initialize hasher.
+
+        Args:
+            method: Werkzeug hash method with cost parameters, e.g. "scrypt:32768:8:1"
+            workers: Number of hashing threads, 0 to hash on the calling thread
+            queue_depth: Operations that may wait for a free thread
+            timeout: Seconds to wait for a result before giving up
+        """
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_depth)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._dummy_hash: str | None = None
+        self._method_prefix: str | None = None
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Drop the executor inherited from the parent, its threads are gone."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the thread pool on first use."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+        return self._executor
+
+    def _track(self, delta: int) -> None:
+        """Update the number of running and queued operations."""
+        with self._lock:
+            self._in_flight += delta
+            PASSWORD_HASH_IN_FLIGHT.set(self._in_flight)
+
+    def _run(self, operation: str, function: Callable[..., T], *args: str) -> T:
+        """Run a hashing function within the concurrency limit.
+
+        Raises:
+            ServiceUnavailableError: If the pool is saturated or the result
+                takes longer than the timeout
+        """
+        if not self._slots.acquire(blocking=False):
+            PASSWORD_HASH_REJECTED.inc("saturated")
+            raise ServiceUnavailableError("Too many concurrent logins, please retry")
+
+        self._track(1)
+        start = time.perf_counter()
+
+        def release(_: object = None) -> None:
+            self._track(-1)
+            self._slots.release()
+
+        if self.workers <= 0:
+            try:
+                return function(*args)
+            finally:
+                release()
+                PASSWORD_HASH_SECONDS.observe(time.perf_counter() - start, operation)
+
+        # The slot is released when the work is done, even if we stop waiting
+        future: Future[T] = self._get_executor().submit(function, *args)
+        future.add_done_callback(release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            PASSWORD_HASH_REJECTED.inc("timeout")
+            raise ServiceUnavailableError("Password check timed out, please retry") from e
+        finally:
+            PASSWORD_HASH_SECONDS.observe(time.perf_counter() - start, operation)
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method.
+
+        Args:
+            password: Plaintext password
+
+        Returns:
+            Hash string including method, parameters and salt
+        """
+        return self._run("hash", self._generate, password)
+
+    def _generate(self, password: str) -> str:
+        """Hash a password on the current thread."""
+        return generate_password_hash(password, method=self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Check a password against a stored hash.
+
+        Args:
+            pwhash: Stored hash
+            password: Plaintext password
+
+        Returns:
+            True if the password matches
+        """
+        return self._run("verify", check_password_hash, pwhash, password)
+
+    def verify_dummy(self, password: str) -> None:
+        """Spend the time of a verification without a stored hash.
+
+        Used for unknown accounts so response times do not reveal whether an
+        account exists.
+
+        Args:
+            password: Plaintext password
+        """
+        self.verify(self._get_dummy_hash(), password)
+
+    def _get_dummy_hash(self) -> str:
+        """Hash a random password with the configured method on first use."""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Check whether a hash was made with other than the configured method.
+
+        The method is compared as Werkzeug writes it into a hash, with all
+        cost parameters, so a shorthand like "scrypt" matches hashes made
+        with its default parameters.
+
+        Args:
+            pwhash: Stored hash
+
+        Returns:
+            True if the hash should be replaced on the next successful login
+        """
+        if self._method_prefix is None:
+            self._method_prefix = self._get_dummy_hash().split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._method_prefix
+
+
+password_hasher = PasswordHasher(
+    Config.PASSWORD_HASH_METHOD,
+    workers=Config.PASSWORD_HASH_WORKERS,
+    queue_depth=Config.PASSWORD_HASH_QUEUE_DEPTH,
+    timeout=Config.PASSWORD_HASH_TIMEOUT,
+)
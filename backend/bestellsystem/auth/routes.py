@@ -0,0 +1,63 @@
+"""Authentication API endpoints."""
+
+from typing import Any
+
+from flask import Blueprint, request
+
+from bestellsystem.auth.service import authenticate
+from bestellsystem.auth.tokens import current_claims, login_required, token_service
+from bestellsystem.db import get_request_session
+from bestellsystem.utils.errors import ValidationError
+
+auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
+
+
+@auth_bp.route("/login", methods=["POST"])
+def login() -> tuple[dict[str, Any], int]:
+    """Check email and password and issue an access token.
+
+    Returns:
+        JSON response with the access token and the authenticated user, and
+        HTTP status code
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object")
+    email = data.get("email")
+    password = data.get("password")
+    if not isinstance(email, str) or not isinstance(password, str) or not password:
+        raise ValidationError(
+            "email and password are required", payload={"fields": ["email", "password"]}
+        )
+
+    user = authenticate(get_request_session(), email, password)
+    return {
+        "access_token": token_service.issue(user),
+        "token_type": "Bearer",
+        "expires_in": token_service.ttl,
+        "user": {"id": user.id, "email": user.email, "role": user.role},
+    }, 200
+
+
+@auth_bp.route("/me", methods=["GET"])
+@login_required
+def me() -> tuple[dict[str, Any], int]:
+    """Return the caller as identified by the access token.
+
+    Returns:
+        JSON response with user ID and role, and HTTP status code
+    """
+    claims = current_claims()
+    return {"user": {"id": claims.user_id, "role": claims.role}}, 200
+
+
+@auth_bp.route("/logout", methods=["POST"])
+@login_required
+def logout() -> tuple[dict[str, Any], int]:
+    """Revoke the caller's access token.
+
+    Returns:
+        Empty JSON response and HTTP status code
+    """
+    token_service.revoke(get_request_session(), current_claims())
+    return {}, 200
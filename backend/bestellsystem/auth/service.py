@@ -0,0 +1,59 @@
+"""User authentication."""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from bestellsystem.auth.passwords import PasswordHasher, password_hasher
+from bestellsystem.models import User
+from bestellsystem.utils.errors import UnauthorizedError
+from bestellsystem.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def set_password(user: User, password: str, hasher: PasswordHasher | None = None) -> None:
+    """Hash and store a new password for a user.
+
+    Args:
+        user: User to update
+        password: Plaintext password
+        hasher: Password hasher, defaults to the one built from Config
+    """
+    hasher = hasher or password_hasher
+    user.password_hash = hasher.hash(password)
+
+
+def authenticate(
+    session: Session, email: str, password: str, hasher: PasswordHasher | None = None
+) -> User:
+    """Check a user's credentials.
+
+    Hashes made with outdated parameters are replaced after a successful
+    login, while the plaintext password is at hand; the change is committed
+    with the session.
+
+    Args:
+        session: Database session
+        email: Email address of the user
+        password: Plaintext password
+        hasher: Password hasher, defaults to the one built from Config
+
+    Returns:
+        Authenticated user
+
+    Raises:
+        UnauthorizedError: If the email is unknown or the password is wrong
+        ServiceUnavailableError: If password hashing is saturated
+    """
+    hasher = hasher or password_hasher
+    user = session.scalars(select(User).where(User.email == email)).one_or_none()
+    if user is None:
+        hasher.verify_dummy(password)
+        raise UnauthorizedError("Invalid email or password")
+    if not hasher.verify(user.password_hash, password):
+        raise UnauthorizedError("Invalid email or password")
+
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hasher.hash(password)
+        logger.info("Upgraded password hash", extra={"user_id": user.id})
+    return user
@@ -0,0 +1,352 @@
+"""Signed access tokens, verification cache and revocation list."""
+
+import functools
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, TypeVar, cast
+
+from flask import g, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from bestellsystem.config import Config
+from bestellsystem.db import SessionLocal, use_primary
+from bestellsystem.models import RevokedToken, User
+from bestellsystem.utils.cache import TTLCache
+from bestellsystem.utils.errors import ForbiddenError, UnauthorizedError
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter
+
+TOKEN_VERIFICATIONS = Counter(
+    "auth_token_verifications_total", "Access token checks by outcome", ("result",)
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Rows of expired revocations are deleted at most this often per worker
+PURGE_INTERVAL = 60.0
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class TokenClaims:
+    """Verified contents of an access token."""
+
+    user_id: int
+    role: str
+    jti: str
+    expires_at: float
+
+
+class RevocationList:
+    """IDs of revoked tokens, mirrored from the database into memory.
+
+    Checks are a set lookup. The set is loaded on first use, and every check
+    waits until that load is complete; afterwards the first check after
+    ``refresh_seconds`` reloads it in a background thread and the checks use
+    the current copy meanwhile, so a token revoked in another worker is
+    rejected here after about that delay; revocations made by this process
+    apply immediately. Rows of expired tokens are deleted
+    while reloading, at most every PURGE_INTERVAL seconds.
+    """
+
+    def __init__(self, refresh_seconds: float, background: bool = True) -> None:
+        """Initialize revocation list.
+
+        Args:
+            refresh_seconds: Maximum age of the in-memory copy
+            background: Reload in a background thread instead of the check
+                that noticed the copy is due
+        """
+        self.refresh_seconds = refresh_seconds
+        self.background = background
+        self._revoked: frozenset[str] = frozenset()
+        self._local: dict[str, float] = {}
+        self._loaded_at = float("-inf")
+        self._checked_at = float("-inf")
+        self._purged_at = float("-inf")
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Create the lock; a forked process must not inherit a held one."""
+        self._refresh_lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        """Check whether a token ID has been revoked.
+
+        Args:
+            jti: Token ID
+
+        Returns:
+            True if the token must be rejected
+        """
+        if self._loaded_at == float("-inf"):
+            self._load_first()
+        elif time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self._start_refresh()
+        return jti in self._revoked or jti in self._local
+
+    def revoke(self, session: Session, claims: TokenClaims) -> None:
+        """Revoke a token until it expires.
+
+        The row is written with the session; the caller commits.
+
+        Args:
+            session: Database session
+            claims: Claims of the token to revoke
+        """
+        expires_at = datetime.fromtimestamp(claims.expires_at, timezone.utc)
+        session.merge(RevokedToken(jti=claims.jti, expires_at=expires_at))
+        self._local[claims.jti] = claims.expires_at
+
+    def _load_first(self) -> None:
+        """Load the revoked token IDs, waiting for a load already running.
+
+        No token is accepted before the list was loaded once; until then,
+        every check retries the load.
+        """
+        with self._refresh_lock:
+            if self._loaded_at == float("-inf"):
+                self._checked_at = time.monotonic()
+                self._try_refresh()
+
+    def _start_refresh(self) -> None:
+        """Reload the revoked token IDs unless another thread is doing so."""
+        if not self._refresh_lock.acquire(blocking=False):
+            # Another thread is reloading, use the current copy meanwhile
+            return
+        self._checked_at = time.monotonic()
+        if self.background:
+            threading.Thread(
+                target=self._refresh_and_release, name="revocation-refresh", daemon=True
+            ).start()
+            return
+        self._refresh_and_release()
+
+    def _refresh_and_release(self) -> None:
+        """Reload with the lock held by the caller, then release it."""
+        try:
+            self._try_refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _try_refresh(self) -> None:
+        """Reload, keeping the last copy if the database cannot be read."""
+        try:
+            self._refresh()
+        except Exception:
+            logger.warning("Could not load revoked tokens", exc_info=True)
+
+    def _refresh(self) -> None:
+        """Delete expired rows if due and reload the revoked token IDs."""
+        with SessionLocal() as session:
+            use_primary(session)
+            now = datetime.now(timezone.utc)
+            if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                self._purged_at = time.monotonic()
+                session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+                session.commit()
+            self._revoked = frozenset(
+                session.scalars(select(RevokedToken.jti).where(RevokedToken.expires_at > now))
+            )
+        self._loaded_at = time.monotonic()
+        wall_now = time.time()
+        for jti, expires_at in list(self._local.items()):
+            if expires_at <= wall_now or jti in self._revoked:
+                self._local.pop(jti, None)
+
+    def clear(self) -> None:
+        """Forget all revocations and force a reload on the next check."""
+        self._revoked = frozenset()
+        self._local.clear()
+        self._loaded_at = float("-inf")
+        self._checked_at = float("-inf")
+
+
+class TokenService:
+    """Issue and verify signed, short-lived access tokens.
+
+    Tokens carry the user ID and role, signed with ``SECRET_KEY``, so
+    authenticated requests need no database lookup. Verified tokens are kept
+    in a bounded cache to skip signature checks and decoding for the
+    following requests of the same client.
+    """
+
+    def __init__(
+        self,
+        secret_key: str,
+        ttl: int,
+        cache_size: int,
+        revocations: RevocationList,
+    ) -> None:
+        """Initialize token service.
+
+        Args:
+            secret_key: Key used to sign tokens
+            ttl: Token lifetime in seconds
+            cache_size: Maximum number of cached verified tokens
+            revocations: Revocation list checked on every verification
+        """
+        self.ttl = ttl
+        self.revocations = revocations
+        self._serializer = URLSafeTimedSerializer(secret_key, salt="access-token")
+        self._cache: TTLCache[TokenClaims] = TTLCache(cache_size, ttl)
+
+    def issue(self, user: User) -> str:
+        """Create an access token for a user.
+
+        Args:
+            user: Authenticated user
+
+        Returns:
+            Signed token
+        """
+        claims = {"sub": user.id, "role": user.role, "jti": os.urandom(16).hex()}
+        return self._serializer.dumps(claims)
+
+    def verify(self, token: str) -> TokenClaims:
+        """Check a token and return its claims.
+
+        Args:
+            token: Token from the Authorization header
+
+        Returns:
+            Claims of the token
+
+        Raises:
+            UnauthorizedError: If the token is invalid, expired or revoked
+        """
+        claims = self._cache.get(token)
+        if claims is None:
+            TOKEN_VERIFICATIONS.inc("miss")
+            claims = self._decode(token)
+            self._cache.set(token, claims, ttl=claims.expires_at - time.time())
+        else:
+            TOKEN_VERIFICATIONS.inc("cached")
+        if claims.expires_at <= time.time():
+            self._cache.delete(token)
+            raise UnauthorizedError("Token expired")
+        if self.revocations.is_revoked(claims.jti):
+            self._cache.delete(token)
+            raise UnauthorizedError("Token revoked")
+        return claims
+
+    def _decode(self, token: str) -> TokenClaims:
+        """Check the signature and age of a token."""
+        try:
+            data, issued_at = self._serializer.loads(token, max_age=self.ttl, return_timestamp=True)
+            return TokenClaims(
+                user_id=int(data["sub"]),
+                role=str(data["role"]),
+                jti=str(data["jti"]),
+                expires_at=issued_at.timestamp() + self.ttl,
+            )
+        except SignatureExpired as e:
+            TOKEN_VERIFICATIONS.inc("expired")
+            raise UnauthorizedError("Token expired") from e
+        except (BadSignature, KeyError, TypeError, ValueError) as e:
+            TOKEN_VERIFICATIONS.inc("invalid")
+            raise UnauthorizedError("Invalid token") from e
+
+    def revoke(self, session: Session, claims: TokenClaims) -> None:
+        """Revoke a token, e.g. on logout.
+
+        Args:
+            session: Database session; the caller commits
+            claims: Claims of the token to revoke
+        """
+        self.revocations.revoke(session, claims)
+
+
+token_service = TokenService(
+    Config.SECRET_KEY,
+    ttl=Config.ACCESS_TOKEN_TTL,
+    cache_size=Config.TOKEN_CACHE_SIZE,
+    revocations=RevocationList(Config.TOKEN_REVOCATION_REFRESH_SECONDS),
+)
+
+
+def verify_authorization(header: str) -> TokenClaims:
+    """Verify the bearer token of an Authorization header.
+
+    Args:
+        header: Value of the Authorization header, empty if there is none
+
+    Returns:
+        Claims of the token
+
+    Raises:
+        UnauthorizedError: If there is no valid bearer token
+    """
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise UnauthorizedError("Authentication required")
+    return token_service.verify(token.strip())
+
+
+def current_claims() -> TokenClaims:
+    """Verify the bearer token of the current request.
+
+    The claims are stored on ``flask.g`` so they are verified once per request.
+
+    Returns:
+        Claims of the caller's token
+
+    Raises:
+        UnauthorizedError: If there is no valid bearer token
+    """
+    claims: TokenClaims | None = g.get("token_claims")
+    if claims is not None:
+        return claims
+    claims = verify_authorization(request.headers.get("Authorization", ""))
+    g.token_claims = claims
+    g.user_id = claims.user_id
+    return claims
+
+
+def login_required(view: F) -> F:
+    """Require a valid access token for a view.
+
+    Args:
+        view: View function
+
+    Returns:
+        Wrapped view function
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        current_claims()
+        return view(*args, **kwargs)
+
+    return cast(F, wrapper)
+
+
+def require_role(*roles: str) -> Callable[[F], F]:
+    """Require a valid access token with one of the given roles.
+
+    Args:
+        *roles: Accepted roles
+
+    Returns:
+        Decorator for view functions
+    """
+
+    def decorator(view: F) -> F:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            claims = current_claims()
+            if claims.role not in roles:
+                raise ForbiddenError("Insufficient role", payload={"required": list(roles)})
+            return view(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
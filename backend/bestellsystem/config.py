@@ -14,15 +14,212 @@ class Config:
     # Server
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    # Worker processes serving the app; gunicorn.conf.py exports GUNICORN_WORKERS,
+    # uvicorn --workers defaults to WEB_CONCURRENCY
+    WORKERS: int = int(os.getenv("GUNICORN_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
 
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "False").lower() in ("true", "1", "yes")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_QUEUE_POLICY: str = os.getenv("LOG_QUEUE_POLICY", "drop")
+    LOG_BATCH_SIZE: int = int(os.getenv("LOG_BATCH_SIZE", "100"))
+    LOG_FLUSH_INTERVAL: float = float(os.getenv("LOG_FLUSH_INTERVAL", "0.2"))
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+    LOG_REQUESTS: bool = os.getenv("LOG_REQUESTS", "True").lower() in ("true", "1", "yes")
+
+    # Instrumentation
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "False").lower() in ("true", "1", "yes")
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "yes")
+    # Shared directory for aggregating metrics of all Gunicorn workers
+    METRICS_DIR: str = os.getenv("METRICS_DIR", "")
+    # Bearer token required to read /api/v1/metrics (empty: no token required)
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
 
     # Database (for future use)
     DATABASE_URL: str = os.getenv(
         "DATABASE_URL", "sqlite:///./bestellsystem.db"
     )
+    # Comma separated read replica URLs (empty: all queries use DATABASE_URL)
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    # Clients read from the primary for this many seconds after they wrote
+    DB_READ_YOUR_WRITES_SECONDS: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+    # Seconds an unreachable replica is skipped before it is tried again
+    DB_REPLICA_RETRY_SECONDS: float = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Ping connections idle longer than this on checkout (0: always, -1: never)
+    DB_PING_IDLE_SECONDS: float = float(os.getenv("DB_PING_IDLE_SECONDS", "30"))
+    # Log every statement through SQLAlchemy (very verbose)
+    DB_ECHO: bool = os.getenv("DB_ECHO", "False").lower() in ("true", "1", "yes")
+    # Log statements slower than this with normalized SQL (0: off)
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    # Warn when a request runs the same statement this often, e.g. N+1 (0: off)
+    DB_REPEATED_QUERY_THRESHOLD: int = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+    # Warn when a request runs more queries than this (0: off)
+    DB_QUERY_BUDGET: int = int(os.getenv("DB_QUERY_BUDGET", "0"))
+
+    # Password hashing (werkzeug method string with cost parameters)
+    PASSWORD_HASH_METHOD: str = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # Operations that may wait for a hashing thread before logins fail with 503
+    PASSWORD_HASH_QUEUE_DEPTH: int = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "8"))
+    PASSWORD_HASH_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+    # Access tokens
+    ACCESS_TOKEN_TTL: int = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    # Maximum delay until a token revoked in another worker is rejected
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = float(
+        os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5")
+    )
+
+    # Response cache: "memory" (per worker), "sqlite" (shared by all workers), "none"
+    # or "auto" (memory with one worker, sqlite with several)
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "auto")
+    RESPONSE_CACHE_PATH: str = os.getenv("RESPONSE_CACHE_PATH", "")
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+    # Response compression
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "True").lower() in (
+        "true",
+        "1",
+        "yes",
+    )
+    # Smaller responses are sent uncompressed; streamed responses are always compressed
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+    COMPRESSION_LEVEL: int = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Orders
+    ORDERS_BULK_BATCH_SIZE: int = int(os.getenv("ORDERS_BULK_BATCH_SIZE", "1000"))
+    ORDERS_BULK_MAX_ORDERS: int = int(os.getenv("ORDERS_BULK_MAX_ORDERS", "10000"))
+    # Load orders with COPY on PostgreSQL instead of batched INSERT statements
+    ORDERS_BULK_USE_COPY: bool = os.getenv("ORDERS_BULK_USE_COPY", "True").lower() in (
+        "true",
+        "1",
+        "yes",
+    )
+    ORDERS_PAGE_SIZE: int = int(os.getenv("ORDERS_PAGE_SIZE", "50"))
+    ORDERS_MAX_PAGE_SIZE: int = int(os.getenv("ORDERS_MAX_PAGE_SIZE", "500"))
+    # Rows fetched per round trip by the server-side cursor of the order export
+    ORDERS_EXPORT_FETCH_SIZE: int = int(os.getenv("ORDERS_EXPORT_FETCH_SIZE", "1000"))
+
+    # Longest a client may wait on GET /orders/<id>/status in ASGI mode
+    ORDER_STATUS_MAX_WAIT: float = float(os.getenv("ORDER_STATUS_MAX_WAIT", "30"))
+    # Same under WSGI, where a waiting client occupies a worker; 0 answers at once
+    ORDER_STATUS_WSGI_MAX_WAIT: float = float(os.getenv("ORDER_STATUS_WSGI_MAX_WAIT", "0"))
+    ORDER_STATUS_POLL_INTERVAL: float = float(os.getenv("ORDER_STATUS_POLL_INTERVAL", "1.0"))
+
+    # ASGI mode: threads running the Flask (sync) views
+    ASGI_WSGI_THREADS: int = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+
+    # Server-Sent Events: "local" (single process), "sqlite" or "postgres" (LISTEN/NOTIFY)
+    EVENTS_BACKEND: str = os.getenv("EVENTS_BACKEND", "local")
+    EVENTS_SQLITE_PATH: str = os.getenv("EVENTS_SQLITE_PATH", "")
+    EVENTS_POLL_INTERVAL: float = float(os.getenv("EVENTS_POLL_INTERVAL", "0.2"))
+    # Events buffered per stream before a slow client is disconnected
+    EVENTS_QUEUE_SIZE: int = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+    # Profiling (opt-in): cProfile a fraction of requests and keep stack
+    # samples of requests slower than PROFILING_SLOW_MS (0: off)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() in (
+        "true",
+        "1",
+        "yes",
+    )
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))
+    PROFILING_SLOW_MS: float = float(os.getenv("PROFILING_SLOW_MS", "1000"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    # Slowest profiles kept per worker and entries per profile
+    PROFILING_KEEP: int = int(os.getenv("PROFILING_KEEP", "20"))
+    PROFILING_TOP_N: int = int(os.getenv("PROFILING_TOP_N", "25"))
+    # Bearer token for /api/v1/debug/profiles (endpoint disabled when empty)
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+
+    # Rate limits as "N/s", "N/m" or "N/h" with optional ":burst" (empty: off)
+    RATE_LIMIT_GLOBAL: str = os.getenv("RATE_LIMIT_GLOBAL", "")
+    RATE_LIMIT_CLIENT: str = os.getenv("RATE_LIMIT_CLIENT", "")
+    # Comma separated endpoint=rate pairs, shared by all clients of the route
+    RATE_LIMIT_ROUTES: str = os.getenv("RATE_LIMIT_ROUTES", "")
+    # Bucket state: "memory" (per worker) or "mmap" (shared by the workers of a host)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_PATH: str = os.getenv("RATE_LIMIT_PATH", "")
+    RATE_LIMIT_SLOTS: int = int(os.getenv("RATE_LIMIT_SLOTS", "65536"))
+    # Header identifying clients behind a proxy, e.g. X-Forwarded-For (empty: remote address)
+    RATE_LIMIT_CLIENT_HEADER: str = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+    # Proxies appending to that header; the client is the entry this many
+    # places from the right, earlier entries are set by the client
+    RATE_LIMIT_TRUSTED_PROXIES: int = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))
+    RATE_LIMIT_EXEMPT: str = os.getenv("RATE_LIMIT_EXEMPT", "api_v1.health,api_v1.metrics")
+    # Load shedding: concurrent requests per worker and how long a request may
+    # wait for a slot; requests queued longer than ADMISSION_MAX_QUEUE_MS in
+    # front of the app (X-Request-Start header) are dropped (0: off)
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0"))
+    ADMISSION_MAX_QUEUE_MS: float = float(os.getenv("ADMISSION_MAX_QUEUE_MS", "0"))
+
+    # Idempotency-Key handling of POST requests: lifetime of stored responses,
+    # responses cached per worker, how long a retry waits for a running first
+    # attempt and after how long a claim counts as abandoned (must exceed the
+    # longest request, e.g. the Gunicorn timeout)
+    IDEMPOTENCY_ENABLED: bool = os.getenv("IDEMPOTENCY_ENABLED", "True").lower() in (
+        "true",
+        "1",
+        "yes",
+    )
+    IDEMPOTENCY_TTL: float = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+    IDEMPOTENCY_WAIT_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+    IDEMPOTENCY_LOCK_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+    # Endpoints whose responses are never stored (login responses carry tokens)
+    IDEMPOTENCY_EXEMPT: str = os.getenv("IDEMPOTENCY_EXEMPT", "api_v1.auth.login")
+
+    # Order IDs: node range of this host, disjoint between hosts sharing a
+    # database, and the directory of the node files (default: temp directory)
+    ID_NODE_BASE: int = int(os.getenv("ID_NODE_BASE", "0"))
+    ID_NODE_COUNT: int = int(os.getenv("ID_NODE_COUNT", "1024"))
+    ID_NODE_DIR: str = os.getenv("ID_NODE_DIR", "")
+    # Milliseconds the ID generator may run ahead of a clock that stepped back
+    ID_MAX_CLOCK_DRIFT_MS: int = int(os.getenv("ID_MAX_CLOCK_DRIFT_MS", "1000"))
+
+    # Transactional outbox: webhooks notified of order changes (comma-separated
+    # URLs and topics, "" for all topics), signed with the secret if set
+    OUTBOX_WEBHOOK_URLS: str = os.getenv("OUTBOX_WEBHOOK_URLS", "")
+    OUTBOX_WEBHOOK_TOPICS: str = os.getenv("OUTBOX_WEBHOOK_TOPICS", "")
+    OUTBOX_WEBHOOK_SECRET: str = os.getenv("OUTBOX_WEBHOOK_SECRET", "")
+    OUTBOX_WEBHOOK_TIMEOUT: float = float(os.getenv("OUTBOX_WEBHOOK_TIMEOUT", "10"))
+    # Outbox worker: messages claimed at once, concurrent deliveries, polling
+    # interval when idle, lease of a claimed message (must exceed the longest
+    # delivery), attempts and exponential backoff between them, and the port
+    # serving its metrics (0 disables)
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    OUTBOX_CONCURRENCY: int = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+    OUTBOX_LEASE_SECONDS: float = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "12"))
+    OUTBOX_BACKOFF_BASE: float = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+    OUTBOX_BACKOFF_MAX: float = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+    OUTBOX_METRICS_PORT: int = int(os.getenv("OUTBOX_METRICS_PORT", "0"))
+
+    # Product catalog: seconds between checks of the catalog version (changes
+    # are searchable after at most this plus the rebuild time), rebuilding
+    # changed snapshots in a background thread, and search result limits
+    CATALOG_REFRESH_INTERVAL: float = float(os.getenv("CATALOG_REFRESH_INTERVAL", "1"))
+    CATALOG_REFRESH_IN_BACKGROUND: bool = os.getenv(
+        "CATALOG_REFRESH_IN_BACKGROUND", "True"
+    ).lower() in ("true", "1", "yes")
+    CATALOG_SEARCH_LIMIT: int = int(os.getenv("CATALOG_SEARCH_LIMIT", "20"))
+    CATALOG_SEARCH_MAX_LIMIT: int = int(os.getenv("CATALOG_SEARCH_MAX_LIMIT", "100"))
+
+    # Health check
+    HEALTH_CHECK_DB: bool = os.getenv("HEALTH_CHECK_DB", "False").lower() in ("true", "1", "yes")
+    HEALTH_DB_PROBE_TTL: float = float(os.getenv("HEALTH_DB_PROBE_TTL", "5"))
 
     @classmethod
     def get(cls, key: str, default: Any = None) -> Any:
@@ -1,9 +1,55 @@
 """Database configuration and setup using SQLAlchemy."""
 
-from sqlalchemy import create_engine
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Any, cast
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import (
+    CompoundSelect,
+    Engine,
+    ExceptionContext,
+    Select,
+    create_engine,
+    event,
+    make_url,
+    text,
+)
+from sqlalchemy import exc as sqlalchemy_exc
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import ConnectionPoolEntry, PoolProxiedConnection, QueuePool
 
 from bestellsystem.config import Config
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Gauge, Histogram
+from bestellsystem.utils.timing import add_phase
+
+logger = get_logger(__name__)
+
+# Pool metrics are labelled with the engine: "primary" or the replica's host
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size", ("engine",))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ("engine",))
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ("engine",))
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled connection",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that timed out", ("engine",))
+DB_POOL_PINGS = Counter("db_pool_pings_total", "Liveness pings of idle connections", ("engine",))
+DB_POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations_total", "Invalidated connections", ("engine", "kind")
+)
+DB_ROUTED_STATEMENTS = Counter(
+    "db_routed_statements_total", "Statements routed by target database", ("target",)
+)
+DB_SESSIONS_LEAKED = Counter(
+    "db_sessions_leaked_total", "Sessions still open at the end of a request"
+)
 
 
 class Base(DeclarativeBase):
@@ -12,23 +58,481 @@ class Base(DeclarativeBase):
     pass
 
 
-# Create engine using DATABASE_URL from config
-engine = create_engine(
-    Config.DATABASE_URL,
-    echo=Config.DEBUG,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-)
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool publishing checkout wait times, timeouts and usage metrics."""
+
+    def __init__(self, creator: Any, engine_label: str = "primary", **kw: Any) -> None:
+        """Initialize pool.
+
+        Args:
+            creator: Function returning a new DBAPI connection
+            engine_label: Value of the ``engine`` label of the pool metrics,
+                passed to create_engine() as ``engine_label``
+            **kw: QueuePool options
+        """
+        super().__init__(creator, **kw)
+        self.engine_label = engine_label
+
+    def recreate(self) -> QueuePool:
+        """Create a new pool with the same options, e.g. on engine.dispose()."""
+        pool = super().recreate()
+        cast(InstrumentedQueuePool, pool).engine_label = self.engine_label
+        return pool
+
+    def connect(self) -> PoolProxiedConnection:
+        """Check out a connection, recording how long the caller waited."""
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except sqlalchemy_exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(self.engine_label)
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            DB_POOL_CHECKOUT_SECONDS.observe(waited, self.engine_label)
+            add_phase("db_checkout", waited)
+        self._update_gauges()
+        return connection
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        """Return a connection and publish the new pool usage."""
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        """Publish the current pool usage of this process."""
+        checked_out = self.checkedout()
+        DB_POOL_SIZE.set(self.size(), self.engine_label)
+        DB_POOL_CHECKED_OUT.set(checked_out, self.engine_label)
+        DB_POOL_OVERFLOW.set(max(0, checked_out - self.size()), self.engine_label)
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _install_liveness_check(engine: Engine, ping_idle_seconds: float, label: str) -> None:
+    """Ping connections on checkout only if they were idle for a while.
+
+    ``pool_pre_ping`` pings on every checkout, which costs a round trip per
+    request. Connections that were in use moments ago are almost certainly
+    still alive, so only those idle longer than ``ping_idle_seconds`` are
+    pinged. A failed ping raises DisconnectionError, which makes the pool
+    discard the connection and retry with a fresh one.
+
+    Args:
+        engine: Engine to instrument
+        ping_idle_seconds: Idle time after which a connection is pinged,
+            0 pings on every checkout and a negative value disables pinging
+        label: Value of the ``engine`` label of the metrics
+    """
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection: Any, connection_record: ConnectionPoolEntry) -> None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(
+        dbapi_connection: Any, connection_record: ConnectionPoolEntry, connection_proxy: Any
+    ) -> None:
+        if ping_idle_seconds < 0:
+            return
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < ping_idle_seconds:
+            return
+        DB_POOL_PINGS.inc(label)
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise sqlalchemy_exc.DisconnectionError("Connection failed liveness check") from e
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        DB_POOL_INVALIDATIONS.inc(label, "hard")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        DB_POOL_INVALIDATIONS.inc(label, "soft")
+
+
+def create_db_engine(url: str, label: str = "primary") -> Engine:
+    """Create an engine with pool settings and instrumentation from Config.
+
+    Args:
+        url: Database URL
+        label: Value of the ``engine`` label of its pool metrics
+
+    Returns:
+        SQLAlchemy engine
+    """
+    options: dict[str, Any] = {"echo": Config.DB_ECHO}
+    # Only dialects that pool with QueuePool accept the sizing options;
+    # in-memory SQLite for example keeps one connection per thread
+    parsed_url = make_url(url)
+    pool_class = parsed_url.get_dialect().get_pool_class(parsed_url)  # type: ignore[attr-defined]
+    if issubclass(pool_class, QueuePool):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            engine_label=label,
+        )
+    new_engine = create_engine(url, **options)
+    _install_liveness_check(new_engine, Config.DB_PING_IDLE_SECONDS, label)
+    return new_engine
+
+
+class ReplicaRouter:
+    """Round-robin selection of healthy read replicas.
+
+    A replica that fails with a disconnect or cannot be connected to is
+    skipped for ``retry_seconds``; when no replica is healthy, reads go to the
+    primary.
+    """
+
+    def __init__(self, replicas: list[Engine], retry_seconds: float = 30.0) -> None:
+        """Initialize router.
+
+        Args:
+            replicas: Engines of the read replicas
+            retry_seconds: How long an unhealthy replica is skipped
+        """
+        self.replicas = replicas
+        self.retry_seconds = retry_seconds
+        self._next = itertools.count()
+        self._unhealthy_until: dict[Engine, float] = {}
+        for replica in replicas:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def _on_error(self, context: ExceptionContext) -> None:
+        """Take a replica out of rotation after a connection failure."""
+        if context.is_disconnect or context.connection is None:
+            self.mark_unhealthy(context.engine)
+
+    def mark_unhealthy(self, replica: Engine | None) -> None:
+        """Skip a replica for ``retry_seconds``."""
+        if replica is not None:
+            self._unhealthy_until[replica] = time.monotonic() + self.retry_seconds
+            logger.warning("Database replica marked unhealthy", extra={"replica": str(replica.url)})
+
+    def read_engine(self) -> Engine | None:
+        """Return the next healthy replica, or None if there is none."""
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next) % len(self.replicas)]
+            if self._unhealthy_until.get(replica, 0.0) <= now:
+                return replica
+        return None
+
+
+class RoutingSession(Session):
+    """Session sending read-only work to replicas and writes to the primary.
+
+    Plain SELECT statements go to a replica chosen once per session, so all
+    reads of a session see the same snapshot. Anything else (flushes, DML,
+    SELECT ... FOR UPDATE, textual SQL) goes to the primary, and once a
+    session has written it stays on the primary to read its own writes.
+    """
+
+    def __init__(self, *args: Any, router: ReplicaRouter | None = None, **kwargs: Any) -> None:
+        """Initialize session.
+
+        Args:
+            *args: Positional arguments for Session
+            router: Replica router, defaults to the one built from Config
+            **kwargs: Keyword arguments for Session
+        """
+        if kwargs.get("bind") is None:
+            kwargs["bind"] = get_engine()
+        super().__init__(*args, **kwargs)
+        self.router = router if router is not None else get_replica_router()
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Any:
+        """Pick the engine for a statement."""
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if not self.router.replicas or self.info.get("use_primary"):
+            return primary
+
+        is_read = (
+            not self._flushing
+            and isinstance(clause, (Select, CompoundSelect))
+            and getattr(clause, "_for_update_arg", None) is None
+        )
+        if not is_read:
+            self.info["use_primary"] = True
+            DB_ROUTED_STATEMENTS.inc("primary")
+            return primary
+
+        replica = self.info.get("replica")
+        if replica is None:
+            replica = self.router.read_engine() or primary
+            self.info["replica"] = replica
+        DB_ROUTED_STATEMENTS.inc("primary" if replica is primary else "replica")
+        return replica
+
+
+def use_primary(session: Session) -> None:
+    """Send all further statements of a session to the primary.
+
+    Args:
+        session: Session to pin to the primary
+    """
+    session.info["use_primary"] = True
+
+
+# Engines are created on first use, so importing models or running tools
+# that never query does not pay for engine construction
+_engine: Engine | None = None
+_replica_router: ReplicaRouter | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Return the engine for DATABASE_URL, creating it on first use.
+
+    Returns:
+        Engine of the primary database
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine(Config.DATABASE_URL)
+    return _engine
+
+
+def replica_label(url: str) -> str:
+    """Return the metrics label of a replica: the host of its URL.
+
+    Args:
+        url: Database URL of the replica
+
+    Returns:
+        "host:port", the host, or for SQLite the database file
+    """
+    parsed_url = make_url(url)
+    if parsed_url.host is None:
+        return parsed_url.database or "replica"
+    if parsed_url.port is None:
+        return parsed_url.host
+    return f"{parsed_url.host}:{parsed_url.port}"
+
+
+def get_replica_router() -> ReplicaRouter:
+    """Return the router over DATABASE_REPLICA_URLS, creating it on first use.
+
+    Returns:
+        Replica router, without replicas if none are configured
+    """
+    global _replica_router
+    if _replica_router is None:
+        with _engine_lock:
+            if _replica_router is None:
+                _replica_router = ReplicaRouter(
+                    [
+                        create_db_engine(url.strip(), label=replica_label(url.strip()))
+                        for url in Config.DATABASE_REPLICA_URLS.split(",")
+                        if url.strip()
+                    ],
+                    retry_seconds=Config.DB_REPLICA_RETRY_SECONDS,
+                )
+    return _replica_router
+
+
+def _dispose_engines_after_fork() -> None:
+    """Drop the connections inherited from the parent process.
+
+    With Gunicorn's preload_app the app is created before the workers are
+    forked; a pooled connection used by two processes corrupts its protocol
+    state. close=False leaves the sockets to the parent, the child opens its
+    own connections on demand.
+    """
+    global _engine_lock
+    _engine_lock = threading.Lock()
+    engines = [_engine] if _engine is not None else []
+    if _replica_router is not None:
+        engines += _replica_router.replicas
+    for db_engine in engines:
+        db_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+
+def __getattr__(name: str) -> Any:
+    """Create ``engine`` and ``replica_router`` when they are first accessed."""
+    if name == "engine":
+        return get_engine()
+    if name == "replica_router":
+        return get_replica_router()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Create session factory; sessions without a bind use get_engine()
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=None)
+
+# Cookie telling later requests of a client that it wrote recently
+PRIMARY_STICKY_COOKIE = "db_primary_until"
 
 
 def get_session() -> Session:
     """Get a new database session.
-    
+
+    The caller owns the session and must close it. Inside a request, prefer
+    get_request_session(); sessions from here that are still open when the
+    request ends are counted as leaked and closed.
+
     Returns:
         SQLAlchemy Session instance
     """
-    return SessionLocal()
+    session = SessionLocal()
+    if has_request_context():
+        g.setdefault("_db_unmanaged_sessions", []).append(session)
+    return session
+
+
+def get_request_session() -> Session:
+    """Get the session of the current request.
+
+    The session is created on first use, so requests that never touch the
+    database never check out a connection. It is committed after the view
+    returned a successful response, rolled back otherwise and closed when the
+    request ends.
+
+    Returns:
+        SQLAlchemy Session instance shared by the current request
+    """
+    session: Session | None = g.get("_db_session")
+    if session is None:
+        session = SessionLocal()
+        g._db_session = session
+        # Read-your-writes: a client that wrote recently reads from the primary
+        try:
+            primary_until = float(request.cookies.get(PRIMARY_STICKY_COOKIE, "0"))
+        except ValueError:
+            primary_until = 0.0
+        if primary_until > time.time():
+            use_primary(session)
+    return session
+
+
+def _commit_request_session(response: Response) -> Response:
+    """Commit the request session if the response is successful.
+
+    Committing before the response is sent turns commit failures into error
+    responses instead of losing them after the client saw a success.
+    """
+    session: Session | None = g.get("_db_session")
+    if session is not None and response.status_code < 400 and session.in_transaction():
+        start = time.perf_counter()
+        session.commit()
+        add_phase("db_commit", time.perf_counter() - start)
+
+        window = Config.DB_READ_YOUR_WRITES_SECONDS
+        router = getattr(session, "router", None)
+        if session.info.get("use_primary") and router and router.replicas and window > 0:
+            response.set_cookie(
+                PRIMARY_STICKY_COOKIE,
+                f"{time.time() + window:.3f}",
+                max_age=int(math.ceil(window)),
+                httponly=True,
+                samesite="Lax",
+            )
+    return response
+
+
+def _close_request_sessions(exception: BaseException | None) -> None:
+    """Roll back and close the request session and any leaked sessions."""
+    session: Session | None = g.pop("_db_session", None)
+    if session is not None:
+        try:
+            session.rollback()
+        finally:
+            session.close()
+
+    for unmanaged in g.pop("_db_unmanaged_sessions", []):
+        if unmanaged.in_transaction():
+            DB_SESSIONS_LEAKED.inc()
+            logger.warning(
+                "Database session was not closed before the end of the request",
+                extra={"endpoint": request.endpoint},
+            )
+            unmanaged.close()
+
+
+def register_session_handling(app: Flask) -> None:
+    """Manage request-scoped sessions for the app.
+
+    Must be called after register_request_timing so the commit runs before
+    the request duration is taken.
+
+    Args:
+        app: Flask application instance
+    """
+    app.after_request(_commit_request_session)
+    app.teardown_request(_close_request_sessions)
+
+
+class DatabaseProbe:
+    """Database readiness check with a cached result.
+
+    Load balancers poll the health endpoint several times per second per
+    worker; the probe only runs a query once per ``ttl`` seconds and serves the
+    cached result in between. Concurrent callers never wait for a running
+    probe but get the previous result instead.
+    """
+
+    def __init__(self, ttl: float = 5.0) -> None:
+        """Initialize probe.
+
+        Args:
+            ttl: Seconds a probe result is reused
+        """
+        self.ttl = ttl
+        self._result: dict[str, Any] | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, db_engine: Engine | None = None) -> dict[str, Any]:
+        """Return the (possibly cached) readiness of the database.
+
+        Args:
+            db_engine: Engine to probe, defaults to the application engine
+
+        Returns:
+            Dict with "status" ("ok" or "unavailable") and probe details
+        """
+        result = self._result
+        if result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return result
+        if not self._lock.acquire(blocking=False):
+            # Another thread is probing; a slightly stale answer is fine
+            return result or {"status": "unknown"}
+        try:
+            self._result = self._probe(db_engine or get_engine())
+            self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._lock.release()
+
+    def _probe(self, db_engine: Engine) -> dict[str, Any]:
+        """Run a trivial query against the database."""
+        start = time.perf_counter()
+        try:
+            with db_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception as e:
+            return {"status": "unavailable", "error": type(e).__name__}
+        result: dict[str, Any] = {
+            "status": "ok",
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        pool = db_engine.pool
+        if isinstance(pool, QueuePool):
+            result["pool"] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.checkedout() - pool.size()),
+            }
+        return result
+
+
+database_probe = DatabaseProbe(ttl=Config.HEALTH_DB_PROBE_TTL)
@@ -0,0 +1,27 @@
+"""Add (created_at, id) index on order for keyset pagination
+
+Revision ID: 8d4e2b7a1c90
+Revises: 3f2a9c1d7e4b
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4e2b7a1c90"
+down_revision: Union[str, Sequence[str], None] = "3f2a9c1d7e4b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_order_created_at_id", "order", ["created_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_order_created_at_id", table_name="order")
@@ -0,0 +1,46 @@
+"""Use BIGINT order IDs
+
+Order IDs are generated by the application (bestellsystem.utils.ids) and need
+64 bits. The serial default of order.id on PostgreSQL stays in place for
+writers still relying on it; its values stay far below generated IDs.
+
+Revision ID: a7c3e5f19d42
+Revises: c51f0e6a9b23
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e5f19d42"
+down_revision: Union[str, Sequence[str], None] = "c51f0e6a9b23"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("order_item") as batch_op:
+        batch_op.alter_column(
+            "order_id", existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False
+        )
+    with op.batch_alter_table("order") as batch_op:
+        batch_op.alter_column(
+            "id", existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("order") as batch_op:
+        batch_op.alter_column(
+            "id", existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False
+        )
+    with op.batch_alter_table("order_item") as batch_op:
+        batch_op.alter_column(
+            "order_id", existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False
+        )
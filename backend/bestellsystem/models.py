@@ -2,10 +2,21 @@
 
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, String
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from bestellsystem.db import Base
+from bestellsystem.utils.ids import next_id
 
 
 class User(Base):
@@ -20,3 +31,143 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
     )
+
+
+class Order(Base):
+    """Order placed by a POS terminal or partner integration."""
+
+    __tablename__ = "order"
+    __table_args__ = (Index("ix_order_created_at_id", "created_at", "id"),)
+
+    # Generated by the application, see bestellsystem.utils.ids
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=False, default=next_id
+    )
+    external_id: Mapped[str | None] = mapped_column(String(64), index=True)
+    source: Mapped[str] = mapped_column(String(50), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="received")
+    currency: Mapped[str] = mapped_column(String(3), nullable=False)
+    total_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+
+    items: Mapped[list["OrderItem"]] = relationship(
+        back_populates="order", cascade="all, delete-orphan"
+    )
+
+
+class OrderItem(Base):
+    """Line item of an order."""
+
+    __tablename__ = "order_item"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    order_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("order.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    sku: Mapped[str] = mapped_column(String(64), nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    unit_price_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    order: Mapped[Order] = relationship(back_populates="items")
+
+
+class RevokedToken(Base):
+    """Access token revoked before its expiry, e.g. on logout."""
+
+    __tablename__ = "revoked_token"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """Response stored for an Idempotency-Key, or a claim while its request runs."""
+
+    __tablename__ = "idempotency_key"
+
+    # Hash of method, path and header value
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # NULL while the first request is running
+    status_code: Mapped[int | None] = mapped_column(Integer)
+    content_type: Mapped[str | None] = mapped_column(String(255))
+    response_body: Mapped[bytes | None] = mapped_column(LargeBinary)
+    locked_until: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+
+
+class OutboxMessage(Base):
+    """Side effect of a transaction, delivered to one destination by the outbox worker."""
+
+    __tablename__ = "outbox_message"
+    __table_args__ = (Index("ix_outbox_message_status_available_at", "status", "available_at"),)
+
+    # Generated by the application, so messages sort by creation time
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=False, default=next_id
+    )
+    topic: Mapped[str] = mapped_column(String(100), nullable=False)
+    destination: Mapped[str] = mapped_column(String(255), nullable=False)
+    # JSON document
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    # "pending" until delivered (the row is then deleted) or "dead" after the last attempt
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Set while a worker delivers the message; expired leases are claimed again
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime)
+    last_error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class CatalogVersion(Base):
+    """Single-row counter of catalog changes, see bestellsystem.products.catalog."""
+
+    __tablename__ = "catalog_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Incremented by every transaction changing categories or products
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # Version of the last transaction deleting a row
+    deleted_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class Category(Base):
+    """Menu category, nested below an optional parent category."""
+
+    __tablename__ = "category"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=False, default=next_id
+    )
+    parent_id: Mapped[int | None] = mapped_column(
+        BigInteger, ForeignKey("category.id", ondelete="CASCADE"), index=True
+    )
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Order among the siblings
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Catalog version of the last change
+    version: Mapped[int] = mapped_column(BigInteger, index=True, nullable=False, default=0)
+
+
+class Product(Base):
+    """Product of the menu."""
+
+    __tablename__ = "product"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=False, default=next_id
+    )
+    sku: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    category_id: Mapped[int | None] = mapped_column(
+        BigInteger, ForeignKey("category.id", ondelete="SET NULL"), index=True
+    )
+    price_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+    currency: Mapped[str] = mapped_column(String(3), nullable=False, default="EUR")
+    # Retired products stay for order history but are not offered
+    active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    # Catalog version of the last change
+    version: Mapped[int] = mapped_column(BigInteger, index=True, nullable=False, default=0)
@@ -0,0 +1,5 @@
+"""Orders package."""
+
+from bestellsystem.orders.routes import orders_bp
+
+__all__ = ["orders_bp"]
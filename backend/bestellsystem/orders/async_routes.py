@@ -0,0 +1,47 @@
+"""Native async order endpoints served by the ASGI application."""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from bestellsystem.auth.tokens import verify_authorization
+from bestellsystem.orders.status import load_order_status, parse_wait
+
+if TYPE_CHECKING:
+    from bestellsystem.asgi import AsgiApplication, AsyncRequest
+
+
+def register_async_routes(app: "AsgiApplication") -> None:
+    """Register the async order routes.
+
+    Args:
+        app: ASGI application
+    """
+    config = app.flask_app.config
+    max_wait = config.get("ORDER_STATUS_MAX_WAIT", 30)
+    poll_interval = config.get("ORDER_STATUS_POLL_INTERVAL", 1.0)
+
+    @app.route("/api/v1/orders/<int:order_id>/status", endpoint="api_v1.orders.order_status")
+    async def order_status(request: "AsyncRequest") -> tuple[dict[str, Any], int]:
+        """Long-poll the status of an order without holding a thread.
+
+        Same contract as the Flask view orders.order_status, including its
+        access token check; between polls the request holds neither a thread
+        nor a database connection.
+
+        Returns:
+            JSON response with the order status and HTTP status code
+        """
+        # The Flask hooks do not run here (admission control runs in the
+        # dispatcher); the first check loads the revocation list
+        await asyncio.to_thread(verify_authorization, request.headers.get("authorization", ""))
+        order_id = request.path_params["order_id"]
+        known = request.query.get("known")
+        wait = parse_wait(request.query.get("wait"), max_wait)
+        deadline = time.monotonic() + wait
+        while True:
+            status = await asyncio.to_thread(load_order_status, order_id)
+            remaining = deadline - time.monotonic()
+            if status != known or remaining <= 0:
+                return {"id": str(order_id), "status": status}, 200
+            await asyncio.sleep(min(poll_interval, remaining))
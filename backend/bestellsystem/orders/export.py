@@ -0,0 +1,168 @@
+"""Streaming export and serialization of orders."""
+
+import csv
+import io
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Row, Select, select
+from sqlalchemy.orm import Session
+
+from bestellsystem.models import Order, OrderItem
+
+CSV_COLUMNS = (
+    "order_id",
+    "external_id",
+    "source",
+    "status",
+    "currency",
+    "total_cents",
+    "created_at",
+    "sku",
+    "quantity",
+    "unit_price_cents",
+)
+
+# Number of serialized orders or CSV rows yielded to the server at once
+WRITE_BATCH = 500
+
+
+def order_to_dict(order: Order) -> dict[str, Any]:
+    """Serialize an order with its items.
+
+    Args:
+        order: Order with loaded items
+
+    Returns:
+        JSON-serializable dictionary
+    """
+    return {
+        "id": str(order.id),
+        "external_id": order.external_id,
+        "source": order.source,
+        "status": order.status,
+        "currency": order.currency,
+        "total_cents": order.total_cents,
+        "created_at": order.created_at.isoformat(),
+        "items": [
+            {"sku": item.sku, "quantity": item.quantity, "unit_price_cents": item.unit_price_cents}
+            for item in order.items
+        ],
+    }
+
+
+def export_statement(since: datetime | None = None, until: datetime | None = None) -> Select:
+    """Build the statement selecting flat order/item rows in keyset order.
+
+    Args:
+        since: Only orders created at or after this time
+        until: Only orders created before this time
+
+    Returns:
+        Select of order columns followed by item columns
+    """
+    statement = (
+        select(
+            Order.id,
+            Order.external_id,
+            Order.source,
+            Order.status,
+            Order.currency,
+            Order.total_cents,
+            Order.created_at,
+            OrderItem.sku,
+            OrderItem.quantity,
+            OrderItem.unit_price_cents,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    )
+    if since is not None:
+        statement = statement.where(Order.created_at >= since)
+    if until is not None:
+        statement = statement.where(Order.created_at < until)
+    return statement
+
+
+def _stream_rows(session: Session, statement: Select[Any], fetch_size: int) -> Iterator[Row[Any]]:
+    """Execute a statement with a server-side cursor and yield its rows.
+
+    With ``yield_per`` SQLAlchemy uses a server-side cursor where the driver
+    supports it (psycopg2 named cursors) and fetches ``fetch_size`` rows at a
+    time, so memory use does not depend on the size of the result.
+    """
+    result = session.execute(statement.execution_options(yield_per=fetch_size))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def stream_ndjson(session: Session, statement: Select[Any], fetch_size: int) -> Iterator[str]:
+    """Stream orders as newline-delimited JSON, one order with its items per line.
+
+    Args:
+        session: Database session
+        statement: Statement from export_statement()
+        fetch_size: Rows fetched from the database at a time
+
+    Yields:
+        Chunks of NDJSON lines
+    """
+    lines: list[str] = []
+    current: dict[str, Any] | None = None
+    current_id: int | None = None
+    for row in _stream_rows(session, statement, fetch_size):
+        if current is None or current_id != row.id:
+            if current is not None:
+                lines.append(json.dumps(current, separators=(",", ":")))
+                if len(lines) >= WRITE_BATCH:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+            current_id = row.id
+            current = {
+                "id": str(row.id),
+                "external_id": row.external_id,
+                "source": row.source,
+                "status": row.status,
+                "currency": row.currency,
+                "total_cents": row.total_cents,
+                "created_at": row.created_at.isoformat(),
+                "items": [],
+            }
+        if row.sku is not None:
+            current["items"].append(
+                {"sku": row.sku, "quantity": row.quantity, "unit_price_cents": row.unit_price_cents}
+            )
+    if current is not None:
+        lines.append(json.dumps(current, separators=(",", ":")))
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def stream_csv(session: Session, statement: Select[Any], fetch_size: int) -> Iterator[str]:
+    """Stream orders as CSV with one row per order item.
+
+    Args:
+        session: Database session
+        statement: Statement from export_statement()
+        fetch_size: Rows fetched from the database at a time
+
+    Yields:
+        Chunks of CSV text, starting with the header row
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for row in _stream_rows(session, statement, fetch_size):
+        writer.writerow((*row[:6], row.created_at.isoformat(), *row[7:]))
+        rows += 1
+        if rows >= WRITE_BATCH:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
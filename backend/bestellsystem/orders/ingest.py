@@ -0,0 +1,347 @@
+"""Streaming parsing and batched persistence of bulk order uploads."""
+
+import codecs
+import csv
+import io
+import json
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import IO, Any
+
+from sqlalchemy import Connection, insert
+
+from bestellsystem.models import Order, OrderItem
+from bestellsystem.orders.validation import OrderInput, validate_order
+from bestellsystem.outbox.destinations import destinations_for
+from bestellsystem.outbox.store import enqueue
+from bestellsystem.utils.errors import ValidationError
+from bestellsystem.utils.ids import next_ids
+from bestellsystem.utils.metrics import Counter, Histogram
+
+ORDERS_INGESTED = Counter(
+    "orders_ingested_total", "Orders received through bulk ingestion", ("result",)
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "orders_ingest_batch_seconds", "Time to persist one batch of orders", ("method",)
+)
+
+CHUNK_SIZE = 64 * 1024
+
+# Per-item errors beyond this many are only counted, to bound the response size
+MAX_REPORTED_ERRORS = 100
+
+_WHITESPACE = " \t\r\n"
+
+# Outbox topic of ingested batches
+ORDERS_CREATED = "orders.created"
+
+
+class _ParseError(Exception):
+    """A single item of the upload could not be decoded."""
+
+
+def iter_ndjson(stream: IO[bytes]) -> Iterator[Any]:
+    """Decode newline-delimited JSON one line at a time.
+
+    Lines that are not valid JSON are yielded as _ParseError instances so the
+    caller can report them without aborting the upload. Blank lines are skipped.
+
+    Args:
+        stream: Binary request body
+
+    Yields:
+        Decoded JSON value or _ParseError per non-blank line
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield _ParseError(str(e))
+
+
+def iter_json_array(stream: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Decode the objects of a top-level JSON array incrementally.
+
+    Only the current chunk and the element being decoded are held in memory.
+    Elements must be objects, which makes it unambiguous whether an element
+    has been read completely.
+
+    Args:
+        stream: Binary request body
+        chunk_size: Number of bytes read at a time
+
+    Yields:
+        Decoded element objects
+
+    Raises:
+        ValidationError: If the body is not a JSON array of objects
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + utf8.decode(chunk, final=eof)
+        position = 0
+        return True
+
+    def next_token() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ""
+
+    try:
+        if next_token() != "[":
+            raise ValidationError("Request body must be a JSON array")
+        position += 1
+        while True:
+            token = next_token()
+            if token == "]":
+                position += 1
+                break
+            if started:
+                if token != ",":
+                    raise ValidationError("Malformed JSON array")
+                position += 1
+                token = next_token()
+            if token != "{":
+                raise ValidationError("JSON array elements must be objects")
+            while True:
+                try:
+                    value, position = decoder.raw_decode(buffer, position)
+                    break
+                except json.JSONDecodeError as e:
+                    if not fill():
+                        raise ValidationError("Malformed JSON array") from e
+            started = True
+            yield value
+        if next_token():
+            raise ValidationError("Unexpected data after JSON array")
+    except UnicodeDecodeError as e:
+        raise ValidationError("Request body must be UTF-8 encoded") from e
+
+
+@dataclass
+class IngestResult:
+    """Outcome of a bulk ingestion."""
+
+    created: int = 0
+    failed: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, index: int, errors: dict[str, str]) -> None:
+        """Record a rejected item."""
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "errors": errors})
+
+
+def _use_copy(connection: Connection) -> bool:
+    """Check whether COPY is available on the connection."""
+    return connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2"
+
+
+def _copy_rows(
+    connection: Connection, table: str, columns: Iterable[str], rows: Iterable[Any]
+) -> None:
+    """Load rows with COPY ... FROM STDIN in CSV format."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{table}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _persist_with_copy(
+    connection: Connection, orders: list[OrderInput], order_ids: list[int], created_at: datetime
+) -> None:
+    """Persist a batch with COPY."""
+    _copy_rows(
+        connection,
+        "order",
+        ("id", "external_id", "source", "status", "currency", "total_cents", "created_at"),
+        (
+            (
+                order_id,
+                order.external_id,
+                order.source,
+                "received",
+                order.currency,
+                order.total_cents,
+                created_at.isoformat(),
+            )
+            for order_id, order in zip(order_ids, orders, strict=True)
+        ),
+    )
+    _copy_rows(
+        connection,
+        "order_item",
+        ("order_id", "sku", "quantity", "unit_price_cents"),
+        (
+            (order_id, item.sku, item.quantity, item.unit_price_cents)
+            for order_id, order in zip(order_ids, orders, strict=True)
+            for item in order.items
+        ),
+    )
+
+
+def _persist_with_insert(
+    connection: Connection, orders: list[OrderInput], order_ids: list[int], created_at: datetime
+) -> None:
+    """Persist a batch with multi-row INSERT statements."""
+    connection.execute(
+        insert(Order),
+        [
+            {
+                "id": order_id,
+                "external_id": order.external_id,
+                "source": order.source,
+                "status": "received",
+                "currency": order.currency,
+                "total_cents": order.total_cents,
+                "created_at": created_at,
+            }
+            for order_id, order in zip(order_ids, orders, strict=True)
+        ],
+    )
+    connection.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": order_id,
+                "sku": item.sku,
+                "quantity": item.quantity,
+                "unit_price_cents": item.unit_price_cents,
+            }
+            for order_id, order in zip(order_ids, orders, strict=True)
+            for item in order.items
+        ],
+    )
+
+
+def persist_orders(
+    connection: Connection, orders: list[OrderInput], use_copy: bool = True
+) -> list[int]:
+    """Persist a batch of validated orders.
+
+    Uses COPY on PostgreSQL with psycopg2 and batched INSERT statements
+    everywhere else. Runs in the transaction of the connection.
+
+    Args:
+        connection: Connection to the primary database
+        orders: Validated orders
+        use_copy: Use COPY where available
+
+    Returns:
+        IDs of the persisted orders, in the order of ``orders``
+    """
+    if not orders:
+        return []
+    created_at = datetime.now(timezone.utc)
+    order_ids = next_ids(len(orders))
+    method = "copy" if use_copy and _use_copy(connection) else "insert"
+    start = time.perf_counter()
+    if method == "copy":
+        _persist_with_copy(connection, orders, order_ids, created_at)
+    else:
+        _persist_with_insert(connection, orders, order_ids, created_at)
+    INGEST_BATCH_SECONDS.observe(time.perf_counter() - start, method)
+    return order_ids
+
+
+def _enqueue_created(
+    connection: Connection, orders: list[OrderInput], order_ids: list[int]
+) -> None:
+    """Announce a persisted batch to the outbox destinations subscribed to it."""
+    if not order_ids or not destinations_for(ORDERS_CREATED):
+        return
+    enqueue(
+        connection,
+        ORDERS_CREATED,
+        {
+            "orders": [
+                {
+                    "id": str(order_id),
+                    "external_id": order.external_id,
+                    "source": order.source,
+                    "currency": order.currency,
+                    "total_cents": order.total_cents,
+                }
+                for order_id, order in zip(order_ids, orders, strict=True)
+            ]
+        },
+    )
+
+
+def ingest_orders(
+    connection: Connection,
+    payloads: Iterable[Any],
+    batch_size: int,
+    max_orders: int,
+    use_copy: bool = True,
+) -> IngestResult:
+    """Validate and persist a stream of order payloads in batches.
+
+    Invalid items are reported in the result and skipped; valid ones are
+    written every ``batch_size`` orders, so memory use does not grow with the
+    size of the upload. Every batch is announced with an "orders.created"
+    outbox message in the same transaction.
+
+    Args:
+        connection: Connection to the primary database
+        payloads: Decoded order payloads, or _ParseError for undecodable items
+        batch_size: Number of orders persisted per batch
+        max_orders: Maximum number of orders accepted per upload
+        use_copy: Use COPY where available
+
+    Returns:
+        Number of created orders and the per-item errors
+
+    Raises:
+        ValidationError: If the upload contains more than ``max_orders`` items
+    """
+    result = IngestResult()
+    batch: list[OrderInput] = []
+    for index, payload in enumerate(payloads):
+        if index >= max_orders:
+            raise ValidationError(f"At most {max_orders} orders per request")
+        if isinstance(payload, _ParseError):
+            result.add_error(index, {"order": f"invalid JSON: {payload}"})
+            continue
+        order, errors = validate_order(payload)
+        if order is None:
+            result.add_error(index, errors)
+            continue
+        batch.append(order)
+        if len(batch) >= batch_size:
+            _enqueue_created(connection, batch, persist_orders(connection, batch, use_copy))
+            result.created += len(batch)
+            batch = []
+    _enqueue_created(connection, batch, persist_orders(connection, batch, use_copy))
+    result.created += len(batch)
+
+    ORDERS_INGESTED.inc("created", amount=result.created)
+    ORDERS_INGESTED.inc("rejected", amount=result.failed)
+    return result
@@ -0,0 +1,304 @@
+"""Order API endpoints."""
+
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from bestellsystem.auth.tokens import login_required, require_role
+from bestellsystem.db import get_request_session
+from bestellsystem.models import Order
+from bestellsystem.orders.export import export_statement, order_to_dict, stream_csv, stream_ndjson
+from bestellsystem.orders.ingest import ingest_orders, iter_json_array, iter_ndjson
+from bestellsystem.orders.status import load_order_status, parse_wait
+from bestellsystem.orders.validation import ORDER_STATUSES
+from bestellsystem.outbox import enqueue
+from bestellsystem.utils.errors import NotFoundError, ValidationError
+from bestellsystem.utils.events import format_sse, publish_after_commit, subscribe
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.pagination import encode_cursor, keyset_page, parse_limit
+from bestellsystem.utils.response_cache import cached, mark_changed
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+
+# Roles allowed to create orders and change their status
+STAFF_ROLES = ("staff", "admin")
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", stream_ndjson),
+    "csv": ("text/csv", stream_csv),
+}
+
+# Keyset of the order listing and export, backed by ix_order_created_at_id
+ORDER_KEYSET = (Order.created_at, Order.id)
+
+orders_bp = Blueprint("orders", __name__, url_prefix="/orders")
+
+logger = get_logger(__name__)
+
+
+@orders_bp.route("/bulk", methods=["POST"])
+@require_role(*STAFF_ROLES)
+def bulk_create() -> tuple[dict[str, Any], int]:
+    """Create many orders from an NDJSON or JSON array upload.
+
+    The body is decoded and validated while it is read and valid orders are
+    written in batches within the request transaction. Invalid orders are
+    skipped and reported by index in the details of a ValidationError
+    envelope. If no order was valid, the request fails with that error.
+
+    Returns:
+        JSON response with the number of created and rejected orders, and
+        HTTP status code 201, or 207 if some orders were rejected
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        payloads = iter_ndjson(request.stream)
+    elif request.mimetype == "application/json":
+        payloads = iter_json_array(request.stream)
+    else:
+        raise ValidationError(
+            "Unsupported content type",
+            payload={"supported": ["application/json", *NDJSON_MIMETYPES]},
+        )
+
+    session = get_request_session()
+    result = ingest_orders(
+        session.connection(),
+        payloads,
+        batch_size=current_app.config.get("ORDERS_BULK_BATCH_SIZE", 1000),
+        max_orders=current_app.config.get("ORDERS_BULK_MAX_ORDERS", 10000),
+        use_copy=current_app.config.get("ORDERS_BULK_USE_COPY", True),
+    )
+    mark_changed(session, "order", "order_item")
+    logger.info(
+        "Bulk order upload processed",
+        extra={"orders_created": result.created, "orders_failed": result.failed},
+    )
+
+    if not result.failed:
+        if not result.created:
+            raise ValidationError("Request contains no orders")
+        return {"created": result.created, "failed": 0}, 201
+
+    error = ValidationError(
+        f"{result.failed} orders were rejected",
+        payload={"failed": result.failed, "items": result.errors},
+    )
+    if not result.created:
+        raise error
+    return {"created": result.created, "failed": result.failed, **error.to_dict()}, 207
+
+
+def _datetime_arg(name: str) -> datetime | None:
+    """Parse an optional ISO 8601 query argument."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValidationError(f"{name} must be an ISO 8601 timestamp") from e
+
+
+@orders_bp.route("", methods=["GET"])
+@login_required
+@cached("order", "order_item")
+def list_orders() -> tuple[dict[str, Any], int]:
+    """List orders oldest first, one page at a time.
+
+    Pages are selected by keyset pagination on (created_at, id); pass the
+    ``next_cursor`` of a response as ``cursor`` to get the following page.
+
+    Returns:
+        JSON response with the orders of the page and the cursor of the next
+        page (None on the last page), and HTTP status code
+    """
+    limit = parse_limit(
+        request.args.get("limit"),
+        default=current_app.config.get("ORDERS_PAGE_SIZE", 50),
+        maximum=current_app.config.get("ORDERS_MAX_PAGE_SIZE", 500),
+    )
+    statement = keyset_page(
+        select(Order).options(selectinload(Order.items)),
+        ORDER_KEYSET,
+        limit,
+        request.args.get("cursor"),
+    )
+    orders = list(get_request_session().scalars(statement))
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor((orders[-1].created_at, orders[-1].id))
+    return {"data": [order_to_dict(order) for order in orders], "next_cursor": next_cursor}, 200
+
+
+@orders_bp.route("/<int:order_id>", methods=["GET"])
+@login_required
+def get_order(order_id: int) -> tuple[dict[str, Any], int]:
+    """Get a single order with its items.
+
+    Args:
+        order_id: ID of the order
+
+    Returns:
+        JSON response with the order and HTTP status code
+    """
+    order = get_request_session().get(Order, order_id, options=[selectinload(Order.items)])
+    if order is None:
+        raise NotFoundError("Order not found")
+    return order_to_dict(order), 200
+
+
+@orders_bp.route("/<int:order_id>/status", methods=["GET"])
+@login_required
+def order_status(order_id: int) -> tuple[dict[str, Any], int]:
+    """Get the status of an order, optionally waiting for a change.
+
+    With ``known`` set to the status the client already has, the response
+    is delayed until the status differs or ``wait`` seconds have passed.
+    Under WSGI the waiting request occupies a worker, so ``wait`` is capped
+    at ORDER_STATUS_WSGI_MAX_WAIT, by default 0; the ASGI application serves
+    this path with an async handler capped at ORDER_STATUS_MAX_WAIT instead
+    (see bestellsystem.asgi).
+
+    Args:
+        order_id: ID of the order
+
+    Returns:
+        JSON response with the order status and HTTP status code
+    """
+    known = request.args.get("known")
+    max_wait = current_app.config.get("ORDER_STATUS_WSGI_MAX_WAIT", 0)
+    wait = parse_wait(request.args.get("wait"), max_wait)
+    poll_interval = current_app.config.get("ORDER_STATUS_POLL_INTERVAL", 1.0)
+
+    # Every poll uses its own short-lived session, so no connection is held
+    # while sleeping
+    deadline = time.monotonic() + wait
+    while True:
+        status = load_order_status(order_id)
+        remaining = deadline - time.monotonic()
+        if status != known or remaining <= 0:
+            return {"id": str(order_id), "status": status}, 200
+        time.sleep(min(poll_interval, remaining))
+
+
+@orders_bp.route("/<int:order_id>/status", methods=["PUT"])
+@require_role(*STAFF_ROLES)
+def update_order_status(order_id: int) -> tuple[dict[str, Any], int]:
+    """Change the status of an order.
+
+    Subscribers of the order event stream are notified once the change is
+    committed; outbox destinations receive an "order.status_changed"
+    message written in the same transaction.
+
+    Args:
+        order_id: ID of the order
+
+    Returns:
+        JSON response with the new order status and HTTP status code
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object")
+    status = data.get("status")
+    if status not in ORDER_STATUSES:
+        raise ValidationError(
+            "Invalid order status",
+            payload={"status": "must be one of: " + ", ".join(ORDER_STATUSES)},
+        )
+
+    session = get_request_session()
+    order = session.get(Order, order_id)
+    if order is None:
+        raise NotFoundError("Order not found")
+    if order.status != status:
+        enqueue(
+            session,
+            "order.status_changed",
+            {"id": str(order_id), "status": status, "previous_status": order.status},
+        )
+        order.status = status
+        publish_after_commit(session, "order_status", {"id": str(order_id), "status": status})
+    return {"id": str(order_id), "status": status}, 200
+
+
+@orders_bp.route("/events", methods=["GET"])
+@login_required
+def order_events() -> Response:
+    """Stream order status changes as Server-Sent Events.
+
+    Pass ``order_id`` (repeatable) to receive only the changes of some
+    orders. A comment line is sent when nothing else was sent for
+    EVENTS_HEARTBEAT_SECONDS, so proxies keep the connection open. Clients
+    that do not keep up are disconnected with an ``evicted`` event and should
+    reload the status before reconnecting.
+
+    Returns:
+        Streamed text/event-stream response
+    """
+    try:
+        order_ids = {str(int(value)) for value in request.args.getlist("order_id")}
+    except ValueError as e:
+        raise ValidationError("order_id must be an integer") from e
+    heartbeat = current_app.config.get("EVENTS_HEARTBEAT_SECONDS", 15)
+
+    def generate() -> Iterator[str]:
+        # Runs after the request context is gone and holds no database session
+        with subscribe("order_status") as subscription:
+            yield f"retry: {int(heartbeat * 1000)}\n\n"
+            last_sent = time.monotonic()
+            while True:
+                item = subscription.get(timeout=heartbeat)
+                if subscription.evicted:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                if item is not None and (not order_ids or item.data.get("id") in order_ids):
+                    yield format_sse(item)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= heartbeat:
+                    yield ": heartbeat\n\n"
+                    last_sent = time.monotonic()
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@orders_bp.route("/export", methods=["GET"])
+@login_required
+def export_orders() -> Response:
+    """Stream all orders as NDJSON or CSV.
+
+    Query arguments: ``format`` (ndjson or csv), ``since`` and ``until``
+    (ISO 8601, created_at range). Rows are read through a server-side cursor
+    and written as they arrive, so memory use is constant regardless of the
+    number of orders.
+
+    Returns:
+        Streamed response
+    """
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        raise ValidationError("format must be one of: " + ", ".join(EXPORT_FORMATS))
+    mimetype, serialize = EXPORT_FORMATS[export_format]
+    statement = export_statement(_datetime_arg("since"), _datetime_arg("until"))
+    fetch_size = current_app.config.get("ORDERS_EXPORT_FETCH_SIZE", 1000)
+
+    def generate() -> Iterator[str]:
+        # Runs while the response is sent; the request session is closed
+        # when the stream ends
+        yield from serialize(get_request_session(), statement, fetch_size)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=orders.{export_format}"},
+    )
@@ -0,0 +1,67 @@
+"""Order status lookups shared by the sync and async order routes."""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import Order
+from bestellsystem.utils.errors import NotFoundError, ValidationError
+
+
+def order_status(session: Session, order_id: int) -> str:
+    """Return the status of an order.
+
+    Args:
+        session: Database session
+        order_id: ID of the order
+
+    Returns:
+        Order status
+
+    Raises:
+        NotFoundError: If the order does not exist
+    """
+    status = session.scalar(select(Order.status).where(Order.id == order_id))
+    if status is None:
+        raise NotFoundError("Order not found")
+    return status
+
+
+def load_order_status(order_id: int) -> str:
+    """Return the status of an order using a short-lived session.
+
+    Meant to be called from a worker thread outside of a request context.
+
+    Args:
+        order_id: ID of the order
+
+    Returns:
+        Order status
+
+    Raises:
+        NotFoundError: If the order does not exist
+    """
+    with SessionLocal() as session:
+        return order_status(session, order_id)
+
+
+def parse_wait(value: str | None, max_wait: float) -> float:
+    """Parse the ``wait`` argument of a status long-poll.
+
+    Args:
+        value: Raw query argument
+        max_wait: Upper bound in seconds
+
+    Returns:
+        Seconds to wait for a status change
+
+    Raises:
+        ValidationError: If the value is not a number
+    """
+    if value is None:
+        return 0.0
+    try:
+        wait = float(value)
+    except ValueError as e:
+        raise ValidationError("wait must be a number") from e
+    return max(0.0, min(wait, max_wait))
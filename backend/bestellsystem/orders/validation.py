@@ -0,0 +1,131 @@
+"""Validation of incoming order payloads."""
+
+import re
+from dataclasses import dataclass
+from typing import Any
+
+MAX_ITEMS_PER_ORDER = 500
+MAX_QUANTITY = 10000
+# Largest value of the INTEGER columns holding prices and totals
+MAX_CENTS = 2**31 - 1
+ORDER_STATUSES = ("received", "accepted", "preparing", "ready", "completed", "cancelled")
+
+_CURRENCY_PATTERN = re.compile(r"[A-Z]{3}")
+
+
+@dataclass(frozen=True, slots=True)
+class ItemInput:
+    """Validated order line item."""
+
+    sku: str
+    quantity: int
+    unit_price_cents: int
+
+
+@dataclass(frozen=True, slots=True)
+class OrderInput:
+    """Validated order."""
+
+    external_id: str | None
+    source: str
+    currency: str
+    items: tuple[ItemInput, ...]
+
+    @property
+    def total_cents(self) -> int:
+        """Order total in cents."""
+        return sum(item.quantity * item.unit_price_cents for item in self.items)
+
+
+def _int(value: Any) -> int | None:
+    """Return the value if it is an integer, rejecting booleans."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _string(
+    data: dict[str, Any],
+    field: str,
+    max_length: int,
+    errors: dict[str, str],
+    default: str | None = None,
+) -> str | None:
+    """Read an optional string field, recording an error if it is invalid.
+
+    A missing field and an explicit null both give ``default``.
+    """
+    value = data.get(field)
+    if value is None:
+        return default
+    if not isinstance(value, str) or not value.strip():
+        errors[field] = "must be a non-empty string"
+        return None
+    if len(value) > max_length:
+        errors[field] = f"must be at most {max_length} characters"
+        return None
+    return value
+
+
+def _validate_item(data: Any, prefix: str, errors: dict[str, str]) -> ItemInput | None:
+    """Validate one line item, recording errors under ``prefix``."""
+    if not isinstance(data, dict):
+        errors[prefix] = "must be an object"
+        return None
+    item_errors: dict[str, str] = {}
+    sku = _string(data, "sku", 64, item_errors)
+    if sku is None and "sku" not in item_errors:
+        item_errors["sku"] = "is required"
+    quantity = _int(data.get("quantity"))
+    if quantity is None or not 1 <= quantity <= MAX_QUANTITY:
+        item_errors["quantity"] = f"must be an integer between 1 and {MAX_QUANTITY}"
+    unit_price_cents = _int(data.get("unit_price_cents"))
+    if unit_price_cents is None or not 0 <= unit_price_cents <= MAX_CENTS:
+        item_errors["unit_price_cents"] = f"must be an integer between 0 and {MAX_CENTS}"
+    elif "quantity" not in item_errors and (quantity or 0) * unit_price_cents > MAX_CENTS:
+        item_errors["unit_price_cents"] = f"times quantity must be at most {MAX_CENTS}"
+    if item_errors or sku is None or quantity is None or unit_price_cents is None:
+        errors.update({f"{prefix}.{field}": message for field, message in item_errors.items()})
+        return None
+    return ItemInput(sku=sku, quantity=quantity, unit_price_cents=unit_price_cents)
+
+
+def validate_order(data: Any) -> tuple[OrderInput | None, dict[str, str]]:
+    """Validate a single order payload.
+
+    Args:
+        data: Decoded JSON value of one order
+
+    Returns:
+        Tuple of (validated order or None, mapping of field path to error message)
+    """
+    errors: dict[str, str] = {}
+    if not isinstance(data, dict):
+        return None, {"order": "must be an object"}
+
+    external_id = _string(data, "external_id", 64, errors)
+    source = _string(data, "source", 50, errors, default="api")
+    currency = data.get("currency", "EUR")
+    if not isinstance(currency, str) or not _CURRENCY_PATTERN.fullmatch(currency):
+        errors["currency"] = "must be a three-letter ISO 4217 code"
+
+    raw_items = data.get("items")
+    items: list[ItemInput] = []
+    if not isinstance(raw_items, list) or not raw_items:
+        errors["items"] = "must be a non-empty list"
+    elif len(raw_items) > MAX_ITEMS_PER_ORDER:
+        errors["items"] = f"must contain at most {MAX_ITEMS_PER_ORDER} items"
+    else:
+        for index, raw_item in enumerate(raw_items):
+            item = _validate_item(raw_item, f"items[{index}]", errors)
+            if item is not None:
+                items.append(item)
+        if not errors and sum(i.quantity * i.unit_price_cents for i in items) > MAX_CENTS:
+            errors["items"] = f"must total at most {MAX_CENTS} cents"
+
+    if errors or source is None:
+        return None, errors
+    return (
+        OrderInput(external_id=external_id, source=source, currency=currency, items=tuple(items)),
+        errors,
+    )
@@ -0,0 +1,21 @@
+"""Transactional outbox for side effects of orders, delivered by a separate worker."""
+
+from bestellsystem.outbox.destinations import (
+    Message,
+    PermanentError,
+    configure_webhooks,
+    register_destination,
+    unregister_destination,
+    webhook_destination_name,
+)
+from bestellsystem.outbox.store import enqueue
+
+__all__ = [
+    "Message",
+    "PermanentError",
+    "configure_webhooks",
+    "enqueue",
+    "register_destination",
+    "unregister_destination",
+    "webhook_destination_name",
+]
@@ -0,0 +1,6 @@
+"""Entry point of ``python -m bestellsystem.outbox``."""
+
+from bestellsystem.outbox.worker import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Destinations of outbox messages and the handlers delivering to them.
+
+A destination is a named handler subscribed to some topics. Enqueueing a
+message writes one row per subscribed destination, so a destination that
+fails is retried without delivering the message to the others again.
+Handlers raise to fail a delivery; PermanentError marks failures that
+retrying cannot fix.
+
+Webhook destinations are configured with OUTBOX_WEBHOOK_URLS; further
+handlers, e.g. for confirmation emails or receipt printers, are added with
+register_destination() in the API processes and in the outbox worker.
+"""
+
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlsplit
+
+# Status codes of webhook responses worth retrying among the 4xx codes
+RETRYABLE_CLIENT_ERRORS = frozenset({408, 409, 425, 429})
+
+WEBHOOK_PREFIX = "webhook:"
+
+
+class PermanentError(Exception):
+    """Delivery failure that retrying cannot fix."""
+
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    """Outbox message claimed for delivery."""
+
+    id: int
+    topic: str
+    destination: str
+    payload: dict[str, Any]
+    # Including the current one
+    attempts: int
+    created_at: datetime
+
+
+Handler = Callable[[Message], None]
+
+
+@dataclass(frozen=True, slots=True)
+class Destination:
+    """Handler and the topics it is subscribed to."""
+
+    name: str
+    handler: Handler
+    # None subscribes to every topic
+    topics: frozenset[str] | None = None
+
+    def accepts(self, topic: str) -> bool:
+        """Check whether the destination is subscribed to a topic."""
+        return self.topics is None or topic in self.topics
+
+
+class WebhookHandler:
+    """POST messages as JSON to a partner's URL."""
+
+    def __init__(self, url: str, secret: str = "", timeout: float = 10.0) -> None:
+        """Initialize handler.
+
+        Args:
+            url: HTTP(S) URL of the webhook
+            secret: Key of the HMAC-SHA256 signature sent in
+                X-Outbox-Signature, or "" to send no signature
+            timeout: Seconds to wait for the partner's response
+
+        Raises:
+            ValueError: If the URL is not an HTTP(S) URL
+        """
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise ValueError(f"Webhook URL must use http or https: {url!r}")
+        self.url = url
+        self._secret = secret.encode()
+        self.timeout = timeout
+
+    def __call__(self, message: Message) -> None:
+        """Deliver a message.
+
+        The partner deduplicates retried deliveries by X-Outbox-Message-Id.
+
+        Args:
+            message: Message to deliver
+
+        Raises:
+            PermanentError: If the partner rejected the message with a 4xx status
+            OSError: If the request failed or the partner answered with a 5xx status
+        """
+        body = json.dumps(
+            {
+                "id": str(message.id),
+                "topic": message.topic,
+                "created_at": message.created_at.isoformat(),
+                "data": message.payload,
+            }
+        ).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "bestellsystem-outbox",
+            "X-Outbox-Message-Id": str(message.id),
+            "X-Outbox-Attempt": str(message.attempts),
+        }
+        if self._secret:
+            signature = hmac.new(self._secret, body, hashlib.sha256).hexdigest()
+            headers["X-Outbox-Signature"] = f"sha256={signature}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code not in RETRYABLE_CLIENT_ERRORS:
+                raise PermanentError(f"Webhook rejected the message with {e.code}") from e
+            raise
+
+
+_destinations: dict[str, Destination] = {}
+
+
+def register_destination(name: str, handler: Handler, topics: Iterable[str] | None = None) -> None:
+    """Deliver messages of some topics to a handler.
+
+    Register the same destinations in the API processes, which enqueue
+    messages, and in the outbox worker, which delivers them.
+
+    Args:
+        name: Unique name, stored with the messages
+        handler: Function delivering a message
+        topics: Subscribed topics, or None for all topics
+    """
+    _destinations[name] = Destination(
+        name, handler, frozenset(topics) if topics is not None else None
+    )
+
+
+def unregister_destination(name: str) -> None:
+    """Stop enqueueing messages for a destination.
+
+    Args:
+        name: Name of the destination
+    """
+    _destinations.pop(name, None)
+
+
+def webhook_destination_name(url: str) -> str:
+    """Return the destination name of a webhook.
+
+    The name is stored with every message, so it is a short hash of the URL
+    instead of the URL itself, which may be long or contain credentials.
+
+    Args:
+        url: Webhook URL
+
+    Returns:
+        Name like "webhook:1a2b3c4d5e6f7a8b"
+    """
+    return WEBHOOK_PREFIX + hashlib.sha256(url.encode()).hexdigest()[:16]
+
+
+def configure_webhooks(
+    urls: str, topics: str = "", secret: str = "", timeout: float = 10.0
+) -> None:
+    """Replace the webhook destinations.
+
+    Args:
+        urls: Comma-separated webhook URLs
+        topics: Comma-separated topics sent to the webhooks, or "" for all topics
+        secret: Key of the webhook signatures
+        timeout: Seconds to wait for a webhook response
+
+    Raises:
+        ValueError: If a URL is not an HTTP(S) URL
+    """
+    for name in [name for name in _destinations if name.startswith(WEBHOOK_PREFIX)]:
+        del _destinations[name]
+    subscribed = [topic.strip() for topic in topics.split(",") if topic.strip()] or None
+    for url in (url.strip() for url in urls.split(",")):
+        if url:
+            register_destination(
+                webhook_destination_name(url), WebhookHandler(url, secret, timeout), subscribed
+            )
+
+
+def destinations_for(topic: str) -> list[str]:
+    """Return the names of the destinations subscribed to a topic."""
+    return [name for name, destination in _destinations.items() if destination.accepts(topic)]
+
+
+def get_destination(name: str) -> Destination | None:
+    """Return a registered destination by name."""
+    return _destinations.get(name)
@@ -0,0 +1,229 @@
+"""Reading and writing the outbox table.
+
+Messages are written in the transaction of the change they belong to and
+therefore exist exactly when the change was committed. Workers claim due
+messages by setting a lease in a short transaction of their own, deliver
+them outside of any transaction and then delete them or schedule a retry.
+A worker that dies mid-delivery leaves its lease to expire, after which the
+messages are claimed again: delivery is at least once.
+"""
+
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import ColumnElement, Connection, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from bestellsystem.models import OutboxMessage
+from bestellsystem.outbox.destinations import Message, destinations_for
+from bestellsystem.utils.ids import next_ids
+
+PENDING = "pending"
+DEAD = "dead"
+
+# Stored part of the last error of a message
+MAX_ERROR_LENGTH = 2000
+
+
+def enqueue(target: Session | Connection, topic: str, payload: dict[str, Any]) -> int:
+    """Write a message for every destination subscribed to a topic.
+
+    The rows are inserted in the current transaction of ``target``, so they
+    are committed or rolled back together with the change they announce.
+
+    Args:
+        target: Session or connection of the transaction
+        topic: Topic of the message, e.g. "order.status_changed"
+        payload: JSON serializable content
+
+    Returns:
+        Number of written messages, 0 if no destination is subscribed
+    """
+    destinations = destinations_for(topic)
+    if not destinations:
+        return 0
+    now = datetime.now(timezone.utc)
+    document = json.dumps(payload)
+    target.execute(
+        insert(OutboxMessage),
+        [
+            {
+                "id": message_id,
+                "topic": topic,
+                "destination": destination,
+                "payload": document,
+                "status": PENDING,
+                "attempts": 0,
+                "available_at": now,
+                "created_at": now,
+            }
+            for message_id, destination in zip(
+                next_ids(len(destinations)), destinations, strict=True
+            )
+        ],
+    )
+    return len(destinations)
+
+
+def _claimable(now: datetime) -> ColumnElement[bool]:
+    """Condition of messages due for delivery and not leased by a worker."""
+    return (
+        (OutboxMessage.status == PENDING)
+        & (OutboxMessage.available_at <= now)
+        & or_(OutboxMessage.locked_until.is_(None), OutboxMessage.locked_until <= now)
+    )
+
+
+def claim_batch(session: Session, limit: int, lease_seconds: float) -> list[Message]:
+    """Lease up to ``limit`` due messages, oldest first.
+
+    On PostgreSQL the candidates are selected with FOR UPDATE SKIP LOCKED,
+    so concurrent workers claim different messages without waiting for each
+    other. SQLite ignores the locking clause; there the single UPDATE
+    statement runs under the database write lock and re-checks the lease,
+    so a message is never claimed twice either. Commit the session right
+    after claiming to release the row locks.
+
+    Args:
+        session: Session on the primary database
+        limit: Maximum number of messages
+        lease_seconds: Time after which unfinished messages are claimed again
+
+    Returns:
+        Claimed messages in order of their IDs
+    """
+    now = datetime.now(timezone.utc)
+    claimable = _claimable(now)
+    candidates = (
+        select(OutboxMessage.id)
+        .where(claimable)
+        .order_by(OutboxMessage.available_at, OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    statement = (
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidates.scalar_subquery()), claimable)
+        .values(
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=OutboxMessage.attempts + 1,
+        )
+        .returning(
+            OutboxMessage.id,
+            OutboxMessage.topic,
+            OutboxMessage.destination,
+            OutboxMessage.payload,
+            OutboxMessage.attempts,
+            OutboxMessage.created_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    messages = [
+        Message(
+            id=row.id,
+            topic=row.topic,
+            destination=row.destination,
+            payload=json.loads(row.payload),
+            attempts=row.attempts,
+            created_at=row.created_at.replace(tzinfo=timezone.utc),
+        )
+        for row in session.execute(statement)
+    ]
+    messages.sort(key=lambda message: message.id)
+    return messages
+
+
+def mark_delivered(session: Session, message_id: int) -> None:
+    """Delete a delivered message.
+
+    Args:
+        session: Session on the primary database
+        message_id: ID of the message
+    """
+    session.execute(delete(OutboxMessage).where(OutboxMessage.id == message_id))
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Return the delay before the next attempt.
+
+    The delay doubles with every attempt up to ``maximum`` and is randomized
+    by up to half its length, so messages failing together are not retried
+    together.
+
+    Args:
+        attempts: Attempts made so far, at least 1
+        base: Delay after the first attempt in seconds
+        maximum: Longest delay in seconds
+
+    Returns:
+        Delay in seconds
+    """
+    delay = min(maximum, base * 2.0 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def mark_failed(
+    session: Session,
+    message: Message,
+    error: str,
+    retry_in: float | None,
+) -> None:
+    """Record a failed delivery.
+
+    Args:
+        session: Session on the primary database
+        message: Claimed message
+        error: Description of the failure
+        retry_in: Seconds until the next attempt, or None to give up on the message
+    """
+    now = datetime.now(timezone.utc)
+    values: dict[str, Any] = {"locked_until": None, "last_error": error[:MAX_ERROR_LENGTH]}
+    if retry_in is None:
+        values["status"] = DEAD
+    else:
+        values["available_at"] = now + timedelta(seconds=retry_in)
+    session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == message.id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class QueueStats:
+    """Size and lag of the outbox."""
+
+    pending: int
+    dead: int
+    # Age of the oldest message due for delivery, 0 if none is due
+    lag_seconds: float
+
+
+def queue_stats(session: Session) -> QueueStats:
+    """Count the messages and measure the queue lag.
+
+    Args:
+        session: Session on the primary database
+
+    Returns:
+        Number of pending and dead messages and the queue lag
+    """
+    now = datetime.now(timezone.utc)
+    counts: dict[str, int] = dict(
+        session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+    )
+    oldest = session.scalar(
+        select(func.min(OutboxMessage.available_at)).where(
+            OutboxMessage.status == PENDING, OutboxMessage.available_at <= now
+        )
+    )
+    lag = 0.0
+    if oldest is not None:
+        lag = max(0.0, (now - oldest.replace(tzinfo=timezone.utc)).total_seconds())
+    return QueueStats(pending=counts.get(PENDING, 0), dead=counts.get(DEAD, 0), lag_seconds=lag)
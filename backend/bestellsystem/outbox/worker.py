@@ -0,0 +1,345 @@
+"""Worker delivering outbox messages outside of the API processes.
+
+Run with ``python -m bestellsystem.outbox`` (or ``make outbox-worker``). The
+worker claims batches of due messages and hands them to a thread pool of
+OUTBOX_CONCURRENCY threads; it only claims as many messages as threads are
+free, so messages never wait in the worker while their lease runs out.
+Failed deliveries are retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS is reached; the message is then kept with status "dead".
+Any number of workers may run against the same database.
+"""
+
+import argparse
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import FrameType
+from typing import Any
+
+from sqlalchemy.orm import sessionmaker
+
+from bestellsystem.config import Config, get_config
+from bestellsystem.db import SessionLocal, use_primary
+from bestellsystem.outbox.destinations import (
+    Message,
+    PermanentError,
+    configure_webhooks,
+    get_destination,
+)
+from bestellsystem.outbox.store import (
+    backoff_delay,
+    claim_batch,
+    mark_delivered,
+    mark_failed,
+    queue_stats,
+)
+from bestellsystem.utils.logging import get_logger, setup_logging, shutdown_logging
+from bestellsystem.utils.metrics import Counter, Gauge, Histogram, render_prometheus
+
+OUTBOX_MESSAGES = Counter(
+    "outbox_messages_total", "Outbox delivery attempts by result", ("topic", "result")
+)
+OUTBOX_DELIVERY_LAG = Histogram(
+    "outbox_delivery_lag_seconds",
+    "Time from enqueueing a message to its successful delivery",
+    ("topic",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+OUTBOX_HANDLER_SECONDS = Histogram(
+    "outbox_handler_seconds",
+    "Duration of delivery attempts, including recording their outcome",
+    ("topic",),
+)
+OUTBOX_PENDING = Gauge("outbox_pending_messages", "Messages waiting for delivery or a retry")
+OUTBOX_DEAD = Gauge("outbox_dead_messages", "Messages given up after their last attempt")
+OUTBOX_QUEUE_LAG = Gauge("outbox_queue_lag_seconds", "Age of the oldest message due for delivery")
+
+# Minimum seconds between two queue size queries
+STATS_INTERVAL = 5.0
+
+logger = get_logger(__name__)
+
+
+class OutboxWorker:
+    """Claims outbox messages and delivers them with bounded concurrency."""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker[Any] = SessionLocal,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 12,
+        backoff_base: float = 2.0,
+        backoff_max: float = 3600.0,
+    ) -> None:
+        """Initialize worker.
+
+        Args:
+            session_factory: Factory of sessions on the application database
+            batch_size: Maximum number of messages claimed at once
+            concurrency: Maximum number of messages delivered at the same time
+            poll_interval: Seconds to wait when no message is due
+            lease_seconds: Time after which an unfinished delivery is retried
+                by any worker, must exceed the longest delivery
+            max_attempts: Attempts before a message is given up
+            backoff_base: Delay after the first failed attempt in seconds
+            backoff_max: Longest delay between attempts in seconds
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stopping = threading.Event()
+        self._slots = threading.Condition()
+        self._in_flight = 0
+        self._stats_at = 0.0
+
+    @classmethod
+    def from_config(cls, config: type[Config] = Config, **overrides: Any) -> "OutboxWorker":
+        """Create a worker with the OUTBOX_* settings of a configuration.
+
+        Args:
+            config: Configuration class
+            **overrides: Arguments of the constructor replacing settings
+
+        Returns:
+            Configured worker
+        """
+        settings: dict[str, Any] = {
+            "batch_size": config.OUTBOX_BATCH_SIZE,
+            "concurrency": config.OUTBOX_CONCURRENCY,
+            "poll_interval": config.OUTBOX_POLL_INTERVAL,
+            "lease_seconds": config.OUTBOX_LEASE_SECONDS,
+            "max_attempts": config.OUTBOX_MAX_ATTEMPTS,
+            "backoff_base": config.OUTBOX_BACKOFF_BASE,
+            "backoff_max": config.OUTBOX_BACKOFF_MAX,
+        }
+        return cls(**{**settings, **overrides})
+
+    def claim(self, limit: int) -> list[Message]:
+        """Claim up to ``limit`` due messages in a transaction of their own."""
+        with self.session_factory.begin() as session:
+            use_primary(session)
+            return claim_batch(session, limit, self.lease_seconds)
+
+    def deliver(self, message: Message) -> str:
+        """Deliver a claimed message and record the outcome.
+
+        Args:
+            message: Claimed message
+
+        Returns:
+            "delivered", "retried" or "dead"
+        """
+        start = time.perf_counter()
+        destination = get_destination(message.destination)
+        try:
+            if destination is None:
+                raise LookupError(f"Unknown outbox destination {message.destination!r}")
+            destination.handler(message)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retry_in = None
+            if not isinstance(e, PermanentError) and message.attempts < self.max_attempts:
+                retry_in = backoff_delay(message.attempts, self.backoff_base, self.backoff_max)
+            result = "dead" if retry_in is None else "retried"
+            logger.warning(
+                "Outbox delivery failed",
+                extra={
+                    "message_id": message.id,
+                    "topic": message.topic,
+                    "destination": message.destination,
+                    "attempt": message.attempts,
+                    "retry_in": retry_in,
+                    "error": error,
+                },
+            )
+            with self.session_factory.begin() as session:
+                use_primary(session)
+                mark_failed(session, message, error, retry_in)
+        else:
+            with self.session_factory.begin() as session:
+                use_primary(session)
+                mark_delivered(session, message.id)
+            result = "delivered"
+            lag = (datetime.now(timezone.utc) - message.created_at).total_seconds()
+            OUTBOX_DELIVERY_LAG.observe(lag, message.topic)
+        OUTBOX_HANDLER_SECONDS.observe(time.perf_counter() - start, message.topic)
+        OUTBOX_MESSAGES.inc(message.topic, result)
+        return result
+
+    def run_once(self) -> int:
+        """Claim one batch and deliver it before returning.
+
+        Returns:
+            Number of claimed messages
+        """
+        messages = self.claim(self.batch_size)
+        if len(messages) > 1 and self.concurrency > 1:
+            with ThreadPoolExecutor(min(self.concurrency, len(messages))) as executor:
+                list(executor.map(self._deliver_logged, messages))
+        else:
+            for message in messages:
+                self._deliver_logged(message)
+        return len(messages)
+
+    def run(self) -> None:
+        """Deliver messages until stop() is called, then finish the running deliveries."""
+        logger.info(
+            "Outbox worker started",
+            extra={"concurrency": self.concurrency, "batch_size": self.batch_size},
+        )
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="outbox") as executor:
+            while not self._stopping.is_set():
+                free = self._wait_for_slots()
+                if not free:
+                    continue
+                requested = min(self.batch_size, free)
+                try:
+                    messages = self.claim(requested)
+                except Exception:
+                    logger.exception("Claiming outbox messages failed")
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                for message in messages:
+                    with self._slots:
+                        self._in_flight += 1
+                    executor.submit(self._deliver_in_slot, message)
+                if len(messages) < requested:
+                    # Drained the due messages, wait for new ones
+                    self.report_queue()
+                    self._stopping.wait(self.poll_interval)
+        logger.info("Outbox worker stopped")
+
+    def stop(self) -> None:
+        """Make run() return after the running deliveries."""
+        self._stopping.set()
+        with self._slots:
+            self._slots.notify_all()
+
+    def report_queue(self, force: bool = False) -> None:
+        """Update the queue gauges, at most every STATS_INTERVAL seconds unless forced."""
+        now = time.monotonic()
+        if not force and now - self._stats_at < STATS_INTERVAL:
+            return
+        self._stats_at = now
+        try:
+            with self.session_factory() as session:
+                use_primary(session)
+                stats = queue_stats(session)
+        except Exception:
+            logger.exception("Reading the outbox queue size failed")
+            return
+        OUTBOX_PENDING.set(stats.pending)
+        OUTBOX_DEAD.set(stats.dead)
+        OUTBOX_QUEUE_LAG.set(stats.lag_seconds)
+
+    def _wait_for_slots(self) -> int:
+        """Wait until a thread is free and return the number of free threads."""
+        with self._slots:
+            while self._in_flight >= self.concurrency and not self._stopping.is_set():
+                self._slots.wait()
+            return 0 if self._stopping.is_set() else self.concurrency - self._in_flight
+
+    def _deliver_in_slot(self, message: Message) -> None:
+        """Deliver a message in a pool thread and free its slot."""
+        try:
+            self._deliver_logged(message)
+        finally:
+            with self._slots:
+                self._in_flight -= 1
+                self._slots.notify()
+
+    def _deliver_logged(self, message: Message) -> None:
+        """Deliver a message, logging errors of the outbox table itself.
+
+        The message is claimed again once its lease expired.
+        """
+        try:
+            self.deliver(message)
+        except Exception:
+            logger.exception(
+                "Recording an outbox delivery failed", extra={"message_id": message.id}
+            )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the worker's metrics in the Prometheus text format."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Return the metrics."""
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Do not log scrapes."""
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve the metrics of this process on a port in a background thread.
+
+    Args:
+        port: TCP port
+
+    Returns:
+        Running server
+    """
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="outbox-metrics", daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the outbox worker until SIGTERM or SIGINT.
+
+    Args:
+        argv: Command line arguments (default: sys.argv)
+    """
+    config = get_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bestellsystem.outbox", description="Deliver outbox messages."
+    )
+    parser.add_argument("--once", action="store_true", help="deliver the messages due now and exit")
+    parser.add_argument("--concurrency", type=int, default=config.OUTBOX_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=config.OUTBOX_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    setup_logging(level=config.LOG_LEVEL, log_format=config.LOG_FORMAT)
+    configure_webhooks(
+        config.OUTBOX_WEBHOOK_URLS,
+        config.OUTBOX_WEBHOOK_TOPICS,
+        config.OUTBOX_WEBHOOK_SECRET,
+        config.OUTBOX_WEBHOOK_TIMEOUT,
+    )
+    worker = OutboxWorker.from_config(
+        config, concurrency=args.concurrency, batch_size=args.batch_size
+    )
+    try:
+        if args.once:
+            while worker.run_once():
+                pass
+            return
+        if config.OUTBOX_METRICS_PORT:
+            serve_metrics(config.OUTBOX_METRICS_PORT)
+
+        def stop(signum: int, frame: FrameType | None) -> None:
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        worker.run()
+    finally:
+        shutdown_logging()
@@ -0,0 +1,5 @@
+"""Products package."""
+
+from bestellsystem.products.routes import products_bp
+
+__all__ = ["products_bp"]
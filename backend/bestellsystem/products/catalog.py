@@ -0,0 +1,297 @@
+"""Per-worker catalog snapshot, kept current through a version counter.
+
+Every transaction writing categories or products takes the next value of
+the single-row ``catalog_version`` counter and stamps the changed rows with
+it. Updating the counter locks its row until the transaction ends, so
+versions become visible in ascending order and a reader that has seen
+version n has seen every change up to n.
+
+Each worker holds an immutable CatalogSnapshot. At most every
+CATALOG_REFRESH_INTERVAL seconds a request compares the snapshot's version
+with the counter. If the catalog changed, a background thread loads the
+rows stamped with a newer version and derives the next snapshot from the
+current one, while requests keep reading the current one. Rows are only
+read in full on first use and after rows were deleted; retire products by
+clearing ``active`` rather than deleting them.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from flask import Flask
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session, UOWTransaction, sessionmaker
+
+from bestellsystem.db import SessionLocal, use_primary
+from bestellsystem.models import CatalogVersion, Category, Product
+from bestellsystem.products.search import CatalogSnapshot, CategoryRecord, ProductRecord
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Gauge, Histogram
+
+CATALOG_REFRESHES = Counter(
+    "catalog_refreshes_total", "Catalog snapshots built by kind of load", ("kind",)
+)
+CATALOG_REFRESH_SECONDS = Histogram(
+    "catalog_refresh_seconds",
+    "Time to load changes and build a catalog snapshot",
+    ("kind",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+CATALOG_VERSION = Gauge("catalog_version", "Catalog version of the worker's snapshot")
+CATALOG_PRODUCTS = Gauge("catalog_products", "Active products in the worker's snapshot")
+
+CATALOG_MODELS = (Category, Product)
+
+logger = get_logger(__name__)
+
+
+def bump_catalog_version(session: Session, deleted: bool = False) -> int:
+    """Take the next catalog version in the session's transaction.
+
+    Called automatically when categories or products are flushed through the
+    ORM; call it for Core statements writing them and stamp the rows with
+    the returned version. The counter row stays locked until commit.
+
+    Args:
+        session: Session of the writing transaction
+        deleted: Whether the transaction deletes rows, forcing a full reload
+
+    Returns:
+        New catalog version
+    """
+    values: dict[str, Any] = {"version": CatalogVersion.version + 1}
+    if deleted:
+        values["deleted_version"] = CatalogVersion.version + 1
+    version = session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(**values)
+        .returning(CatalogVersion.version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if version is None:
+        # Databases created without the migrations have no counter row yet
+        session.execute(
+            insert(CatalogVersion).values(id=1, version=1, deleted_version=1 if deleted else 0)
+        )
+        version = 1
+    return version
+
+
+def _stamp_catalog_changes(session: Session, flush_context: UOWTransaction, instances: Any) -> None:
+    """Stamp flushed categories and products with a new catalog version."""
+    changed = [obj for obj in session.new if isinstance(obj, CATALOG_MODELS)]
+    changed.extend(
+        obj for obj in session.dirty if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj)
+    )
+    deleted = any(isinstance(obj, CATALOG_MODELS) for obj in session.deleted)
+    if not changed and not deleted:
+        return
+    version = bump_catalog_version(session, deleted)
+    for obj in changed:
+        obj.version = version
+
+
+class CatalogCache:
+    """Holds the catalog snapshot of this process and refreshes it."""
+
+    def __init__(
+        self,
+        refresh_seconds: float = 1.0,
+        session_factory: sessionmaker[Any] = SessionLocal,
+        background: bool = True,
+    ) -> None:
+        """Initialize cache.
+
+        Args:
+            refresh_seconds: Minimum seconds between two version checks
+            session_factory: Factory of sessions on the application database
+            background: Build changed snapshots in a background thread
+                instead of the request that noticed the change
+        """
+        self.refresh_seconds = refresh_seconds
+        self.session_factory = session_factory
+        self.background = background
+        self._snapshot: CatalogSnapshot | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """Create the lock; a forked process must not inherit a held one."""
+        self._refresh_lock = threading.Lock()
+        self._checked_at = time.monotonic() if self._snapshot is not None else float("-inf")
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Return the current snapshot, loading it on first use.
+
+        Returns:
+            Snapshot, possibly up to ``refresh_seconds`` plus the time of a
+            rebuild behind the database
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._refresh_locked()
+            assert self._snapshot is not None
+            return self._snapshot
+        if time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self._check(snapshot)
+            # Replaced unless the refresh runs in the background
+            return self._snapshot or snapshot
+        return snapshot
+
+    def refresh(self) -> CatalogSnapshot:
+        """Bring the snapshot up to date before returning it."""
+        with self._refresh_lock:
+            self._refresh_locked()
+        assert self._snapshot is not None
+        return self._snapshot
+
+    def clear(self) -> None:
+        """Drop the snapshot, so the next use loads the catalog in full."""
+        with self._refresh_lock:
+            self._snapshot = None
+            self._checked_at = float("-inf")
+
+    def _check(self, snapshot: CatalogSnapshot) -> None:
+        """Compare the snapshot's version with the counter and start a refresh."""
+        if not self._refresh_lock.acquire(blocking=False):
+            # Another thread is checking or refreshing, use the current snapshot meanwhile
+            return
+        self._checked_at = time.monotonic()
+        try:
+            version, _ = self._read_version()
+            if version == snapshot.version:
+                self._refresh_lock.release()
+                return
+            if self.background:
+                threading.Thread(
+                    target=self._refresh_and_release, name="catalog-refresh", daemon=True
+                ).start()
+                return
+            self._refresh_and_release()
+        except Exception:
+            self._refresh_lock.release()
+            # Keep the current snapshot; check again after the interval
+            logger.warning("Could not check the catalog version", exc_info=True)
+
+    def _refresh_and_release(self) -> None:
+        """Refresh with the lock held by the caller, then release it."""
+        try:
+            self._refresh_locked()
+        except Exception:
+            logger.warning("Could not refresh the catalog", exc_info=True)
+        finally:
+            self._refresh_lock.release()
+
+    def _read_version(self, session: Session | None = None) -> tuple[int, int]:
+        """Return the catalog version and the version of the last deletion."""
+        if session is None:
+            with self.session_factory() as own_session:
+                use_primary(own_session)
+                return self._read_version(own_session)
+        row = session.execute(
+            select(CatalogVersion.version, CatalogVersion.deleted_version).where(
+                CatalogVersion.id == 1
+            )
+        ).first()
+        return (row.version, row.deleted_version) if row is not None else (0, 0)
+
+    def _refresh_locked(self) -> None:
+        """Load the changes since the current snapshot and replace it."""
+        start = time.perf_counter()
+        previous = self._snapshot
+        with self.session_factory() as session:
+            use_primary(session)
+            version, deleted_version = self._read_version(session)
+            if previous is not None and version == previous.version:
+                return
+            full = previous is None or deleted_version > previous.version
+            since = -1 if previous is None or full else previous.version
+            products = session.execute(
+                select(
+                    Product.id,
+                    Product.sku,
+                    Product.name,
+                    Product.category_id,
+                    Product.price_cents,
+                    Product.currency,
+                    Product.active,
+                ).where(Product.version > since)
+            ).all()
+            categories = None
+            if full or session.scalar(select(Category.id).where(Category.version > since).limit(1)):
+                categories = [
+                    CategoryRecord(row.id, row.parent_id, row.name, row.position)
+                    for row in session.execute(
+                        select(Category.id, Category.parent_id, Category.name, Category.position)
+                    )
+                ]
+
+        records = _product_records(row for row in products if row.active)
+        if previous is None or full:
+            kind = "full"
+            snapshot = CatalogSnapshot(version, records, categories or ())
+        else:
+            kind = "incremental"
+            removed = [row.id for row in products if not row.active]
+            snapshot = previous.updated(version, records, removed, categories)
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+
+        elapsed = time.perf_counter() - start
+        CATALOG_REFRESHES.inc(kind)
+        CATALOG_REFRESH_SECONDS.observe(elapsed, kind)
+        CATALOG_VERSION.set(version)
+        CATALOG_PRODUCTS.set(len(snapshot.products))
+        logger.info(
+            "Catalog snapshot built",
+            extra={
+                "kind": kind,
+                "version": version,
+                "changed_products": len(products),
+                "products": len(snapshot.products),
+                "duration_ms": round(elapsed * 1000, 3),
+            },
+        )
+
+
+def _product_records(rows: Iterable[Any]) -> list[ProductRecord]:
+    """Create the records of product rows."""
+    return [
+        ProductRecord.create(
+            row.id, row.sku, row.name, row.category_id, row.price_cents, row.currency
+        )
+        for row in rows
+    ]
+
+
+# Catalog of this process, replaced by register_catalog()
+catalog = CatalogCache()
+
+
+def _reset_after_fork() -> None:
+    """Replace the lock of the catalog, which a refresh thread may hold while forking."""
+    catalog._reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def register_catalog(app: Flask, session_class: type[Session] = Session) -> None:
+    """Serve the catalog from a per-worker snapshot.
+
+    Args:
+        app: Flask application instance
+        session_class: Session class whose flushes stamp catalog changes
+    """
+    global catalog
+    catalog = CatalogCache(
+        refresh_seconds=app.config.get("CATALOG_REFRESH_INTERVAL", 1.0),
+        background=app.config.get("CATALOG_REFRESH_IN_BACKGROUND", True),
+    )
+    if not event.contains(session_class, "before_flush", _stamp_catalog_changes):
+        event.listen(session_class, "before_flush", _stamp_catalog_changes)
@@ -0,0 +1,72 @@
+"""Product catalog endpoints, served from the worker's catalog snapshot."""
+
+import time
+from typing import Any
+
+from flask import Blueprint, Response, current_app, request
+
+from bestellsystem.products import catalog as catalog_module
+from bestellsystem.utils.errors import ValidationError
+from bestellsystem.utils.pagination import parse_limit
+from bestellsystem.utils.response_cache import etag_matches, not_modified
+from bestellsystem.utils.timing import add_phase
+
+# Longest accepted search query
+MAX_QUERY_LENGTH = 100
+
+products_bp = Blueprint("products", __name__, url_prefix="/products")
+
+
+@products_bp.route("/search", methods=["GET"])
+def search_products() -> tuple[dict[str, Any], int]:
+    """Search active products by name or SKU as the user types.
+
+    Every word of ``q`` matches the beginning of a word of the product name
+    or SKU, ignoring case and accents; longer words also match inside words
+    and with typos when there are too few other results. With
+    ``category_id`` only products of that category and its subcategories
+    are returned; without ``q`` they are listed by name.
+
+    Returns:
+        JSON response with the matching products, best matches first, the
+        catalog version they were read at, and HTTP status code
+    """
+    query = request.args.get("q", "")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValidationError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    limit = parse_limit(
+        request.args.get("limit"),
+        default=current_app.config.get("CATALOG_SEARCH_LIMIT", 20),
+        maximum=current_app.config.get("CATALOG_SEARCH_MAX_LIMIT", 100),
+    )
+    category_id = None
+    if "category_id" in request.args:
+        try:
+            category_id = int(request.args["category_id"])
+        except ValueError as e:
+            raise ValidationError("category_id must be an integer") from e
+    if not query and category_id is None:
+        raise ValidationError("q or category_id is required")
+
+    snapshot = catalog_module.catalog.snapshot()
+    start = time.perf_counter()
+    products = snapshot.search(query, limit, category_id)
+    add_phase("catalog_search", time.perf_counter() - start)
+    return {"data": [product.to_dict() for product in products], "version": snapshot.version}, 200
+
+
+@products_bp.route("/categories", methods=["GET"])
+def category_tree() -> Response:
+    """Get the category tree with the number of active products per category.
+
+    Returns:
+        JSON response with the root categories and their nested children,
+        ordered by position and name, or 304 if the client's copy is current
+    """
+    snapshot = catalog_module.catalog.snapshot()
+    etag = f'"catalog-{snapshot.version}"'
+    if etag_matches(etag):
+        return not_modified(etag)
+    response = Response(snapshot.category_tree_json, mimetype="application/json")
+    response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,528 @@
+"""Immutable catalog snapshot with a search-as-you-type index.
+
+A snapshot holds the active products sorted by their normalized name and
+the category tree, both precomputed once, so requests only read from it
+and never lock. Product and category records are frozen slotted dataclasses.
+
+Search matches every query term as the prefix of a word of the product name
+or SKU, after folding case and accents ("Käse" matches "kase"). The index is
+the sorted vocabulary of all words with the products containing each word:
+the words starting with a term form a contiguous range found by bisection,
+which gives the lookups of a prefix trie at a fraction of its memory.
+Products of one- and two-letter prefixes, the most expensive to merge, are
+precomputed. Results come in three tiers, each in name order:
+
+1. names starting with the query
+2. products matching every term by prefix
+3. products matching when terms of four or more characters may also occur
+   inside a word ("schorle" finds "Apfelschorle") or contain a typo after
+   their first letter (numbers never do); the candidate words come from a trigram index of the
+   vocabulary and typos are checked with a bounded edit distance. Only
+   searched if the tiers above return too few products.
+"""
+
+import bisect
+import heapq
+import json
+import re
+import unicodedata
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any
+
+# Prefixes up to this length have their products precomputed
+SHORT_PREFIX_LENGTH = 2
+
+# Terms need this many characters to match inside words and with typos
+FUZZY_MIN_LENGTH = 4
+
+# Prefixes of more words are looked up by sorting rather than merging
+MERGED_WORDS_MAX = 32
+
+# Terms of this length and longer may contain two typos
+FUZZY_TWO_EDITS_LENGTH = 8
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Sorts after every normalized key starting with the same prefix
+_KEY_END = "\U0010ffff"
+
+
+def normalize(text: str) -> list[str]:
+    """Split text into words folded to lower case without accents.
+
+    Args:
+        text: Product name, SKU or query
+
+    Returns:
+        Words in the order of the text, e.g. ["kase", "spatzle"] for "Käse-Spätzle"
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return _WORD.findall("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+@dataclass(frozen=True, slots=True)
+class ProductRecord:
+    """Active product as offered in the catalog."""
+
+    id: int
+    sku: str
+    name: str
+    category_id: int | None
+    price_cents: int
+    currency: str
+    # Normalized words of the name joined by spaces, the sort key of the snapshot
+    key: str
+    # Distinct normalized words of name and SKU, each preceded by a space, so
+    # a prefix matches when " " + prefix occurs in it
+    words: str
+
+    @classmethod
+    def create(
+        cls,
+        id: int,
+        sku: str,
+        name: str,
+        category_id: int | None,
+        price_cents: int,
+        currency: str,
+    ) -> "ProductRecord":
+        """Create a record, normalizing name and SKU for search."""
+        name_words = normalize(name)
+        words = "".join(" " + word for word in dict.fromkeys(chain(name_words, normalize(sku))))
+        return cls(id, sku, name, category_id, price_cents, currency, " ".join(name_words), words)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize for API responses."""
+        return {
+            "id": str(self.id),
+            "sku": self.sku,
+            "name": self.name,
+            "category_id": None if self.category_id is None else str(self.category_id),
+            "price_cents": self.price_cents,
+            "currency": self.currency,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryRecord:
+    """Category as stored."""
+
+    id: int
+    parent_id: int | None
+    name: str
+    position: int
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryNode:
+    """Category with its precomputed place in the tree."""
+
+    id: int
+    name: str
+    parent_id: int | None
+    # IDs from the root down to the parent
+    path: tuple[int, ...]
+    children: tuple[int, ...]
+    # The category and all categories below it
+    descendants: frozenset[int]
+    # Snapshot positions of the products in the category and below, ascending
+    products: array
+
+    @property
+    def product_count(self) -> int:
+        """Number of active products in the category and below."""
+        return len(self.products)
+
+
+def _trigrams(word: str) -> set[str]:
+    """Return the trigrams of a word, marking its start so prefixes share them."""
+    padded = "^" + word
+    return {padded[i : i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def _max_edits(term: str) -> int:
+    """Return the typos tolerated in a term, 0 if it only matches by prefix."""
+    if len(term) < FUZZY_MIN_LENGTH or not term.isalpha():
+        return 0
+    return 2 if len(term) >= FUZZY_TWO_EDITS_LENGTH else 1
+
+
+def _starts_similar(term: str, word: str, limit: int) -> bool:
+    """Check whether a prefix of ``word`` is within ``limit`` edits of ``term``.
+
+    Computes the Levenshtein distances of ``term`` to all prefixes of
+    ``word`` at once and stops as soon as they all exceed ``limit``.
+    """
+    if term[0] != word[0]:
+        return False
+    prefix = word[: len(term) + limit]
+    previous = list(range(len(prefix) + 1))
+    for i, char in enumerate(term, 1):
+        current = [i]
+        for j, other in enumerate(prefix, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other))
+            )
+        if min(current) > limit:
+            return False
+        previous = current
+    return min(previous[max(1, len(term) - limit) :]) <= limit
+
+
+@dataclass(frozen=True, slots=True)
+class _Term:
+    """Query term resolved against the vocabulary."""
+
+    text: str
+    # Vocabulary range of the words starting with the term
+    first: int
+    last: int
+    # Words containing the term or within the tolerated edits (only in the
+    # fuzzy tier) and their IDs
+    similar: frozenset[str] = frozenset()
+    similar_ids: tuple[int, ...] = ()
+
+    def matches(self, words: str) -> bool:
+        """Check whether the words of a product match the term."""
+        if " " + self.text in words:
+            return True
+        return bool(self.similar) and not self.similar.isdisjoint(words.split())
+
+
+class SearchIndex:
+    """Word index over the products of a snapshot.
+
+    The positions of the products containing each word are stored in one
+    flat array, in vocabulary order, so the index holds a few large arrays
+    instead of an array per word.
+    """
+
+    __slots__ = ("vocabulary", "_postings", "_offsets", "_short", "_trigrams")
+
+    def __init__(self, products: tuple[ProductRecord, ...]) -> None:
+        """Index products.
+
+        Args:
+            products: Products in snapshot order
+        """
+        by_word: dict[str, list[int]] = {}
+        short: dict[str, list[int]] = {}
+        for position, product in enumerate(products):
+            for word in product.words.split():
+                by_word.setdefault(word, []).append(position)
+                for prefix in (word[:1], word[:SHORT_PREFIX_LENGTH]):
+                    positions = short.setdefault(prefix, [])
+                    if not positions or positions[-1] != position:
+                        positions.append(position)
+        self.vocabulary: tuple[str, ...] = tuple(sorted(by_word))
+        self._postings = array("I")
+        # Start of the postings of each word in _postings, and their end
+        self._offsets = array("I", [0])
+        trigrams: dict[str, list[int]] = {}
+        for word_id, word in enumerate(self.vocabulary):
+            self._postings.extend(by_word[word])
+            self._offsets.append(len(self._postings))
+            if word.isalpha():
+                for trigram in _trigrams(word):
+                    trigrams.setdefault(trigram, []).append(word_id)
+        self._short = {prefix: array("I", positions) for prefix, positions in short.items()}
+        self._trigrams = {trigram: array("I", ids) for trigram, ids in trigrams.items()}
+
+    def term(self, text: str, fuzzy: bool = False) -> _Term:
+        """Resolve a normalized query term.
+
+        Args:
+            text: Normalized term
+            fuzzy: Also collect the words containing the term or within the
+                tolerated edits
+
+        Returns:
+            Resolved term
+        """
+        first = bisect.bisect_left(self.vocabulary, text)
+        last = bisect.bisect_left(self.vocabulary, text + _KEY_END, first)
+        similar_ids: tuple[int, ...] = ()
+        limit = _max_edits(text) if fuzzy else 0
+        if limit:
+            grams = _trigrams(text)
+            shared: dict[int, int] = {}
+            for trigram in grams:
+                for word_id in self._trigrams.get(trigram, ()):
+                    shared[word_id] = shared.get(word_id, 0) + 1
+            # Every edit changes at most three trigrams; words containing the
+            # term only lack its start trigram
+            needed = max(1, len(grams) - 3 * limit)
+            similar_ids = tuple(
+                word_id
+                for word_id, count in shared.items()
+                if count >= needed
+                and not first <= word_id < last
+                and (
+                    text in self.vocabulary[word_id]
+                    or _starts_similar(text, self.vocabulary[word_id], limit)
+                )
+            )
+        similar = frozenset(self.vocabulary[word_id] for word_id in similar_ids)
+        return _Term(text, first, last, similar, similar_ids)
+
+    def estimate(self, term: _Term) -> int:
+        """Return an upper bound of the products matching a term."""
+        offsets = self._offsets
+        return (
+            offsets[term.last]
+            - offsets[term.first]
+            + sum(offsets[word_id + 1] - offsets[word_id] for word_id in term.similar_ids)
+        )
+
+    def _word_positions(self, word_id: int) -> array:
+        """Return the positions of the products containing a word."""
+        return self._postings[self._offsets[word_id] : self._offsets[word_id + 1]]
+
+    def positions(self, term: _Term) -> Iterator[int]:
+        """Yield the positions of the products matching a term in ascending order."""
+        word_ids: Iterable[int] = range(term.first, term.last)
+        if term.similar_ids:
+            word_ids = chain(word_ids, term.similar_ids)
+        elif len(term.text) <= SHORT_PREFIX_LENGTH:
+            yield from self._short.get(term.text, ())
+            return
+        elif term.last - term.first > MERGED_WORDS_MAX:
+            # Sorting is cheaper than merging the postings of many words
+            yield from sorted(
+                set(self._postings[self._offsets[term.first] : self._offsets[term.last]])
+            )
+            return
+        previous = -1
+        for position in heapq.merge(*(self._word_positions(i) for i in word_ids)):
+            if position != previous:
+                yield position
+                previous = position
+
+
+class CatalogSnapshot:
+    """Immutable catalog of one version, shared by all requests of a worker."""
+
+    __slots__ = (
+        "version",
+        "products",
+        "categories",
+        "roots",
+        "category_tree_json",
+        "_category_records",
+        "_positions",
+        "_keys",
+        "_index",
+    )
+
+    def __init__(
+        self,
+        version: int,
+        products: Iterable[ProductRecord],
+        categories: Iterable[CategoryRecord],
+    ) -> None:
+        """Build a snapshot and its indexes.
+
+        Args:
+            version: Catalog version the records were read at
+            products: Active products
+            categories: All categories
+        """
+        self.version = version
+        self.products: tuple[ProductRecord, ...] = tuple(
+            sorted(products, key=lambda product: (product.key, product.id))
+        )
+        self._keys = tuple(product.key for product in self.products)
+        self._positions = {product.id: i for i, product in enumerate(self.products)}
+        self._index = SearchIndex(self.products)
+        self._category_records = tuple(categories)
+        self._build_tree()
+
+    def _build_tree(self) -> None:
+        """Precompute paths, descendants and product lists of the categories."""
+        records = {category.id: category for category in self._category_records}
+        children: dict[int | None, list[CategoryRecord]] = {}
+        for category in records.values():
+            parent = category.parent_id if category.parent_id in records else None
+            children.setdefault(parent, []).append(category)
+        for siblings in children.values():
+            siblings.sort(key=lambda category: (category.position, category.name, category.id))
+        direct: dict[int, list[int]] = {}
+        for position, product in enumerate(self.products):
+            if product.category_id is not None:
+                direct.setdefault(product.category_id, []).append(position)
+
+        nodes: dict[int, CategoryNode] = {}
+
+        def build(category: CategoryRecord, path: tuple[int, ...]) -> dict[str, Any]:
+            below = [build(child, (*path, category.id)) for child in children.get(category.id, ())]
+            child_ids = tuple(child.id for child in children.get(category.id, ()))
+            descendants = frozenset(
+                chain((category.id,), *(nodes[child].descendants for child in child_ids))
+            )
+            positions = array(
+                "I",
+                heapq.merge(direct.get(category.id, ()), *(nodes[c].products for c in child_ids)),
+            )
+            nodes[category.id] = CategoryNode(
+                category.id,
+                category.name,
+                category.parent_id,
+                path,
+                child_ids,
+                descendants,
+                positions,
+            )
+            return {
+                "id": str(category.id),
+                "name": category.name,
+                "product_count": len(positions),
+                "children": below,
+            }
+
+        tree = [build(category, ()) for category in children.get(None, ())]
+        self.categories: dict[int, CategoryNode] = nodes
+        self.roots: tuple[int, ...] = tuple(category.id for category in children.get(None, ()))
+        self.category_tree_json: bytes = json.dumps({"data": tree}, ensure_ascii=False).encode()
+
+    def updated(
+        self,
+        version: int,
+        products: Iterable[ProductRecord],
+        removed: Iterable[int] = (),
+        categories: Iterable[CategoryRecord] | None = None,
+    ) -> "CatalogSnapshot":
+        """Return the snapshot with some records replaced.
+
+        Changes that keep the name, SKU and category of every product, e.g.
+        price updates, only replace records and share the search index with
+        this snapshot; other changes rebuild the indexes from the records.
+
+        Args:
+            version: Catalog version of the changes
+            products: Changed or new active products
+            removed: IDs of products no longer active
+            categories: All categories if any changed, None to keep them
+
+        Returns:
+            New snapshot
+        """
+        changed = {product.id: product for product in products}
+        gone = set(removed)
+        if gone.isdisjoint(self._positions) and all(
+            (position := self._positions.get(product.id)) is not None
+            and (current := self.products[position]).key == product.key
+            and current.words == product.words
+            and current.category_id == product.category_id
+            for product in changed.values()
+        ):
+            records = list(self.products)
+            for product in changed.values():
+                records[self._positions[product.id]] = product
+            snapshot = object.__new__(CatalogSnapshot)
+            snapshot.version = version
+            snapshot.products = tuple(records)
+            snapshot._keys = self._keys
+            snapshot._positions = self._positions
+            snapshot._index = self._index
+            if categories is None:
+                snapshot._category_records = self._category_records
+                snapshot.categories = self.categories
+                snapshot.roots = self.roots
+                snapshot.category_tree_json = self.category_tree_json
+            else:
+                snapshot._category_records = tuple(categories)
+                snapshot._build_tree()
+            return snapshot
+
+        records = [
+            product
+            for product in self.products
+            if product.id not in changed and product.id not in gone
+        ]
+        records.extend(changed.values())
+        return CatalogSnapshot(
+            version, records, self._category_records if categories is None else categories
+        )
+
+    def get(self, product_id: int) -> ProductRecord | None:
+        """Return an active product by ID."""
+        position = self._positions.get(product_id)
+        return None if position is None else self.products[position]
+
+    def search(
+        self, query: str, limit: int = 20, category_id: int | None = None
+    ) -> list[ProductRecord]:
+        """Find products for a query typed so far.
+
+        Args:
+            query: Words or word beginnings of product names or SKUs
+            limit: Maximum number of results
+            category_id: Only return products of this category and below
+
+        Returns:
+            Matching products, best matches first
+        """
+        terms = normalize(query)
+        allowed: CategoryNode | None = None
+        if category_id is not None:
+            allowed = self.categories.get(category_id)
+            if allowed is None:
+                return []
+        if not terms:
+            if allowed is None:
+                return []
+            return [self.products[position] for position in allowed.products[:limit]]
+
+        found: list[int] = []
+        seen: set[int] = set()
+
+        def accept(position: int) -> bool:
+            """Add a position unless filtered or already found; True when done."""
+            if position in seen:
+                return False
+            if allowed is not None:
+                if self.products[position].category_id not in allowed.descendants:
+                    return False
+            seen.add(position)
+            found.append(position)
+            return len(found) >= limit
+
+        # Names starting with the query are a range of the sorted names
+        phrase = " ".join(terms)
+        first = bisect.bisect_left(self._keys, phrase)
+        last = bisect.bisect_left(self._keys, phrase + _KEY_END, first)
+        starting: Iterable[int] = range(first, last)
+        if allowed is not None and len(allowed.products) < last - first:
+            in_category = allowed.products
+            starting = in_category[
+                bisect.bisect_left(in_category, first) : bisect.bisect_left(in_category, last)
+            ]
+        for position in starting:
+            if accept(position):
+                return self._records(found)
+
+        for fuzzy in (False, True):
+            if fuzzy and not any(_max_edits(term) for term in terms):
+                break
+            resolved = [self._index.term(term, fuzzy) for term in terms]
+            resolved.sort(key=self._index.estimate)
+            driver, others = resolved[0], resolved[1:]
+            if allowed is not None and len(allowed.products) < self._index.estimate(driver):
+                candidates: Iterable[int] = allowed.products
+                others = resolved
+            else:
+                candidates = self._index.positions(driver)
+            for position in candidates:
+                if position in seen:
+                    continue
+                words = self.products[position].words
+                if all(term.matches(words) for term in others) and accept(position):
+                    return self._records(found)
+        return self._records(found)
+
+    def _records(self, positions: list[int]) -> list[ProductRecord]:
+        """Return the records at snapshot positions."""
+        return [self.products[position] for position in positions]
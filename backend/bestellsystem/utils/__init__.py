@@ -2,23 +2,30 @@
 
 from bestellsystem.utils.errors import (
     APIError,
+    ConflictError,
     ForbiddenError,
     InternalServerError,
     NotFoundError,
+    ServiceUnavailableError,
+    TooManyRequestsError,
     UnauthorizedError,
     ValidationError,
     register_error_handlers,
 )
-from bestellsystem.utils.logging import get_logger, setup_logging
+from bestellsystem.utils.logging import get_logger, setup_logging, shutdown_logging
 
 __all__ = [
     "setup_logging",
+    "shutdown_logging",
     "get_logger",
     "APIError",
     "ValidationError",
     "NotFoundError",
     "UnauthorizedError",
     "ForbiddenError",
+    "ConflictError",
     "InternalServerError",
+    "ServiceUnavailableError",
+    "TooManyRequestsError",
     "register_error_handlers",
 ]
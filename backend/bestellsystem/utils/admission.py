@@ -0,0 +1,546 @@
+"""Admission control: rate limiting and load shedding.
+
+Requests are checked before any view code runs, by a Flask hook and, for
+the native async routes of the ASGI application, by its dispatcher:
+
+* load shedding: a worker runs at most ADMISSION_MAX_IN_FLIGHT requests at a
+  time, further requests wait up to ADMISSION_QUEUE_TIMEOUT seconds for a
+  slot; requests that already waited longer than ADMISSION_MAX_QUEUE_MS in
+  front of the application (per the proxy's X-Request-Start header) are
+  dropped. Both answer 503, so latency stays bounded instead of a queue
+  growing in front of busy workers.
+* rate limiting: token buckets per client, per route and global answer 429
+  with Retry-After once exhausted. A request takes a token from every bucket
+  that applies to it, or from none if one of them is empty.
+
+Bucket state lives in a backend: "memory" keeps it per worker process,
+"mmap" in a file shared by all workers of a host.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+from flask import Flask, g, request
+
+from bestellsystem.utils.errors import ServiceUnavailableError, TooManyRequestsError
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Gauge
+
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected by a rate limit", ("scope",))
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests shed to protect latency", ("reason",)
+)
+REQUESTS_IN_FLIGHT = Gauge("requests_in_flight", "Requests running in this worker")
+
+_PERIODS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Returns a request header by name, None if it is missing
+HeaderGetter = Callable[[str], str | None]
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Rate:
+    """Token bucket parameters."""
+
+    per_second: float
+    burst: float
+
+
+@dataclass(frozen=True, slots=True)
+class Bucket:
+    """A token bucket a request draws from."""
+
+    scope: str
+    key: str
+    rate: Rate
+
+
+def parse_rate(spec: str) -> Rate:
+    """Parse a rate like "10/s", "600/m" or "10/s:50" (with burst).
+
+    Without an explicit burst, a bucket holds one period's worth of tokens.
+
+    Args:
+        spec: Rate specification
+
+    Returns:
+        Parsed rate
+
+    Raises:
+        ValueError: If the specification is malformed
+    """
+    rate_part, _, burst_part = spec.strip().partition(":")
+    count, _, period = rate_part.partition("/")
+    try:
+        tokens = float(count)
+        per_second = tokens / _PERIODS[period.strip()]
+        burst = float(burst_part) if burst_part else tokens
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate: {spec!r}") from None
+    if per_second <= 0 or burst < 1:
+        raise ValueError(f"Invalid rate: {spec!r}")
+    return Rate(per_second, burst)
+
+
+def parse_route_rates(spec: str) -> dict[str, Rate]:
+    """Parse comma separated ``endpoint=rate`` pairs.
+
+    Args:
+        spec: e.g. "api_v1.orders.bulk_create=5/s:10,api_v1.auth.login=30/m"
+
+    Returns:
+        Rate per endpoint
+
+    Raises:
+        ValueError: If a pair is malformed
+    """
+    rates = {}
+    for pair in spec.split(","):
+        if not pair.strip():
+            continue
+        endpoint, separator, rate = pair.partition("=")
+        if not separator or not endpoint.strip():
+            raise ValueError(f"Invalid route rate: {pair!r}")
+        rates[endpoint.strip()] = parse_rate(rate)
+    return rates
+
+
+def _refill(tokens: float, updated: float, rate: Rate, now: float) -> float:
+    """Return the tokens of a bucket at ``now``."""
+    return min(rate.burst, tokens + max(0.0, now - updated) * rate.per_second)
+
+
+class RateLimitBackend(Protocol):
+    """Storage of token bucket state."""
+
+    def acquire(self, buckets: Sequence[Bucket], now: float) -> tuple[float, Bucket | None]:
+        """Take a token from every bucket, or from none if one is empty.
+
+        Args:
+            buckets: Buckets the request draws from
+            now: Current time.time()
+
+        Returns:
+            (0.0, None) if the tokens were taken, else the seconds until the
+            most limiting bucket has a token again and that bucket
+        """
+        ...
+
+
+def _take(
+    states: list[tuple[float, float]], buckets: Sequence[Bucket], now: float
+) -> tuple[list[float], float, Bucket | None]:
+    """Decide on a request given the (tokens, updated) state of its buckets.
+
+    Returns:
+        New token counts, the wait and the limiting bucket (None if allowed)
+    """
+    tokens = [
+        _refill(stored, updated, bucket.rate, now)
+        for (stored, updated), bucket in zip(states, buckets, strict=True)
+    ]
+    wait, limiting = 0.0, None
+    for available, bucket in zip(tokens, buckets, strict=True):
+        if available < 1.0:
+            bucket_wait = (1.0 - available) / bucket.rate.per_second
+            if bucket_wait > wait:
+                wait, limiting = bucket_wait, bucket
+    if limiting is None:
+        tokens = [available - 1.0 for available in tokens]
+    return tokens, wait, limiting
+
+
+class MemoryBackend:
+    """Bucket state of this process, keeping the most recently used buckets."""
+
+    def __init__(self, size: int = 65536) -> None:
+        """Initialize backend.
+
+        Args:
+            size: Maximum number of buckets kept
+        """
+        self.size = size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets: Sequence[Bucket], now: float) -> tuple[float, Bucket | None]:
+        """Take a token from every bucket, or from none if one is empty."""
+        with self._lock:
+            states = [self._buckets.get(bucket.key, (bucket.rate.burst, now)) for bucket in buckets]
+            tokens, wait, limiting = _take(states, buckets, now)
+            for available, bucket in zip(tokens, buckets, strict=True):
+                self._buckets[bucket.key] = (available, now)
+                self._buckets.move_to_end(bucket.key)
+            while len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+        return wait, limiting
+
+
+# Slot of the mmap table: key hash (0: free), tokens, time of the last update
+_SLOT = struct.Struct("<Qdd")
+
+# Slots probed for a key before the least recently updated one is reused
+_PROBES = 8
+
+
+def _key_hash(key: str) -> int:
+    """Hash a bucket key to a non-zero 64-bit integer."""
+    digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return digest or 1
+
+
+class MmapBackend:
+    """Bucket state in a memory-mapped file shared by the workers of a host.
+
+    The file is a fixed-size open-addressing table. Updates take an exclusive
+    flock on the file (and a lock for the threads of this process), which
+    costs two system calls per request. When all probed slots are taken the
+    least recently updated bucket is replaced; that client then starts again
+    with a full bucket, so size the table well above the number of active
+    clients.
+    """
+
+    def __init__(self, path: str, slots: int = 65536) -> None:
+        """Initialize backend.
+
+        Args:
+            path: Table file, created if missing and shared by all workers
+            slots: Number of buckets the table holds
+        """
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = 0
+        self._open()
+
+    def _open(self) -> None:
+        """Open and map the table file.
+
+        flock() locks belong to the open file description, which a forked
+        child shares with its parent, so every process opens its own.
+        """
+        size = self.slots * _SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _find(self, key_hash: int) -> int:
+        """Return the slot index of a key, or the slot to store it in."""
+        start = key_hash % self.slots
+        candidate, oldest = start, float("inf")
+        for probe in range(_PROBES):
+            index = (start + probe) % self.slots
+            stored_hash, _, updated = _SLOT.unpack_from(self._map, index * _SLOT.size)
+            if stored_hash == key_hash:
+                return index
+            if stored_hash == 0:
+                return index
+            if updated < oldest:
+                candidate, oldest = index, updated
+        return candidate
+
+    def acquire(self, buckets: Sequence[Bucket], now: float) -> tuple[float, Bucket | None]:
+        """Take a token from every bucket, or from none if one is empty."""
+        if self._pid != os.getpid():
+            self._open()
+        hashes = [_key_hash(bucket.key) for bucket in buckets]
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                indexes = [self._find(key_hash) for key_hash in hashes]
+                states = []
+                for index, key_hash, bucket in zip(indexes, hashes, buckets, strict=True):
+                    stored_hash, tokens, updated = _SLOT.unpack_from(self._map, index * _SLOT.size)
+                    if stored_hash != key_hash:
+                        tokens, updated = bucket.rate.burst, now
+                    states.append((tokens, updated))
+                tokens_after, wait, limiting = _take(states, buckets, now)
+                for index, key_hash, available in zip(indexes, hashes, tokens_after, strict=True):
+                    _SLOT.pack_into(self._map, index * _SLOT.size, key_hash, available, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return wait, limiting
+
+
+def create_backend(name: str, path: str = "", slots: int = 65536) -> RateLimitBackend:
+    """Create a rate limit backend.
+
+    Args:
+        name: "memory" or "mmap"
+        path: Table file of the mmap backend
+        slots: Number of buckets kept
+
+    Returns:
+        Backend instance
+
+    Raises:
+        ValueError: If the backend is unknown or the mmap path is missing
+    """
+    if name == "memory":
+        return MemoryBackend(slots)
+    if name == "mmap":
+        if not path:
+            raise ValueError("RATE_LIMIT_PATH is required for the mmap backend")
+        return MmapBackend(path, slots)
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+class ConcurrencyLimiter:
+    """Limits the requests running at the same time in this process."""
+
+    def __init__(self, limit: int, queue_timeout: float = 0.0) -> None:
+        """Initialize limiter.
+
+        Args:
+            limit: Maximum number of requests running at a time
+            queue_timeout: Seconds a request may wait for a free slot
+        """
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Start with all slots free, requests of the parent do not run here."""
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting up to ``queue_timeout`` seconds.
+
+        Returns:
+            Whether a slot was taken
+        """
+        if self.queue_timeout > 0:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if acquired:
+            self._track(1)
+        return acquired
+
+    def release(self) -> None:
+        """Return a slot."""
+        self._track(-1)
+        self._slots.release()
+
+    def _track(self, delta: int) -> None:
+        """Update the number of running requests."""
+        with self._lock:
+            self._in_flight += delta
+            REQUESTS_IN_FLIGHT.set(self._in_flight)
+
+
+def queue_time(header: str | None, now: float) -> float | None:
+    """Return how long a request waited since the proxy received it.
+
+    Args:
+        header: X-Request-Start value, "t=<time>" or "<time>" in seconds,
+            milliseconds or microseconds since the epoch
+        now: Current time.time()
+
+    Returns:
+        Seconds waited, None if the header is missing or malformed
+    """
+    if not header:
+        return None
+    try:
+        started = float(header.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, now - started)
+
+
+@dataclass(slots=True)
+class _Settings:
+    """Limits in effect, set by register_admission_control()."""
+
+    backend: RateLimitBackend
+    global_rate: Rate | None
+    client_rate: Rate | None
+    route_rates: dict[str, Rate]
+    client_header: str
+    trusted_proxies: int
+    exempt: frozenset[str]
+    max_queue_seconds: float
+    limiter: ConcurrencyLimiter | None
+
+
+_settings: _Settings | None = None
+
+
+def client_id() -> str:
+    """Identify the client of the current request for its rate limit.
+
+    Clients can send the header themselves, so only the addresses appended
+    by the trusted proxies count: with ``trusted_proxies`` proxies the
+    client is the entry that many places from the right, which the first
+    proxy added.
+
+    Returns:
+        Address added to the configured client header (e.g.
+        X-Forwarded-For) by the outermost trusted proxy, else the remote
+        address
+    """
+    return _client_address(request.headers.get, request.remote_addr)
+
+
+def _client_address(get_header: HeaderGetter, remote_addr: str | None) -> str:
+    """Identify a client from its request headers and remote address."""
+    settings = _settings
+    if settings is not None and settings.client_header:
+        value = get_header(settings.client_header)
+        if value:
+            addresses = [address.strip() for address in value.split(",")]
+            if len(addresses) >= settings.trusted_proxies:
+                address = addresses[-settings.trusted_proxies]
+                if address:
+                    return address
+    return remote_addr or "unknown"
+
+
+def _buckets(
+    settings: _Settings, endpoint: str, get_header: HeaderGetter, remote_addr: str | None
+) -> list[Bucket]:
+    """Return the buckets a request to ``endpoint`` draws from."""
+    buckets = []
+    if settings.client_rate is not None:
+        client = _client_address(get_header, remote_addr)
+        buckets.append(Bucket("client", f"client:{client}", settings.client_rate))
+    route_rate = settings.route_rates.get(endpoint)
+    if route_rate is not None:
+        buckets.append(Bucket("route", f"route:{endpoint}", route_rate))
+    if settings.global_rate is not None:
+        buckets.append(Bucket("global", "global", settings.global_rate))
+    return buckets
+
+
+def admit(
+    endpoint: str, get_header: HeaderGetter, remote_addr: str | None
+) -> ConcurrencyLimiter | None:
+    """Reject a request if the worker is overloaded or a rate limit is exhausted.
+
+    May wait up to ADMISSION_QUEUE_TIMEOUT seconds for a concurrency slot.
+
+    Args:
+        endpoint: Endpoint name of the request
+        get_header: Returns a request header by name
+        remote_addr: Address of the peer
+
+    Returns:
+        Limiter whose slot the request holds and must release once it is
+        done, None if it holds none
+
+    Raises:
+        ServiceUnavailableError: If the request is shed
+        TooManyRequestsError: If a rate limit is exhausted
+    """
+    settings = _settings
+    if settings is None or endpoint in settings.exempt:
+        return None
+
+    now = time.time()
+    if settings.max_queue_seconds > 0:
+        waited = queue_time(get_header("X-Request-Start"), now)
+        if waited is not None and waited > settings.max_queue_seconds:
+            ADMISSION_REJECTED.inc("queue_time")
+            raise ServiceUnavailableError("Server overloaded, please retry", retry_after=1)
+
+    buckets = _buckets(settings, endpoint, get_header, remote_addr)
+    if buckets:
+        wait, limiting = settings.backend.acquire(buckets, now)
+        if limiting is not None:
+            RATE_LIMITED.inc(limiting.scope)
+            logger.info(
+                "Rate limit exceeded",
+                extra={"endpoint": endpoint, "scope": limiting.scope, "retry_after": wait},
+            )
+            raise TooManyRequestsError("Rate limit exceeded", retry_after=wait)
+
+    if settings.limiter is None:
+        return None
+    if not settings.limiter.acquire():
+        ADMISSION_REJECTED.inc("in_flight")
+        raise ServiceUnavailableError("Server overloaded, please retry", retry_after=1)
+    return settings.limiter
+
+
+def _admit_request() -> None:
+    """Admit the current Flask request, keeping its concurrency slot on ``g``."""
+    limiter = admit(request.endpoint or "unmatched", request.headers.get, request.remote_addr)
+    if limiter is not None:
+        g._admission_slot = limiter
+
+
+def _release_slot(exception: BaseException | None) -> None:
+    """Free the request's concurrency slot."""
+    limiter: ConcurrencyLimiter | None = g.pop("_admission_slot", None)
+    if limiter is not None:
+        limiter.release()
+
+
+def register_admission_control(app: Flask) -> None:
+    """Install rate limits and load shedding configured in the app config.
+
+    Nothing is registered when no limit is configured. Must be called after
+    register_request_timing, so rejected requests are timed and logged.
+
+    Args:
+        app: Flask application instance
+
+    Raises:
+        ValueError: If a rate or the backend configuration is invalid
+    """
+    global _settings
+    config = app.config
+    global_rate = config.get("RATE_LIMIT_GLOBAL", "")
+    client_rate = config.get("RATE_LIMIT_CLIENT", "")
+    route_rates = parse_route_rates(config.get("RATE_LIMIT_ROUTES", ""))
+    max_in_flight = config.get("ADMISSION_MAX_IN_FLIGHT", 0)
+    max_queue_ms = config.get("ADMISSION_MAX_QUEUE_MS", 0)
+    if not (global_rate or client_rate or route_rates or max_in_flight > 0 or max_queue_ms > 0):
+        _settings = None
+        return
+
+    exempt = config.get("RATE_LIMIT_EXEMPT", "")
+    _settings = _Settings(
+        backend=create_backend(
+            config.get("RATE_LIMIT_BACKEND", "memory"),
+            config.get("RATE_LIMIT_PATH", ""),
+            config.get("RATE_LIMIT_SLOTS", 65536),
+        ),
+        global_rate=parse_rate(global_rate) if global_rate else None,
+        client_rate=parse_rate(client_rate) if client_rate else None,
+        route_rates=route_rates,
+        client_header=config.get("RATE_LIMIT_CLIENT_HEADER", ""),
+        trusted_proxies=max(1, config.get("RATE_LIMIT_TRUSTED_PROXIES", 1)),
+        exempt=frozenset(e.strip() for e in exempt.split(",") if e.strip()),
+        max_queue_seconds=max_queue_ms / 1000,
+        limiter=(
+            ConcurrencyLimiter(max_in_flight, config.get("ADMISSION_QUEUE_TIMEOUT", 0.0))
+            if max_in_flight > 0
+            else None
+        ),
+    )
+    app.before_request(_admit_request)
+    app.teardown_request(_release_slot)
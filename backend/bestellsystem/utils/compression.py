@@ -0,0 +1,157 @@
+"""Response compression negotiated by Accept-Encoding."""
+
+import gzip
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from flask import Flask, Response, current_app, request
+
+from bestellsystem.utils.metrics import Counter
+from bestellsystem.utils.timing import add_phase
+
+try:
+    import brotli  # type: ignore[import-not-found, unused-ignore]
+except ImportError:
+    brotli = None
+
+COMPRESSED_RESPONSES = Counter(
+    "http_compressed_responses_total", "Compressed responses by encoding", ("encoding",)
+)
+
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/jsonl",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+
+def _is_compressible(mimetype: str | None) -> bool:
+    """Check whether a content type benefits from compression."""
+    # Event streams stay open for hours; a compressor per stream costs more
+    # memory than the few bytes per event it saves
+    if not mimetype or mimetype == "text/event-stream":
+        return False
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def available_encodings() -> list[str]:
+    """Return the supported encodings in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding() -> str | None:
+    """Pick the best encoding the client accepts, or None."""
+    encoding = request.accept_encodings.best_match(available_encodings())
+    return encoding if isinstance(encoding, str) else None
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete body.
+
+    Args:
+        data: Response body
+        encoding: "gzip" or "br"
+        level: gzip level (1-9) or brotli quality (0-11)
+
+    Returns:
+        Compressed body
+    """
+    if encoding == "br":
+        return bytes(brotli.compress(data, quality=level))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks: Iterable[Any], encoding: str, level: int) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk.
+
+    Every chunk is flushed so clients receive data as soon as the view yields
+    it, as they would without compression.
+
+    Args:
+        chunks: Body chunks as produced by the view (str or bytes)
+        encoding: "gzip" or "br"
+        level: gzip level (1-9) or brotli quality (0-11)
+
+    Yields:
+        Compressed chunks
+    """
+    try:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=level)
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                yield compressor.process(data) + compressor.flush()
+            yield compressor.finish()
+        else:
+            gzipper = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                yield gzipper.compress(data) + gzipper.flush(zlib.Z_SYNC_FLUSH)
+            yield gzipper.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _compress_response(response: Response) -> Response:
+    """Compress the response body if the client accepts it and it pays off."""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or request.method == "HEAD"
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not _is_compressible(response.mimetype)
+    ):
+        return response
+
+    # The representation depends on Accept-Encoding even when sent uncompressed
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    start = time.perf_counter()
+    config = current_app.config
+    if encoding == "br":
+        level = config.get("COMPRESSION_BROTLI_QUALITY", 4)
+    else:
+        level = config.get("COMPRESSION_LEVEL", 6)
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get("COMPRESSION_MIN_SIZE", 500):
+            return response
+        response.set_data(compress(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    # A strong ETag identifies the exact bytes, so the encoded variant gets its own
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+    COMPRESSED_RESPONSES.inc(encoding)
+    add_phase("compress", time.perf_counter() - start)
+    return response
+
+
+def register_compression(app: Flask) -> None:
+    """Compress responses of the app.
+
+    Must be called after register_request_timing so compression time is
+    part of the request duration.
+
+    Args:
+        app: Flask application instance
+    """
+    if app.config.get("COMPRESSION_ENABLED", True):
+        app.after_request(_compress_response)
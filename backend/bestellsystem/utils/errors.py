@@ -1,10 +1,17 @@
 """Unified error handling and response envelope."""
 
+import functools
+import json
+import math
 from typing import Any
 
-from flask import jsonify
+from flask import Response
 from werkzeug.exceptions import HTTPException
 
+from bestellsystem.utils.metrics import Counter
+
+API_ERRORS = Counter("api_errors_total", "API errors by error class", ("error",))
+
 
 class APIError(Exception):
     """Base API error class."""
@@ -14,6 +21,7 @@ class APIError(Exception):
         message: str,
         status_code: int = 400,
         payload: dict[str, Any] | None = None,
+        retry_after: float | None = None,
     ) -> None:
         """Initialize API error.
 
@@ -21,11 +29,14 @@ class APIError(Exception):
             message: Error message
             status_code: HTTP status code
             payload: Additional error details
+            retry_after: Seconds after which the client may retry, sent as
+                Retry-After header
         """
         super().__init__()
         self.message = message
         self.status_code = status_code
         self.payload = payload
+        self.retry_after = retry_after
 
     def to_dict(self) -> dict[str, Any]:
         """Convert error to dictionary."""
@@ -72,6 +83,32 @@ class ForbiddenError(APIError):
         super().__init__(message, status_code=403, payload=payload)
 
 
+class ConflictError(APIError):
+    """Conflict error (409)."""
+
+    def __init__(
+        self,
+        message: str,
+        payload: dict[str, Any] | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Initialize conflict error."""
+        super().__init__(message, status_code=409, payload=payload, retry_after=retry_after)
+
+
+class TooManyRequestsError(APIError):
+    """Rate limit error (429)."""
+
+    def __init__(
+        self,
+        message: str,
+        payload: dict[str, Any] | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Initialize rate limit error."""
+        super().__init__(message, status_code=429, payload=payload, retry_after=retry_after)
+
+
 class InternalServerError(APIError):
     """Internal server error (500)."""
 
@@ -80,6 +117,71 @@ class InternalServerError(APIError):
         super().__init__(message, status_code=500, payload=payload)
 
 
+class ServiceUnavailableError(APIError):
+    """Service unavailable error (503)."""
+
+    def __init__(
+        self,
+        message: str,
+        payload: dict[str, Any] | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Initialize service unavailable error."""
+        super().__init__(message, status_code=503, payload=payload, retry_after=retry_after)
+
+
+@functools.lru_cache(maxsize=256)
+def error_envelope(message: str, status_code: int) -> bytes:
+    """Serialize an error envelope without details.
+
+    Most error responses repeat a handful of messages ("Not Found",
+    "Authentication required", ...), so their serialized form is cached.
+
+    Args:
+        message: Error message
+        status_code: HTTP status code
+
+    Returns:
+        JSON body
+    """
+    envelope = {"error": {"message": message, "status_code": status_code}}
+    return json.dumps(envelope, separators=(",", ":")).encode() + b"\n"
+
+
+def _envelope_response(message: str, status_code: int) -> tuple[Response, int]:
+    """Build an error response from a cached envelope."""
+    return Response(error_envelope(message, status_code), mimetype="application/json"), status_code
+
+
+def serialize_api_error(error: APIError) -> tuple[bytes, dict[str, str]]:
+    """Count an API error and serialize its response.
+
+    Used by the Flask error handler and by the native async routes of the
+    ASGI application, so both answer with the same envelope and headers.
+
+    Args:
+        error: API error instance
+
+    Returns:
+        Tuple of (JSON body, extra response headers)
+    """
+    API_ERRORS.inc(type(error).__name__)
+    if error.payload:
+        body = json.dumps(error.to_dict(), separators=(",", ":")).encode() + b"\n"
+    else:
+        body = error_envelope(error.message, error.status_code)
+    headers = {}
+    if error.retry_after is not None:
+        headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return body, headers
+
+
+def serialize_internal_error() -> bytes:
+    """Count an unhandled exception and return the body of its 500 response."""
+    API_ERRORS.inc(InternalServerError.__name__)
+    return error_envelope("Internal server error", 500)
+
+
 def handle_api_error(error: APIError) -> tuple[Any, int]:
     """Handle API errors and return JSON response.
 
@@ -89,8 +191,8 @@ def handle_api_error(error: APIError) -> tuple[Any, int]:
     Returns:
         Tuple of (JSON response, status code)
     """
-    response = jsonify(error.to_dict())
-    return response, error.status_code
+    body, headers = serialize_api_error(error)
+    return Response(body, mimetype="application/json", headers=headers), error.status_code
 
 
 def handle_http_exception(error: HTTPException) -> tuple[Any, int]:
@@ -102,15 +204,7 @@ def handle_http_exception(error: HTTPException) -> tuple[Any, int]:
     Returns:
         Tuple of (JSON response, status code)
     """
-    response = jsonify(
-        {
-            "error": {
-                "message": error.description or "An error occurred",
-                "status_code": error.code or 500,
-            }
-        }
-    )
-    return response, error.code or 500
+    return _envelope_response(error.description or "An error occurred", error.code or 500)
 
 
 def handle_generic_exception(error: Exception) -> tuple[Any, int]:
@@ -122,15 +216,7 @@ def handle_generic_exception(error: Exception) -> tuple[Any, int]:
     Returns:
         Tuple of (JSON response, status code)
     """
-    response = jsonify(
-        {
-            "error": {
-                "message": "Internal server error",
-                "status_code": 500,
-            }
-        }
-    )
-    return response, 500
+    return Response(serialize_internal_error(), mimetype="application/json"), 500
 
 
 def register_error_handlers(app: Any) -> None:
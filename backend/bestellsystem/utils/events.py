@@ -0,0 +1,511 @@
+"""Event broker fanning out committed changes to Server-Sent Event streams.
+
+Events are published when the transaction that caused them commits. The
+backend carries them to every worker process; in each process one listener
+thread hands them to the local subscribers. Every subscriber has a bounded
+queue, and a subscriber that falls behind is evicted instead of slowing down
+delivery to the others or buffering without limit.
+"""
+
+import json
+import os
+import queue
+import select
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, Protocol
+
+from flask import Flask
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, PoolProxiedConnection
+
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Gauge
+
+EVENTS_PUBLISHED = Counter("events_published_total", "Published events by channel", ("channel",))
+EVENT_SUBSCRIBERS = Gauge("event_subscribers", "Open event subscriptions in this worker")
+EVENT_SUBSCRIBERS_EVICTED = Counter(
+    "event_subscribers_evicted_total", "Subscribers evicted because their queue was full"
+)
+
+# PostgreSQL NOTIFY channel carrying all events
+NOTIFY_CHANNEL = "bestellsystem_events"
+
+# Seconds events are kept in the SQLite backend for slow pollers
+SQLITE_RETENTION_SECONDS = 60.0
+
+logger = get_logger(__name__)
+
+Dispatch = Callable[[str], None]
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    """Event delivered to subscribers."""
+
+    channel: str
+    data: dict[str, Any]
+
+
+class EventBackend(Protocol):
+    """Transport delivering published messages to the listener of every worker."""
+
+    def publish(self, message: str) -> None:
+        """Send a message to all workers."""
+
+    def start(self, dispatch: Dispatch) -> None:
+        """Start delivering messages of all workers to ``dispatch``."""
+
+    def stop(self) -> None:
+        """Stop delivering messages."""
+
+
+class LocalBackend:
+    """Delivers events within the publishing process only."""
+
+    def __init__(self) -> None:
+        """Initialize backend."""
+        self._dispatch: Dispatch | None = None
+
+    def publish(self, message: str) -> None:
+        """Deliver a message to the local listener."""
+        if self._dispatch is not None:
+            self._dispatch(message)
+
+    def start(self, dispatch: Dispatch) -> None:
+        """Start delivering messages to ``dispatch``."""
+        self._dispatch = dispatch
+
+    def stop(self) -> None:
+        """Stop delivering messages."""
+        self._dispatch = None
+
+
+class _ListenerThread:
+    """Background thread of a polling or listening backend."""
+
+    def __init__(self, name: str, target: Callable[[Dispatch, threading.Event], None]) -> None:
+        self._name = name
+        self._target = target
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, dispatch: Dispatch) -> None:
+        """Start the thread unless it is running in this process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._target, args=(dispatch, self._stopped), name=self._name, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Ask the thread to stop and wait briefly for it."""
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+
+class SQLiteBackend:
+    """Events shared by the worker processes of a host through a SQLite file.
+
+    Publishers append rows; the listener of each worker polls for rows newer
+    than the last one it has seen. Meant for single-host deployments without
+    PostgreSQL and for tests.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.2) -> None:
+        """Initialize backend.
+
+        Args:
+            path: Database file, created if missing
+            poll_interval: Seconds between polls of the listener
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._listener = _ListenerThread("event-listener", self._listen)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS event "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT, created_at REAL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of the current thread and process."""
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def publish(self, message: str) -> None:
+        """Append a message and drop messages past the retention."""
+        now = time.time()
+        connection = self._connect()
+        connection.execute("INSERT INTO event (message, created_at) VALUES (?, ?)", (message, now))
+        connection.execute(
+            "DELETE FROM event WHERE created_at < ?", (now - SQLITE_RETENTION_SECONDS,)
+        )
+
+    def start(self, dispatch: Dispatch) -> None:
+        """Start polling for messages."""
+        self._listener.start(dispatch)
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self._listener.stop()
+
+    def _listen(self, dispatch: Dispatch, stopped: threading.Event) -> None:
+        """Poll for new rows until stopped."""
+        connection = self._connect()
+        (last_id,) = connection.execute("SELECT coalesce(max(id), 0) FROM event").fetchone()
+        while not stopped.wait(self.poll_interval):
+            try:
+                rows = connection.execute(
+                    "SELECT id, message FROM event WHERE id > ? ORDER BY id", (last_id,)
+                ).fetchall()
+            except sqlite3.Error:
+                logger.warning("Could not poll for events", exc_info=True)
+                continue
+            for row_id, message in rows:
+                dispatch(message)
+                last_id = row_id
+
+
+class PostgresBackend:
+    """Events distributed with PostgreSQL LISTEN/NOTIFY.
+
+    Every worker keeps one connection listening on NOTIFY_CHANNEL and one
+    for sending notifications, both outside of the SQLAlchemy pool.
+    """
+
+    def __init__(self, url: str, reconnect_seconds: float = 1.0) -> None:
+        """Initialize backend.
+
+        Args:
+            url: SQLAlchemy database URL
+            reconnect_seconds: Delay before reconnecting a failed listener
+        """
+        self._engine = create_engine(url, poolclass=NullPool)
+        self.reconnect_seconds = reconnect_seconds
+        self._connection: PoolProxiedConnection | None = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self._listener = _ListenerThread("event-listener", self._listen)
+
+    def _connect(self) -> PoolProxiedConnection:
+        """Open an autocommit connection; it is closed when released."""
+        connection = self._engine.raw_connection()
+        connection.driver_connection.autocommit = True  # type: ignore[union-attr]
+        return connection
+
+    def publish(self, message: str) -> None:
+        """Send a notification, reconnecting once if the connection broke."""
+        with self._lock:
+            for attempt in range(2):
+                if self._connection is None or self._pid != os.getpid():
+                    self._connection = self._connect()
+                    self._pid = os.getpid()
+                try:
+                    cursor = self._connection.cursor()
+                    cursor.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, message))
+                    cursor.close()
+                    return
+                except Exception:
+                    self._connection.invalidate()
+                    self._connection = None
+                    if attempt:
+                        raise
+
+    def start(self, dispatch: Dispatch) -> None:
+        """Start listening for notifications."""
+        self._listener.start(dispatch)
+
+    def stop(self) -> None:
+        """Stop listening."""
+        self._listener.stop()
+
+    def _listen(self, dispatch: Dispatch, stopped: threading.Event) -> None:
+        """Receive notifications until stopped, reconnecting after errors."""
+        while not stopped.is_set():
+            try:
+                connection = self._connect()
+            except Exception:
+                logger.warning("Could not connect event listener", exc_info=True)
+                stopped.wait(self.reconnect_seconds)
+                continue
+            driver_connection: Any = connection.driver_connection
+            try:
+                cursor = connection.cursor()
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                cursor.close()
+                while not stopped.is_set():
+                    if select.select([driver_connection], [], [], 1.0)[0]:
+                        driver_connection.poll()
+                        while driver_connection.notifies:
+                            dispatch(driver_connection.notifies.pop(0).payload)
+            except Exception:
+                logger.warning("Event listener failed, reconnecting", exc_info=True)
+                stopped.wait(self.reconnect_seconds)
+            finally:
+                connection.close()
+
+
+class Subscription:
+    """Events of some channels, buffered in a bounded queue."""
+
+    def __init__(self, broker: "EventBroker", channels: frozenset[str], queue_size: int) -> None:
+        """Initialize subscription.
+
+        Args:
+            broker: Broker delivering the events
+            channels: Subscribed channels
+            queue_size: Events buffered before the subscriber is evicted
+        """
+        self.broker = broker
+        self.channels = channels
+        self.evicted = False
+        self._queue: queue.Queue[Event | None] = queue.Queue(maxsize=queue_size)
+
+    def get(self, timeout: float) -> Event | None:
+        """Wait for the next event.
+
+        Args:
+            timeout: Seconds to wait
+
+        Returns:
+            The next event, or None on timeout or after eviction
+        """
+        if self.evicted:
+            return None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, item: Event) -> bool:
+        """Queue an event without blocking; False if the queue is full."""
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return False
+        return True
+
+    def _evict(self) -> None:
+        """Mark the subscription evicted and wake up a waiting reader."""
+        self.evicted = True
+        with self._queue.mutex:
+            self._queue.queue.clear()
+        self._queue.put_nowait(None)
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self.broker.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        """Return the subscription."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the subscription."""
+        self.close()
+
+
+class EventBroker:
+    """Publish events and fan them out to the subscribers of this process."""
+
+    def __init__(self, backend: EventBackend, queue_size: int = 100) -> None:
+        """Initialize broker.
+
+        Args:
+            backend: Transport between worker processes
+            queue_size: Events buffered per subscriber
+        """
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, data: dict[str, Any]) -> None:
+        """Publish an event to the subscribers of all workers.
+
+        Args:
+            channel: Event channel
+            data: JSON-serializable event data
+        """
+        EVENTS_PUBLISHED.inc(channel)
+        self.backend.publish(json.dumps({"channel": channel, "data": data}, separators=(",", ":")))
+
+    def subscribe(self, *channels: str) -> Subscription:
+        """Subscribe to channels; the backend listener starts on first use.
+
+        Args:
+            *channels: Channels to receive events of
+
+        Returns:
+            Subscription, to be closed when the client goes away
+        """
+        subscription = Subscription(self, frozenset(channels), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            EVENT_SUBSCRIBERS.set(len(self._subscribers))
+        self.backend.start(self.dispatch)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription.
+
+        Args:
+            subscription: Subscription to remove
+        """
+        with self._lock:
+            self._subscribers.discard(subscription)
+            EVENT_SUBSCRIBERS.set(len(self._subscribers))
+
+    def dispatch(self, message: str) -> None:
+        """Hand a message received from the backend to the local subscribers.
+
+        Args:
+            message: Serialized event
+        """
+        try:
+            decoded = json.loads(message)
+            item = Event(decoded["channel"], decoded["data"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Dropped malformed event")
+            return
+        with self._lock:
+            subscribers = [s for s in self._subscribers if item.channel in s.channels]
+        for subscription in subscribers:
+            if not subscription._offer(item):
+                EVENT_SUBSCRIBERS_EVICTED.inc()
+                subscription._evict()
+                self.unsubscribe(subscription)
+
+    def stop(self) -> None:
+        """Stop the backend listener."""
+        self.backend.stop()
+
+
+# Broker used by the event streams, replaced by configure_events()
+event_broker = EventBroker(LocalBackend())
+
+
+def configure_events(
+    backend: str,
+    queue_size: int = 100,
+    url: str = "",
+    path: str = "",
+    poll_interval: float = 0.2,
+) -> None:
+    """Select the event backend.
+
+    Args:
+        backend: "local", "sqlite" or "postgres"
+        queue_size: Events buffered per subscriber
+        url: Database URL of the PostgreSQL backend
+        path: Database file of the SQLite backend
+        poll_interval: Seconds between polls of the SQLite backend
+
+    Raises:
+        ValueError: If the backend is unknown or the SQLite path is missing
+    """
+    global event_broker
+    transport: EventBackend
+    if backend == "local":
+        transport = LocalBackend()
+    elif backend == "sqlite":
+        if not path:
+            raise ValueError("EVENTS_SQLITE_PATH is required for the sqlite backend")
+        transport = SQLiteBackend(path, poll_interval)
+    elif backend == "postgres":
+        transport = PostgresBackend(url)
+    else:
+        raise ValueError(f"Unknown events backend: {backend}")
+    event_broker.stop()
+    event_broker = EventBroker(transport, queue_size)
+
+
+def subscribe(*channels: str) -> Subscription:
+    """Subscribe to channels of the configured broker.
+
+    Args:
+        *channels: Channels to receive events of
+
+    Returns:
+        Subscription, to be closed when the client goes away
+    """
+    return event_broker.subscribe(*channels)
+
+
+def format_sse(item: Event) -> str:
+    """Serialize an event in the text/event-stream format.
+
+    Args:
+        item: Event to send
+
+    Returns:
+        Event block including the terminating blank line
+    """
+    return f"event: {item.channel}\ndata: {json.dumps(item.data, separators=(',', ':'))}\n\n"
+
+
+def publish_after_commit(session: Session, channel: str, data: dict[str, Any]) -> None:
+    """Publish an event once the session's transaction commits.
+
+    Events of transactions that are rolled back are discarded.
+
+    Args:
+        session: Session whose transaction causes the event
+        channel: Event channel
+        data: JSON-serializable event data
+    """
+    session.info.setdefault("pending_events", []).append((channel, data))
+
+
+def _publish_pending_events(session: Session) -> None:
+    """Publish the events of a committed transaction."""
+    for channel, data in session.info.pop("pending_events", ()):
+        try:
+            event_broker.publish(channel, data)
+        except Exception:
+            logger.warning("Could not publish event", exc_info=True, extra={"channel": channel})
+
+
+def _discard_pending_events(session: Session) -> None:
+    """Forget the events of a rolled back transaction."""
+    session.info.pop("pending_events", None)
+
+
+def register_events(app: Flask, session_class: type[Session] = Session) -> None:
+    """Configure the event broker and publish events on ORM commits.
+
+    Args:
+        app: Flask application instance
+        session_class: Session class whose commits publish pending events
+    """
+    configure_events(
+        app.config.get("EVENTS_BACKEND", "local"),
+        queue_size=app.config.get("EVENTS_QUEUE_SIZE", 100),
+        url=app.config.get("DATABASE_URL", ""),
+        path=app.config.get("EVENTS_SQLITE_PATH", ""),
+        poll_interval=app.config.get("EVENTS_POLL_INTERVAL", 0.2),
+    )
+    if not event.contains(session_class, "after_commit", _publish_pending_events):
+        event.listen(session_class, "after_commit", _publish_pending_events)
+        event.listen(session_class, "after_rollback", _discard_pending_events)
@@ -0,0 +1,490 @@
+"""Idempotency-Key handling for POST endpoints of the API.
+
+A client retrying a POST sends the same ``Idempotency-Key`` header with every
+attempt. The first attempt runs the view; its response is stored and
+replayed to the retries, marked with ``Idempotent-Replayed: true``, so a
+retried upload never creates its orders twice:
+
+* Keys are scoped to method and path and stored with a SHA-256 hash of the
+  request body. A retry with the same key and a different body fails with a
+  ValidationError.
+* The first attempt claims the key in the idempotency_key table before the
+  view runs. Successful responses are written in the transaction of the
+  request, so the stored response and the view's writes commit together.
+  Failed attempts (status 400 and above) release the key, so a retry runs
+  the view again; their writes were rolled back.
+* Attempts arriving while the first is running wait for its response, up
+  to IDEMPOTENCY_WAIT_TIMEOUT seconds, then get 409. Claims of attempts that
+  died without releasing the key can be taken over after
+  IDEMPOTENCY_LOCK_TIMEOUT seconds.
+* Stored responses live IDEMPOTENCY_TTL seconds. Each worker keeps recently
+  seen ones in an LRU cache, so replays usually skip the database.
+
+To compute the hash before the view runs, the body of a request with a key
+is copied to a spooled temporary file (in memory up to 1 MiB, on disk
+beyond), which the view then reads as ``request.stream``.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import IO
+
+from flask import Flask, Response, g, request
+from sqlalchemy import Update, and_, delete, event, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from bestellsystem.db import SessionLocal, use_primary
+from bestellsystem.models import IdempotencyKey
+from bestellsystem.utils.cache import TTLCache
+from bestellsystem.utils.errors import ConflictError, ValidationError
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter
+from bestellsystem.utils.timing import add_log_field
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total", "Requests with an Idempotency-Key by outcome", ("result",)
+)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Request bodies up to this size are spooled in memory
+SPOOL_MEMORY_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Interval of waiters polling for a claim held by another process
+POLL_INTERVAL = 0.1
+# Expired rows are deleted at most this often per worker
+PURGE_INTERVAL = 60.0
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    """Stored response of a key, or its claim while ``status_code`` is None."""
+
+    request_hash: str
+    status_code: int | None
+    content_type: str | None
+    body: bytes | None
+    expires_at: float
+
+
+def scoped_key(method: str, path: str, key: str) -> str:
+    """Return the storage key of an Idempotency-Key.
+
+    Args:
+        method: HTTP method
+        path: Request path
+        key: Value of the Idempotency-Key header
+
+    Returns:
+        64 hex digits
+    """
+    return hashlib.sha256(f"{method} {path}\n{key}".encode()).hexdigest()
+
+
+def _timestamp(value: datetime) -> float:
+    """Convert a stored datetime, naive in UTC on some databases, to a Unix timestamp."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _datetime(timestamp: float) -> datetime:
+    """Convert a Unix timestamp to an aware datetime in UTC."""
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class IdempotencyStore:
+    """Stored responses in the database, with an LRU cache of completed ones.
+
+    Requests of this process waiting for a key claimed here are woken by an
+    event when it is completed or released; claims of other processes are
+    polled.
+    """
+
+    def __init__(self, ttl: float, lock_timeout: float, cache_size: int) -> None:
+        """Initialize store.
+
+        Args:
+            ttl: Seconds responses are stored
+            lock_timeout: Seconds after which a claim is considered abandoned
+            cache_size: Completed responses cached per process
+        """
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.cache_size = cache_size
+        self._reset()
+
+    def _reset(self) -> None:
+        """Start with an empty cache; claims of the parent are not waited for here."""
+        self._cache: TTLCache[StoredResponse] = TTLCache(self.cache_size, self.ttl)
+        self._in_flight: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._purged_at = float("-inf")
+
+    def lookup(self, key: str) -> StoredResponse | None:
+        """Return the stored response or the claim of a key.
+
+        Args:
+            key: Storage key
+
+        Returns:
+            Completed response or running claim, None if the key is free
+        """
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        now = time.time()
+        with SessionLocal() as session:
+            # A claim committed a moment ago may not have reached a replica yet
+            use_primary(session)
+            row = session.get(IdempotencyKey, key)
+            if row is None or _timestamp(row.expires_at) <= now:
+                return None
+            if row.status_code is None and _timestamp(row.locked_until) <= now:
+                # Abandoned claim, free to be taken over
+                return None
+            stored = StoredResponse(
+                row.request_hash,
+                row.status_code,
+                row.content_type,
+                row.response_body,
+                _timestamp(row.expires_at),
+            )
+        if stored.status_code is not None:
+            self._cache.set(key, stored, stored.expires_at - now)
+        return stored
+
+    def claim(self, key: str, request_hash: str) -> bool:
+        """Claim a free key for a request about to run.
+
+        Args:
+            key: Storage key
+            request_hash: Hash of the request body
+
+        Returns:
+            Whether the key was claimed; False if another request holds it
+        """
+        now = time.time()
+        values = {
+            "request_hash": request_hash,
+            "status_code": None,
+            "content_type": None,
+            "response_body": None,
+            "locked_until": _datetime(now + self.lock_timeout),
+            "expires_at": _datetime(now + self.ttl),
+        }
+        with SessionLocal() as session:
+            use_primary(session)
+            if now - self._purged_at >= PURGE_INTERVAL:
+                self._purged_at = now
+                session.execute(
+                    delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _datetime(now))
+                )
+                session.commit()
+            session.add(IdempotencyKey(key=key, **values))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                # Take over an expired response or an abandoned claim
+                result = session.execute(
+                    update(IdempotencyKey)
+                    .where(
+                        IdempotencyKey.key == key,
+                        or_(
+                            IdempotencyKey.expires_at <= _datetime(now),
+                            and_(
+                                IdempotencyKey.status_code.is_(None),
+                                IdempotencyKey.locked_until <= _datetime(now),
+                            ),
+                        ),
+                    )
+                    .values(**values)
+                )
+                session.commit()
+                if getattr(result, "rowcount", 0) != 1:
+                    return False
+        self._cache.delete(key)
+        with self._lock:
+            self._in_flight[key] = threading.Event()
+        return True
+
+    def completion(self, key: str, response: StoredResponse) -> Update:
+        """Build the statement storing the response of a claimed key.
+
+        Args:
+            key: Storage key
+            response: Response to store
+
+        Returns:
+            UPDATE statement, to be executed in the request transaction
+        """
+        return (
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(
+                status_code=response.status_code,
+                content_type=response.content_type,
+                response_body=response.body,
+            )
+        )
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        """Store the response of a claimed key in a transaction of its own.
+
+        Args:
+            key: Storage key
+            response: Response to store
+        """
+        with SessionLocal() as session:
+            session.execute(self.completion(key, response))
+            session.commit()
+        self.resolve(key, response)
+
+    def release(self, key: str, request_hash: str) -> None:
+        """Free a claimed key whose request failed.
+
+        Args:
+            key: Storage key
+            request_hash: Hash of the request body of the claim
+        """
+        try:
+            with SessionLocal() as session:
+                session.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.key == key,
+                        IdempotencyKey.request_hash == request_hash,
+                        IdempotencyKey.status_code.is_(None),
+                    )
+                )
+                session.commit()
+        except Exception:
+            # The claim is taken over once IDEMPOTENCY_LOCK_TIMEOUT has passed
+            logger.warning("Could not release idempotency key", exc_info=True)
+        self.resolve(key, None)
+
+    def resolve(self, key: str, response: StoredResponse | None) -> None:
+        """Cache a committed response and wake the requests waiting for the key.
+
+        Args:
+            key: Storage key
+            response: Stored response, None if the claim was released
+        """
+        if response is not None:
+            self._cache.set(key, response, response.expires_at - time.time())
+        with self._lock:
+            waiting = self._in_flight.pop(key, None)
+        if waiting is not None:
+            waiting.set()
+
+    def wait(self, key: str, timeout: float) -> None:
+        """Wait until a claimed key may have been resolved.
+
+        Args:
+            key: Storage key
+            timeout: Longest wait in seconds
+        """
+        with self._lock:
+            waiting = self._in_flight.get(key)
+        if waiting is not None:
+            waiting.wait(timeout)
+        else:
+            time.sleep(min(timeout, POLL_INTERVAL))
+
+
+@dataclass(slots=True)
+class _Claim:
+    """Key claimed by the current request."""
+
+    key: str
+    request_hash: str
+    done: bool = False
+
+
+# Store used by the request hooks, replaced by register_idempotency()
+idempotency_store = IdempotencyStore(ttl=86400, lock_timeout=60, cache_size=10000)
+
+# Settings from the app config, applied by register_idempotency()
+_wait_timeout = 10.0
+_exempt: frozenset[str] = frozenset()
+
+
+def _reset_after_fork() -> None:
+    """Reset the store in use, whose lock a request thread may hold while forking."""
+    idempotency_store._reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _spool_body() -> str:
+    """Copy the request body to a spooled file read by the view and hash it.
+
+    Returns:
+        SHA-256 of the body, hex encoded
+    """
+    digest = hashlib.sha256()
+    spool: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    while chunk := request.stream.read(CHUNK_SIZE):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    # Replaces the cached_property, so the view reads the copy
+    request._get_current_object().__dict__["stream"] = spool  # type: ignore[attr-defined]
+    g._idempotency_spool = spool
+    return digest.hexdigest()
+
+
+def _replay(stored: StoredResponse) -> Response:
+    """Build the response of a retry from the stored response."""
+    response = Response(stored.body, status=stored.status_code, content_type=stored.content_type)
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _check_idempotency_key() -> Response | None:
+    """Replay the stored response of a retried request or claim its key.
+
+    Raises:
+        ValidationError: If the key is malformed or was used with another body
+        ConflictError: If the first request with the key is still running
+    """
+    header = request.headers.get(IDEMPOTENCY_HEADER)
+    if (
+        header is None
+        or request.method != "POST"
+        or "api_v1" not in request.blueprints
+        or request.endpoint in _exempt
+    ):
+        return None
+    if not 0 < len(header) <= MAX_KEY_LENGTH:
+        raise ValidationError(f"{IDEMPOTENCY_HEADER} must have 1 to {MAX_KEY_LENGTH} characters")
+
+    request_hash = _spool_body()
+    key = scoped_key(request.method, request.path, header)
+    deadline = time.monotonic() + _wait_timeout
+    waited = False
+    while True:
+        stored = idempotency_store.lookup(key)
+        if stored is None:
+            if idempotency_store.claim(key, request_hash):
+                g._idempotency_claim = _Claim(key, request_hash)
+                add_log_field("idempotency", "waited_executed" if waited else "executed")
+                IDEMPOTENCY_REQUESTS.inc("executed")
+                return None
+            # Claimed by a concurrent request in the meantime
+            continue
+        if stored.request_hash != request_hash:
+            IDEMPOTENCY_REQUESTS.inc("mismatched")
+            raise ValidationError(
+                f"{IDEMPOTENCY_HEADER} was already used with a different request body"
+            )
+        if stored.status_code is not None:
+            add_log_field("idempotency", "waited_replayed" if waited else "replayed")
+            IDEMPOTENCY_REQUESTS.inc("replayed")
+            return _replay(stored)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            IDEMPOTENCY_REQUESTS.inc("conflict")
+            raise ConflictError(
+                f"A request with this {IDEMPOTENCY_HEADER} is still in progress", retry_after=1
+            )
+        waited = True
+        idempotency_store.wait(key, remaining)
+
+
+def _store_response(response: Response) -> Response:
+    """Store the response of a request that claimed its key, or release the key."""
+    claim: _Claim | None = g.get("_idempotency_claim")
+    if claim is None or claim.done:
+        return response
+    if response.status_code >= 400 or response.is_streamed:
+        claim.done = True
+        idempotency_store.release(claim.key, claim.request_hash)
+        return response
+
+    stored = StoredResponse(
+        claim.request_hash,
+        response.status_code,
+        response.headers.get("Content-Type"),
+        response.get_data(),
+        time.time() + idempotency_store.ttl,
+    )
+    session: Session | None = g.get("_db_session")
+    if session is not None and session.in_transaction():
+        # Committed with the writes of the view; resolved by _resolve_committed
+        session.execute(idempotency_store.completion(claim.key, stored))
+        session.info["idempotency_response"] = (claim, stored)
+    else:
+        claim.done = True
+        idempotency_store.complete(claim.key, stored)
+    return response
+
+
+def _resolve_committed(session: Session) -> None:
+    """Publish the stored response once the request transaction committed."""
+    pending: tuple[_Claim, StoredResponse] | None = session.info.pop("idempotency_response", None)
+    if pending is not None:
+        claim, stored = pending
+        claim.done = True
+        idempotency_store.resolve(claim.key, stored)
+
+
+def _discard_uncommitted(session: Session) -> None:
+    """Forget the stored response of a rolled back transaction."""
+    session.info.pop("idempotency_response", None)
+
+
+def _release_unfinished(exception: BaseException | None) -> None:
+    """Release the key of a request that ended without storing its response."""
+    claim: _Claim | None = g.pop("_idempotency_claim", None)
+    if claim is not None and not claim.done:
+        claim.done = True
+        idempotency_store.release(claim.key, claim.request_hash)
+    spool: IO[bytes] | None = g.pop("_idempotency_spool", None)
+    if spool is not None:
+        spool.close()
+
+
+def register_idempotency(app: Flask, session_class: type[Session] = Session) -> None:
+    """Handle Idempotency-Key headers of POST requests to the API.
+
+    Must be called after register_session_handling and
+    register_compression: its response hook then runs before the request
+    transaction is committed and before the response is compressed.
+
+    Args:
+        app: Flask application instance
+        session_class: Session class whose commits publish stored responses
+    """
+    global idempotency_store, _wait_timeout, _exempt
+    if not app.config.get("IDEMPOTENCY_ENABLED", True):
+        return
+    idempotency_store = IdempotencyStore(
+        ttl=app.config.get("IDEMPOTENCY_TTL", 86400),
+        lock_timeout=app.config.get("IDEMPOTENCY_LOCK_TIMEOUT", 60),
+        cache_size=app.config.get("IDEMPOTENCY_CACHE_SIZE", 10000),
+    )
+    _wait_timeout = app.config.get("IDEMPOTENCY_WAIT_TIMEOUT", 10)
+    _exempt = frozenset(
+        name.strip()
+        for name in app.config.get("IDEMPOTENCY_EXEMPT", "api_v1.auth.login").split(",")
+        if name.strip()
+    )
+    app.before_request(_check_idempotency_key)
+    app.after_request(_store_response)
+    app.teardown_request(_release_unfinished)
+    if not event.contains(session_class, "after_commit", _resolve_committed):
+        event.listen(session_class, "after_commit", _resolve_committed)
+        event.listen(session_class, "after_rollback", _discard_uncommitted)
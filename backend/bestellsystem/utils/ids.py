@@ -0,0 +1,325 @@
+"""Time-sortable 64-bit IDs generated without a database round trip.
+
+IDs follow the Snowflake layout, most significant bit first::
+
+    0 | 41 bits milliseconds since EPOCH_MS | 10 bits node | 12 bits sequence
+
+so they sort by creation time, fit a signed BIGINT and stay unique as long as
+no two running processes use the same node. Every process claims a node of
+``ID_NODE_BASE .. ID_NODE_BASE + ID_NODE_COUNT - 1`` by locking a file in
+ID_NODE_DIR; the lock is released by the kernel when the process exits.
+Gunicorn workers try the node of their worker index first (see
+gunicorn.conf.py), so worker n usually generates with node ID_NODE_BASE + n.
+Hosts sharing a database need disjoint node ranges.
+
+Clock skew: the generator never goes back in time. When the wall clock steps
+backwards it keeps counting on its last millisecond, moving on to the next
+millisecond when 4096 IDs were issued in it. It runs at most
+ID_MAX_CLOCK_DRIFT_MS ahead of the latest clock reading and waits when it
+would run further ahead. The node file holds a lease, the highest timestamp
+the node may have used, so a process taking over a node after a restart
+continues after its predecessor's IDs even if the clock is behind them.
+
+IDs are above 2**53 and lose precision as JSON numbers in JavaScript, so API,
+event and webhook payloads send them as strings; path and query parameters
+accept either form.
+"""
+
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from bestellsystem.config import Config
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter
+
+# 2026-01-01T00:00:00Z, IDs can be generated for 69 years from then
+EPOCH_MS = 1_767_225_600_000
+
+TIMESTAMP_BITS = 41
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+MAX_TIMESTAMP = (1 << TIMESTAMP_BITS) - 1
+
+# Length of a lease written to the node file; one write per lease and process
+LEASE_MS = 1000
+
+_LEASE = struct.Struct("<q")
+
+ID_CLOCK_REGRESSIONS = Counter(
+    "id_clock_regressions_total", "Wall clock readings earlier than a previous one"
+)
+ID_DRIFT_WAITS = Counter(
+    "id_drift_waits_total", "Waits of the ID generator for the wall clock to catch up"
+)
+
+logger = get_logger(__name__)
+
+
+def _now_ms() -> int:
+    """Return the wall clock in milliseconds since the Unix epoch."""
+    return time.time_ns() // 1_000_000
+
+
+@dataclass(frozen=True, slots=True)
+class IdParts:
+    """Components of a generated ID."""
+
+    timestamp: datetime
+    node: int
+    sequence: int
+
+
+def parse_id(value: int) -> IdParts:
+    """Split an ID into its components.
+
+    Args:
+        value: Generated ID
+
+    Returns:
+        Creation time, node and sequence number
+    """
+    milliseconds = (value >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return IdParts(
+        timestamp=datetime.fromtimestamp(milliseconds / 1000, timezone.utc),
+        node=(value >> SEQUENCE_BITS) & MAX_NODE,
+        sequence=value & MAX_SEQUENCE,
+    )
+
+
+class NodeLease:
+    """Exclusive claim of a node on this host, held by a locked file."""
+
+    def __init__(self, node: int, fd: int) -> None:
+        """Initialize lease on a locked node file.
+
+        Args:
+            node: Claimed node
+            fd: Descriptor of the node file, locked by this process
+        """
+        self.node = node
+        self._fd = fd
+        data = os.pread(fd, _LEASE.size, 0)
+        self.expires_ms: int = _LEASE.unpack(data)[0] if len(data) == _LEASE.size else 0
+
+    @classmethod
+    def claim(
+        cls, directory: str, first: int, count: int, preferred: int | None = None
+    ) -> "NodeLease":
+        """Lock the file of the first free node.
+
+        Args:
+            directory: Directory of the node files, shared by the processes of a host
+            first: Lowest node of the range
+            count: Number of nodes in the range
+            preferred: Node tried first, if it lies in the range
+
+        Returns:
+            Lease of the claimed node
+
+        Raises:
+            ValueError: If the range exceeds the node bits
+            RuntimeError: If every node of the range is taken
+        """
+        if first < 0 or count < 1 or first + count - 1 > MAX_NODE:
+            raise ValueError(f"Node range {first}+{count} outside 0..{MAX_NODE}")
+        os.makedirs(directory, exist_ok=True)
+        candidates = list(range(first, first + count))
+        if preferred in candidates:
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        for node in candidates:
+            fd = os.open(os.path.join(directory, f"node-{node}"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return cls(node, fd)
+        raise RuntimeError(f"All {count} ID nodes from {first} are taken in {directory}")
+
+    def extend(self, until_ms: int) -> None:
+        """Record that the node may have used timestamps up to ``until_ms``.
+
+        Args:
+            until_ms: End of the lease in milliseconds since the Unix epoch
+        """
+        os.pwrite(self._fd, _LEASE.pack(until_ms), 0)
+        self.expires_ms = until_ms
+
+    def close(self) -> None:
+        """Close the node file, releasing the node unless a forked process shares it."""
+        os.close(self._fd)
+
+
+class IdGenerator:
+    """Thread-safe generator of the IDs of one node."""
+
+    def __init__(
+        self,
+        node: int,
+        max_drift_ms: int = 1000,
+        lease: NodeLease | None = None,
+        clock: Callable[[], int] = _now_ms,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize generator.
+
+        Args:
+            node: Node written into the IDs, unique among running processes
+            max_drift_ms: Milliseconds the generator may run ahead of the clock
+            lease: Lease of the node, continued after the previous holder's IDs
+            clock: Wall clock in milliseconds since the Unix epoch
+            sleep: Function waiting a number of seconds
+
+        Raises:
+            ValueError: If the node exceeds the node bits
+        """
+        if not 0 <= node <= MAX_NODE:
+            raise ValueError(f"Node must be between 0 and {MAX_NODE}")
+        self.node = node
+        self.max_drift_ms = max_drift_ms
+        self._lease = lease
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._wall_ms = clock()
+        # The next ID starts a new millisecond after the lease of the previous holder
+        self._last_ms = lease.expires_ms if lease is not None else 0
+        self._sequence = MAX_SEQUENCE + 1
+
+    def next_id(self) -> int:
+        """Return a new ID."""
+        return self.next_ids(1)[0]
+
+    def next_ids(self, count: int) -> list[int]:
+        """Return ``count`` new IDs in ascending order.
+
+        Args:
+            count: Number of IDs
+
+        Returns:
+            IDs taken under a single lock acquisition
+
+        Raises:
+            OverflowError: If the clock is outside the 41-bit range from EPOCH_MS
+        """
+        ids: list[int] = []
+        node = self.node << SEQUENCE_BITS
+        with self._lock:
+            now = self._clock()
+            if now < self._wall_ms:
+                ID_CLOCK_REGRESSIONS.inc()
+            else:
+                self._wall_ms = now
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            while remaining := count - len(ids):
+                if self._sequence > MAX_SEQUENCE:
+                    self._next_millisecond()
+                if self._lease is not None and self._last_ms > self._lease.expires_ms:
+                    self._lease.extend(self._last_ms + LEASE_MS)
+                elapsed = self._last_ms - EPOCH_MS
+                if not 0 <= elapsed <= MAX_TIMESTAMP:
+                    raise OverflowError("Clock outside the range of the ID epoch")
+                # The rest of the current millisecond's sequence numbers, at most
+                taken = min(remaining, MAX_SEQUENCE + 1 - self._sequence)
+                first = (elapsed << (NODE_BITS + SEQUENCE_BITS)) | node | self._sequence
+                ids.extend(range(first, first + taken))
+                self._sequence += taken
+        return ids
+
+    def _next_millisecond(self) -> None:
+        """Move on after the current millisecond ran out of sequence numbers."""
+        self._last_ms = max(self._last_ms + 1, self._clock())
+        self._sequence = 0
+        while (ahead := self._last_ms - max(self._wall_ms, self._clock())) > self.max_drift_ms:
+            ID_DRIFT_WAITS.inc()
+            self._sleep((ahead - self.max_drift_ms) / 1000)
+        self._wall_ms = max(self._wall_ms, self._clock())
+
+    def close(self) -> None:
+        """Give up the node lease."""
+        if self._lease is not None:
+            self._lease.close()
+
+
+_generator: IdGenerator | None = None
+_generator_lock = threading.Lock()
+# Worker index set by the Gunicorn post_fork hook
+_worker_index: int | None = None
+
+
+def set_worker_index(index: int) -> None:
+    """Prefer node ID_NODE_BASE + ``index`` for this process.
+
+    Must be called before the first ID is generated.
+
+    Args:
+        index: Index of the worker among the live workers of its master
+    """
+    global _worker_index
+    _worker_index = index
+
+
+def get_generator() -> IdGenerator:
+    """Return the generator of this process, claiming a node on first use."""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                directory = Config.ID_NODE_DIR or os.path.join(
+                    tempfile.gettempdir(), "bestellsystem-id-nodes"
+                )
+                preferred = None if _worker_index is None else Config.ID_NODE_BASE + _worker_index
+                lease = NodeLease.claim(
+                    directory, Config.ID_NODE_BASE, Config.ID_NODE_COUNT, preferred
+                )
+                _generator = IdGenerator(
+                    lease.node, max_drift_ms=Config.ID_MAX_CLOCK_DRIFT_MS, lease=lease
+                )
+                logger.info("Claimed ID node", extra={"node": lease.node, "pid": os.getpid()})
+    return _generator
+
+
+def next_id() -> int:
+    """Return a new ID, usable as column default (``default=next_id``)."""
+    return get_generator().next_id()
+
+
+def next_ids(count: int) -> list[int]:
+    """Return ``count`` new IDs in ascending order, e.g. for a bulk insert.
+
+    Args:
+        count: Number of IDs
+
+    Returns:
+        New IDs
+    """
+    return get_generator().next_ids(count)
+
+
+def _reset_after_fork() -> None:
+    """Claim a node of its own in a forked process.
+
+    The child closes its copy of the parent's node file; the lock stays with
+    the parent, which holds the same open file.
+    """
+    global _generator, _generator_lock, _worker_index
+    if _generator is not None:
+        _generator.close()
+    _generator = None
+    _generator_lock = threading.Lock()
+    _worker_index = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
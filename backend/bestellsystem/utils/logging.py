@@ -1,80 +1,602 @@
 """JSON logging configuration for structured logging."""
 
+import atexit
+import copy
+import itertools
 import json
 import logging
+import os
+import queue
 import sys
-from datetime import datetime, timezone
+import threading
+import time
+from collections.abc import Callable
+from datetime import date, datetime
 from typing import Any
 
+from flask import g, has_request_context, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment]
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+# Marker placed on the queue to tell the writer thread to drain and exit
+_SENTINEL: Any = object()
+
+# Active background writer, if setup_logging was called with async_mode
+_listener: "BatchingQueueListener | None" = None
+
+
+def _json_default(value: Any) -> Any:
+    """Convert values the JSON encoder does not understand."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _stdlib_dumps(data: dict[str, Any]) -> str:
+    """Serialize with the standard library encoder."""
+    return json.dumps(data, default=_json_default)
+
+
+def _orjson_dumps(data: dict[str, Any]) -> str:
+    """Serialize with orjson."""
+    return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _safe_dumps(data: dict[str, Any]) -> str:
+    """Serialize values one by one, falling back to repr() for anything broken."""
+    safe: dict[str, Any] = {}
+    for key, value in data.items():
+        try:
+            json.dumps(value, default=_json_default)
+            safe[str(key)] = value
+        except (TypeError, ValueError, RecursionError):
+            safe[str(key)] = repr(value)
+    return json.dumps(safe, default=_json_default)
+
+
+# Use orjson when installed, it is several times faster than the json module
+default_dumps: Callable[[dict[str, Any]], str] = (
+    _orjson_dumps if orjson is not None else _stdlib_dumps
+)
+
+# LogRecord attributes that are not user supplied extra fields
+_RESERVED_ATTRS = frozenset(logging.LogRecord("", logging.INFO, "", 0, "", (), None).__dict__) | {
+    "message",
+    "asctime",
+    "taskName",
+    "request_id",
+    "user_id",
+}
+
 
 class JsonFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging."""
 
+    def __init__(
+        self,
+        *args: Any,
+        dumps: Callable[[dict[str, Any]], str] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize formatter.
+
+        Args:
+            *args: Positional arguments for logging.Formatter
+            dumps: Function serializing a dict to a JSON string,
+                defaults to orjson when installed and json otherwise
+            **kwargs: Keyword arguments for logging.Formatter
+        """
+        super().__init__(*args, **kwargs)
+        self.dumps = dumps or default_dumps
+        # (whole second, formatted "YYYY-MM-DDTHH:MM:SS") of the last record
+        self._second_cache: tuple[int, str] = (-1, "")
+
+    def format_timestamp(self, created: float) -> str:
+        """Format a record creation time as ISO 8601 in UTC.
+
+        The date and time part only changes once per second, so it is cached
+        and only the microseconds are formatted for each record.
+
+        Args:
+            created: Record creation time as returned by time.time()
+
+        Returns:
+            Timestamp like 2025-11-06T13:00:00.000000+00:00
+        """
+        second = int(created)
+        cached_second, prefix = self._second_cache
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._second_cache = (second, prefix)
+        micros = int((created - second) * 1_000_000)
+        return f"{prefix}.{micros:06d}+00:00"
+
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data: dict[str, Any] = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": self.format_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
+        record_dict = record.__dict__
+
         # Add extra fields if available
-        if hasattr(record, "request_id"):
-            log_data["request_id"] = record.request_id
+        if "request_id" in record_dict:
+            log_data["request_id"] = record_dict["request_id"]
 
-        if hasattr(record, "user_id"):
-            log_data["user_id"] = record.user_id
+        if "user_id" in record_dict:
+            log_data["user_id"] = record_dict["user_id"]
 
-        # Add exception info if present
+        # Add exception info if present; queued records carry it as text
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_data["exception"] = record.exc_text
 
         # Add any extra fields from the record
-        for key, value in record.__dict__.items():
-            if key not in [
-                "name",
-                "msg",
-                "args",
-                "created",
-                "filename",
-                "funcName",
-                "levelname",
-                "levelno",
-                "lineno",
-                "module",
-                "msecs",
-                "message",
-                "pathname",
-                "process",
-                "processName",
-                "relativeCreated",
-                "thread",
-                "threadName",
-                "exc_info",
-                "exc_text",
-                "stack_info",
-                "request_id",
-                "user_id",
-            ]:
+        for key, value in record_dict.items():
+            if key not in _RESERVED_ATTRS:
                 log_data[key] = value
 
-        return json.dumps(log_data)
+        try:
+            return self.dumps(log_data)
+        except (TypeError, ValueError, RecursionError):
+            return _safe_dumps(log_data)
+
+
+# Renders tracebacks of records before they are queued
+_exception_formatter = logging.Formatter()
+
+
+class BoundedQueueHandler(logging.Handler):
+    """Handler that hands records to a bounded queue instead of writing them.
+
+    Formatting and I/O happen on the writer thread of a BatchingQueueListener,
+    so the calling thread only pays for a queue insert. When the queue is full
+    the record is either dropped immediately ("drop") or the caller waits up
+    to ``block_timeout`` seconds for space ("block") before dropping it.
+    """
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[Any]",
+        policy: str = "drop",
+        block_timeout: float = 0.05,
+    ) -> None:
+        """Initialize queue handler.
+
+        Args:
+            log_queue: Bounded queue shared with the listener
+            policy: Overflow policy, one of OVERFLOW_POLICIES
+            block_timeout: Seconds to wait for space with the "block" policy
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log queue overflow policy: {policy!r}")
+        super().__init__()
+        self.queue = log_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._dropped = itertools.count()
+        self._dropped_total = 0
+
+    @property
+    def dropped(self) -> int:
+        """Number of records dropped because the queue was full."""
+        return self._dropped_total
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        """Filter and enqueue a record without taking the handler lock."""
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return a copy of a record that is safe to format on another thread.
+
+        As in QueueHandler.prepare, the message is merged with its arguments
+        and the traceback rendered to text now, so the queued record holds no
+        references to arguments that may still change or to stack frames.
+        Unlike there, the message is not formatted, so the listener's
+        formatter still sees the level, logger and extra fields.
+
+        Args:
+            record: Record passed to the handler
+
+        Returns:
+            Prepared copy of the record
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Prepare a record and enqueue it according to the overflow policy."""
+        try:
+            prepared = self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            if self.policy == "block":
+                self.queue.put(prepared, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(prepared)
+        except queue.Full:
+            # itertools.count is atomic under the GIL, a plain += is not
+            self._dropped_total = next(self._dropped) + 1
+
+
+class BatchingQueueListener:
+    """Background writer that drains a log queue in batches.
+
+    Records are formatted by the target handler's formatter and written to its
+    stream with a single write and flush per batch. A batch is flushed when it
+    reaches ``batch_size`` records or ``flush_interval`` seconds after its
+    first record arrived, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[Any]",
+        handler: "logging.StreamHandler[Any]",
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        queue_handler: BoundedQueueHandler | None = None,
+    ) -> None:
+        """Initialize listener.
+
+        Args:
+            log_queue: Queue filled by a BoundedQueueHandler
+            handler: Stream handler providing the formatter and output stream
+            batch_size: Maximum number of records per write
+            flush_interval: Maximum seconds a record waits before being written
+            queue_handler: Producer handler whose drop counter is reported
+        """
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue_handler = queue_handler
+        self._reported_drops = 0
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Drain outstanding records and stop the writer thread.
+
+        Args:
+            timeout: Maximum seconds to wait for the queue to drain
+        """
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(_SENTINEL, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        """Writer loop collecting records into batches."""
+        while True:
+            record = self.queue.get()
+            if record is _SENTINEL:
+                self._report_drops()
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        record = self.queue.get(timeout=remaining)
+                    else:
+                        record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _SENTINEL:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            self._report_drops()
+            if stopping:
+                return
+
+    def _write(self, batch: list[logging.LogRecord]) -> None:
+        """Format and write a batch of records with a single flush."""
+        handler = self.handler
+        lines = []
+        for record in batch:
+            if record.levelno < handler.level:
+                continue
+            try:
+                lines.append(handler.format(record))
+            except Exception:
+                handler.handleError(record)
+        if not lines:
+            return
+        try:
+            handler.stream.write(handler.terminator.join(lines) + handler.terminator)
+            handler.flush()
+        except Exception:
+            handler.handleError(batch[-1])
+
+    def _report_drops(self) -> None:
+        """Write a warning when records were dropped since the last report."""
+        if self.queue_handler is None:
+            return
+        dropped = self.queue_handler.dropped
+        if dropped <= self._reported_drops:
+            return
+        record = logging.LogRecord(
+            name=__name__,
+            level=logging.WARNING,
+            pathname=__file__,
+            lineno=0,
+            msg="Dropped %d log records because the log queue was full",
+            args=(dropped - self._reported_drops,),
+            exc_info=None,
+        )
+        record.dropped_total = dropped
+        self._reported_drops = dropped
+        self._write([record])
 
 
-def setup_logging(level: str = "INFO", log_format: str = "json") -> None:
+class RequestContextFilter(logging.Filter):
+    """Attach the current request and user ID to records logged during a request."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Add ``request_id`` and ``user_id`` to the record when inside a request."""
+        if has_request_context():
+            if "request_id" not in record.__dict__:
+                request_id = g.get("request_id")
+                if request_id is not None:
+                    record.request_id = request_id
+            if "user_id" not in record.__dict__:
+                user_id = g.get("user_id")
+                if user_id is not None:
+                    record.user_id = user_id
+        return True
+
+
+class _SampleRule:
+    """Keep ``keep`` out of every ``every`` records."""
+
+    def __init__(self, keep: int, every: int) -> None:
+        """Initialize rule."""
+        self.keep = keep
+        self.every = every
+        self._counter = itertools.count()
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        """Return whether the record is part of the sample."""
+        return next(self._counter) % self.every < self.keep
+
+
+class _RateRule:
+    """Token bucket allowing ``rate`` records per second.
+
+    Records suppressed by the bucket are counted and the count is attached to
+    the next record that passes as the ``suppressed`` extra field.
+    """
+
+    def __init__(self, rate: float) -> None:
+        """Initialize rule."""
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        """Take a token for the record, or count it as suppressed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return False
+            self._tokens -= 1
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def parse_sampling_rule(spec: str) -> "_SampleRule | _RateRule":
+    """Parse a single sampling rule.
+
+    Args:
+        spec: "K/N" to keep K out of every N records, or "K/s" to allow at
+            most K records per second
+
+    Returns:
+        Rule instance
+
+    Raises:
+        ValueError: If the rule cannot be parsed
+    """
+    amount, _, unit = spec.strip().partition("/")
+    try:
+        if unit.strip() == "s":
+            rate = float(amount)
+            if rate <= 0:
+                raise ValueError
+            return _RateRule(rate)
+        keep, every = int(amount), int(unit)
+        if keep < 0 or every <= 0:
+            raise ValueError
+        return _SampleRule(keep, every)
+    except ValueError:
+        raise ValueError(f"Invalid log sampling rule: {spec!r}") from None
+
+
+def parse_sampling_rules(spec: str) -> dict[str, str]:
+    """Parse a comma separated list of ``target=rule`` pairs.
+
+    Args:
+        spec: For example "api_v1.health=1/s,bestellsystem.db=1/100"
+
+    Returns:
+        Mapping of target (logger name or endpoint) to rule string
+    """
+    rules: dict[str, str] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        target, sep, rule = item.partition("=")
+        if not sep or not target.strip():
+            raise ValueError(f"Invalid log sampling rule: {item!r}")
+        rules[target.strip()] = rule.strip()
+    return rules
+
+
+class SamplingFilter(logging.Filter):
+    """Sample or rate-limit records per logger or per Flask endpoint.
+
+    Targets are matched against the endpoint of the current request first
+    (e.g. "api_v1.health") and then against the logger name and its parents
+    (e.g. "bestellsystem" matches "bestellsystem.app"). Records at or above
+    ``exempt_level`` always pass, so errors are never sampled away.
+    """
+
+    def __init__(
+        self,
+        rules: str | dict[str, str],
+        exempt_level: int = logging.WARNING,
+    ) -> None:
+        """Initialize filter.
+
+        Args:
+            rules: Rule specification string or mapping of target to rule
+            exempt_level: Records at or above this level are never dropped
+        """
+        super().__init__()
+        if isinstance(rules, str):
+            rules = parse_sampling_rules(rules)
+        self.rules = {target: parse_sampling_rule(rule) for target, rule in rules.items()}
+        self.exempt_level = exempt_level
+        self._logger_rules: dict[str, _SampleRule | _RateRule | None] = {}
+
+    def _rule_for_logger(self, name: str) -> "_SampleRule | _RateRule | None":
+        """Resolve the rule for a logger name, walking up its parents."""
+        try:
+            return self._logger_rules[name]
+        except KeyError:
+            pass
+        rule = None
+        candidate = name
+        while candidate:
+            if candidate in self.rules:
+                rule = self.rules[candidate]
+                break
+            candidate = candidate.rpartition(".")[0]
+        self._logger_rules[name] = rule
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return whether the record should be emitted."""
+        if record.levelno >= self.exempt_level:
+            return True
+
+        rule = None
+        if has_request_context() and request.endpoint is not None:
+            rule = self.rules.get(request.endpoint)
+        if rule is None:
+            rule = self._rule_for_logger(record.name)
+        return rule is None or rule.allow(record)
+
+
+def shutdown_logging() -> None:
+    """Flush and stop the background log writer, if one is running.
+
+    Safe to call multiple times; registered with atexit and called from the
+    Gunicorn ``worker_exit`` hook so buffered records are not lost.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork() -> None:
+    """Give a forked child its own log queue and writer thread.
+
+    Threads do not survive fork(), so a worker forked from a preloaded
+    Gunicorn master would queue records that are never written. Records
+    still queued in the parent are written by the parent; the child starts
+    with an empty queue, whose lock the parent's writer may have held.
+    """
+    if _listener is None:
+        return
+    log_queue: queue.Queue[Any] = queue.Queue(maxsize=_listener.queue.maxsize)
+    _listener.queue = log_queue
+    if _listener.queue_handler is not None:
+        _listener.queue_handler.queue = log_queue
+    _listener.start()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def setup_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    async_mode: bool = False,
+    queue_size: int = 10000,
+    overflow_policy: str = "drop",
+    batch_size: int = 100,
+    flush_interval: float = 0.2,
+    sampling: str | dict[str, str] | None = None,
+) -> None:
     """Configure logging for the application.
 
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_format: Format type ('json' for structured JSON, 'text' for standard)
+        async_mode: Write records from a background thread in batches
+        queue_size: Maximum number of queued records in async mode
+        overflow_policy: What to do when the queue is full ('drop' or 'block')
+        batch_size: Maximum number of records written per batch in async mode
+        flush_interval: Maximum seconds a record is buffered in async mode
+        sampling: Sampling rules for SamplingFilter, e.g. "api_v1.health=1/s"
     """
+    global _listener
+
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
     # Remove existing handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    shutdown_logging()
 
     # Create console handler
     console_handler = logging.StreamHandler(sys.stdout)
@@ -88,7 +610,30 @@ def setup_logging(level: str = "INFO", log_format: str = "json") -> None:
         formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+
+    root_handler: logging.Handler = console_handler
+    if async_mode:
+        # Hand records to a per-process writer thread so callers never block on I/O
+        log_queue: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+        queue_handler = BoundedQueueHandler(log_queue, policy=overflow_policy)
+        queue_handler.setLevel(console_handler.level)
+        _listener = BatchingQueueListener(
+            log_queue,
+            console_handler,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            queue_handler=queue_handler,
+        )
+        _listener.start()
+        root_handler = queue_handler
+
+    # Filter before enqueueing so sampled-out records cost as little as possible
+    # and the request context is still available
+    root_handler.addFilter(RequestContextFilter())
+    if sampling:
+        root_handler.addFilter(SamplingFilter(sampling))
+
+    root_logger.addHandler(root_handler)
 
 
 def get_logger(name: str) -> logging.Logger:
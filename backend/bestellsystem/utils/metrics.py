@@ -0,0 +1,594 @@
+"""In-process metrics with lock-free recording and Prometheus exposition.
+
+Values live in a store shared by all metrics. The default store keeps them in
+per-thread dictionaries. When ``METRICS_DIR`` is configured they are written to
+memory-mapped files instead, one per writer thread and process, so that the
+``/metrics`` endpoint of any Gunicorn worker can report totals for all workers.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, Protocol
+
+from bestellsystem.utils.logging import get_logger
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# (metric name, label values, suffix) identifying a single stored value
+MetricKey = tuple[str, tuple[str, ...], Any]
+
+logger = get_logger(__name__)
+
+
+class _Shard(Protocol):
+    """Values written by a single thread (counters) or process (gauges)."""
+
+    def inc(self, key: MetricKey, amount: float) -> None: ...
+
+    def set(self, key: MetricKey, value: float) -> None: ...
+
+    def items(self) -> list[tuple[MetricKey, float]]: ...
+
+    def clear(self) -> None: ...
+
+
+class _DictShard:
+    """Shard keeping values in a dictionary."""
+
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        """Initialize shard."""
+        self.values: dict[MetricKey, float] = {}
+
+    def inc(self, key: MetricKey, amount: float) -> None:
+        """Add ``amount`` to a value."""
+        values = self.values
+        values[key] = values.get(key, 0.0) + amount
+
+    def set(self, key: MetricKey, value: float) -> None:
+        """Overwrite a value."""
+        self.values[key] = value
+
+    def items(self) -> list[tuple[MetricKey, float]]:
+        """Return a copy of all values."""
+        return list(self.values.items())
+
+    def clear(self) -> None:
+        """Reset all values."""
+        self.values.clear()
+
+
+class ShardedValueStore:
+    """Per-thread value shards that are merged when read.
+
+    Every thread increments values in its own shard, so recording never takes
+    a lock. The lock only guards the shard list when a thread records its
+    first value. Gauges are set in a single per-process shard, since the last
+    written value wins regardless of the thread that wrote it.
+    """
+
+    def __init__(self) -> None:
+        """Initialize store."""
+        self._lock = threading.Lock()
+        self._reset()
+        # A forked child (e.g. a Gunicorn worker) must not share the parent's shards
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Forget all shards of this process."""
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._process_shard: _Shard | None = None
+
+    def _new_shard(self, kind: str) -> _Shard:
+        """Create a shard for a new writer."""
+        return _DictShard()
+
+    def _shard(self) -> _Shard:
+        """Return the calling thread's shard, creating it on first use."""
+        try:
+            shard: _Shard = self._local.shard
+        except AttributeError:
+            with self._lock:
+                shard = self._new_shard("counter")
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, key: MetricKey, amount: float = 1.0) -> None:
+        """Add ``amount`` to a value."""
+        self._shard().inc(key, amount)
+
+    def set(self, key: MetricKey, value: float) -> None:
+        """Overwrite a per-process value."""
+        shard = self._process_shard
+        if shard is None:
+            with self._lock:
+                if self._process_shard is None:
+                    self._process_shard = self._new_shard("gauge")
+                shard = self._process_shard
+        shard.set(key, value)
+
+    def _all_items(self) -> Iterable[tuple[MetricKey, float]]:
+        """Yield the values of every shard."""
+        with self._lock:
+            shards = list(self._shards)
+            if self._process_shard is not None:
+                shards.append(self._process_shard)
+        for shard in shards:
+            yield from shard.items()
+
+    def collect(self) -> dict[MetricKey, float]:
+        """Return the sum of all shards."""
+        totals: dict[MetricKey, float] = {}
+        for key, value in self._all_items():
+            totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def clear(self) -> None:
+        """Reset all values."""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+            if self._process_shard is not None:
+                self._process_shard.clear()
+
+
+# Layout of a shard file: a header holding the number of used bytes, then
+# entries of [key length][JSON key][padding to 8 bytes][float64 value]
+_HEADER = struct.Struct("<Q")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+# Shard files are sparse and never remapped, so a writer can update values
+# without coordinating with other threads of the same process
+MMAP_SHARD_SIZE = 1024 * 1024
+
+
+def _encode_key(key: MetricKey) -> bytes:
+    """Serialize a metric key for a shard file."""
+    name, labelvalues, suffix = key
+    return json.dumps([name, list(labelvalues), suffix]).encode()
+
+
+def _decode_key(data: bytes) -> MetricKey:
+    """Deserialize a metric key from a shard file."""
+    name, labelvalues, suffix = json.loads(data)
+    return name, tuple(labelvalues), suffix
+
+
+class _MmapShard:
+    """Shard keeping values in a memory-mapped file."""
+
+    def __init__(self, path: Path) -> None:
+        """Create the shard file.
+
+        Args:
+            path: File to create, must not be used by another writer
+        """
+        self.path = path
+        with open(path, "w+b") as f:
+            f.truncate(MMAP_SHARD_SIZE)
+            self._map = mmap.mmap(f.fileno(), MMAP_SHARD_SIZE)
+        self._used = _HEADER.size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions: dict[MetricKey, int] = {}
+        self._full = False
+        # The gauge shard is written by every thread of the process
+        self._allocate_lock = threading.Lock()
+
+    def _position(self, key: MetricKey) -> int | None:
+        """Return the value offset of a key, allocating an entry if needed."""
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+        with self._allocate_lock:
+            return self._allocate(key)
+
+    def _allocate(self, key: MetricKey) -> int | None:
+        """Write a new entry for a key, with the allocation lock held."""
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+
+        encoded = _encode_key(key)
+        position = self._used + _KEY_LENGTH.size + len(encoded)
+        position += -position % 8
+        end = position + _VALUE.size
+        if end > MMAP_SHARD_SIZE:
+            if not self._full:
+                logger.warning("Metrics shard %s is full, dropping new series", self.path)
+                self._full = True
+            return None
+
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        start = self._used + _KEY_LENGTH.size
+        self._map[start : start + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, position, 0.0)
+        # Publish the entry to readers only after it is completely written
+        self._used = end
+        _HEADER.pack_into(self._map, 0, end)
+        self._positions[key] = position
+        return position
+
+    def inc(self, key: MetricKey, amount: float) -> None:
+        """Add ``amount`` to a value."""
+        position = self._position(key)
+        if position is not None:
+            current = _VALUE.unpack_from(self._map, position)[0]
+            _VALUE.pack_into(self._map, position, current + amount)
+
+    def set(self, key: MetricKey, value: float) -> None:
+        """Overwrite a value."""
+        position = self._position(key)
+        if position is not None:
+            _VALUE.pack_into(self._map, position, value)
+
+    def items(self) -> list[tuple[MetricKey, float]]:
+        """Return all values of this shard."""
+        return read_shard_file(self.path)
+
+    def clear(self) -> None:
+        """Reset all values."""
+        for position in self._positions.values():
+            _VALUE.pack_into(self._map, position, 0.0)
+
+
+def read_shard_file(path: Path) -> list[tuple[MetricKey, float]]:
+    """Read all values from a shard file written by any process.
+
+    Args:
+        path: Shard file
+
+    Returns:
+        List of (key, value) pairs
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return []
+        used = _HEADER.unpack(header)[0]
+        data = header + f.read(used - _HEADER.size)
+
+    items = []
+    offset = _HEADER.size
+    while offset + _KEY_LENGTH.size <= len(data):
+        length = _KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + _KEY_LENGTH.size
+        position = start + length
+        position += -position % 8
+        if position + _VALUE.size > len(data):
+            break
+        key = _decode_key(data[start : start + length])
+        items.append((key, _VALUE.unpack_from(data, position)[0]))
+        offset = position + _VALUE.size
+    return items
+
+
+def _pid_alive(pid: int) -> bool:
+    """Return whether a process with the given ID exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MmapValueStore(ShardedValueStore):
+    """Value store aggregating memory-mapped shard files of all processes.
+
+    Counter files of exited processes keep contributing to the totals so
+    counters never go backwards when a worker is replaced. Gauge files are
+    only read while the process that wrote them is alive.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        """Initialize store.
+
+        Args:
+            directory: Directory shared by all worker processes
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._shard_count = 0
+        super().__init__()
+
+    def _reset(self) -> None:
+        """Forget all shards of this process."""
+        super()._reset()
+        self._shard_count = 0
+
+    def _new_shard(self, kind: str) -> _Shard:
+        """Create a shard file named after the process and writer."""
+        pid = os.getpid()
+        if kind == "gauge":
+            path = self.directory / f"gauge_{pid}.db"
+        else:
+            self._shard_count += 1
+            path = self.directory / f"counter_{pid}_{self._shard_count}.db"
+        return _MmapShard(path)
+
+    def _all_items(self) -> Iterable[tuple[MetricKey, float]]:
+        """Yield the values of every shard file in the directory."""
+        for path in sorted(self.directory.glob("*.db")):
+            if path.name.startswith("gauge_"):
+                pid = int(path.stem.split("_")[1])
+                if not _pid_alive(pid):
+                    continue
+            try:
+                yield from read_shard_file(path)
+            except (OSError, ValueError):
+                logger.warning("Skipping unreadable metrics shard %s", path)
+
+
+def clear_metrics_dir(directory: str | Path) -> None:
+    """Remove shard files left over from a previous run.
+
+    Call once in the Gunicorn master before workers are started.
+
+    Args:
+        directory: Metrics directory
+    """
+    for path in Path(directory).glob("*.db"):
+        path.unlink(missing_ok=True)
+
+
+# Process wide store used by all metrics unless another one is passed
+value_store: ShardedValueStore = ShardedValueStore()
+
+
+def configure_metrics(directory: str | None) -> ShardedValueStore:
+    """Select the process wide value store.
+
+    Args:
+        directory: Shared directory for multi-process aggregation, or None to
+            keep values in memory of this process only
+
+    Returns:
+        The active value store
+    """
+    global value_store
+    if directory:
+        if getattr(value_store, "directory", None) != Path(directory):
+            value_store = MmapValueStore(directory)
+    elif isinstance(value_store, MmapValueStore):
+        value_store = ShardedValueStore()
+    return value_store
+
+
+# Metrics rendered by render_prometheus(), in registration order
+REGISTRY: list["Metric"] = []
+
+
+class Metric:
+    """Base class for named metrics."""
+
+    type_name = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        store: ShardedValueStore | None = None,
+        registry: list["Metric"] | None = REGISTRY,
+    ) -> None:
+        """Initialize metric.
+
+        Args:
+            name: Metric name
+            documentation: Human readable description
+            labelnames: Names of the label values passed when recording
+            store: Value store, defaults to the process wide store
+            registry: Registry to add the metric to, or None
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._store = store
+        if registry is not None:
+            registry.append(self)
+
+    @property
+    def store(self) -> ShardedValueStore:
+        """Store holding the values of this metric."""
+        return self._store if self._store is not None else value_store
+
+    def samples(
+        self, values: dict[MetricKey, float]
+    ) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        """Return exposition samples as (name, labels, value) tuples."""
+        return [
+            (self.name, tuple(zip(self.labelnames, labelvalues, strict=False)), value)
+            for (name, labelvalues, _), value in sorted(values.items(), key=_sort_key)
+            if name == self.name
+        ]
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Increase the counter.
+
+        Args:
+            *labelvalues: One value per label name
+            amount: Increment
+        """
+        self.store.inc((self.name, labelvalues, ""), amount)
+
+
+class Gauge(Metric):
+    """Per-process value summed over all live processes."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        """Set the value of this process.
+
+        Args:
+            value: New value
+            *labelvalues: One value per label name
+        """
+        self.store.set((self.name, labelvalues, ""), value)
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram keyed by label values."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+        store: ShardedValueStore | None = None,
+        registry: list[Metric] | None = REGISTRY,
+    ) -> None:
+        """Initialize histogram.
+
+        Args:
+            name: Metric name
+            documentation: Human readable description
+            labelnames: Names of the labels passed to observe()
+            buckets: Sorted upper bounds; an implicit +Inf bucket is added
+            store: Value store, defaults to the process wide store
+            registry: Registry to add the metric to, or None
+        """
+        super().__init__(name, documentation, labelnames, store, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation.
+
+        Args:
+            value: Observed value, e.g. a duration in seconds
+            *labelvalues: One value per label name
+        """
+        store = self.store
+        # Index len(buckets) is the +Inf bucket
+        bucket = bisect_left(self.buckets, value)
+        store.inc((self.name, labelvalues, bucket))
+        store.inc((self.name, labelvalues, "sum"), value)
+
+    def snapshot(
+        self, values: dict[MetricKey, float] | None = None
+    ) -> dict[tuple[str, ...], dict[str, Any]]:
+        """Return cumulative bucket counts, count and sum per label set.
+
+        Args:
+            values: Collected store values, read from the store if omitted
+        """
+        if values is None:
+            values = self.store.collect()
+        series: dict[tuple[str, ...], dict[str, Any]] = {}
+        for (name, labelvalues, suffix), value in values.items():
+            if name != self.name:
+                continue
+            entry = series.setdefault(
+                labelvalues, {"counts": [0.0] * (len(self.buckets) + 1), "sum": 0.0}
+            )
+            if suffix == "sum":
+                entry["sum"] = value
+            else:
+                entry["counts"][suffix] += value
+
+        result: dict[tuple[str, ...], dict[str, Any]] = {}
+        for labelvalues, entry in series.items():
+            cumulative = 0.0
+            buckets = []
+            for bound, count in zip(self.buckets + (float("inf"),), entry["counts"], strict=True):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            result[labelvalues] = {
+                "buckets": buckets,
+                "count": cumulative,
+                "sum": entry["sum"],
+            }
+        return result
+
+    def samples(
+        self, values: dict[MetricKey, float]
+    ) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        """Return bucket, count and sum samples."""
+        samples = []
+        for labelvalues, series in sorted(self.snapshot(values).items()):
+            labels = tuple(zip(self.labelnames, labelvalues, strict=False))
+            for bound, count in series["buckets"]:
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                samples.append((f"{self.name}_bucket", bucket_labels, count))
+            samples.append((f"{self.name}_count", labels, series["count"]))
+            samples.append((f"{self.name}_sum", labels, series["sum"]))
+        return samples
+
+
+def _sort_key(item: tuple[MetricKey, float]) -> tuple[tuple[str, ...], str]:
+    """Order samples by label values."""
+    (_, labelvalues, suffix), _ = item
+    return labelvalues, str(suffix)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the text exposition format."""
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+def _escape_label(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(registry: list[Metric] | None = None) -> str:
+    """Render metrics in the Prometheus text exposition format (0.0.4).
+
+    Args:
+        registry: Metrics to render, defaults to all registered metrics
+
+    Returns:
+        Exposition text
+    """
+    metrics = REGISTRY if registry is None else registry
+    collected: dict[int, dict[MetricKey, float]] = {}
+    lines = []
+    for metric in metrics:
+        store = metric.store
+        if id(store) not in collected:
+            collected[id(store)] = store.collect()
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for name, labels, value in metric.samples(collected[id(store)]):
+            if labels:
+                rendered = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+                lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
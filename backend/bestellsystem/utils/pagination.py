@@ -0,0 +1,111 @@
+"""Keyset pagination with opaque cursor tokens."""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import ColumnElement, Select, tuple_
+from sqlalchemy.orm import QueryableAttribute
+
+from bestellsystem.utils.errors import ValidationError
+
+KeysetColumn = ColumnElement[Any] | QueryableAttribute[Any]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque token.
+
+    Args:
+        values: Values of the keyset columns, datetimes are ISO formatted
+
+    Returns:
+        URL-safe token
+    """
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(plain, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, columns: Sequence[KeysetColumn]) -> list[Any]:
+    """Decode a cursor token into values for the keyset columns.
+
+    Args:
+        token: Token returned by encode_cursor
+        columns: Keyset columns, used to restore datetime values
+
+    Returns:
+        Values of the keyset columns
+
+    Raises:
+        ValidationError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        return [
+            (
+                datetime.fromisoformat(value)
+                if column.type.python_type is datetime and isinstance(value, str)
+                else value
+            )
+            for column, value in zip(columns, values, strict=True)
+        ]
+    except (binascii.Error, ValueError, NotImplementedError) as e:
+        raise ValidationError("Invalid cursor", payload={"cursor": token}) from e
+
+
+def keyset_page(
+    statement: Select[Any],
+    columns: Sequence[KeysetColumn],
+    limit: int,
+    cursor: str | None = None,
+) -> Select[Any]:
+    """Restrict a statement to the page following a cursor.
+
+    Unlike OFFSET, the database seeks directly to the cursor position through
+    an index on the keyset columns, so late pages are as fast as the first.
+    The last column must be unique. One row more than ``limit`` is selected to
+    tell whether another page follows.
+
+    Args:
+        statement: Select statement to paginate
+        columns: Keyset columns in sort order, e.g. (created_at, id)
+        limit: Page size
+        cursor: Token of the previous page, None for the first page
+
+    Returns:
+        Statement ordered by the keyset columns and limited to ``limit + 1`` rows
+    """
+    if cursor:
+        statement = statement.where(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+    return statement.order_by(*columns).limit(limit + 1)
+
+
+def parse_limit(value: str | None, default: int, maximum: int) -> int:
+    """Parse a ``limit`` query argument.
+
+    Args:
+        value: Raw query argument
+        default: Page size if the argument is missing
+        maximum: Largest allowed page size
+
+    Returns:
+        Page size
+
+    Raises:
+        ValidationError: If the value is not an integer between 1 and ``maximum``
+    """
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise ValidationError(f"limit must be an integer between 1 and {maximum}")
+    return limit
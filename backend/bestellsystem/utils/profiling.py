@@ -0,0 +1,388 @@
+"""Opt-in request profiling.
+
+Two triggers capture profiles:
+
+* sampled: a fraction of requests runs under cProfile, which records every
+  function call of the request thread; only one profiler can be active per
+  process (Python 3.12+ raises otherwise), so a sampled request overlapping
+  another one is sampled by the stack sampler instead
+* slow: while a request runs, a background thread samples its stack every
+  few milliseconds; if the request ends up slower than the threshold, the
+  samples are kept
+
+The slowest profiles are kept in memory and a summary line is logged for
+each. Nothing is registered when profiling is disabled.
+"""
+
+import cProfile
+import heapq
+import itertools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter as FrameCounter
+from dataclasses import asdict, dataclass, field
+from types import FrameType
+from typing import Any
+
+from flask import Flask, Response, current_app, g, request
+
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter
+from bestellsystem.utils.timing import ENVIRON_START_KEY
+
+PROFILES_CAPTURED = Counter(
+    "request_profiles_captured_total", "Captured request profiles by trigger", ("trigger",)
+)
+
+# Frames recorded per stack sample, innermost first
+MAX_STACK_DEPTH = 64
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """Profile of one request."""
+
+    id: str
+    trigger: str
+    method: str
+    path: str
+    endpoint: str
+    status_code: int
+    duration_ms: float
+    captured_at: float
+    top: list[dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        """Return the profile without its function or stack list."""
+        data = asdict(self)
+        del data["top"]
+        return data
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the profile as a JSON-serializable dictionary."""
+        return asdict(self)
+
+
+class ProfileStore:
+    """Keeps the ``size`` slowest profiles."""
+
+    def __init__(self, size: int) -> None:
+        """Initialize store.
+
+        Args:
+            size: Maximum number of profiles kept
+        """
+        self.size = size
+        self._heap: list[tuple[float, int, Profile]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        """Keep a profile if it is among the slowest ones."""
+        entry = (profile.duration_ms, next(self._sequence), profile)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def list(self) -> list[Profile]:
+        """Return the kept profiles, slowest first."""
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [profile for _, _, profile in entries]
+
+    def get(self, profile_id: str) -> Profile | None:
+        """Return a kept profile by ID."""
+        return next((p for p in self.list() if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        """Remove all profiles."""
+        with self._lock:
+            self._heap.clear()
+
+
+def _frame_name(frame: FrameType) -> str:
+    """Describe a frame as module:function:line."""
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from a background thread.
+
+    The sampler thread sleeps while no thread is registered, so idle workers
+    pay nothing; otherwise each tick costs one sys._current_frames() call
+    plus a stack walk per registered thread.
+    """
+
+    def __init__(self, interval: float) -> None:
+        """Initialize sampler.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self._samples: dict[int, FrameCounter[tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Forget the thread and samples inherited from the parent."""
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id: int) -> None:
+        """Start sampling a thread.
+
+        Args:
+            thread_id: threading.get_ident() of the thread
+        """
+        with self._lock:
+            self._samples[thread_id] = FrameCounter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id: int) -> FrameCounter[tuple[str, ...]]:
+        """Stop sampling a thread.
+
+        Args:
+            thread_id: threading.get_ident() of the thread
+
+        Returns:
+            Number of samples per stack (innermost frame first)
+        """
+        with self._lock:
+            return self._samples.pop(thread_id, FrameCounter())
+
+    def _run(self) -> None:
+        """Sample registered threads until the process exits."""
+        while True:
+            if not self._samples:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame: FrameType | None = frames.get(thread_id)
+                    stack: list[str] = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        stack.append(_frame_name(frame))
+                        frame = frame.f_back
+                    if stack:
+                        samples[tuple(stack)] += 1
+
+
+def top_stacks(
+    samples: FrameCounter[tuple[str, ...]], interval: float, limit: int
+) -> list[dict[str, Any]]:
+    """Summarize stack samples by the functions most often on top.
+
+    Args:
+        samples: Number of samples per stack, innermost frame first
+        interval: Seconds between samples
+        limit: Maximum number of entries
+
+    Returns:
+        Entries with the innermost frame, its most frequent stack, the
+        number of samples and the estimated time
+    """
+    by_frame: FrameCounter[str] = FrameCounter()
+    example: dict[str, tuple[str, ...]] = {}
+    for stack, count in samples.most_common():
+        by_frame[stack[0]] += count
+        example.setdefault(stack[0], stack)
+    return [
+        {
+            "function": frame,
+            "samples": count,
+            "estimated_ms": round(count * interval * 1000, 1),
+            "stack": list(example[frame][:20]),
+        }
+        for frame, count in by_frame.most_common(limit)
+    ]
+
+
+def top_functions(profiler: cProfile.Profile, limit: int) -> list[dict[str, Any]]:
+    """Summarize a cProfile run by cumulative time.
+
+    Args:
+        profiler: Finished profiler
+        limit: Maximum number of entries
+
+    Returns:
+        Entries with the function, call count, own time and cumulative time
+    """
+    # Stats.stats maps (file, line, function) to (primitive calls, calls,
+    # own time, cumulative time, callers)
+    stats: dict[tuple[str, int, str], tuple[Any, ...]]
+    stats = pstats.Stats(profiler).stats  # type: ignore[attr-defined]
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{function}:{line}",
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, function), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def _hottest(top: list[dict[str, Any]]) -> str | None:
+    """Return the function with the most own time or samples."""
+    if not top:
+        return None
+    entry = max(top, key=lambda e: e["own_ms"] if "own_ms" in e else e["samples"])
+    return str(entry["function"])
+
+
+# Profiles of this process, replaced by register_profiling()
+profile_store = ProfileStore(20)
+
+_stack_sampler: StackSampler | None = None
+
+# Held while a cProfile profiler is enabled
+_cprofile_lock = threading.Lock()
+
+
+def _enable_cprofile() -> cProfile.Profile | None:
+    """Enable a cProfile profiler unless another one is running.
+
+    Returns:
+        Enabled profiler, or None if another request holds the profiler
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another tool (e.g. a debugger or coverage) registered a profiler
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _disable_cprofile(profiler: cProfile.Profile) -> None:
+    """Disable a profiler enabled by _enable_cprofile()."""
+    profiler.disable()
+    _cprofile_lock.release()
+
+
+def _reset_after_fork() -> None:
+    """Release the profiler lock a request of the parent process may hold."""
+    global _cprofile_lock
+    _cprofile_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _start_profiling() -> None:
+    """Start a profiler for the request if it is sampled or may become slow."""
+    config = current_app.config
+    sampled = random.random() < config.get("PROFILING_SAMPLE_RATE", 0.0)
+    if sampled:
+        profiler = _enable_cprofile()
+        if profiler is not None:
+            g._profiler = profiler
+            return
+        g._profile_sampled = True
+    if _stack_sampler is not None and (sampled or config.get("PROFILING_SLOW_MS", 1000) > 0):
+        g._profiled_thread = threading.get_ident()
+        _stack_sampler.start(g._profiled_thread)
+
+
+def _finish_profiling(response: Response) -> Response:
+    """Stop the request's profiler and keep the profile if it qualifies."""
+    profiler: cProfile.Profile | None = g.pop("_profiler", None)
+    thread_id: int | None = g.pop("_profiled_thread", None)
+    sampled: bool = g.pop("_profile_sampled", False)
+    if profiler is not None:
+        _disable_cprofile(profiler)
+    samples = _stack_sampler.stop(thread_id) if _stack_sampler and thread_id else None
+
+    config = current_app.config
+    start = request.environ.get(ENVIRON_START_KEY)
+    duration_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+    limit = config.get("PROFILING_TOP_N", 25)
+    interval = config.get("PROFILING_INTERVAL_MS", 5) / 1000
+    if profiler is not None:
+        trigger, top = "sampled", top_functions(profiler, limit)
+    elif samples is not None and sampled:
+        trigger, top = "sampled", top_stacks(samples, interval, limit)
+    elif samples is not None and duration_ms >= config.get("PROFILING_SLOW_MS", 1000):
+        trigger, top = "slow", top_stacks(samples, interval, limit)
+    else:
+        return response
+
+    profile = Profile(
+        id=g.get("request_id") or "",
+        trigger=trigger,
+        method=request.method,
+        path=request.path,
+        endpoint=request.endpoint or "unmatched",
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 3),
+        captured_at=time.time(),
+        top=top,
+    )
+    profile_store.add(profile)
+    PROFILES_CAPTURED.inc(trigger)
+    logger.info(
+        "Request profiled",
+        extra={
+            "profile_trigger": trigger,
+            "endpoint": profile.endpoint,
+            "duration_ms": profile.duration_ms,
+            "top_function": _hottest(top),
+        },
+    )
+    return response
+
+
+def _cleanup_profiling(exception: BaseException | None) -> None:
+    """Stop profilers left running when after_request hooks were skipped."""
+    profiler: cProfile.Profile | None = g.pop("_profiler", None)
+    if profiler is not None:
+        _disable_cprofile(profiler)
+    g.pop("_profile_sampled", None)
+    thread_id: int | None = g.pop("_profiled_thread", None)
+    if _stack_sampler is not None and thread_id is not None:
+        _stack_sampler.stop(thread_id)
+
+
+def register_profiling(app: Flask) -> None:
+    """Profile sampled and slow requests if PROFILING_ENABLED is set.
+
+    Args:
+        app: Flask application instance
+    """
+    global profile_store, _stack_sampler
+    if not app.config.get("PROFILING_ENABLED"):
+        return
+
+    profile_store = ProfileStore(app.config.get("PROFILING_KEEP", 20))
+    interval = app.config.get("PROFILING_INTERVAL_MS", 5) / 1000
+    if _stack_sampler is None:
+        _stack_sampler = StackSampler(interval)
+    _stack_sampler.interval = interval
+    app.before_request(_start_profiling)
+    app.after_request(_finish_profiling)
+    app.teardown_request(_cleanup_profiling)
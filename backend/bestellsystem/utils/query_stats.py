@@ -0,0 +1,274 @@
+"""SQL query instrumentation.
+
+Every statement sent to the database is timed by engine-level cursor events.
+Per request this yields:
+
+* the number of queries and the time spent in them, added to the request log
+  record (``db_queries``, ``db_ms``) and to Server-Timing as the "db" phase
+* a "Repeated query" warning when the same normalized statement runs
+  DB_REPEATED_QUERY_THRESHOLD times or more (typically an N+1 pattern)
+* a "Query budget exceeded" warning when a request runs more than
+  DB_QUERY_BUDGET queries
+
+Statements slower than DB_SLOW_QUERY_MS are logged with their normalized SQL
+and a fingerprint of the parameters, so slow queries can be grouped without
+writing parameter values (which may contain personal data) to the log.
+
+Tests can enforce a budget with query_budget().
+"""
+
+import functools
+import hashlib
+import re
+import threading
+import time
+from collections import Counter as StatementCounter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import Engine, event
+
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Histogram
+from bestellsystem.utils.timing import add_log_field, add_phase
+
+DB_QUERIES = Counter("db_queries_total", "Executed SQL statements")
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Execution time of SQL statements",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than DB_SLOW_QUERY_MS")
+DB_REPEATED_QUERIES = Counter(
+    "db_repeated_queries_total",
+    "Requests repeating a statement DB_REPEATED_QUERY_THRESHOLD times or more",
+    ("endpoint",),
+)
+
+logger = get_logger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """Replace literals and placeholders of a statement with ``?``.
+
+    IN lists and multi-row VALUES collapse to one entry, so statements that
+    differ only in the number of bound values normalize to the same text.
+
+    Args:
+        statement: SQL as sent to the driver
+
+    Returns:
+        Normalized statement on a single line
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    normalized = _VALUES_ROWS.sub(r"VALUES \1, ...", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def fingerprint_parameters(parameters: Any) -> str:
+    """Return a short hash identifying a set of bound parameters.
+
+    Args:
+        parameters: Parameters as passed to the driver
+
+    Returns:
+        16 hex digits; equal parameters give equal fingerprints
+    """
+    return hashlib.blake2b(repr(parameters).encode(), digest_size=8).hexdigest()
+
+
+class QueryStats:
+    """Queries of a request or of a count_queries() block."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: StatementCounter[str] = StatementCounter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        """Record an executed statement.
+
+        Args:
+            statement: Normalized statement
+            seconds: Execution time
+        """
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Return statements executed at least ``threshold`` times, most frequent first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget() when a block runs too many queries."""
+
+
+# Settings from the app config, applied by register_query_instrumentation()
+_slow_query_seconds = 0.2
+_repeated_threshold = 5
+_query_budget = 0
+
+# count_queries() blocks active in the current thread
+_local = threading.local()
+
+
+def _active_stats() -> list[QueryStats]:
+    """Return the statistics the current statement is recorded in."""
+    active: list[QueryStats] = list(getattr(_local, "collectors", ()))
+    if has_request_context():
+        stats: QueryStats | None = g.get("_query_stats")
+        if stats is not None:
+            active.append(stats)
+    return active
+
+
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    """Remember when the statement was sent."""
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    """Record the statement's execution time."""
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.observe(elapsed)
+    add_phase("db", elapsed)
+
+    normalized = normalize_sql(statement)
+    for stats in _active_stats():
+        stats.record(normalized, elapsed)
+
+    if _slow_query_seconds > 0 and elapsed >= _slow_query_seconds:
+        DB_SLOW_QUERIES.inc()
+        logger.warning(
+            "Slow query",
+            extra={
+                "sql": normalized,
+                "parameters_fingerprint": fingerprint_parameters(parameters),
+                "executemany": executemany,
+                "duration_ms": round(elapsed * 1000, 3),
+            },
+        )
+
+
+def _install_listeners() -> None:
+    """Listen to the cursor events of all engines, once per process."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count the queries the current thread runs inside the block.
+
+    Queries of requests served by a test client in the same thread count too.
+
+    Yields:
+        Statistics filled while the block runs
+    """
+    _install_listeners()
+    stats = QueryStats()
+    collectors: list[QueryStats] = _local.__dict__.setdefault("collectors", [])
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """Fail if the block runs more than ``max_queries`` queries.
+
+    Args:
+        max_queries: Largest allowed number of queries
+
+    Yields:
+        Statistics filled while the block runs
+
+    Raises:
+        QueryBudgetExceeded: If the block ran more queries
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {n}x {sql}" for sql, n in stats.statements.most_common())
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries executed, budget is {max_queries}:\n{statements}"
+        )
+
+
+def _start_query_stats() -> None:
+    """Start counting the queries of the request."""
+    g._query_stats = QueryStats()
+
+
+def _finish_query_stats(response: Response) -> Response:
+    """Add the request's query statistics to its log record and check for N+1 patterns."""
+    stats: QueryStats | None = g.get("_query_stats")
+    if stats is None:
+        return response
+    add_log_field("db_queries", stats.count)
+    add_log_field("db_ms", round(stats.seconds * 1000, 3))
+
+    endpoint = request.endpoint or "unmatched"
+    if _repeated_threshold > 0:
+        repeated = stats.repeated(_repeated_threshold)
+        if repeated:
+            DB_REPEATED_QUERIES.inc(endpoint)
+        for statement, count in repeated:
+            logger.warning(
+                "Repeated query",
+                extra={"endpoint": endpoint, "sql": statement, "repetitions": count},
+            )
+    if 0 < _query_budget < stats.count:
+        logger.warning(
+            "Query budget exceeded",
+            extra={"endpoint": endpoint, "db_queries": stats.count, "budget": _query_budget},
+        )
+    return response
+
+
+def register_query_instrumentation(app: Flask) -> None:
+    """Count and time the SQL queries of each request.
+
+    Must be called after register_request_timing and before
+    register_session_handling, so the queries of the commit are included and
+    the fields are added before the request is logged.
+
+    Args:
+        app: Flask application instance
+    """
+    global _slow_query_seconds, _repeated_threshold, _query_budget
+    _slow_query_seconds = app.config.get("DB_SLOW_QUERY_MS", 200) / 1000
+    _repeated_threshold = app.config.get("DB_REPEATED_QUERY_THRESHOLD", 5)
+    _query_budget = app.config.get("DB_QUERY_BUDGET", 0)
+    _install_listeners()
+    app.before_request(_start_query_stats)
+    app.after_request(_finish_query_stats)
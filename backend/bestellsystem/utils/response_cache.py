@@ -0,0 +1,396 @@
+"""Response cache for GET views with strong ETags and ORM-driven invalidation.
+
+Cached responses are stored as bytes, so hits skip both the view and JSON
+serialization. Each entry belongs to one or more tables; a commit that
+inserted, updated or deleted rows of a table bumps that table's generation,
+which is part of the cache key, so stale entries are never served again.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Protocol, TypeVar, cast
+
+from flask import Flask, Response, current_app, g, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from bestellsystem.utils.cache import TTLCache
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "response_cache_requests_total",
+    "Cacheable requests by outcome",
+    ("endpoint", "result"),
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+logger = get_logger(__name__)
+
+_ENCODING_SUFFIX = re.compile(r'-(?:gzip|br)"$')
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """Serialized response stored in the cache."""
+
+    body: bytes
+    mimetype: str
+    etag: str
+
+
+class CacheBackend(Protocol):
+    """Storage for cached responses and table generations."""
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return a live entry."""
+
+    def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        """Store an entry for ``ttl`` seconds."""
+
+    def generation(self, table: str) -> int:
+        """Return the current generation of a table."""
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Start a new generation for each table."""
+
+
+class NullBackend:
+    """Backend that caches nothing; conditional GETs still work."""
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return nothing."""
+        return None
+
+    def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        """Discard the entry."""
+
+    def generation(self, table: str) -> int:
+        """Return a constant generation."""
+        return 0
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Do nothing."""
+
+
+class MemoryBackend:
+    """Per-process LRU cache.
+
+    Generations are per process too, so a write handled by another worker
+    only becomes visible here when entries expire. Use a short TTL or the
+    SQLite backend with several workers.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """Initialize backend.
+
+        Args:
+            maxsize: Maximum number of cached responses
+        """
+        self._entries: TTLCache[CachedResponse] = TTLCache(maxsize, float("inf"))
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return a live entry."""
+        return self._entries.get(key)
+
+    def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        """Store an entry for ``ttl`` seconds."""
+        self._entries.set(key, entry, ttl)
+
+    def generation(self, table: str) -> int:
+        """Return the current generation of a table."""
+        return self._generations.get(table, 0)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Start a new generation for each table."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+
+class SQLiteBackend:
+    """Cache shared by all worker processes of a host through a SQLite file.
+
+    Each thread uses its own connection in WAL mode, so readers never block
+    each other. Generations are shared too: a write in one worker invalidates
+    the entries of all workers.
+    """
+
+    def __init__(self, path: str, maxsize: int) -> None:
+        """Initialize backend.
+
+        Args:
+            path: Database file, created if missing
+            maxsize: Entries kept when expired ones are purged
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS entry (
+                    key TEXT PRIMARY KEY, body BLOB, mimetype TEXT, etag TEXT, expires_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS generation (name TEXT PRIMARY KEY, value INTEGER);
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of the current thread and process."""
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return a live entry."""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT body, mimetype, etag FROM entry WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return CachedResponse(*row) if row else None
+
+    def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        """Store an entry for ``ttl`` seconds, purging expired ones when full."""
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?)",
+            (key, entry.body, entry.mimetype, entry.etag, now + ttl),
+        )
+        (count,) = connection.execute("SELECT count(*) FROM entry").fetchone()
+        if count > self.maxsize:
+            connection.execute("DELETE FROM entry WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "DELETE FROM entry WHERE key IN "
+                "(SELECT key FROM entry ORDER BY expires_at LIMIT max(0, "
+                "(SELECT count(*) FROM entry) - ?))",
+                (self.maxsize,),
+            )
+
+    def generation(self, table: str) -> int:
+        """Return the current generation of a table."""
+        row = (
+            self._connect()
+            .execute("SELECT value FROM generation WHERE name = ?", (table,))
+            .fetchone()
+        )
+        return int(row[0]) if row else 0
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Start a new generation for each table."""
+        self._connect().executemany(
+            "INSERT INTO generation VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            [(table,) for table in sorted(tables)],
+        )
+
+
+# Backend used by cached views, replaced by configure_response_cache()
+response_cache_backend: CacheBackend = MemoryBackend(maxsize=1024)
+
+
+def configure_response_cache(backend: str, maxsize: int, path: str = "", workers: int = 1) -> None:
+    """Select the response cache backend.
+
+    The memory backend only sees the writes of its own worker, so with
+    several workers the others would serve stale responses until they
+    expire; "auto" therefore selects the SQLite backend in that case.
+
+    Args:
+        backend: "memory", "sqlite", "none" or "auto"
+        maxsize: Maximum number of cached responses
+        path: Database file of the SQLite backend
+        workers: Number of worker processes serving the app
+
+    Raises:
+        ValueError: If the backend is unknown or the SQLite path is missing
+    """
+    global response_cache_backend
+    if backend == "auto":
+        backend = "sqlite" if workers > 1 else "memory"
+    elif backend == "memory" and workers > 1:
+        logger.warning(
+            "Response cache is per worker, writes do not invalidate the other workers' entries",
+            extra={"workers": workers},
+        )
+    if backend == "memory":
+        response_cache_backend = MemoryBackend(maxsize)
+    elif backend == "sqlite":
+        if not path:
+            raise ValueError(
+                "RESPONSE_CACHE_PATH is required for the sqlite backend, which is the "
+                "default with several workers"
+            )
+        response_cache_backend = SQLiteBackend(path, maxsize)
+    elif backend == "none":
+        response_cache_backend = NullBackend()
+    else:
+        raise ValueError(f"Unknown response cache backend: {backend}")
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(etag: str) -> bool:
+    """Check the If-None-Match header of the request against an ETag."""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    # Compression appends the encoding to the ETag of the compressed variant
+    candidates = {
+        _ENCODING_SUFFIX.sub('"', candidate.strip()) for candidate in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """Build a 304 response without a body."""
+    response = Response(status=304)
+    response.headers["ETag"] = etag
+    return response
+
+
+def _cache_key(tables: tuple[str, ...]) -> str:
+    """Derive the cache key from route, query arguments, role and table generations."""
+    claims = g.get("token_claims")
+    role = claims.role if claims is not None else ""
+    generations = [response_cache_backend.generation(table) for table in tables]
+    key = json.dumps(
+        [
+            request.endpoint,
+            request.path,
+            sorted(request.args.items(multi=True)),
+            role,
+            generations,
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+
+
+def cached(*tables: str, ttl: float | None = None) -> Callable[[F], F]:
+    """Cache the successful responses of a GET view.
+
+    Apply it below authentication decorators so the caller is checked before
+    a cached response is served and the role becomes part of the cache key.
+
+    Args:
+        *tables: Tables the response is built from; writes to them invalidate it
+        ttl: Lifetime of entries in seconds, defaults to RESPONSE_CACHE_TTL
+
+    Returns:
+        Decorator for view functions
+    """
+
+    def decorator(view: F) -> F:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            endpoint = request.endpoint or view.__name__
+            key = _cache_key(tables)
+            entry = response_cache_backend.get(key)
+            if entry is not None:
+                if etag_matches(entry.etag):
+                    RESPONSE_CACHE_REQUESTS.inc(endpoint, "not_modified")
+                    return not_modified(entry.etag)
+                RESPONSE_CACHE_REQUESTS.inc(endpoint, "hit")
+                response = Response(entry.body, mimetype=entry.mimetype)
+                response.headers["ETag"] = entry.etag
+                return response
+
+            RESPONSE_CACHE_REQUESTS.inc(endpoint, "miss")
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            etag = make_etag(body)
+            lifetime = current_app.config.get("RESPONSE_CACHE_TTL", 60) if ttl is None else ttl
+            response_cache_backend.set(
+                key, CachedResponse(body, response.mimetype or "", etag), lifetime
+            )
+            if etag_matches(etag):
+                return not_modified(etag)
+            response.headers["ETag"] = etag
+            return response
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def _collect_changed_tables(session: Session, flush_context: Any, instances: Any) -> None:
+    """Remember the tables touched by a flush until the transaction ends."""
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table is not None:
+            changed.add(table)
+
+
+def _invalidate_changed_tables(session: Session) -> None:
+    """Invalidate cached responses built from tables changed by the commit."""
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        try:
+            response_cache_backend.bump(changed)
+        except Exception:
+            logger.warning("Could not invalidate cached responses", exc_info=True)
+
+
+def _discard_changed_tables(session: Session) -> None:
+    """Forget changed tables when the transaction is rolled back."""
+    session.info.pop("changed_tables", None)
+
+
+def mark_changed(session: Session, *tables: str) -> None:
+    """Invalidate the responses built from tables when the session commits.
+
+    ORM flushes are tracked automatically; call this after writing through
+    Core statements on the session's connection.
+
+    Args:
+        session: Session whose transaction wrote the rows
+        *tables: Names of the changed tables
+    """
+    session.info.setdefault("changed_tables", set()).update(tables)
+
+
+def register_response_cache(app: Flask, session_class: type[Session] = Session) -> None:
+    """Configure the response cache and invalidate it on ORM commits.
+
+    Args:
+        app: Flask application instance
+        session_class: Session class whose commits invalidate cached responses
+    """
+    configure_response_cache(
+        app.config.get("RESPONSE_CACHE_BACKEND", "auto"),
+        maxsize=app.config.get("RESPONSE_CACHE_SIZE", 1024),
+        path=app.config.get("RESPONSE_CACHE_PATH", ""),
+        workers=app.config.get("WORKERS", 1),
+    )
+    if not event.contains(session_class, "before_flush", _collect_changed_tables):
+        event.listen(session_class, "before_flush", _collect_changed_tables)
+        event.listen(session_class, "after_commit", _invalidate_changed_tables)
+        event.listen(session_class, "after_rollback", _discard_changed_tables)
@@ -0,0 +1,259 @@
+"""Per-request phase timing, Server-Timing headers and latency histograms."""
+
+import functools
+import re
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+
+from bestellsystem.utils.logging import get_logger
+from bestellsystem.utils.metrics import Counter, Histogram
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Number of handled requests",
+    labelnames=("endpoint", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency in seconds",
+    labelnames=("endpoint", "status"),
+)
+
+# WSGI environ key holding the perf_counter() value at request entry
+ENVIRON_START_KEY = "bestellsystem.request_start"
+
+# Incoming X-Request-ID values are only trusted when they look like an ID
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+logger = get_logger(__name__)
+
+
+class RequestTiming:
+    """Timing state of the current request, stored on ``flask.g``."""
+
+    __slots__ = ("start", "handler_end", "error", "phases", "log_fields")
+
+    def __init__(self, start: float) -> None:
+        """Initialize timing state.
+
+        Args:
+            start: perf_counter() value at which the request entered the app
+        """
+        self.start = start
+        self.handler_end: float | None = None
+        self.error: str | None = None
+        self.phases: dict[str, float] = {}
+        self.log_fields: dict[str, Any] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time spent in a phase."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+class TimingMiddleware:
+    """WSGI middleware recording when a request enters the application.
+
+    Flask matches the URL and pushes the request context before any
+    ``before_request`` hook runs, so the time until then is reported as the
+    "route" phase.
+    """
+
+    def __init__(self, wsgi_app: Callable[..., Iterable[bytes]]) -> None:
+        """Initialize middleware.
+
+        Args:
+            wsgi_app: Wrapped WSGI application
+        """
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable[..., Any]) -> Any:
+        """Stamp the environ and call the wrapped application."""
+        environ[ENVIRON_START_KEY] = time.perf_counter()
+        return self.wsgi_app(environ, start_response)
+
+
+def current_timing() -> RequestTiming | None:
+    """Return the timing state of the current request, if any."""
+    if not has_request_context():
+        return None
+    timing: RequestTiming | None = g.get("_request_timing")
+    return timing
+
+
+def add_phase(name: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request.
+
+    Does nothing outside of a request, so callers like the database layer can
+    report timings unconditionally.
+
+    Args:
+        name: Phase name, e.g. "db"
+        seconds: Duration in seconds
+    """
+    timing = current_timing()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+def add_log_field(name: str, value: Any) -> None:
+    """Add a field to the "Request completed" log record of the current request.
+
+    Does nothing outside of a request.
+
+    Args:
+        name: Field name
+        value: JSON-serializable value
+    """
+    timing = current_timing()
+    if timing is not None:
+        timing.log_fields[name] = value
+
+
+def _timed_view(view: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a view function to record the "handler" phase."""
+
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        timing = current_timing()
+        if timing is None:
+            return view(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        except Exception as e:
+            timing.error = type(e).__name__
+            raise
+        finally:
+            timing.handler_end = time.perf_counter()
+            timing.add("handler", timing.handler_end - start)
+
+    return wrapper
+
+
+def request_id_from_header(value: str | None) -> str:
+    """Return the client's request ID if it looks like one, else a new ID.
+
+    Args:
+        value: X-Request-ID header of the request, if any
+
+    Returns:
+        Request ID to use for logging and the response header
+    """
+    if value and _REQUEST_ID_PATTERN.match(value):
+        return value
+    return uuid.uuid4().hex
+
+
+def _start_request() -> None:
+    """Create the timing state and assign the request ID."""
+    now = time.perf_counter()
+    start = request.environ.get(ENVIRON_START_KEY, now)
+    timing = RequestTiming(start)
+    timing.add("route", now - start)
+    g._request_timing = timing
+
+    g.request_id = request_id_from_header(request.headers.get("X-Request-ID"))
+
+
+def _finish_request(response: Response) -> Response:
+    """Record latency, add response headers and log the request."""
+    timing = current_timing()
+    if timing is None:
+        return response
+
+    now = time.perf_counter()
+    if timing.handler_end is not None:
+        # Time between the view returning and now went into make_response
+        # or, if the view raised, into the error handler
+        timing.add("error" if timing.error else "serialize", now - timing.handler_end)
+    elif response.status_code >= 400:
+        timing.add("error", now - timing.start - timing.phases.get("route", 0.0))
+    total = now - timing.start
+    timing.add("total", total)
+
+    response.headers["X-Request-ID"] = g.request_id
+    if current_app.config.get("SERVER_TIMING"):
+        response.headers["Server-Timing"] = format_server_timing(timing.phases)
+
+    record_request(
+        request.endpoint or "unmatched",
+        request.method,
+        request.path,
+        response.status_code,
+        total,
+        log=current_app.config.get("LOG_REQUESTS", False),
+        **timing.log_fields,
+    )
+    return response
+
+
+def record_request(
+    endpoint: str,
+    method: str,
+    path: str,
+    status_code: int,
+    duration: float,
+    log: bool,
+    **log_fields: Any,
+) -> None:
+    """Count a handled request, observe its latency and log it.
+
+    Shared by the Flask hooks and the native async routes of the ASGI
+    application.
+
+    Args:
+        endpoint: Endpoint name
+        method: HTTP method
+        path: Request path
+        status_code: HTTP status code of the response
+        duration: Seconds spent on the request
+        log: Whether to log a "Request completed" record
+        **log_fields: Additional fields of the log record
+    """
+    status = str(status_code)
+    REQUEST_COUNT.inc(endpoint, method, status)
+    REQUEST_LATENCY.observe(duration, endpoint, status)
+    if log:
+        logger.info(
+            "Request completed",
+            extra={
+                "method": method,
+                "path": path,
+                "endpoint": endpoint,
+                "status_code": status_code,
+                "duration_ms": round(duration * 1000, 3),
+                **log_fields,
+            },
+        )
+
+
+def format_server_timing(phases: dict[str, float]) -> str:
+    """Format phase durations as a Server-Timing header value.
+
+    Args:
+        phases: Mapping of phase name to duration in seconds
+
+    Returns:
+        Header value like "route;dur=0.05, handler;dur=1.20"
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items())
+
+
+def register_request_timing(app: Flask) -> None:
+    """Instrument all registered views of the app with request timing.
+
+    Must be called after all blueprints have been registered, since only the
+    view functions known at this point are wrapped.
+
+    Args:
+        app: Flask application instance
+    """
+    app.wsgi_app = TimingMiddleware(app.wsgi_app)  # type: ignore[method-assign]
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = _timed_view(view)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,45 @@
+"""Fixtures shared by the test modules."""
+
+import pytest
+
+from bestellsystem.app import create_app
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.config import Config
+from bestellsystem.db import Base, SessionLocal, create_db_engine
+from bestellsystem.models import User
+
+
+@pytest.fixture
+def test_engine(tmp_path):
+    """Bind the session factory to a temporary database."""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
+    Base.metadata.create_all(engine)
+    original_bind = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=engine)
+    yield engine
+    SessionLocal.configure(bind=original_bind)
+    engine.dispose()
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    """Return a factory of test applications.
+
+    Keyword arguments override Config attributes before the application is
+    created, so they also reach settings read while it is registered.
+    """
+
+    def make(**settings):
+        for key, value in settings.items():
+            monkeypatch.setattr(Config, key, value)
+        app = create_app()
+        app.config.update({"TESTING": True})
+        return app
+
+    return make
+
+
+@pytest.fixture
+def staff_token():
+    """Return an access token of a staff member."""
+    return token_service.issue(User(id=1, role="staff"))
@@ -0,0 +1,199 @@
+"""Tests for rate limiting and load shedding."""
+
+import os
+import time
+
+import pytest
+
+from bestellsystem.utils import admission
+from bestellsystem.utils.admission import (
+    Bucket,
+    ConcurrencyLimiter,
+    MemoryBackend,
+    MmapBackend,
+    Rate,
+    parse_rate,
+    parse_route_rates,
+    queue_time,
+)
+
+
+@pytest.fixture
+def make_app(make_app):
+    """Return the app factory, forgetting the admission settings afterwards."""
+    yield make_app
+    admission._settings = None
+
+
+def test_parse_rate():
+    """Test rates with and without burst are parsed."""
+    assert parse_rate("10/s") == Rate(10.0, 10.0)
+    assert parse_rate("120/m:5") == Rate(2.0, 5.0)
+    assert parse_route_rates("a.b=1/h, c=2/s:4") == {
+        "a.b": Rate(1 / 3600, 1.0),
+        "c": Rate(2.0, 4.0),
+    }
+
+
+@pytest.mark.parametrize("spec", ["10", "10/d", "x/s", "0/s", "1/s:0"])
+def test_parse_rate_rejects_invalid(spec):
+    """Test malformed rates are rejected."""
+    with pytest.raises(ValueError):
+        parse_rate(spec)
+
+
+def test_bucket_allows_burst_then_refills():
+    """Test a bucket allows its burst and refills at its rate."""
+    backend = MemoryBackend()
+    bucket = Bucket("client", "client:a", Rate(2.0, 3.0))
+    assert [backend.acquire([bucket], 100.0)[1] for _ in range(3)] == [None] * 3
+
+    wait, limiting = backend.acquire([bucket], 100.0)
+    assert limiting is bucket
+    assert wait == pytest.approx(0.5)
+    assert backend.acquire([bucket], 100.5) == (0.0, None)
+
+
+def test_rejected_request_takes_no_tokens():
+    """Test a request rejected by one bucket does not drain the others."""
+    backend = MemoryBackend()
+    client = Bucket("client", "client:a", Rate(1.0, 5.0))
+    route = Bucket("route", "route:x", Rate(1.0, 1.0))
+    assert backend.acquire([client, route], 0.0)[1] is None
+    assert backend.acquire([client, route], 0.0)[1] is route
+    assert backend.acquire([client, route], 0.0)[1] is route
+    # Four tokens left, one per rejected attempt would have left two
+    assert all(backend.acquire([client], 0.0)[1] is None for _ in range(4))
+
+
+def test_memory_backend_evicts_least_recently_used():
+    """Test the memory backend keeps at most ``size`` buckets."""
+    backend = MemoryBackend(size=2)
+    for key in "abc":
+        backend.acquire([Bucket("client", key, Rate(1.0, 1.0))], 0.0)
+    assert list(backend._buckets) == ["b", "c"]
+
+
+def test_mmap_backend_is_shared_between_processes(tmp_path):
+    """Test workers see each other's bucket state through the file."""
+    path = str(tmp_path / "buckets")
+    backend = MmapBackend(path, slots=64)
+    bucket = Bucket("global", "global", Rate(1.0, 2.0))
+    now = time.time()
+    assert backend.acquire([bucket], now)[1] is None
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if backend.acquire([bucket], now)[1] is None else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    assert backend.acquire([bucket], now)[1] is bucket
+    assert MmapBackend(path, slots=64).acquire([bucket], now)[1] is bucket
+
+
+def test_mmap_backend_reuses_oldest_slot_when_full(tmp_path):
+    """Test keys beyond the table size replace the least recently updated one."""
+    backend = MmapBackend(str(tmp_path / "buckets"), slots=4)
+    rate = Rate(1.0, 1.0)
+    for i in range(10):
+        assert backend.acquire([Bucket("client", f"client:{i}", rate)], float(i))[1] is None
+    assert backend.acquire([Bucket("client", "client:9", rate)], 9.0)[1] is not None
+
+
+def test_queue_time_units():
+    """Test X-Request-Start in seconds, milliseconds and microseconds."""
+    now = 1_700_000_010.0
+    assert queue_time("t=1700000009.5", now) == pytest.approx(0.5)
+    assert queue_time("1700000009500", now) == pytest.approx(0.5)
+    assert queue_time("t=1700000009500000", now) == pytest.approx(0.5)
+    assert queue_time("garbage", now) is None
+    assert queue_time(None, now) is None
+
+
+def test_concurrency_limiter():
+    """Test the limiter hands out at most ``limit`` slots."""
+    limiter = ConcurrencyLimiter(2)
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+
+
+def test_nothing_registered_without_limits(make_app):
+    """Test no hook is installed when no limit is configured."""
+    app = make_app()
+    hooks = [hook for hooks in app.before_request_funcs.values() for hook in hooks]
+    assert admission._admit_request not in hooks
+
+
+def test_client_limit_returns_429_with_retry_after(make_app):
+    """Test clients over their limit get 429 while others and health checks pass."""
+    client = make_app(
+        RATE_LIMIT_CLIENT="2/m", RATE_LIMIT_CLIENT_HEADER="X-Forwarded-For"
+    ).test_client()
+    headers = {"X-Forwarded-For": "10.0.0.1, 203.0.113.7"}
+    assert client.get("/api/v1/orders/1", headers=headers).status_code != 429
+    assert client.get("/api/v1/orders/1", headers=headers).status_code != 429
+
+    response = client.get("/api/v1/orders/1", headers=headers)
+    assert response.status_code == 429
+    assert response.json["error"]["message"] == "Rate limit exceeded"
+    assert response.headers["Retry-After"] == "30"
+
+    other = {"X-Forwarded-For": "198.51.100.1"}
+    assert client.get("/api/v1/orders/1", headers=other).status_code != 429
+    assert client.get("/api/v1/health", headers=headers).status_code == 200
+
+
+def test_client_cannot_choose_its_address(make_app):
+    """Test forged X-Forwarded-For entries do not give clients fresh limits."""
+    client = make_app(
+        RATE_LIMIT_CLIENT="1/m",
+        RATE_LIMIT_CLIENT_HEADER="X-Forwarded-For",
+        RATE_LIMIT_TRUSTED_PROXIES=2,
+    ).test_client()
+    # Client-sent entry, address added by the edge proxy, internal proxy
+    forged = {"X-Forwarded-For": "1.1.1.1, 203.0.113.7, 10.0.0.1"}
+    assert client.get("/api/v1/orders/1", headers=forged).status_code != 429
+    forged = {"X-Forwarded-For": "2.2.2.2, 203.0.113.7, 10.0.0.1"}
+    assert client.get("/api/v1/orders/1", headers=forged).status_code == 429
+    # Fewer entries than proxies: the header was not set by them
+    short = {"X-Forwarded-For": "198.51.100.1"}
+    assert client.get("/api/v1/orders/1", headers=short).status_code != 429
+    assert client.get("/api/v1/orders/1", headers=short).status_code == 429
+
+
+def test_route_limit_is_shared_by_clients(make_app):
+    """Test a route limit counts the requests of all clients."""
+    client = make_app(
+        RATE_LIMIT_ROUTES="api_v1.orders.get_order=1/m", RATE_LIMIT_CLIENT_HEADER="X-Real-IP"
+    ).test_client()
+    assert client.get("/api/v1/orders/1", headers={"X-Real-IP": "a"}).status_code != 429
+    assert client.get("/api/v1/orders/1", headers={"X-Real-IP": "b"}).status_code == 429
+    assert client.get("/api/v1/health").status_code == 200
+
+
+def test_requests_over_in_flight_limit_are_shed(make_app):
+    """Test a worker running its maximum of requests answers 503."""
+    app = make_app(ADMISSION_MAX_IN_FLIGHT=1)
+    client = app.test_client()
+
+    @app.route("/nested")
+    def nested():
+        # Issued while this request holds the only slot
+        inner = client.get("/api/v1/orders/1")
+        return {"status": inner.status_code, "retry_after": inner.headers.get("Retry-After")}
+
+    assert client.get("/nested").json == {"status": 503, "retry_after": "1"}
+    # The slot is free again
+    assert client.get("/api/v1/orders/1").status_code != 503
+
+
+def test_requests_queued_too_long_are_shed(make_app):
+    """Test requests that waited in front of the app beyond the limit are dropped."""
+    client = make_app(ADMISSION_MAX_QUEUE_MS=100).test_client()
+    stale = {"X-Request-Start": f"t={time.time() - 5:.3f}"}
+    fresh = {"X-Request-Start": f"t={time.time():.3f}"}
+    assert client.get("/api/v1/orders/1", headers=stale).status_code == 503
+    assert client.get("/api/v1/orders/1", headers=fresh).status_code != 503
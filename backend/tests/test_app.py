@@ -30,3 +30,39 @@ def test_health_endpoint_json_content_type(client):
     """Test health endpoint returns JSON content type."""
     response = client.get("/api/v1/health")
     assert response.content_type == "application/json"
+
+
+def test_health_endpoint_reports_database(app, client, monkeypatch):
+    """Test health endpoint includes the cached database probe when enabled."""
+    from bestellsystem.db import database_probe
+
+    app.config["HEALTH_CHECK_DB"] = True
+    monkeypatch.setattr(database_probe, "check", lambda: {"status": "ok", "latency_ms": 0.5})
+    response = client.get("/api/v1/health")
+    assert response.status_code == 200
+    assert response.json == {"status": "ok", "database": {"status": "ok", "latency_ms": 0.5}}
+
+    monkeypatch.setattr(database_probe, "check", lambda: {"status": "unavailable"})
+    response = client.get("/api/v1/health")
+    assert response.status_code == 503
+    assert response.json["status"] == "unavailable"
+
+
+def test_metrics_endpoint(client):
+    """Test metrics endpoint exposes request metrics in Prometheus format."""
+    client.get("/api/v1/health")
+    response = client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert 'http_requests_total{endpoint="api_v1.health",method="GET",status="200"}' in (
+        response.text
+    )
+    assert "http_request_duration_seconds_bucket" in response.text
+
+
+def test_metrics_endpoint_requires_token(app, client):
+    """Test metrics endpoint checks the bearer token when configured."""
+    app.config["METRICS_TOKEN"] = "secret"
+    assert client.get("/api/v1/metrics").status_code == 401
+    response = client.get("/api/v1/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
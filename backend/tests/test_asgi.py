@@ -0,0 +1,317 @@
+"""Tests for the ASGI application."""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import update
+
+from bestellsystem.asgi import AsgiApplication, WsgiBridge, create_asgi_app
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import Order
+from bestellsystem.orders.async_routes import register_async_routes
+from bestellsystem.utils import admission
+from bestellsystem.utils.errors import ForbiddenError
+
+
+@pytest.fixture
+def asgi_app(test_engine):
+    """Create ASGI application."""
+    app = create_asgi_app()
+    app.flask_app.config.update({"TESTING": True})
+    yield app
+    app.wsgi.shutdown()
+
+
+@pytest.fixture
+def order_id(test_engine):
+    """Create an order and return its ID."""
+    with SessionLocal() as session:
+        order = Order(source="pos", currency="EUR", total_cents=100)
+        session.add(order)
+        session.commit()
+        return order.id
+
+
+@pytest.fixture
+def auth_headers(staff_token):
+    """Return the ASGI headers carrying a staff member's access token."""
+    return [(b"authorization", f"Bearer {staff_token}".encode())]
+
+
+def _scope(method, path, query=b"", headers=()):
+    """Build an ASGI HTTP scope."""
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "root_path": "",
+        "scheme": "http",
+        "query_string": query,
+        "headers": [(b"host", b"testserver"), *headers],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+
+
+async def _request(app, method, path, query=b"", body=b"", headers=()):
+    """Send a request to an ASGI application and collect the response."""
+    scope = _scope(method, path, query, headers)
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like a server, report the disconnect only once the response is sent
+        while not sent or sent[-1].get("more_body", False):
+            await asyncio.sleep(0.001)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    assert start["type"] == "http.response.start"
+    response_headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    response_body = b"".join(message.get("body", b"") for message in sent[1:])
+    return start["status"], response_headers, response_body
+
+
+def test_flask_routes_are_served_through_bridge(asgi_app):
+    """Test requests without an async route reach the Flask app."""
+    status, headers, body = asyncio.run(_request(asgi_app, "GET", "/api/v1/health"))
+    assert status == 200
+    assert json.loads(body) == {"status": "ok"}
+    assert "x-request-id" in headers
+
+
+def test_bridge_passes_request_body(asgi_app, test_engine, auth_headers):
+    """Test request bodies are forwarded to Flask views."""
+    order = {"source": "pos", "items": [{"sku": "A", "quantity": 1, "unit_price_cents": 5}]}
+    body = json.dumps([order])
+    status, _, response_body = asyncio.run(
+        _request(
+            asgi_app,
+            "POST",
+            "/api/v1/orders/bulk",
+            body=body.encode(),
+            headers=[(b"content-type", b"application/json"), *auth_headers],
+        )
+    )
+    assert status == 201
+    assert json.loads(response_body)["created"] == 1
+
+
+def test_bridge_stops_stream_on_disconnect():
+    """Test a streamed WSGI response is closed once the client disconnects."""
+    closed = threading.Event()
+
+    def wsgi_app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/event-stream")])
+
+        def stream():
+            try:
+                while True:
+                    yield b"data: tick\n\n"
+                    time.sleep(0.01)
+            finally:
+                closed.set()
+
+        return stream()
+
+    bridge = WsgiBridge(wsgi_app, threads=1)
+
+    async def scenario():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        disconnect = asyncio.Event()
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) == 3:
+                disconnect.set()
+
+        await asyncio.wait_for(bridge(_scope("GET", "/events"), receive, send), timeout=5)
+        return sent
+
+    sent = asyncio.run(scenario())
+    bridge.shutdown()
+    assert closed.is_set()
+    assert sent[0]["status"] == 200
+    assert all(message.get("more_body") for message in sent[1:])
+
+
+def test_flask_errors_use_envelope(asgi_app, auth_headers):
+    """Test Flask error handlers apply to bridged requests."""
+    status, _, body = asyncio.run(
+        _request(asgi_app, "GET", "/api/v1/orders/999", headers=auth_headers)
+    )
+    assert status == 404
+    assert json.loads(body)["error"]["message"] == "Order not found"
+
+
+def test_async_status_returns_immediately_without_known(asgi_app, order_id, auth_headers):
+    """Test the async status route answers at once without a known status."""
+    url = f"/api/v1/orders/{order_id}/status"
+    status, headers, body = asyncio.run(
+        _request(asgi_app, "GET", url, query=b"wait=5", headers=auth_headers)
+    )
+    assert status == 200
+    assert json.loads(body) == {"id": str(order_id), "status": "received"}
+    assert headers["content-type"] == "application/json"
+
+
+def test_async_status_requires_token(asgi_app, order_id):
+    """Test the async status route checks the access token like the Flask view."""
+    url = f"/api/v1/orders/{order_id}/status"
+    status, _, body = asyncio.run(_request(asgi_app, "GET", url))
+    assert status == 401
+    assert json.loads(body)["error"]["message"] == "Authentication required"
+    headers = [(b"authorization", b"Bearer forged")]
+    assert asyncio.run(_request(asgi_app, "GET", url, headers=headers))[0] == 401
+
+
+def test_async_status_waits_for_change(order_id, make_app, auth_headers):
+    """Test long-polling returns once the order status changes."""
+    app = AsgiApplication(make_app(ORDER_STATUS_POLL_INTERVAL=0.01), wsgi_threads=1)
+    register_async_routes(app)
+
+    async def scenario():
+        poll = asyncio.create_task(
+            _request(
+                app,
+                "GET",
+                f"/api/v1/orders/{order_id}/status",
+                query=b"wait=5&known=received",
+                headers=auth_headers,
+            )
+        )
+        await asyncio.sleep(0.05)
+        assert not poll.done()
+        with SessionLocal() as session:
+            session.execute(update(Order).where(Order.id == order_id).values(status="ready"))
+            session.commit()
+        return await asyncio.wait_for(poll, timeout=5)
+
+    status, _, body = asyncio.run(scenario())
+    assert status == 200
+    assert json.loads(body)["status"] == "ready"
+    app.wsgi.shutdown()
+
+
+def test_async_status_times_out_with_known_status(asgi_app, order_id, auth_headers):
+    """Test long-polling returns the unchanged status after the wait."""
+    status, _, body = asyncio.run(
+        _request(
+            asgi_app,
+            "GET",
+            f"/api/v1/orders/{order_id}/status",
+            query=b"wait=0.05&known=received",
+            headers=auth_headers,
+        )
+    )
+    assert status == 200
+    assert json.loads(body)["status"] == "received"
+
+
+def test_async_errors_use_envelope(asgi_app, auth_headers):
+    """Test API errors of async handlers produce the error envelope."""
+    status, _, body = asyncio.run(
+        _request(asgi_app, "GET", "/api/v1/orders/999/status", headers=auth_headers)
+    )
+    assert status == 404
+    assert json.loads(body) == {"error": {"message": "Order not found", "status_code": 404}}
+
+    status, _, body = asyncio.run(
+        _request(
+            asgi_app, "GET", "/api/v1/orders/1/status", query=b"wait=soon", headers=auth_headers
+        )
+    )
+    assert status == 400
+
+
+def test_async_route_unhandled_exception(test_engine, make_app):
+    """Test unexpected exceptions of async handlers become a 500 envelope."""
+    app = AsgiApplication(make_app(), wsgi_threads=1)
+
+    @app.route("/boom", endpoint="boom")
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    @app.route("/forbidden", endpoint="forbidden")
+    async def forbidden(request):
+        raise ForbiddenError("Nope")
+
+    status, _, body = asyncio.run(_request(app, "GET", "/boom"))
+    assert status == 500
+    assert json.loads(body)["error"]["message"] == "Internal server error"
+    status, _, _ = asyncio.run(_request(app, "GET", "/forbidden"))
+    assert status == 403
+    app.wsgi.shutdown()
+
+
+def test_async_routes_pass_admission_control(test_engine, make_app, monkeypatch):
+    """Test rate limits and the in-flight limit also apply to async routes."""
+    monkeypatch.setattr(admission, "_settings", None)
+    flask_app = make_app(
+        RATE_LIMIT_CLIENT="1/m",
+        RATE_LIMIT_CLIENT_HEADER="X-Forwarded-For",
+        ADMISSION_MAX_IN_FLIGHT=1,
+    )
+    app = AsgiApplication(flask_app, wsgi_threads=1)
+    release = asyncio.Event()
+
+    @app.route("/hold", endpoint="hold")
+    async def hold(request):
+        await release.wait()
+        return {}, 200
+
+    client_a = [(b"x-forwarded-for", b"203.0.113.7")]
+    client_b = [(b"x-forwarded-for", b"198.51.100.1")]
+
+    async def scenario():
+        first = asyncio.create_task(_request(app, "GET", "/hold", headers=client_a))
+        await asyncio.sleep(0.05)
+        try:
+            shed = await asyncio.wait_for(_request(app, "GET", "/hold", headers=client_b), 5)
+            limited = await asyncio.wait_for(_request(app, "GET", "/hold", headers=client_a), 5)
+        finally:
+            release.set()
+        return await first, shed, limited
+
+    first, shed, limited = asyncio.run(scenario())
+    app.wsgi.shutdown()
+    assert first[0] == 200
+    # The only slot is held by the first request
+    assert shed[0] == 503
+    assert shed[1]["retry-after"] == "1"
+    assert limited[0] == 429
+    assert json.loads(limited[2])["error"]["message"] == "Rate limit exceeded"
+    # The slot is released once the handler returned
+    assert admission._settings.limiter.acquire()
+
+
+def test_lifespan(asgi_app):
+    """Test lifespan startup and shutdown are acknowledged."""
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
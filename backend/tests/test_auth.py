@@ -0,0 +1,162 @@
+"""Tests for password hashing and login."""
+
+import threading
+
+import pytest
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+
+from bestellsystem.auth import service
+from bestellsystem.auth.passwords import PasswordHasher
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import User
+from bestellsystem.utils.errors import ServiceUnavailableError
+
+# Cheap parameters keep the tests fast
+FAST_METHOD = "scrypt:1024:8:1"
+
+
+@pytest.fixture
+def hasher():
+    """Create a hasher with cheap parameters."""
+    return PasswordHasher(FAST_METHOD, workers=1, queue_depth=1)
+
+
+def _blocked(hasher):
+    """Occupy all slots of a hasher until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def wait():
+        started.set()
+        release.wait(5)
+        return True
+
+    threads = [
+        threading.Thread(target=hasher._run, args=("verify", wait), daemon=True) for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    return release, threads
+
+
+def test_hash_and_verify(hasher):
+    """Test hashes verify and embed the configured method."""
+    pwhash = hasher.hash("s3cret")
+    assert pwhash.startswith(FAST_METHOD + "$")
+    assert hasher.verify(pwhash, "s3cret")
+    assert not hasher.verify(pwhash, "wrong")
+    assert not hasher.needs_rehash(pwhash)
+
+
+def test_needs_rehash_on_changed_parameters(hasher):
+    """Test hashes with other parameters or algorithms need a rehash."""
+    assert hasher.needs_rehash(generate_password_hash("x", method="scrypt:2048:8:1"))
+    assert hasher.needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:1000"))
+
+
+def test_needs_rehash_with_default_parameters():
+    """Test a method without parameters matches hashes with its defaults."""
+    hasher = PasswordHasher("pbkdf2", workers=0, queue_depth=0)
+    pwhash = hasher.hash("pw")
+    assert pwhash.split("$", 1)[0] != "pbkdf2"
+    assert not hasher.needs_rehash(pwhash)
+    assert hasher.needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:1000"))
+
+
+def test_inline_hasher():
+    """Test hashing on the calling thread when no workers are configured."""
+    hasher = PasswordHasher(FAST_METHOD, workers=0, queue_depth=0)
+    assert hasher.verify(hasher.hash("pw"), "pw")
+
+
+def test_saturated_pool_fails_fast(hasher):
+    """Test operations beyond the queue depth are rejected with 503."""
+    release, threads = _blocked(hasher)
+    try:
+        with pytest.raises(ServiceUnavailableError) as exc_info:
+            hasher.hash("pw")
+        assert exc_info.value.status_code == 503
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert hasher.verify(hasher.hash("pw"), "pw")
+
+
+def test_slow_operation_times_out():
+    """Test callers stop waiting after the timeout."""
+    hasher = PasswordHasher(FAST_METHOD, workers=1, queue_depth=1, timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(ServiceUnavailableError) as exc_info:
+            hasher._run("verify", lambda: release.wait(5))
+        assert "timed out" in exc_info.value.message
+    finally:
+        release.set()
+
+
+@pytest.fixture
+def client(test_engine, make_app, hasher, monkeypatch):
+    """Create test client with a user and a cheap hasher."""
+    monkeypatch.setattr(service, "password_hasher", hasher)
+    with SessionLocal() as session:
+        session.add(
+            User(
+                email="anna@example.com",
+                # Hashed with outdated parameters, upgraded on login
+                password_hash=generate_password_hash("s3cret", method="pbkdf2:sha256:1000"),
+                role="staff",
+            )
+        )
+        session.commit()
+
+    return make_app().test_client()
+
+
+def test_login_success_upgrades_hash(client):
+    """Test a successful login returns the user and upgrades the hash."""
+    response = client.post(
+        "/api/v1/auth/login", json={"email": "anna@example.com", "password": "s3cret"}
+    )
+
+    assert response.status_code == 200
+    assert response.json["user"]["role"] == "staff"
+    with SessionLocal() as session:
+        pwhash = session.scalars(select(User.password_hash)).one()
+    assert pwhash.startswith(FAST_METHOD + "$")
+
+
+@pytest.mark.parametrize(
+    "email,password", [("anna@example.com", "wrong"), ("nobody@example.com", "s3cret")]
+)
+def test_login_invalid_credentials(client, email, password):
+    """Test wrong passwords and unknown users get the same 401."""
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": password})
+
+    assert response.status_code == 401
+    assert response.json["error"]["message"] == "Invalid email or password"
+    with SessionLocal() as session:
+        pwhash = session.scalars(select(User.password_hash)).one()
+    assert pwhash.startswith("pbkdf2:")
+
+
+def test_login_requires_fields(client):
+    """Test missing credentials are rejected."""
+    response = client.post("/api/v1/auth/login", json={"email": "anna@example.com"})
+    assert response.status_code == 400
+
+
+def test_login_saturated(client, hasher):
+    """Test logins fail fast with 503 while hashing is saturated."""
+    release, threads = _blocked(hasher)
+    try:
+        response = client.post(
+            "/api/v1/auth/login", json={"email": "anna@example.com", "password": "s3cret"}
+        )
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert response.status_code == 503
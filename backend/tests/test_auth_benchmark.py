@@ -0,0 +1,71 @@
+"""Benchmark of logins per second for one worker process.
+
+Run with ``pytest tests/test_auth_benchmark.py -s`` to see the numbers. The
+hash parameters are those of Config.PASSWORD_HASH_METHOD, so the numbers
+reflect the configured cost.
+"""
+
+import threading
+import time
+
+import pytest
+
+from bestellsystem.auth import service
+from bestellsystem.auth.passwords import PasswordHasher
+from bestellsystem.config import Config
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import User
+
+LOGINS = 8
+CLIENT_THREADS = 4
+
+
+@pytest.fixture
+def app(test_engine, make_app):
+    """Create application with one user."""
+    hasher = PasswordHasher(Config.PASSWORD_HASH_METHOD, workers=1)
+    with SessionLocal() as session:
+        session.add(User(email="bench@example.com", password_hash=hasher.hash("pw"), role="a"))
+        session.commit()
+    return make_app(LOG_REQUESTS=False)
+
+
+def _logins_per_second(app, hasher, monkeypatch):
+    """Log in from several threads, like a gthread worker, and return the rate."""
+    monkeypatch.setattr(service, "password_hasher", hasher)
+    statuses = []
+
+    def run():
+        client = app.test_client()
+        for _ in range(LOGINS // CLIENT_THREADS):
+            response = client.post(
+                "/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"}
+            )
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=run) for _ in range(CLIENT_THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert statuses == [200] * LOGINS
+    return LOGINS / elapsed
+
+
+def test_login_throughput(app, monkeypatch):
+    """Compare logins per second with one and with several hashing threads."""
+    queue_depth = CLIENT_THREADS
+    single = _logins_per_second(
+        app, PasswordHasher(Config.PASSWORD_HASH_METHOD, 1, queue_depth), monkeypatch
+    )
+    pooled = _logins_per_second(
+        app, PasswordHasher(Config.PASSWORD_HASH_METHOD, CLIENT_THREADS, queue_depth), monkeypatch
+    )
+
+    print(
+        f"\nLogins/s per worker ({Config.PASSWORD_HASH_METHOD}): "
+        f"1 hashing thread={single:,.1f} {CLIENT_THREADS} hashing threads={pooled:,.1f}"
+    )
+    assert single > 0 and pooled > 0
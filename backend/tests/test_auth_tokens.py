@@ -0,0 +1,242 @@
+"""Tests for access tokens and role checks."""
+
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+from bestellsystem.auth import service
+from bestellsystem.auth.passwords import PasswordHasher
+from bestellsystem.auth.tokens import (
+    RevocationList,
+    TokenClaims,
+    TokenService,
+    login_required,
+    require_role,
+    token_service,
+)
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import RevokedToken, User
+from bestellsystem.utils.errors import UnauthorizedError, register_error_handlers
+
+
+@pytest.fixture(autouse=True)
+def clear_revocations():
+    """Start and end every test with an empty revocation list."""
+    token_service.revocations.clear()
+    yield
+    token_service.revocations.clear()
+
+
+@pytest.fixture
+def tokens(test_engine):
+    """Create a token service with a short revocation refresh interval."""
+    revocations = RevocationList(0.05, background=False)
+    return TokenService("secret", ttl=60, cache_size=100, revocations=revocations)
+
+
+def test_issue_and_verify(tokens):
+    """Test tokens carry user ID and role."""
+    claims = tokens.verify(tokens.issue(User(id=7, role="admin")))
+    assert (claims.user_id, claims.role) == (7, "admin")
+    assert claims.expires_at == pytest.approx(time.time() + 60, abs=2)
+
+
+def test_verify_uses_cache(tokens, monkeypatch):
+    """Test verified tokens are not decoded again."""
+    token = tokens.issue(User(id=7, role="admin"))
+    tokens.verify(token)
+    monkeypatch.setattr(tokens, "_decode", lambda token: pytest.fail("decoded twice"))
+    assert tokens.verify(token).user_id == 7
+
+
+@pytest.mark.parametrize(
+    "mangle", [lambda t: t + "x", lambda t: "a" + t[1:], lambda t: "not-a-token"]
+)
+def test_verify_rejects_tampered_tokens(tokens, mangle):
+    """Test tokens with a bad signature are rejected."""
+    with pytest.raises(UnauthorizedError):
+        tokens.verify(mangle(tokens.issue(User(id=7, role="admin"))))
+
+
+def test_verify_rejects_foreign_key(tokens):
+    """Test tokens signed with another key are rejected."""
+    other = TokenService("other", ttl=60, cache_size=10, revocations=RevocationList(60))
+    with pytest.raises(UnauthorizedError):
+        tokens.verify(other.issue(User(id=7, role="admin")))
+
+
+def test_verify_rejects_expired(tokens, monkeypatch):
+    """Test cached tokens are rejected once expired."""
+    token = tokens.issue(User(id=7, role="admin"))
+    tokens.verify(token)
+    monkeypatch.setattr(time, "time", lambda: 1e12)
+    with pytest.raises(UnauthorizedError) as exc_info:
+        tokens.verify(token)
+    assert exc_info.value.message == "Token expired"
+
+
+def test_revocation_visible_to_other_processes(tokens):
+    """Test a revocation written by another worker is picked up on refresh."""
+    token = tokens.issue(User(id=7, role="admin"))
+    claims = tokens.verify(token)
+
+    other_worker = RevocationList(60)
+    with SessionLocal() as session:
+        other_worker.revoke(session, claims)
+        session.commit()
+
+    time.sleep(0.06)
+    with pytest.raises(UnauthorizedError) as exc_info:
+        tokens.verify(token)
+    assert exc_info.value.message == "Token revoked"
+
+
+def test_revocation_list_reloads_in_background(test_engine, monkeypatch):
+    """Test checks after the first load do not wait for the database."""
+    revocations = RevocationList(0.05)
+    assert not revocations.is_revoked("jti-1")
+    with SessionLocal() as session:
+        RevocationList(60).revoke(session, TokenClaims(7, "admin", "jti-1", time.time() + 60))
+        session.commit()
+
+    reloaded = threading.Event()
+    original = revocations._refresh
+
+    def slow_refresh():
+        time.sleep(0.1)
+        original()
+        reloaded.set()
+
+    monkeypatch.setattr(revocations, "_refresh", slow_refresh)
+    time.sleep(0.06)
+    start = time.monotonic()
+    assert not revocations.is_revoked("jti-1")
+    assert time.monotonic() - start < 0.05
+    assert reloaded.wait(timeout=5)
+    assert revocations.is_revoked("jti-1")
+
+
+def test_revocation_list_checks_wait_for_first_load(test_engine, monkeypatch):
+    """Test checks arriving during the first load see the loaded list."""
+    with SessionLocal() as session:
+        RevocationList(60).revoke(session, TokenClaims(7, "admin", "jti-1", time.time() + 60))
+        session.commit()
+
+    revocations = RevocationList(60)
+    loading = threading.Event()
+    original = revocations._refresh
+
+    def slow_refresh():
+        loading.set()
+        time.sleep(0.1)
+        original()
+
+    monkeypatch.setattr(revocations, "_refresh", slow_refresh)
+    results = []
+    first = threading.Thread(target=lambda: results.append(revocations.is_revoked("jti-1")))
+    first.start()
+    assert loading.wait(timeout=5)
+    results.append(revocations.is_revoked("jti-1"))
+    first.join()
+    assert results == [True, True]
+
+
+def test_revocation_list_purges_expired_rows(test_engine):
+    """Test rows of expired tokens are deleted when the list is loaded."""
+    now = time.time()
+    with SessionLocal() as session:
+        writer = RevocationList(60)
+        writer.revoke(session, TokenClaims(7, "admin", "expired", now - 1))
+        writer.revoke(session, TokenClaims(7, "admin", "valid", now + 60))
+        session.commit()
+
+    revocations = RevocationList(60)
+    assert revocations.is_revoked("valid")
+    with SessionLocal() as session:
+        assert session.scalars(select(RevokedToken.jti)).all() == ["valid"]
+
+
+@pytest.fixture
+def client(test_engine, make_app, monkeypatch):
+    """Create test client with an admin and a staff user."""
+    hasher = PasswordHasher("scrypt:1024:8:1", workers=1)
+    monkeypatch.setattr(service, "password_hasher", hasher)
+    with SessionLocal() as session:
+        for email, role in (("admin@example.com", "admin"), ("staff@example.com", "staff")):
+            session.add(User(email=email, password_hash=hasher.hash("pw"), role=role))
+        session.commit()
+
+    app = make_app()
+
+    @app.route("/admin-only")
+    @require_role("admin")
+    def admin_only():
+        return {"ok": True}
+
+    return app.test_client()
+
+
+def _login(client, email):
+    """Log in and return the authorization header."""
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": "pw"})
+    assert response.status_code == 200
+    assert response.json["token_type"] == "Bearer"
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def test_me_requires_token(client):
+    """Test protected endpoints reject requests without a token."""
+    response = client.get("/api/v1/auth/me")
+    assert response.status_code == 401
+    assert response.json["error"]["message"] == "Authentication required"
+
+
+def test_me_with_token(client):
+    """Test the token identifies the caller."""
+    response = client.get("/api/v1/auth/me", headers=_login(client, "staff@example.com"))
+    assert response.status_code == 200
+    assert response.json["user"]["role"] == "staff"
+
+
+def test_require_role(client):
+    """Test role checks distinguish 401 and 403."""
+    assert client.get("/admin-only").status_code == 401
+    assert client.get("/admin-only", headers=_login(client, "staff@example.com")).status_code == 403
+    assert client.get("/admin-only", headers=_login(client, "admin@example.com")).status_code == 200
+
+
+def test_logout_revokes_token(client):
+    """Test a token cannot be used after logout."""
+    headers = _login(client, "staff@example.com")
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json["error"]["message"] == "Token revoked"
+
+
+def test_user_id_is_logged(client, caplog):
+    """Test log records of authenticated requests carry the user ID."""
+    headers = _login(client, "admin@example.com")
+    app = client.application
+    app.config["LOG_REQUESTS"] = True
+    with caplog.at_level("INFO"):
+        client.get("/api/v1/auth/me", headers=headers)
+    records = [r for r in caplog.records if r.getMessage() == "Request completed"]
+    assert records[-1].user_id == 1
+
+
+def test_login_required_outside_app():
+    """Test the decorator works on plain Flask apps with the error handlers."""
+    app = Flask(__name__)
+    register_error_handlers(app)
+
+    @app.route("/private")
+    @login_required
+    def private():
+        return {"ok": True}
+
+    assert app.test_client().get("/private").status_code == 401
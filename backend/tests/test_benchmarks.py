@@ -0,0 +1,71 @@
+"""Tests for the benchmark harness."""
+
+import pytest
+
+from benchmarks.compare import find_regressions
+from benchmarks.harness import Result, Scenario, percentile, run_inprocess, summarize
+from bestellsystem.app import create_app
+
+
+def _result(**overrides):
+    """Build a benchmark result."""
+    values = {
+        "scenario": "health",
+        "mode": "inprocess",
+        "database": "sqlite",
+        "requests": 100,
+        "errors": 0,
+        "requests_per_second": 1000.0,
+        "p50_ms": 1.0,
+        "p95_ms": 2.0,
+        "p99_ms": 3.0,
+    }
+    values.update(overrides)
+    return Result(**values)
+
+
+def test_percentile_nearest_rank():
+    """Test percentiles use the nearest rank."""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_throughput():
+    """Test latencies are converted to milliseconds and throughput computed."""
+    scenario = Scenario("health", "GET", "/api/v1/health", 200)
+    result = summarize(scenario, "inprocess", "sqlite", [0.001] * 10, errors=1, elapsed=0.5)
+    assert result.key == "inprocess/sqlite/health"
+    assert result.requests_per_second == 20.0
+    assert result.p95_ms == pytest.approx(1.0)
+    assert result.errors == 1
+
+
+def test_find_regressions():
+    """Test slower latency, lower throughput and new errors are flagged."""
+    baseline = {_result().key: _result()}
+    assert find_regressions(baseline, [_result(p95_ms=2.3)], threshold=0.2) == []
+
+    regressions = find_regressions(
+        baseline, [_result(p95_ms=3.0, requests_per_second=700.0, errors=2)], threshold=0.2
+    )
+    assert {regression["metric"] for regression in regressions} == {
+        "p95_ms",
+        "requests_per_second",
+        "errors",
+    }
+    assert find_regressions(baseline, [_result(scenario="new", p95_ms=99.0)], 0.2) == []
+
+
+def test_run_inprocess_counts_unexpected_statuses():
+    """Test the in-process driver sends requests and counts errors."""
+    app = create_app()
+    app.config.update({"TESTING": True, "LOG_REQUESTS": False})
+    ok = run_inprocess(app, Scenario("health", "GET", "/api/v1/health", 200), 10, concurrency=2)
+    assert ok.requests == 10
+    assert ok.errors == 0
+
+    wrong = run_inprocess(app, Scenario("missing", "GET", "/api/v1/missing", 200), 5)
+    assert wrong.errors == 5
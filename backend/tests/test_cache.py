@@ -0,0 +1,36 @@
+"""Tests for the in-process caches."""
+
+import time
+
+from bestellsystem.utils.cache import TTLCache
+
+
+def test_ttl_cache_get_set():
+    """Test stored values are returned until deleted."""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test the least recently used entry is evicted when full."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expiry():
+    """Test entries expire after their TTL, capped by the cache TTL."""
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1, ttl=3600)
+    cache.set("b", 2, ttl=0)
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
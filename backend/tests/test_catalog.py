@@ -0,0 +1,275 @@
+"""Tests for the product catalog snapshot, its search and its refresh."""
+
+import json
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import select
+
+from benchmarks.catalog import generate_catalog, measure_search
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import CatalogVersion, Category, Product
+from bestellsystem.products import catalog
+from bestellsystem.products.search import (
+    CatalogSnapshot,
+    CategoryRecord,
+    ProductRecord,
+    normalize,
+)
+
+SEARCH_URL = "/api/v1/products/search"
+
+CATEGORIES = [
+    CategoryRecord(1, None, "Speisen", 0),
+    CategoryRecord(2, 1, "Pizza", 0),
+    CategoryRecord(3, 1, "Pasta", 1),
+    CategoryRecord(4, None, "Getränke", 1),
+]
+
+
+def _product(id, name, category_id, sku=None, price_cents=900):
+    """Create a product record."""
+    return ProductRecord.create(id, sku or f"SKU-{id}", name, category_id, price_cents, "EUR")
+
+
+PRODUCTS = [
+    _product(1, "Pizza Margherita", 2),
+    _product(2, "Pizza Salami", 2),
+    _product(3, "Margherita Bianca", 2),
+    _product(4, "Spaghetti Carbonara", 3),
+    _product(5, "Käse-Spätzle", 3, sku="KS-100"),
+    _product(6, "Apfelschorle 0,5l", 4),
+    _product(7, "Pizzabrötchen", None),
+]
+
+
+@pytest.fixture
+def snapshot():
+    """Build a snapshot of the test catalog."""
+    return CatalogSnapshot(1, PRODUCTS, CATEGORIES)
+
+
+def _names(products):
+    """Return the names of products."""
+    return [product.name for product in products]
+
+
+def test_normalize_folds_case_and_accents():
+    """Test words are split and folded to lower case without accents."""
+    assert normalize("Käse-Spätzle, GROSS") == ["kase", "spatzle", "gross"]
+    assert normalize("  ") == []
+
+
+def test_prefix_search_ranks_names_starting_with_query_first(snapshot):
+    """Test names starting with the query come before other prefix matches."""
+    assert _names(snapshot.search("marg")) == ["Margherita Bianca", "Pizza Margherita"]
+    assert _names(snapshot.search("p")) == [
+        "Pizza Margherita",
+        "Pizza Salami",
+        "Pizzabrötchen",
+    ]
+    assert _names(snapshot.search("pizza marg")) == ["Pizza Margherita"]
+    assert _names(snapshot.search("marg piz")) == ["Pizza Margherita"]
+    assert _names(snapshot.search("p", limit=2)) == ["Pizza Margherita", "Pizza Salami"]
+
+
+def test_search_matches_sku_and_ignores_accents(snapshot):
+    """Test SKUs are searchable and accents and case do not matter."""
+    assert _names(snapshot.search("ks-1")) == ["Käse-Spätzle"]
+    assert _names(snapshot.search("KÄSE sp")) == ["Käse-Spätzle"]
+    assert _names(snapshot.search("kase")) == ["Käse-Spätzle"]
+
+
+def test_fuzzy_search_finds_typos_and_words_inside_words(snapshot):
+    """Test longer terms tolerate typos and match inside words."""
+    assert _names(snapshot.search("margarita")) == ["Margherita Bianca", "Pizza Margherita"]
+    assert _names(snapshot.search("carbonera")) == ["Spaghetti Carbonara"]
+    assert _names(snapshot.search("schorle")) == ["Apfelschorle 0,5l"]
+    # Typos in the first letter, in short terms and in numbers are not tolerated
+    assert snapshot.search("xarbonara") == []
+    assert snapshot.search("sxl") == []
+    assert snapshot.search("sku 8") == []
+
+
+def test_category_tree_is_precomputed(snapshot):
+    """Test paths, descendants and product counts of the category tree."""
+    food = snapshot.categories[1]
+    assert snapshot.roots == (1, 4)
+    assert food.children == (2, 3)
+    assert food.descendants == {1, 2, 3}
+    assert food.product_count == 5
+    assert snapshot.categories[3].path == (1,)
+
+    tree = json.loads(snapshot.category_tree_json)["data"]
+    assert [(node["name"], node["product_count"]) for node in tree] == [
+        ("Speisen", 5),
+        ("Getränke", 1),
+    ]
+    assert [node["name"] for node in tree[0]["children"]] == ["Pizza", "Pasta"]
+
+
+def test_search_within_category(snapshot):
+    """Test the category filter includes subcategories."""
+    assert _names(snapshot.search("sp", category_id=1)) == ["Spaghetti Carbonara", "Käse-Spätzle"]
+    assert _names(snapshot.search("sp", category_id=2)) == []
+    assert _names(snapshot.search("sa", category_id=1)) == ["Pizza Salami"]
+    assert _names(snapshot.search("", category_id=2)) == [
+        "Margherita Bianca",
+        "Pizza Margherita",
+        "Pizza Salami",
+    ]
+    assert snapshot.search("pizza", category_id=4) == []
+    assert snapshot.search("pizza", category_id=99) == []
+
+
+def test_updated_shares_index_when_words_are_unchanged(snapshot):
+    """Test price changes keep the index and renames rebuild it."""
+    repriced = snapshot.updated(2, [replace(PRODUCTS[1], price_cents=1000)])
+    assert repriced.version == 2
+    assert repriced._index is snapshot._index
+    assert repriced.get(2).price_cents == 1000
+    assert snapshot.get(2).price_cents == 900
+
+    renamed = snapshot.updated(3, [_product(2, "Pizza Diavola", 2)], removed=[4])
+    assert renamed._index is not snapshot._index
+    assert _names(renamed.search("pizza")) == [
+        "Pizza Diavola",
+        "Pizza Margherita",
+        "Pizzabrötchen",
+    ]
+    assert renamed.get(4) is None
+    assert renamed.categories[3].product_count == 1
+
+
+@pytest.fixture
+def application(test_engine, make_app):
+    """Create an app refreshing the catalog on every request."""
+    return make_app(CATALOG_REFRESH_INTERVAL=0.0, CATALOG_REFRESH_IN_BACKGROUND=False)
+
+
+def _seed():
+    """Store a small catalog and return the IDs of its rows."""
+    with SessionLocal() as session:
+        food = Category(name="Speisen")
+        session.add(food)
+        session.flush()
+        pizza = Category(name="Pizza", parent_id=food.id)
+        session.add(pizza)
+        session.flush()
+        products = [
+            Product(sku="P-1", name="Pizza Margherita", category_id=pizza.id, price_cents=850),
+            Product(sku="P-2", name="Pizza Salami", category_id=pizza.id, price_cents=950),
+        ]
+        session.add_all(products)
+        session.commit()
+        return food.id, pizza.id, [product.id for product in products]
+
+
+def test_writes_are_stamped_with_catalog_version(application):
+    """Test every flush changing the catalog takes the next version."""
+    _, _, (margherita, _) = _seed()
+    with SessionLocal() as session:
+        assert session.scalar(select(CatalogVersion.version)) == 3
+        session.get(Product, margherita).price_cents = 900
+        session.commit()
+        assert session.get(Product, margherita).version == 4
+        # Flushes without catalog changes leave the version alone
+        session.commit()
+        assert session.scalar(select(CatalogVersion.version)) == 4
+
+
+def test_cache_loads_changes_incrementally(application):
+    """Test the cache applies changed rows and reloads in full after deletions."""
+    _, pizza, (margherita, salami) = _seed()
+    cache = catalog.CatalogCache(refresh_seconds=0, background=False)
+    first = cache.snapshot()
+    assert first.version == 3
+    assert _names(first.search("pizza")) == ["Pizza Margherita", "Pizza Salami"]
+
+    with SessionLocal() as session:
+        session.get(Product, margherita).price_cents = 900
+        session.get(Product, salami).active = False
+        session.add(Product(sku="P-3", name="Pizza Funghi", category_id=pizza, price_cents=900))
+        session.commit()
+    second = cache.snapshot()
+    assert second.version == 4
+    assert _names(second.search("pizza")) == ["Pizza Funghi", "Pizza Margherita"]
+    assert second.get(margherita).price_cents == 900
+
+    with SessionLocal() as session:
+        session.delete(session.get(Product, margherita))
+        session.commit()
+    # Deleted rows are only noticed by reloading the catalog in full
+    third = cache.snapshot()
+    assert _names(third.search("pizza")) == ["Pizza Funghi"]
+    assert third.categories[pizza].product_count == 1
+
+
+def test_cache_refreshes_in_background(application):
+    """Test a stale snapshot is served while the next one is built."""
+    _seed()
+    cache = catalog.CatalogCache(refresh_seconds=0)
+    first = cache.snapshot()
+    with SessionLocal() as session:
+        session.add(Product(sku="P-3", name="Pizza Funghi", price_cents=900))
+        session.commit()
+    assert cache.snapshot() is first
+    with cache._refresh_lock:
+        pass
+    assert _names(cache.snapshot().search("funghi")) == ["Pizza Funghi"]
+
+
+def test_search_endpoint(application):
+    """Test the search endpoint returns products and validates its arguments."""
+    _, pizza, _ = _seed()
+    client = application.test_client()
+    response = client.get(SEARCH_URL, query_string={"q": "marg", "category_id": pizza})
+    assert response.status_code == 200
+    assert response.json["version"] == 3
+    assert [(p["sku"], p["price_cents"]) for p in response.json["data"]] == [("P-1", 850)]
+    assert response.json["data"][0]["category_id"] == str(pizza)
+
+    with SessionLocal() as session:
+        session.add(Product(sku="P-3", name="Pizza Funghi", price_cents=900))
+        session.commit()
+    response = client.get(SEARCH_URL, query_string={"q": "pizza", "limit": 2})
+    assert [p["name"] for p in response.json["data"]] == ["Pizza Funghi", "Pizza Margherita"]
+
+    assert client.get(SEARCH_URL).status_code == 400
+    assert client.get(SEARCH_URL, query_string={"q": "x" * 101}).status_code == 400
+    assert client.get(SEARCH_URL, query_string={"category_id": "pizza"}).status_code == 400
+    assert client.get(SEARCH_URL, query_string={"q": "p", "limit": 0}).status_code == 400
+
+
+def test_category_endpoint_is_conditional(application):
+    """Test the category tree carries the catalog version as ETag."""
+    food, pizza, _ = _seed()
+    client = application.test_client()
+    response = client.get("/api/v1/products/categories")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"catalog-3"'
+    assert response.json == {
+        "data": [
+            {
+                "id": str(food),
+                "name": "Speisen",
+                "product_count": 2,
+                "children": [
+                    {"id": str(pizza), "name": "Pizza", "product_count": 2, "children": []}
+                ],
+            }
+        ]
+    }
+    headers = {"If-None-Match": '"catalog-3"'}
+    assert client.get("/api/v1/products/categories", headers=headers).status_code == 304
+
+
+def test_benchmark_generates_searchable_catalog():
+    """Test the benchmark's catalog and measurements on a small scale."""
+    products, categories = generate_catalog(500, categories=10)
+    snapshot = CatalogSnapshot(1, products, categories)
+    assert len(snapshot.products) == 500
+    assert sum(snapshot.categories[root].product_count for root in snapshot.roots) == 500
+    latency = measure_search(snapshot, "prefix", ["piz", "marg", "sal"], limit=5)
+    assert latency.queries == 3
+    assert latency.p50_us <= latency.p99_us <= latency.max_us
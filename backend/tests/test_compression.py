@@ -0,0 +1,133 @@
+"""Tests for response compression and pre-serialized envelopes."""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, stream_with_context
+
+from bestellsystem.app import create_app
+from bestellsystem.utils.compression import available_encodings, register_compression
+from bestellsystem.utils.errors import error_envelope
+from bestellsystem.utils.response_cache import cached
+
+LARGE = {"items": [{"sku": f"SKU-{i}", "name": "Pizza Margherita"} for i in range(200)]}
+
+
+@pytest.fixture
+def app():
+    """Create application with large, small, streamed and cached views."""
+    app = create_app()
+    app.config.update({"TESTING": True})
+
+    @app.route("/large")
+    def large():
+        return LARGE
+
+    @app.route("/small")
+    def small():
+        return {"ok": True}
+
+    @app.route("/stream")
+    def stream():
+        def generate():
+            for i in range(100):
+                yield json.dumps({"line": i}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    @app.route("/image")
+    def image():
+        return Response(b"\x89PNG" * 1000, mimetype="image/png")
+
+    @app.route("/cached")
+    @cached()
+    def cached_view():
+        return LARGE
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return app.test_client()
+
+
+def test_large_json_is_gzipped(client):
+    """Test JSON above the threshold is compressed when accepted."""
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.data)) == LARGE
+    assert int(response.headers["Content-Length"]) == len(response.data)
+
+
+def test_not_compressed_without_accept_encoding(client):
+    """Test clients not accepting gzip get the plain body."""
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json == LARGE
+
+
+def test_small_and_binary_responses_are_not_compressed(client):
+    """Test small bodies and already compressed formats are sent as is."""
+    headers = {"Accept-Encoding": "gzip"}
+    assert "Content-Encoding" not in client.get("/small", headers=headers).headers
+    assert "Content-Encoding" not in client.get("/image", headers=headers).headers
+
+
+def test_streamed_response_is_compressed(client):
+    """Test streamed bodies are compressed chunk by chunk."""
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "gzip"
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert len(lines) == 100
+
+
+def test_compressed_etag_revalidates(client):
+    """Test the ETag of the compressed variant still yields 304."""
+    response = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    response = client.get("/cached", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_compression_can_be_disabled():
+    """Test register_compression honours COMPRESSION_ENABLED."""
+    app = Flask(__name__)
+    app.config["COMPRESSION_ENABLED"] = False
+    register_compression(app)
+    app.route("/large")(lambda: LARGE)
+
+    response = app.test_client().get("/large", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_gzip_always_available():
+    """Test gzip is offered with or without brotli installed."""
+    assert "gzip" in available_encodings()
+
+
+def test_error_envelopes_are_reused(client):
+    """Test common error bodies are serialized once."""
+    error_envelope.cache_clear()
+    first = client.get("/missing")
+    second = client.get("/also-missing")
+
+    assert first.status_code == second.status_code == 404
+    assert first.json["error"]["status_code"] == 404
+    assert first.data == second.data
+    assert error_envelope.cache_info().hits >= 1
+
+
+def test_health_body(client):
+    """Test the pre-serialized health response."""
+    response = client.get("/api/v1/health")
+    assert response.json == {"status": "ok"}
+    assert response.mimetype == "application/json"
@@ -11,6 +11,7 @@ def test_config_defaults():
     assert Config.PORT == 8000
     assert Config.LOG_LEVEL == "INFO"
     assert Config.LOG_FORMAT == "json"
+    assert Config.LOG_SAMPLING == ""
 
 
 def test_config_get():
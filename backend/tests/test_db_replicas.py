@@ -0,0 +1,139 @@
+"""Tests for read replica routing, using SQLite files as stand-ins."""
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from bestellsystem.app import create_app
+from bestellsystem.db import (
+    PRIMARY_STICKY_COOKIE,
+    Base,
+    ReplicaRouter,
+    SessionLocal,
+    create_db_engine,
+    get_request_session,
+)
+from bestellsystem.models import User
+
+
+def _make_database(path, marker):
+    """Create a database containing a single user identifying it."""
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with SessionLocal(bind=engine, router=ReplicaRouter([])) as session:
+        session.add(User(email=marker, password_hash="x", role="staff"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """Create a primary and two replicas."""
+    primary = _make_database(tmp_path / "primary.db", "primary")
+    replicas = [
+        _make_database(tmp_path / "replica1.db", "replica1"),
+        _make_database(tmp_path / "replica2.db", "replica2"),
+    ]
+    yield primary, replicas
+    for engine in [primary, *replicas]:
+        engine.dispose()
+
+
+@pytest.fixture
+def router(databases):
+    """Create a router over the replicas."""
+    return ReplicaRouter(databases[1])
+
+
+def _source(session):
+    """Return the marker of the database a read was served from."""
+    return session.scalars(select(User.email).order_by(User.id)).first()
+
+
+def test_reads_round_robin_over_replicas(databases, router):
+    """Test each session reads from the next replica."""
+    primary, _ = databases
+    sources = []
+    for _ in range(4):
+        with SessionLocal(bind=primary, router=router) as session:
+            sources.append(_source(session))
+    assert sources == ["replica1", "replica2", "replica1", "replica2"]
+
+
+def test_writes_go_to_primary_and_stick(databases, router):
+    """Test flushes use the primary and later reads of the session follow."""
+    primary, _ = databases
+    with SessionLocal(bind=primary, router=router) as session:
+        session.add(User(email="new@example.com", password_hash="x", role="staff"))
+        session.flush()
+        assert _source(session) == "primary"
+        session.commit()
+
+    with SessionLocal(bind=primary, router=ReplicaRouter([])) as session:
+        emails = session.scalars(select(User.email)).all()
+    assert "new@example.com" in emails
+
+
+def test_select_for_update_goes_to_primary(databases, router):
+    """Test locking reads are sent to the primary."""
+    primary, _ = databases
+    with SessionLocal(bind=primary, router=router) as session:
+        email = session.scalars(select(User.email).with_for_update()).first()
+    assert email == "primary"
+
+
+def test_unhealthy_replicas_are_skipped(databases, router):
+    """Test unhealthy replicas are skipped, falling back to the primary."""
+    primary, replicas = databases
+    router.mark_unhealthy(replicas[0])
+    with SessionLocal(bind=primary, router=router) as session:
+        assert _source(session) == "replica2"
+
+    router.mark_unhealthy(replicas[1])
+    with SessionLocal(bind=primary, router=router) as session:
+        assert _source(session) == "primary"
+
+
+def test_unreachable_replica_marked_unhealthy(databases, tmp_path):
+    """Test a replica failing to connect is taken out of rotation."""
+    primary, replicas = databases
+    broken = create_db_engine(f"sqlite:///{tmp_path}/missing/replica.db")
+    router = ReplicaRouter([broken, replicas[0]])
+
+    with SessionLocal(bind=primary, router=router) as session:
+        with pytest.raises(OperationalError):
+            _source(session)
+    with SessionLocal(bind=primary, router=router) as session:
+        assert _source(session) == "replica1"
+
+
+def test_read_your_writes_across_requests(databases, router):
+    """Test a client reads from the primary for a while after writing."""
+    primary, _ = databases
+    original = dict(SessionLocal.kw)
+    SessionLocal.configure(bind=primary, router=router)
+    try:
+        app = create_app()
+        app.config.update({"TESTING": True})
+
+        @app.route("/source")
+        def source():
+            return {"source": _source(get_request_session())}
+
+        @app.route("/users", methods=["POST"])
+        def create_user():
+            get_request_session().add(User(email="rw@example.com", password_hash="x", role="a"))
+            return {}, 201
+
+        client = app.test_client()
+        assert client.get("/source").json["source"].startswith("replica")
+
+        response = client.post("/users")
+        assert PRIMARY_STICKY_COOKIE in response.headers["Set-Cookie"]
+        assert client.get("/source").json["source"] == "primary"
+
+        client.delete_cookie(PRIMARY_STICKY_COOKIE)
+        assert client.get("/source").json["source"].startswith("replica")
+    finally:
+        SessionLocal.kw.clear()
+        SessionLocal.kw.update(original)
@@ -0,0 +1,78 @@
+"""Tests for request-scoped database sessions."""
+
+import pytest
+from sqlalchemy import event, func, select
+
+from bestellsystem.db import DB_SESSIONS_LEAKED, SessionLocal, get_request_session, get_session
+from bestellsystem.models import User
+from bestellsystem.utils.errors import ValidationError
+
+
+@pytest.fixture
+def app(test_engine, make_app):
+    """Create application with views using the request session."""
+    app = make_app()
+
+    @app.route("/users/<email>", methods=["POST"])
+    def create_user(email):
+        get_request_session().add(User(email=email, password_hash="x", role="staff"))
+        if email.startswith("invalid"):
+            raise ValidationError("invalid email")
+        return {"email": email}, 201
+
+    @app.route("/leak")
+    def leak():
+        get_session().execute(select(1))
+        return {"leaked": True}
+
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return app.test_client()
+
+
+def _user_count(engine):
+    """Count users in the database."""
+    with SessionLocal(bind=engine) as session:
+        return session.scalar(select(func.count()).select_from(User))
+
+
+def test_request_session_commits_on_success(client, test_engine):
+    """Test changes are committed when the view succeeds."""
+    assert client.post("/users/a@example.com").status_code == 201
+    assert _user_count(test_engine) == 1
+
+
+def test_request_session_rolls_back_on_error(client, test_engine):
+    """Test changes are rolled back when the view returns an error."""
+    assert client.post("/users/invalid@example.com").status_code == 400
+    assert _user_count(test_engine) == 0
+
+
+def test_request_session_is_lazy(client, test_engine):
+    """Test requests not touching the database never check out a connection."""
+    checkouts = []
+    event.listen(test_engine, "checkout", lambda *args: checkouts.append(args))
+    client.get("/api/v1/health")
+    assert checkouts == []
+
+    client.post("/users/c@example.com")
+    assert len(checkouts) == 1
+
+
+def test_request_session_returns_connection(client, test_engine):
+    """Test the request session gives its connection back to the pool."""
+    client.post("/users/b@example.com")
+    assert test_engine.pool.checkedout() == 0
+
+
+def test_leaked_session_is_counted_and_closed(client, test_engine):
+    """Test sessions left open by a view are counted and closed."""
+    key = (DB_SESSIONS_LEAKED.name, (), "")
+    before = DB_SESSIONS_LEAKED.store.collect().get(key, 0.0)
+    assert client.get("/leak").status_code == 200
+    assert DB_SESSIONS_LEAKED.store.collect()[key] == before + 1
+    assert test_engine.pool.checkedout() == 0
@@ -2,9 +2,12 @@
 
 from bestellsystem.utils.errors import (
     APIError,
+    ConflictError,
     ForbiddenError,
     InternalServerError,
     NotFoundError,
+    ServiceUnavailableError,
+    TooManyRequestsError,
     UnauthorizedError,
     ValidationError,
 )
@@ -62,3 +65,26 @@ def test_internal_server_error():
     error = InternalServerError("Server error")
     assert error.message == "Server error"
     assert error.status_code == 500
+
+
+def test_conflict_error():
+    """Test ConflictError."""
+    error = ConflictError("In progress", retry_after=1)
+    assert error.message == "In progress"
+    assert error.status_code == 409
+    assert error.retry_after == 1
+
+
+def test_service_unavailable_error():
+    """Test ServiceUnavailableError."""
+    error = ServiceUnavailableError("Overloaded")
+    assert error.message == "Overloaded"
+    assert error.status_code == 503
+
+
+def test_too_many_requests_error():
+    """Test TooManyRequestsError takes its arguments in the order of its siblings."""
+    error = TooManyRequestsError("Slow down", {"limit": 10}, 2)
+    assert error.status_code == 429
+    assert error.payload == {"limit": 10}
+    assert error.retry_after == 2
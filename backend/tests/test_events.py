@@ -0,0 +1,180 @@
+"""Tests for the event broker and the order event stream."""
+
+import json
+import time
+
+import pytest
+
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import Order, User
+from bestellsystem.utils.events import (
+    EVENT_SUBSCRIBERS_EVICTED,
+    EventBroker,
+    LocalBackend,
+    SQLiteBackend,
+    publish_after_commit,
+    subscribe,
+)
+
+
+@pytest.fixture
+def client(test_engine, make_app, staff_token):
+    """Create test client of a staff member with a short heartbeat."""
+    client = make_app(EVENTS_HEARTBEAT_SECONDS=0.05).test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {staff_token}"
+    return client
+
+
+@pytest.fixture
+def order_id(test_engine):
+    """Create an order and return its ID."""
+    with SessionLocal() as session:
+        order = Order(source="pos", currency="EUR", total_cents=100)
+        session.add(order)
+        session.commit()
+        return order.id
+
+
+def _wait_for(subscription, timeout=2.0):
+    """Return the next event of a subscription, failing after a timeout."""
+    item = subscription.get(timeout=timeout)
+    assert item is not None
+    return item
+
+
+def test_broker_fans_out_to_channel_subscribers():
+    """Test events reach every subscriber of their channel only."""
+    broker = EventBroker(LocalBackend())
+    first = broker.subscribe("order_status")
+    second = broker.subscribe("order_status")
+    other = broker.subscribe("other")
+
+    broker.publish("order_status", {"id": 1, "status": "ready"})
+    assert _wait_for(first).data == {"id": 1, "status": "ready"}
+    assert _wait_for(second).channel == "order_status"
+    assert other.get(timeout=0.01) is None
+
+    first.close()
+    broker.publish("order_status", {"id": 2, "status": "ready"})
+    assert first.get(timeout=0.01) is None
+    assert _wait_for(second).data["id"] == 2
+
+
+def test_broker_evicts_slow_subscriber():
+    """Test a subscriber with a full queue is evicted without affecting others."""
+    broker = EventBroker(LocalBackend(), queue_size=2)
+    slow = broker.subscribe("order_status")
+    key = (EVENT_SUBSCRIBERS_EVICTED.name, (), "")
+    before = EVENT_SUBSCRIBERS_EVICTED.store.collect().get(key, 0.0)
+
+    for i in range(3):
+        broker.publish("order_status", {"id": i})
+    fast = broker.subscribe("order_status")
+    broker.publish("order_status", {"id": 3})
+
+    assert slow.evicted
+    assert slow.get(timeout=0.01) is None
+    assert _wait_for(fast).data == {"id": 3}
+    assert EVENT_SUBSCRIBERS_EVICTED.store.collect()[key] == before + 1
+
+
+def test_sqlite_backend_delivers_across_brokers(tmp_path):
+    """Test events published by one worker reach the subscribers of another."""
+    path = str(tmp_path / "events.db")
+    publisher = EventBroker(SQLiteBackend(path, poll_interval=0.01))
+    listener = EventBroker(SQLiteBackend(path, poll_interval=0.01))
+    subscription = listener.subscribe("order_status")
+    try:
+        # Wait until the listener has read the current position
+        time.sleep(0.05)
+        publisher.publish("order_status", {"id": 7, "status": "ready"})
+        assert _wait_for(subscription).data == {"id": 7, "status": "ready"}
+    finally:
+        listener.stop()
+
+
+def test_publish_after_commit_only_on_commit(client, order_id):
+    """Test pending events are published on commit and dropped on rollback."""
+    subscription = subscribe("order_status")
+    with SessionLocal() as session:
+        publish_after_commit(session, "order_status", {"id": order_id, "status": "rolled-back"})
+        session.get(Order, order_id)
+        session.rollback()
+        publish_after_commit(session, "order_status", {"id": order_id, "status": "ready"})
+        session.get(Order, order_id).status = "ready"
+        session.commit()
+    assert _wait_for(subscription).data["status"] == "ready"
+    assert subscription.get(timeout=0.01) is None
+    subscription.close()
+
+
+def test_update_order_status(client, order_id):
+    """Test the status update endpoint validates and stores the status."""
+    response = client.put(f"/api/v1/orders/{order_id}/status", json={"status": "ready"})
+    assert response.status_code == 200
+    assert client.get(f"/api/v1/orders/{order_id}/status").json["status"] == "ready"
+
+    response = client.put(f"/api/v1/orders/{order_id}/status", json={"status": "eaten"})
+    assert response.status_code == 400
+    response = client.put(f"/api/v1/orders/{order_id}/status", json=["ready"])
+    assert response.status_code == 400
+    assert response.json["error"]["message"] == "Request body must be a JSON object"
+    response = client.put("/api/v1/orders/999/status", json={"status": "ready"})
+    assert response.status_code == 404
+
+
+def test_order_status_requires_token(client, order_id):
+    """Test reading the status needs a token and changing it a staff role."""
+    url = f"/api/v1/orders/{order_id}/status"
+    token = token_service.issue(User(id=2, role="customer"))
+    assert client.get(url, headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    response = client.put(
+        url, json={"status": "ready"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 403
+    del client.environ_base["HTTP_AUTHORIZATION"]
+    assert client.get(url).status_code == 401
+    assert client.put(url, json={"status": "ready"}).status_code == 401
+
+
+def test_order_events_stream(client, order_id):
+    """Test status changes of the requested orders are streamed with heartbeats."""
+    response = client.get(
+        "/api/v1/orders/events",
+        query_string={"order_id": order_id},
+        headers={"Accept-Encoding": "gzip"},
+        buffered=False,
+    )
+    assert response.mimetype == "text/event-stream"
+    assert "Content-Encoding" not in response.headers
+    stream = iter(response.response)
+    assert next(stream).startswith(b"retry: ")
+    assert next(stream) == b": heartbeat\n\n"
+
+    with SessionLocal() as session:
+        other = Order(source="pos", currency="EUR", total_cents=100)
+        session.add(other)
+        session.commit()
+        other_id = other.id
+    client.put(f"/api/v1/orders/{other_id}/status", json={"status": "ready"})
+    client.put(f"/api/v1/orders/{order_id}/status", json={"status": "preparing"})
+    chunk = next(chunk for chunk in stream if chunk != b": heartbeat\n\n").decode()
+    assert chunk.startswith("event: order_status\n")
+    data = json.loads(chunk.split("data: ", 1)[1])
+    assert data == {"id": str(order_id), "status": "preparing"}
+    response.close()
+
+
+def test_order_events_rejects_invalid_order_id(client):
+    """Test non-numeric order IDs are rejected."""
+    response = client.get("/api/v1/orders/events", query_string={"order_id": "x"})
+    assert response.status_code == 400
+
+
+def test_order_events_requires_token(client):
+    """Test the event stream is not opened without an access token."""
+    del client.environ_base["HTTP_AUTHORIZATION"]
+    response = client.get("/api/v1/orders/events")
+    assert response.status_code == 401
+    assert response.mimetype == "application/json"
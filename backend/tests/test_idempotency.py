@@ -0,0 +1,221 @@
+"""Tests for Idempotency-Key handling."""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import IdempotencyKey, Order, User
+from bestellsystem.orders import routes
+from bestellsystem.utils import idempotency
+from bestellsystem.utils.idempotency import scoped_key
+
+BULK_URL = "/api/v1/orders/bulk"
+
+
+def _body(*external_ids):
+    """Serialize an upload with one order per external ID."""
+    orders = [
+        {
+            "external_id": external_id,
+            "source": "pos",
+            "items": [{"sku": "PIZZA-1", "quantity": 1, "unit_price_cents": 850}],
+        }
+        for external_id in external_ids
+    ]
+    return json.dumps(orders)
+
+
+def _post(client, body, key="key-1"):
+    """Upload orders as a staff member, with an Idempotency-Key unless key is None."""
+    headers = {"Authorization": f"Bearer {token_service.issue(User(id=1, role='staff'))}"}
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return client.post(BULK_URL, data=body, content_type="application/json", headers=headers)
+
+
+@pytest.fixture
+def settings():
+    """Return Config overrides, replaced by tests via parametrize."""
+    return {}
+
+
+@pytest.fixture
+def application(test_engine, settings, make_app):
+    """Create an app with idempotency settings."""
+    return make_app(**settings)
+
+
+@pytest.fixture
+def slow_ingest(monkeypatch):
+    """Make bulk uploads take a while before they write, counting executions."""
+    calls = []
+    original = routes.ingest_orders
+
+    def ingest(*args, **kwargs):
+        calls.append(time.monotonic())
+        time.sleep(0.3)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(routes, "ingest_orders", ingest)
+    return calls
+
+
+def _orders(engine):
+    """Count the stored orders."""
+    with SessionLocal(bind=engine) as session:
+        return session.scalar(select(func.count()).select_from(Order))
+
+
+def test_scoped_key_depends_on_method_and_path():
+    """Test the same header value on different endpoints gives different keys."""
+    assert scoped_key("POST", "/a", "k") == scoped_key("POST", "/a", "k")
+    assert scoped_key("POST", "/a", "k") != scoped_key("POST", "/b", "k")
+    assert len(scoped_key("POST", "/a", "k")) == 64
+
+
+def test_retry_replays_stored_response(application, test_engine):
+    """Test a retried upload returns the first response without creating orders."""
+    client = application.test_client()
+    first = _post(client, _body("a", "b"))
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = _post(client, _body("a", "b"))
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+    assert _orders(test_engine) == 2
+
+    # Another worker, without the response in its cache, replays it from the table
+    idempotency.idempotency_store._cache.clear()
+    assert _post(client, _body("a", "b")).headers["Idempotent-Replayed"] == "true"
+    assert _orders(test_engine) == 2
+
+
+def test_requests_without_key_are_not_deduplicated(application, test_engine):
+    """Test uploads without the header and with other keys run every time."""
+    client = application.test_client()
+    _post(client, _body("a"), key=None)
+    _post(client, _body("a"), key=None)
+    _post(client, _body("a"), key="key-2")
+    assert _orders(test_engine) == 3
+
+
+def test_key_reused_with_other_body_is_rejected(application, test_engine):
+    """Test a key used again with a different body fails with a ValidationError."""
+    client = application.test_client()
+    assert _post(client, _body("a")).status_code == 201
+
+    response = _post(client, _body("b"))
+    assert response.status_code == 400
+    assert "different request body" in response.json["error"]["message"]
+    assert _orders(test_engine) == 1
+
+
+def test_invalid_key_is_rejected(application):
+    """Test empty and overlong keys are rejected."""
+    client = application.test_client()
+    assert _post(client, _body("a"), key="").status_code == 400
+    assert _post(client, _body("a"), key="k" * 256).status_code == 400
+
+
+def test_failed_request_releases_key(application, test_engine):
+    """Test a failed attempt stores nothing, so the retry runs again."""
+    client = application.test_client()
+    assert _post(client, "[{}]").status_code == 400
+    with SessionLocal(bind=test_engine) as session:
+        assert session.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
+    assert _post(client, "[{}]").status_code == 400
+
+
+def test_concurrent_duplicate_waits_for_first_response(application, test_engine, slow_ingest):
+    """Test a duplicate arriving during the first attempt gets its response."""
+    responses = {}
+
+    def upload(name):
+        responses[name] = _post(application.test_client(), _body("a", "b"))
+
+    first = threading.Thread(target=upload, args=("first",))
+    first.start()
+    while not slow_ingest:
+        time.sleep(0.01)
+    upload("second")
+    first.join()
+
+    assert len(slow_ingest) == 1
+    assert responses["first"].status_code == responses["second"].status_code == 201
+    assert responses["second"].headers["Idempotent-Replayed"] == "true"
+    assert _orders(test_engine) == 2
+
+
+@pytest.mark.parametrize("settings", [{"IDEMPOTENCY_WAIT_TIMEOUT": 0.05}])
+def test_duplicate_gets_conflict_after_wait_timeout(application, slow_ingest):
+    """Test a duplicate gives up with 409 while the first attempt is running."""
+    thread = threading.Thread(target=_post, args=(application.test_client(), _body("a")))
+    thread.start()
+    while not slow_ingest:
+        time.sleep(0.01)
+    response = _post(application.test_client(), _body("a"))
+    thread.join()
+
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    assert len(slow_ingest) == 1
+
+
+def test_abandoned_claim_is_taken_over(application, test_engine):
+    """Test a claim past its lock timeout no longer blocks the key."""
+    client = application.test_client()
+    body = _body("a")
+    now = datetime.now(timezone.utc)
+    with SessionLocal(bind=test_engine) as session:
+        session.add(
+            IdempotencyKey(
+                key=scoped_key("POST", BULK_URL, "key-1"),
+                request_hash="0" * 64,
+                locked_until=now - timedelta(seconds=1),
+                expires_at=now + timedelta(hours=1),
+            )
+        )
+        session.commit()
+
+    response = _post(client, body)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert _post(client, body).headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.parametrize("settings", [{"IDEMPOTENCY_ENABLED": False}])
+def test_disabled(application, test_engine):
+    """Test keys are ignored when the feature is disabled."""
+    client = application.test_client()
+    _post(client, _body("a"))
+    _post(client, _body("a"))
+    assert _orders(test_engine) == 2
+
+
+def _exit_with_in_flight_count():
+    """Exit with the number of claims the current store waits for."""
+    os._exit(len(idempotency.idempotency_store._in_flight))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_store_in_use_is_reset_in_forked_child(application):
+    """Test a forked worker forgets the claims of the store registered last."""
+    store = idempotency.idempotency_store
+    store._in_flight["key"] = threading.Event()
+    try:
+        child = multiprocessing.get_context("fork").Process(target=_exit_with_in_flight_count)
+        child.start()
+        child.join()
+        assert child.exitcode == 0
+    finally:
+        store._in_flight.clear()
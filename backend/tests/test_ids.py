@@ -0,0 +1,203 @@
+"""Tests for the order ID generator."""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from benchmarks.ids import measure_processes, measure_threads
+from bestellsystem.config import Config
+from bestellsystem.db import Base, SessionLocal, create_db_engine
+from bestellsystem.models import Order
+from bestellsystem.orders.ingest import persist_orders
+from bestellsystem.orders.validation import ItemInput, OrderInput
+from bestellsystem.utils import ids
+from bestellsystem.utils.ids import (
+    EPOCH_MS,
+    MAX_SEQUENCE,
+    IdGenerator,
+    NodeLease,
+    parse_id,
+)
+
+
+class FakeClock:
+    """Clock in milliseconds that moves only when told to; sleeping advances it."""
+
+    def __init__(self, now: int) -> None:
+        """Initialize clock at ``now``."""
+        self.now = now
+        self.slept: list[float] = []
+
+    def __call__(self) -> int:
+        """Return the current time."""
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the clock instead of waiting."""
+        self.slept.append(seconds)
+        self.now += max(1, round(seconds * 1000))
+
+
+@pytest.fixture
+def clock():
+    """Return a fake clock one day after the ID epoch."""
+    return FakeClock(EPOCH_MS + 86_400_000)
+
+
+@pytest.fixture
+def node_dir(tmp_path, monkeypatch):
+    """Use a temporary node directory for the process generator."""
+    monkeypatch.setattr(Config, "ID_NODE_DIR", str(tmp_path / "nodes"))
+    ids._reset_after_fork()
+    yield tmp_path / "nodes"
+    ids._reset_after_fork()
+
+
+def test_id_layout(clock):
+    """Test timestamp, node and sequence are encoded and parsed back."""
+    generator = IdGenerator(5, clock=clock)
+    first, second = generator.next_ids(2)
+    assert second == first + 1
+    assert first == (86_400_000 << 22) | (5 << 12)
+
+    parts = parse_id(second)
+    assert parts.timestamp == datetime(2026, 1, 2, tzinfo=timezone.utc)
+    assert (parts.node, parts.sequence) == (5, 1)
+    assert 0 < first < 2**63
+
+
+def test_ids_sort_by_time(clock):
+    """Test IDs of a later millisecond are greater whatever the node."""
+    earlier = IdGenerator(1023, clock=clock).next_id()
+    clock.now += 1
+    assert IdGenerator(0, clock=clock).next_id() > earlier
+
+
+def test_exhausted_millisecond_borrows_the_next(clock):
+    """Test more than 4096 IDs per millisecond move on to the next millisecond."""
+    generator = IdGenerator(1, clock=clock)
+    batch = generator.next_ids(MAX_SEQUENCE + 3)
+    assert batch == sorted(set(batch))
+    assert parse_id(batch[-1]).timestamp > parse_id(batch[0]).timestamp
+    assert parse_id(batch[-1]).sequence == 1
+
+
+def test_clock_stepping_back_does_not_repeat_ids(clock):
+    """Test IDs keep increasing when the wall clock goes backwards."""
+    generator = IdGenerator(1, clock=clock)
+    before = generator.next_ids(10)
+    clock.now -= 5000
+    after = generator.next_ids(10)
+    assert after[0] > before[-1]
+    assert after == sorted(after)
+    assert clock.slept == []
+
+
+def test_generator_waits_when_too_far_ahead(clock):
+    """Test the generator waits for the clock instead of exceeding the drift."""
+    generator = IdGenerator(1, max_drift_ms=2, clock=clock, sleep=clock.sleep)
+    start = clock.now
+    issued = generator.next_ids((MAX_SEQUENCE + 1) * 5)
+    assert len(set(issued)) == len(issued)
+    assert clock.slept
+    assert parse_id(issued[-1]).timestamp.timestamp() * 1000 - clock.now <= 2
+    assert clock.now > start
+
+
+def test_invalid_node_is_rejected():
+    """Test nodes outside the 10 bits are rejected."""
+    with pytest.raises(ValueError):
+        IdGenerator(1024)
+    with pytest.raises(ValueError):
+        NodeLease.claim("/tmp", 1000, 100)
+
+
+def test_node_lease_is_exclusive(tmp_path):
+    """Test a locked node is skipped and freed by closing it."""
+    directory = str(tmp_path)
+    first = NodeLease.claim(directory, 10, 2)
+    second = NodeLease.claim(directory, 10, 2)
+    assert (first.node, second.node) == (10, 11)
+    with pytest.raises(RuntimeError, match="All 2 ID nodes"):
+        NodeLease.claim(directory, 10, 2)
+
+    first.close()
+    assert NodeLease.claim(directory, 10, 2, preferred=11).node == 10
+
+
+def test_restart_continues_after_previous_lease(tmp_path, clock):
+    """Test a process taking over a node continues after its predecessor's IDs."""
+    lease = NodeLease.claim(str(tmp_path), 0, 1)
+    previous = IdGenerator(0, lease=lease, clock=clock)
+    last = previous.next_ids(100)[-1]
+    previous.close()
+
+    clock.now -= 10_000
+    successor = IdGenerator(
+        0, lease=NodeLease.claim(str(tmp_path), 0, 1), clock=clock, sleep=clock.sleep
+    )
+    assert successor.next_id() > last
+    # Waited until the clock was at most ID_MAX_CLOCK_DRIFT_MS behind the lease
+    assert clock.slept
+
+
+def test_threads_share_generator_without_duplicates():
+    """Test concurrent threads never get the same ID."""
+    result = measure_threads(threads=4, per_thread=5000)
+    assert result.ids == 20000
+    assert (result.duplicates, result.unordered) == (0, 0)
+
+
+def test_processes_generate_unique_ids():
+    """Test forked processes claim distinct nodes and never collide."""
+    result = measure_processes(processes=4, per_process=20000, batch=100)
+    assert result.ids == 80000
+    assert (result.duplicates, result.unordered) == (0, 0)
+
+
+def test_forked_process_claims_its_own_node(node_dir):
+    """Test the process generator of a forked child does not reuse the parent's node."""
+    parent_node = parse_id(ids.next_id()).node
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_end, str(parse_id(ids.next_id()).node).encode())
+        os._exit(0)
+    os.close(write_end)
+    child_node = int(os.read(read_end, 16))
+    os.waitpid(pid, 0)
+    assert child_node != parent_node
+
+
+def test_worker_index_selects_node(node_dir, monkeypatch):
+    """Test a Gunicorn worker index maps to ID_NODE_BASE + index."""
+    monkeypatch.setattr(Config, "ID_NODE_BASE", 100)
+    monkeypatch.setattr(Config, "ID_NODE_COUNT", 8)
+    ids.set_worker_index(3)
+    assert parse_id(ids.next_id()).node == 103
+
+
+def test_orders_get_generated_ids(tmp_path, node_dir):
+    """Test ORM inserts and bulk ingestion assign generated, time-ordered IDs."""
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
+    Base.metadata.create_all(engine)
+    with SessionLocal(bind=engine) as session:
+        order = Order(source="pos", currency="EUR", total_cents=100)
+        session.add(order)
+        session.commit()
+        first_id = order.id
+
+    item = ItemInput(sku="A", quantity=1, unit_price_cents=100)
+    batch = [OrderInput(f"b-{i}", "pos", "EUR", (item,)) for i in range(3)]
+    with engine.begin() as connection:
+        persist_orders(connection, batch, use_copy=False)
+
+    with SessionLocal(bind=engine) as session:
+        orders = session.scalars(select(Order).order_by(Order.id)).all()
+        assert orders[0].id == first_id
+        assert [o.external_id for o in orders[1:]] == ["b-0", "b-1", "b-2"]
+        assert all(len(o.items) == 1 for o in orders[1:])
+        assert orders[-1].id > 2**32
+    engine.dispose()
@@ -1,9 +1,39 @@
 """Tests for logging utilities."""
 
+import io
 import json
 import logging
+import os
+import queue
+import sys
 
-from bestellsystem.utils.logging import JsonFormatter, get_logger, setup_logging
+import pytest
+from flask import Flask
+
+from bestellsystem.utils import logging as logging_module
+from bestellsystem.utils.logging import (
+    BatchingQueueListener,
+    BoundedQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    get_logger,
+    parse_sampling_rules,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def _make_record(msg="Test message", level=logging.INFO, name="test", args=(), exc_info=None):
+    """Create a plain log record."""
+    return logging.LogRecord(
+        name=name,
+        level=level,
+        pathname="test.py",
+        lineno=1,
+        msg=msg,
+        args=args,
+        exc_info=exc_info,
+    )
 
 
 def test_json_formatter_format():
@@ -27,6 +57,37 @@ def test_json_formatter_format():
     assert data["message"] == "Test message"
 
 
+def test_json_formatter_timestamp_from_record_created():
+    """Test the timestamp is derived from the record, not the current time."""
+    formatter = JsonFormatter()
+    record = _make_record()
+    record.created = 1762434000.25
+    data = json.loads(formatter.format(record))
+
+    assert data["timestamp"] == "2025-11-06T13:00:00.250000+00:00"
+
+
+def test_json_formatter_serializes_unknown_values():
+    """Test extra fields that are not JSON serializable do not crash formatting."""
+    formatter = JsonFormatter()
+    record = _make_record()
+    record.tags = {"a"}
+    record.obj = object()
+    record.big = 2**70
+    data = json.loads(formatter.format(record))
+
+    assert data["tags"] == ["a"]
+    assert data["obj"].startswith("<object object")
+    assert data["big"] == 2**70
+
+
+def test_json_formatter_custom_dumps():
+    """Test a custom encoder can be plugged in."""
+    formatter = JsonFormatter(dumps=lambda data: json.dumps(data, sort_keys=True))
+    data = json.loads(formatter.format(_make_record()))
+    assert data["message"] == "Test message"
+
+
 def test_get_logger():
     """Test get_logger returns logger instance."""
     logger = get_logger(__name__)
@@ -47,3 +108,171 @@ def test_setup_logging_text():
     setup_logging(level="DEBUG", log_format="text")
     root_logger = logging.getLogger()
     assert root_logger.level == logging.DEBUG
+
+
+def test_setup_logging_async_installs_queue_handler():
+    """Test setup_logging in async mode routes records through a queue."""
+    setup_logging(level="INFO", log_format="json", async_mode=True)
+    try:
+        root_logger = logging.getLogger()
+        assert len(root_logger.handlers) == 1
+        assert isinstance(root_logger.handlers[0], BoundedQueueHandler)
+    finally:
+        shutdown_logging()
+        setup_logging(level="INFO", log_format="json")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+def test_async_logging_works_in_forked_child(tmp_path):
+    """Test a forked child (preloaded Gunicorn worker) gets its own writer thread."""
+    setup_logging(level="INFO", log_format="json", async_mode=True)
+    path = tmp_path / "child.log"
+    try:
+        with open(path, "w") as stream:
+            logging_module._listener.handler.setStream(stream)
+            pid = os.fork()
+            if pid == 0:
+                get_logger("test").warning("From child")
+                shutdown_logging()
+                os._exit(0)
+            os.waitpid(pid, 0)
+    finally:
+        shutdown_logging()
+        setup_logging(level="INFO", log_format="json")
+    messages = [json.loads(line)["message"] for line in path.read_text().splitlines()]
+    assert "From child" in messages
+
+
+def test_bounded_queue_handler_drops_when_full():
+    """Test drop policy counts records that do not fit into the queue."""
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), policy="drop")
+    for _ in range(5):
+        handler.handle(_make_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_bounded_queue_handler_prepares_records():
+    """Test queued records are copies with the message and traceback rendered."""
+    handler = BoundedQueueHandler(queue.Queue())
+    items = ["a"]
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = _make_record(msg="items %s", args=(items,), exc_info=sys.exc_info())
+    handler.handle(record)
+    items.append("b")
+
+    queued = handler.queue.get_nowait()
+    assert queued is not record
+    assert queued.getMessage() == "items ['a']"
+    assert queued.args is None
+    assert queued.exc_info is None
+    assert "RuntimeError: boom" in queued.exc_text
+    assert record.args == (items,)
+    assert json.loads(JsonFormatter().format(queued))["exception"] == queued.exc_text
+
+
+def test_bounded_queue_handler_block_policy_times_out():
+    """Test block policy waits briefly, then drops."""
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), policy="block", block_timeout=0.01)
+    handler.handle(_make_record())
+    handler.handle(_make_record())
+    assert handler.dropped == 1
+
+
+def test_bounded_queue_handler_rejects_unknown_policy():
+    """Test invalid overflow policy raises ValueError."""
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(), policy="spill")
+
+
+def test_batching_listener_writes_and_drains_on_stop():
+    """Test listener writes every queued record before stopping."""
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=100)
+    handler = BoundedQueueHandler(log_queue)
+    listener = BatchingQueueListener(log_queue, target, batch_size=10, flush_interval=10)
+    listener.start()
+    for i in range(25):
+        handler.handle(_make_record(msg=f"record {i}"))
+    listener.stop()
+
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == [f"record {i}" for i in range(25)]
+
+
+def test_batching_listener_reports_dropped_records():
+    """Test listener emits a warning with the number of dropped records."""
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=1)
+    handler = BoundedQueueHandler(log_queue)
+    handler.handle(_make_record())
+    handler.handle(_make_record())
+    listener = BatchingQueueListener(log_queue, target, queue_handler=handler)
+    listener.start()
+    listener.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[-1]["level"] == "WARNING"
+    assert lines[-1]["dropped_total"] == 1
+
+
+def test_parse_sampling_rules():
+    """Test sampling rule specification parsing."""
+    rules = parse_sampling_rules("api_v1.health=1/s, bestellsystem.db = 1/100")
+    assert rules == {"api_v1.health": "1/s", "bestellsystem.db": "1/100"}
+
+
+@pytest.mark.parametrize("spec", ["x=abc", "x=1/0", "x=0/s", "=1/2", "x"])
+def test_sampling_filter_rejects_invalid_rules(spec):
+    """Test invalid sampling rules raise ValueError."""
+    with pytest.raises(ValueError):
+        SamplingFilter(spec)
+
+
+def test_sampling_filter_one_in_n():
+    """Test 1/N keeps every Nth record of a matching logger and its children."""
+    sampling_filter = SamplingFilter("bestellsystem=1/3")
+    kept = [sampling_filter.filter(_make_record(name="bestellsystem.app")) for _ in range(9)]
+    assert kept.count(True) == 3
+    assert sampling_filter.filter(_make_record(name="other"))
+
+
+def test_sampling_filter_rate_limit_reports_suppressed():
+    """Test K/s suppresses bursts and reports the suppressed count."""
+    sampling_filter = SamplingFilter("test=2/s")
+    results = [sampling_filter.filter(_make_record()) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+    rule = sampling_filter.rules["test"]
+    rule._tokens = rule.capacity
+    record = _make_record()
+    assert sampling_filter.filter(record)
+    assert record.suppressed == 3
+
+
+def test_sampling_filter_never_drops_errors():
+    """Test records at warning level and above bypass sampling."""
+    sampling_filter = SamplingFilter("test=0/1")
+    assert not sampling_filter.filter(_make_record())
+    assert sampling_filter.filter(_make_record(level=logging.WARNING))
+    assert sampling_filter.filter(_make_record(level=logging.ERROR))
+
+
+def test_sampling_filter_matches_request_endpoint():
+    """Test rules keyed by endpoint apply only inside that route."""
+    app = Flask(__name__)
+
+    @app.route("/health")
+    def health():
+        return "ok"
+
+    sampling_filter = SamplingFilter("health=0/1")
+    with app.test_request_context("/health"):
+        assert not sampling_filter.filter(_make_record())
+    assert sampling_filter.filter(_make_record())
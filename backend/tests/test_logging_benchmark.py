@@ -0,0 +1,113 @@
+"""Micro-benchmark for the JSON log formatter.
+
+Run with ``pytest tests/test_logging_benchmark.py -s`` to see the numbers.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from bestellsystem.utils.logging import JsonFormatter, _stdlib_dumps
+
+RECORDS = 20000
+
+
+class LegacyJsonFormatter(logging.Formatter):
+    """The formatter as it was before the fast path, kept for comparison."""
+
+    def format(self, record):
+        log_data = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if hasattr(record, "request_id"):
+            log_data["request_id"] = record.request_id
+        if hasattr(record, "user_id"):
+            log_data["user_id"] = record.user_id
+        if record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in [
+                "name",
+                "msg",
+                "args",
+                "created",
+                "filename",
+                "funcName",
+                "levelname",
+                "levelno",
+                "lineno",
+                "module",
+                "msecs",
+                "message",
+                "pathname",
+                "process",
+                "processName",
+                "relativeCreated",
+                "thread",
+                "threadName",
+                "exc_info",
+                "exc_text",
+                "stack_info",
+                "request_id",
+                "user_id",
+            ]:
+                log_data[key] = value
+        return json.dumps(log_data)
+
+
+def _make_record():
+    """Create a record resembling a request log line."""
+    record = logging.LogRecord(
+        name="bestellsystem.app",
+        level=logging.INFO,
+        pathname="app.py",
+        lineno=42,
+        msg="Request completed %s",
+        args=("/api/v1/health",),
+        exc_info=None,
+    )
+    record.request_id = "3f2c1a7e"
+    record.duration_ms = 1.25
+    record.status_code = 200
+    return record
+
+
+def _records_per_second(formatter):
+    """Format the same record repeatedly and return the throughput."""
+    record = _make_record()
+    start = time.perf_counter()
+    for _ in range(RECORDS):
+        formatter.format(record)
+    return RECORDS / (time.perf_counter() - start)
+
+
+def test_formatter_throughput():
+    """Compare records per second of the legacy and the fast formatter."""
+    legacy = _records_per_second(LegacyJsonFormatter())
+    fast_stdlib = _records_per_second(JsonFormatter(dumps=_stdlib_dumps))
+    fast = _records_per_second(JsonFormatter())
+
+    print(
+        f"\nJsonFormatter records/s: legacy={legacy:,.0f} "
+        f"fast(json)={fast_stdlib:,.0f} fast(default encoder)={fast:,.0f}"
+    )
+    # Generous bound so the benchmark does not flake on noisy machines
+    assert fast_stdlib > legacy * 0.8
+
+
+def test_formatters_emit_same_fields():
+    """Test the fast formatter keeps the legacy output fields."""
+    record = _make_record()
+    legacy = json.loads(LegacyJsonFormatter().format(record))
+    fast = json.loads(JsonFormatter().format(record))
+
+    # The legacy formatter leaks Python 3.12's taskName attribute
+    legacy.pop("taskName", None)
+    assert legacy.keys() == fast.keys()
+    legacy.pop("timestamp")
+    fast.pop("timestamp")
+    assert legacy == fast
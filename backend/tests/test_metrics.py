@@ -0,0 +1,166 @@
+"""Tests for in-process metrics."""
+
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+
+from bestellsystem.utils.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MmapValueStore,
+    ShardedValueStore,
+    clear_metrics_dir,
+    read_shard_file,
+    render_prometheus,
+)
+
+
+def test_histogram_snapshot_is_cumulative():
+    """Test bucket counts are cumulative and include +Inf."""
+    histogram = Histogram(
+        "test_seconds",
+        "Test",
+        ("route",),
+        buckets=(0.1, 1.0),
+        store=ShardedValueStore(),
+        registry=None,
+    )
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "a")
+
+    series = histogram.snapshot()[("a",)]
+    assert series["buckets"] == [(0.1, 2.0), (1.0, 3.0), (float("inf"), 4.0)]
+    assert series["count"] == 4
+    assert series["sum"] == 2.65
+
+
+def test_sharded_store_merges_threads():
+    """Test values recorded by several threads are summed on collect."""
+    store = ShardedValueStore()
+    key = ("requests", (), "")
+
+    def record():
+        for _ in range(1000):
+            store.inc(key)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.collect()[key] == 4000
+
+
+def test_sharded_store_clear():
+    """Test clear resets all values."""
+    store = ShardedValueStore()
+    store.inc(("requests", (), ""), 5)
+    store.clear()
+    assert store.collect() == {}
+
+
+def test_render_prometheus_text_format():
+    """Test counters, gauges and histograms render in exposition format."""
+    store = ShardedValueStore()
+    registry = []
+    requests = Counter("requests_total", "Requests", ("status",), store=store, registry=registry)
+    pool = Gauge("pool_size", "Pool size", store=store, registry=registry)
+    latency = Histogram(
+        "latency_seconds", "Latency", buckets=(0.5,), store=store, registry=registry
+    )
+    requests.inc("200")
+    requests.inc("200")
+    requests.inc('5"0\\0')
+    pool.set(5)
+    latency.observe(0.25)
+
+    text = render_prometheus(registry)
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 2' in text
+    assert 'requests_total{status="5\\"0\\\\0"} 1' in text
+    assert "pool_size 5" in text
+    assert 'latency_seconds_bucket{le="0.5"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
+    assert "latency_seconds_sum 0.25" in text
+
+
+def test_mmap_store_roundtrip(tmp_path):
+    """Test values written to shard files can be read back."""
+    store = MmapValueStore(tmp_path)
+    store.inc(("requests", ("a",), ""), 2)
+    store.inc(("requests", ("a",), ""), 3)
+    store.set(("pool", (), ""), 7)
+
+    assert store.collect() == {("requests", ("a",), ""): 5.0, ("pool", (), ""): 7.0}
+    counter_file = next(tmp_path.glob("counter_*.db"))
+    assert read_shard_file(counter_file) == [(("requests", ("a",), ""), 5.0)]
+
+
+def test_mmap_store_gauges_from_several_threads(tmp_path):
+    """Test threads setting new gauge series at once each get their own entry."""
+    store = MmapValueStore(tmp_path)
+    barrier = threading.Barrier(8)
+
+    def record(thread):
+        barrier.wait()
+        for i in range(2000):
+            store.set(("pool", (str(thread), str(i)), ""), thread * 10000 + i)
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(8)]
+    # Switch threads often so that allocations interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    gauge_file = next(tmp_path.glob("gauge_*.db"))
+    expected = {
+        ("pool", (str(t), str(i)), ""): t * 10000 + i for t in range(8) for i in range(2000)
+    }
+    assert dict(read_shard_file(gauge_file)) == expected
+
+
+def _record_in_child(directory, pid_queue):
+    """Record a counter and a gauge from a separate process."""
+    store = MmapValueStore(directory)
+    store.inc(("requests", (), ""), 10)
+    store.set(("pool", (), ""), 3)
+    pid_queue.put(os.getpid())
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_mmap_store_aggregates_processes(tmp_path):
+    """Test counters of exited processes are kept and their gauges dropped."""
+    store = MmapValueStore(tmp_path)
+    store.inc(("requests", (), ""), 1)
+    store.set(("pool", (), ""), 2)
+
+    context = multiprocessing.get_context("fork")
+    pid_queue = context.Queue()
+    child = context.Process(target=_record_in_child, args=(tmp_path, pid_queue))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+
+    values = store.collect()
+    assert values[("requests", (), "")] == 11
+    assert values[("pool", (), "")] == 2
+
+
+def test_clear_metrics_dir(tmp_path):
+    """Test leftover shard files are removed."""
+    MmapValueStore(tmp_path).inc(("requests", (), ""))
+    clear_metrics_dir(tmp_path)
+    assert list(tmp_path.glob("*.db")) == []
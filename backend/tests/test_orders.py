@@ -0,0 +1,343 @@
+"""Tests for order validation and bulk ingestion."""
+
+import io
+import json
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import Order, OrderItem, User
+from bestellsystem.orders.ingest import iter_json_array, iter_ndjson
+from bestellsystem.orders.validation import validate_order
+from bestellsystem.utils.errors import ValidationError
+
+
+def _order(index=0, **overrides):
+    """Build a valid order payload."""
+    order = {
+        "external_id": f"pos-{index}",
+        "source": "pos",
+        "items": [
+            {"sku": "PIZZA-1", "quantity": 2, "unit_price_cents": 850},
+            {"sku": "COLA-05", "quantity": 1, "unit_price_cents": 250},
+        ],
+    }
+    order.update(overrides)
+    return order
+
+
+@pytest.fixture
+def client(test_engine, make_app, staff_token):
+    """Create test client of a staff member with a small ingestion batch size."""
+    client = make_app(ORDERS_BULK_BATCH_SIZE=3).test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {staff_token}"
+    return client
+
+
+def _count(engine, model):
+    """Count the rows of a model's table."""
+    with SessionLocal(bind=engine) as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def test_validate_order_valid():
+    """Test a valid order is accepted and totalled."""
+    order, errors = validate_order(_order())
+    assert errors == {}
+    assert order.currency == "EUR"
+    assert order.total_cents == 2 * 850 + 250
+
+
+def test_validate_order_reports_field_paths():
+    """Test invalid fields are reported by path."""
+    order, errors = validate_order(
+        _order(currency="euro", items=[{"sku": "", "quantity": True, "unit_price_cents": -1}])
+    )
+    assert order is None
+    assert set(errors) == {
+        "currency",
+        "items[0].sku",
+        "items[0].quantity",
+        "items[0].unit_price_cents",
+    }
+
+
+def test_validate_order_null_source_and_currency_newline():
+    """Test a null source gets the default and a currency with a newline is rejected."""
+    order, errors = validate_order(_order(source=None))
+    assert errors == {}
+    assert order.source == "api"
+    order, errors = validate_order(_order(currency="EUR\n"))
+    assert order is None
+    assert set(errors) == {"currency"}
+
+
+def test_validate_order_rejects_amounts_beyond_integer_columns():
+    """Test prices, line totals and order totals must fit a 32-bit column."""
+    limit = 2**31 - 1
+    _, errors = validate_order(
+        _order(items=[{"sku": "A", "quantity": 1, "unit_price_cents": 2**31}])
+    )
+    assert set(errors) == {"items[0].unit_price_cents"}
+    _, errors = validate_order(
+        _order(items=[{"sku": "A", "quantity": 2, "unit_price_cents": limit // 2 + 1}])
+    )
+    assert set(errors) == {"items[0].unit_price_cents"}
+    item = {"sku": "A", "quantity": 1, "unit_price_cents": limit // 2 + 1}
+    _, errors = validate_order(_order(items=[item, item]))
+    assert set(errors) == {"items"}
+    order, errors = validate_order(
+        _order(items=[{"sku": "A", "quantity": 1, "unit_price_cents": limit}])
+    )
+    assert errors == {}
+    assert order.total_cents == limit
+
+
+def test_validate_order_requires_items():
+    """Test orders without items are rejected."""
+    _, errors = validate_order(_order(items=[]))
+    assert "items" in errors
+    _, errors = validate_order(["not", "an", "object"])
+    assert errors == {"order": "must be an object"}
+
+
+def test_iter_json_array_small_chunks():
+    """Test array elements are decoded across chunk boundaries."""
+    orders = [_order(i, note="ü" * i) for i in range(5)]
+    body = json.dumps(orders, ensure_ascii=False).encode()
+    assert list(iter_json_array(io.BytesIO(body), chunk_size=7)) == orders
+
+
+@pytest.mark.parametrize("body", [b"{}", b"[1, 2]", b"[{}", b'[{"a": 1} {"b": 2}]', b"[] x"])
+def test_iter_json_array_malformed(body):
+    """Test malformed arrays raise ValidationError."""
+    with pytest.raises(ValidationError):
+        list(iter_json_array(io.BytesIO(body), chunk_size=2))
+
+
+def test_iter_ndjson_reports_bad_lines():
+    """Test undecodable lines do not abort the stream."""
+    values = list(iter_ndjson(io.BytesIO(b'{"a": 1}\n\nnot json\n{"b": 2}\n')))
+    assert values[0] == {"a": 1}
+    assert isinstance(values[1], Exception)
+    assert values[2] == {"b": 2}
+
+
+def test_bulk_create_json_array(client, test_engine):
+    """Test a JSON array upload is persisted in batches."""
+    response = client.post("/api/v1/orders/bulk", json=[_order(i) for i in range(10)])
+
+    assert response.status_code == 201
+    assert response.json == {"created": 10, "failed": 0}
+    assert _count(test_engine, Order) == 10
+    assert _count(test_engine, OrderItem) == 20
+
+    with SessionLocal(bind=test_engine) as session:
+        order = session.scalars(select(Order).where(Order.external_id == "pos-7")).one()
+        assert order.total_cents == 1950
+        assert order.status == "received"
+        assert sorted(item.sku for item in order.items) == ["COLA-05", "PIZZA-1"]
+
+
+def test_bulk_create_ndjson_partial_failure(client, test_engine):
+    """Test invalid items are reported while valid ones are created."""
+    lines = [
+        json.dumps(_order(0)),
+        "{broken",
+        json.dumps(_order(2, items=[])),
+        json.dumps(_order(3)),
+    ]
+    response = client.post(
+        "/api/v1/orders/bulk",
+        data="\n".join(lines),
+        content_type="application/x-ndjson",
+    )
+
+    assert response.status_code == 207
+    assert response.json["created"] == 2
+    assert response.json["failed"] == 2
+    details = response.json["error"]["details"]
+    assert [item["index"] for item in details["items"]] == [1, 2]
+    assert "items" in details["items"][1]["errors"]
+    assert _count(test_engine, Order) == 2
+
+
+def test_bulk_create_reports_oversized_totals_per_order(client, test_engine):
+    """Test totals beyond the integer columns fail their order, not the upload."""
+    expensive = _order(1, items=[{"sku": "A", "quantity": 10, "unit_price_cents": 2**30}])
+    response = client.post("/api/v1/orders/bulk", json=[_order(0), expensive])
+
+    assert response.status_code == 207
+    details = response.json["error"]["details"]
+    assert details["items"] == [
+        {
+            "index": 1,
+            "errors": {"items[0].unit_price_cents": "times quantity must be at most 2147483647"},
+        }
+    ]
+    assert _count(test_engine, Order) == 1
+
+
+def test_bulk_create_all_invalid(client, test_engine):
+    """Test an upload without valid orders fails with a ValidationError."""
+    response = client.post("/api/v1/orders/bulk", json=[_order(0, currency="x")])
+
+    assert response.status_code == 400
+    assert response.json["error"]["details"]["failed"] == 1
+    assert _count(test_engine, Order) == 0
+
+
+def test_bulk_create_limit_rolls_back(client, test_engine):
+    """Test exceeding the order limit rejects the whole upload."""
+    client.application.config["ORDERS_BULK_MAX_ORDERS"] = 5
+    response = client.post("/api/v1/orders/bulk", json=[_order(i) for i in range(8)])
+
+    assert response.status_code == 400
+    assert _count(test_engine, Order) == 0
+
+
+def test_bulk_create_rejects_other_content_types(client):
+    """Test unsupported content types are rejected."""
+    response = client.post("/api/v1/orders/bulk", data="a,b", content_type="text/csv")
+    assert response.status_code == 400
+    assert response.json["error"]["message"] == "Unsupported content type"
+
+
+def test_bulk_create_requires_staff_role(client, test_engine):
+    """Test uploads need a token of a staff member or admin."""
+    del client.environ_base["HTTP_AUTHORIZATION"]
+    assert client.post("/api/v1/orders/bulk", json=[_order()]).status_code == 401
+    token = token_service.issue(User(id=2, role="customer"))
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/v1/orders/bulk", json=[_order()], headers=headers).status_code == 403
+    assert _count(test_engine, Order) == 0
+
+
+def _seed(client, count):
+    """Create orders through the bulk endpoint."""
+    response = client.post("/api/v1/orders/bulk", json=[_order(i) for i in range(count)])
+    assert response.status_code == 201
+
+
+def test_list_orders_keyset_pages(client):
+    """Test following next_cursor visits every order exactly once."""
+    _seed(client, 7)
+    seen = []
+    cursor = None
+    while True:
+        query = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/orders", query_string=query)
+        assert response.status_code == 200
+        seen.extend(order["external_id"] for order in response.json["data"])
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"pos-{i}" for i in range(7)]
+
+
+def test_reading_orders_requires_token(client):
+    """Test listing, fetching and exporting orders need an access token."""
+    _seed(client, 1)
+    order_id = client.get("/api/v1/orders").json["data"][0]["id"]
+    del client.environ_base["HTTP_AUTHORIZATION"]
+    for url in ("/api/v1/orders", f"/api/v1/orders/{order_id}", "/api/v1/orders/export"):
+        assert client.get(url).status_code == 401
+
+
+def test_list_orders_invalid_cursor(client):
+    """Test a malformed cursor is rejected."""
+    response = client.get("/api/v1/orders", query_string={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_export_ndjson(client):
+    """Test the NDJSON export streams one order per line with its items."""
+    _seed(client, 4)
+    response = client.get("/api/v1/orders/export")
+
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    orders = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [order["external_id"] for order in orders] == [f"pos-{i}" for i in range(4)]
+    assert [item["sku"] for item in orders[0]["items"]] == ["PIZZA-1", "COLA-05"]
+
+
+def test_generated_ids_are_sent_as_strings(client):
+    """Test IDs above 2**53 reach JSON clients as exact strings."""
+    _seed(client, 1)
+    with SessionLocal() as session:
+        order_id = session.scalar(select(Order.id))
+    assert order_id > 2**53
+
+    listed = json.loads(client.get("/api/v1/orders").get_data(as_text=True))["data"][0]
+    exported = json.loads(client.get("/api/v1/orders/export").get_data(as_text=True))
+    status = client.get(f"/api/v1/orders/{order_id}/status").get_data(as_text=True)
+    assert listed["id"] == exported["id"] == json.loads(status)["id"] == str(order_id)
+    assert f'"id":"{order_id}"' in status.replace(" ", "")
+
+
+def test_export_csv(client):
+    """Test the CSV export writes one row per item."""
+    _seed(client, 2)
+    response = client.get("/api/v1/orders/export", query_string={"format": "csv"})
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith("order_id,external_id")
+    assert len(lines) == 1 + 2 * 2
+    assert "attachment" in response.headers["Content-Disposition"]
+
+
+def test_export_time_range(client):
+    """Test the export honours since/until and validates them."""
+    _seed(client, 2)
+    response = client.get("/api/v1/orders/export", query_string={"since": "2999-01-01T00:00:00"})
+    assert response.get_data(as_text=True) == ""
+
+    response = client.get("/api/v1/orders/export", query_string={"until": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_get_order_and_status(client):
+    """Test a single order and its status can be fetched."""
+    _seed(client, 1)
+    order = client.get("/api/v1/orders").json["data"][0]
+    response = client.get(f"/api/v1/orders/{order['id']}")
+    assert response.status_code == 200
+    assert response.json == order
+
+    response = client.get(f"/api/v1/orders/{order['id']}/status")
+    assert response.json == {"id": order["id"], "status": "received"}
+    assert client.get("/api/v1/orders/999").status_code == 404
+    assert client.get("/api/v1/orders/999/status").status_code == 404
+
+
+def test_order_status_wait_returns_unchanged_status(client):
+    """Test the status long-poll gives up after the wait."""
+    _seed(client, 1)
+    order_id = client.get("/api/v1/orders").json["data"][0]["id"]
+    client.application.config["ORDER_STATUS_POLL_INTERVAL"] = 0.01
+    client.application.config["ORDER_STATUS_WSGI_MAX_WAIT"] = 1
+    response = client.get(
+        f"/api/v1/orders/{order_id}/status",
+        query_string={"known": "received", "wait": "0.05"},
+    )
+    assert response.json["status"] == "received"
+    response = client.get(f"/api/v1/orders/{order_id}/status", query_string={"wait": "x"})
+    assert response.status_code == 400
+
+
+def test_order_status_wait_is_capped_under_wsgi(client):
+    """Test the WSGI view does not hold a worker longer than its cap."""
+    _seed(client, 1)
+    order_id = client.get("/api/v1/orders").json["data"][0]["id"]
+    client.application.config["ORDER_STATUS_POLL_INTERVAL"] = 0.01
+    start = time.monotonic()
+    response = client.get(
+        f"/api/v1/orders/{order_id}/status",
+        query_string={"known": "received", "wait": "30"},
+    )
+    assert response.json["status"] == "received"
+    assert time.monotonic() - start < 1
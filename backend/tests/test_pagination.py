@@ -0,0 +1,37 @@
+"""Tests for keyset pagination helpers."""
+
+from datetime import datetime
+
+import pytest
+
+from bestellsystem.models import Order
+from bestellsystem.utils.errors import ValidationError
+from bestellsystem.utils.pagination import decode_cursor, encode_cursor, parse_limit
+
+KEYSET = (Order.created_at, Order.id)
+
+
+def test_cursor_roundtrip():
+    """Test cursors restore datetimes and IDs."""
+    values = (datetime(2026, 1, 2, 3, 4, 5, 678), 42)
+    token = encode_cursor(values)
+    assert "=" not in token
+    assert decode_cursor(token, KEYSET) == list(values)
+
+
+@pytest.mark.parametrize(
+    "token", ["!!!", "bm90IGpzb24", encode_cursor([1]), encode_cursor(["x", 1])]
+)
+def test_decode_cursor_invalid(token):
+    """Test malformed cursors raise ValidationError."""
+    with pytest.raises(ValidationError):
+        decode_cursor(token, KEYSET)
+
+
+def test_parse_limit():
+    """Test limit parsing and bounds."""
+    assert parse_limit(None, default=50, maximum=500) == 50
+    assert parse_limit("10", default=50, maximum=500) == 10
+    for value in ("0", "501", "ten"):
+        with pytest.raises(ValidationError):
+            parse_limit(value, default=50, maximum=500)
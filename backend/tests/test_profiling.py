@@ -0,0 +1,133 @@
+"""Tests for request profiling."""
+
+import threading
+import time
+
+import pytest
+
+from bestellsystem.app import create_app
+from bestellsystem.utils import profiling
+from bestellsystem.utils.profiling import Profile, ProfileStore
+
+
+@pytest.fixture
+def make_app(make_app):
+    """Return a factory creating an app with profiling settings and a slow view."""
+
+    def factory(**settings):
+        defaults = {
+            "PROFILING_ENABLED": True,
+            "PROFILING_SAMPLE_RATE": 0.0,
+            "PROFILING_SLOW_MS": 0,
+            "PROFILING_INTERVAL_MS": 1,
+            "PROFILING_TOKEN": "secret",
+        }
+        app = make_app(**{**defaults, **settings})
+
+        @app.route("/slow")
+        def slow_view():
+            time.sleep(0.1)
+            return {"ok": True}
+
+        return app
+
+    yield factory
+    profiling.profile_store.clear()
+
+
+def _profile(duration_ms, profile_id="r"):
+    """Build a profile."""
+    return Profile(profile_id, "slow", "GET", "/", "endpoint", 200, duration_ms, 0.0)
+
+
+def test_disabled_registers_nothing():
+    """Test no hooks or endpoints are installed when profiling is disabled."""
+    app = create_app()
+    hooks = [hook for hooks in app.before_request_funcs.values() for hook in hooks]
+    assert profiling._start_profiling not in hooks
+    assert app.test_client().get("/api/v1/debug/profiles").status_code == 404
+
+
+def test_store_keeps_slowest_profiles():
+    """Test the store keeps only the slowest profiles, slowest first."""
+    store = ProfileStore(2)
+    for i, duration in enumerate([5.0, 50.0, 1.0, 20.0]):
+        store.add(_profile(duration, str(i)))
+    assert [profile.duration_ms for profile in store.list()] == [50.0, 20.0]
+    assert store.get("3").duration_ms == 20.0
+    assert store.get("0") is None
+
+
+def test_sampled_request_is_profiled_with_cprofile(make_app):
+    """Test sampled requests keep a cProfile summary under their request ID."""
+    client = make_app(PROFILING_SAMPLE_RATE=1.0).test_client()
+    response = client.get("/api/v1/health", headers={"X-Request-ID": "sampled-1"})
+    assert response.status_code == 200
+
+    profile = profiling.profile_store.get("sampled-1")
+    assert profile.trigger == "sampled"
+    assert profile.endpoint == "api_v1.health"
+    assert any("health" in entry["function"] for entry in profile.top)
+    assert {"calls", "own_ms", "cumulative_ms"} <= set(profile.top[0])
+
+
+def test_overlapping_sampled_requests_share_the_profiler(make_app):
+    """Test a sampled request overlapping another one falls back to stack sampling."""
+    app = make_app(PROFILING_SAMPLE_RATE=1.0)
+    barrier = threading.Barrier(2, timeout=5)
+
+    @app.route("/together")
+    def together_view():
+        barrier.wait()
+        time.sleep(0.05)
+        return {"ok": True}
+
+    statuses = []
+
+    def request(request_id):
+        response = app.test_client().get("/together", headers={"X-Request-ID": request_id})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=request, args=(f"r{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200, 200]
+    profiles = [profiling.profile_store.get(request_id) for request_id in ("r0", "r1")]
+    assert all(profile.trigger == "sampled" for profile in profiles)
+    kinds = sorted("own_ms" in profile.top[0] for profile in profiles)
+    assert kinds == [False, True]
+    assert not profiling._cprofile_lock.locked()
+
+
+def test_slow_request_keeps_stack_samples(make_app):
+    """Test requests over the threshold keep their stack samples."""
+    client = make_app(PROFILING_SLOW_MS=50).test_client()
+    client.get("/api/v1/health", headers={"X-Request-ID": "fast"})
+    client.get("/slow", headers={"X-Request-ID": "slow"})
+
+    assert profiling.profile_store.get("fast") is None
+    profile = profiling.profile_store.get("slow")
+    assert profile.trigger == "slow"
+    assert profile.duration_ms >= 100
+    assert "slow_view" in profile.top[0]["function"]
+    assert profile.top[0]["samples"] > 0
+
+
+def test_profiles_endpoint_requires_token(make_app):
+    """Test the debug endpoint lists and returns profiles for the token holder."""
+    client = make_app(PROFILING_SLOW_MS=50).test_client()
+    client.get("/slow", headers={"X-Request-ID": "slow"})
+
+    assert client.get("/api/v1/debug/profiles").status_code == 401
+    headers = {"Authorization": "Bearer secret"}
+    response = client.get("/api/v1/debug/profiles", headers=headers)
+    assert response.status_code == 200
+    assert [profile["id"] for profile in response.json["data"]] == ["slow"]
+    assert "top" not in response.json["data"][0]
+
+    response = client.get("/api/v1/debug/profiles/slow", headers=headers)
+    assert response.json["top"]
+    assert client.get("/api/v1/debug/profiles/other", headers=headers).status_code == 404
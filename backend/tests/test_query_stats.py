@@ -0,0 +1,155 @@
+"""Tests for SQL query instrumentation."""
+
+import pytest
+from sqlalchemy import select, text
+
+from bestellsystem.auth.tokens import token_service
+from bestellsystem.db import SessionLocal, get_request_session
+from bestellsystem.models import Order, OrderItem
+from bestellsystem.utils.query_stats import (
+    QueryBudgetExceeded,
+    fingerprint_parameters,
+    normalize_sql,
+    query_budget,
+)
+
+
+@pytest.fixture
+def orders(test_engine):
+    """Store a few orders with one item each."""
+    with SessionLocal() as session:
+        for i in range(6):
+            order = Order(external_id=f"q-{i}", source="pos", currency="EUR", total_cents=100)
+            order.items = [OrderItem(sku="A", quantity=1, unit_price_cents=100)]
+            session.add(order)
+        session.commit()
+
+
+@pytest.fixture
+def settings():
+    """Return Config overrides, replaced by tests via parametrize."""
+    return {}
+
+
+@pytest.fixture
+def client(orders, settings, make_app, staff_token):
+    """Create test client with query settings and a view with an N+1 pattern."""
+    defaults = {"DB_SLOW_QUERY_MS": 0, "DB_REPEATED_QUERY_THRESHOLD": 5, "DB_QUERY_BUDGET": 0}
+    app = make_app(**{**defaults, **settings})
+    app.config.update(
+        {"SERVER_TIMING": True, "LOG_REQUESTS": True, "RESPONSE_CACHE_BACKEND": "none"}
+    )
+
+    @app.route("/item-counts")
+    def item_counts():
+        session = get_request_session()
+        orders = session.scalars(select(Order)).all()
+        # Lazy loads one query per order
+        return {"counts": [len(order.items) for order in orders]}
+
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {staff_token}"
+    # Load the revocation list now, so it does not add to the counted queries
+    token_service.verify(staff_token)
+    return client
+
+
+def _records(caplog, message):
+    """Return the captured records with a message."""
+    return [r for r in caplog.records if r.getMessage() == message]
+
+
+def test_normalize_sql():
+    """Test literals, placeholders and IN lists are normalized."""
+    assert normalize_sql("SELECT * FROM o WHERE id = 5 AND s = 'a''b'") == (
+        "SELECT * FROM o WHERE id = ? AND s = ?"
+    )
+    assert normalize_sql("SELECT *\n  FROM o WHERE id IN (?, ?, ?)") == (
+        "SELECT * FROM o WHERE id IN (...)"
+    )
+    assert normalize_sql("SELECT * FROM o WHERE id IN (%(id_1_1)s, %(id_1_2)s)") == (
+        normalize_sql("SELECT * FROM o WHERE id IN ($1)")
+    )
+    assert normalize_sql("SELECT x::text FROM order_items_1 WHERE a = :a") == (
+        "SELECT x::text FROM order_items_1 WHERE a = ?"
+    )
+    assert normalize_sql("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == (
+        "INSERT INTO t (a, b) VALUES (?, ?), ..."
+    )
+
+
+def test_fingerprint_parameters():
+    """Test equal parameters give equal fingerprints."""
+    assert fingerprint_parameters((1, "a")) == fingerprint_parameters((1, "a"))
+    assert fingerprint_parameters((1, "a")) != fingerprint_parameters((2, "a"))
+
+
+def test_query_counts_in_request_log(client, caplog):
+    """Test the request log record and Server-Timing carry the queries."""
+    with caplog.at_level("INFO"):
+        response = client.get("/api/v1/orders")
+    assert response.status_code == 200
+    assert "db;dur=" in response.headers["Server-Timing"]
+
+    record = _records(caplog, "Request completed")[-1]
+    assert record.db_queries == 2
+    assert record.db_ms > 0
+
+
+def test_repeated_query_is_reported(client, caplog):
+    """Test a statement run once per row is reported as repeated."""
+    with caplog.at_level("INFO"):
+        response = client.get("/item-counts")
+    assert response.json["counts"] == [1] * 6
+
+    records = _records(caplog, "Repeated query")
+    assert len(records) == 1
+    assert records[0].repetitions == 6
+    assert "FROM order_item " in records[0].sql
+    assert "?" in records[0].sql
+
+    caplog.clear()
+    with caplog.at_level("INFO"):
+        client.get("/api/v1/orders")
+    assert not _records(caplog, "Repeated query")
+
+
+@pytest.mark.parametrize("settings", [{"DB_SLOW_QUERY_MS": 1e-6}])
+def test_slow_query_is_logged_without_parameters(client, caplog):
+    """Test slow queries are logged normalized with a parameter fingerprint."""
+    with caplog.at_level("INFO"):
+        client.get("/api/v1/orders?limit=7")
+
+    records = _records(caplog, "Slow query")
+    assert records
+    assert all("7" not in record.sql.split("LIMIT")[-1] for record in records)
+    assert len(records[0].parameters_fingerprint) == 16
+    assert records[0].duration_ms > 0
+
+
+@pytest.mark.parametrize("settings", [{"DB_QUERY_BUDGET": 3}])
+def test_query_budget_exceeded_is_logged(client, caplog):
+    """Test requests over DB_QUERY_BUDGET are reported."""
+    with caplog.at_level("INFO"):
+        client.get("/item-counts")
+    assert _records(caplog, "Query budget exceeded")[0].db_queries == 7
+
+
+def test_query_budget(test_engine):
+    """Test query_budget() fails blocks running too many queries."""
+    with SessionLocal() as session:
+        with query_budget(1) as stats:
+            session.execute(text("SELECT 1"))
+        assert stats.count == 1
+
+        with pytest.raises(QueryBudgetExceeded, match="2 queries executed, budget is 1"):
+            with query_budget(1):
+                session.execute(text("SELECT 1"))
+                session.execute(text("SELECT 2"))
+
+
+def test_order_list_query_count_does_not_grow_with_orders(client):
+    """Test listing orders loads items in one query instead of one per order."""
+    with query_budget(2):
+        response = client.get("/api/v1/orders")
+    assert len(response.json["data"]) == 6
@@ -0,0 +1,171 @@
+"""Tests for the response cache."""
+
+from types import SimpleNamespace
+
+import pytest
+from flask import g, request
+
+from bestellsystem.db import SessionLocal
+from bestellsystem.models import User
+from bestellsystem.utils import response_cache
+from bestellsystem.utils.response_cache import (
+    CachedResponse,
+    MemoryBackend,
+    SQLiteBackend,
+    cached,
+    configure_response_cache,
+    make_etag,
+)
+
+
+@pytest.fixture
+def app(test_engine, make_app):
+    """Create application with a cached view counting its calls."""
+    app = make_app()
+    app.calls = 0
+
+    @app.before_request
+    def fake_auth():
+        role = request.headers.get("X-Role")
+        if role:
+            g.token_claims = SimpleNamespace(role=role)
+
+    @app.route("/users")
+    @cached("user")
+    def users():
+        app.calls += 1
+        if request.args.get("fail"):
+            return {"error": "nope"}, 500
+        with SessionLocal() as session:
+            return {"count": session.query(User).count(), "role": request.headers.get("X-Role")}
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return app.test_client()
+
+
+def _add_user(email, commit=True):
+    """Add a user through the ORM."""
+    with SessionLocal() as session:
+        session.add(User(email=email, password_hash="x", role="staff"))
+        session.flush()
+        if commit:
+            session.commit()
+        else:
+            session.rollback()
+
+
+def test_second_request_is_served_from_cache(client, app):
+    """Test the view runs once and both responses carry the same ETag."""
+    first = client.get("/users")
+    second = client.get("/users")
+
+    assert app.calls == 1
+    assert first.data == second.data
+    assert first.headers["ETag"] == second.headers["ETag"] == make_etag(first.data)
+
+
+def test_conditional_get_returns_304(client, app):
+    """Test a matching If-None-Match yields 304 without a body."""
+    etag = client.get("/users").headers["ETag"]
+
+    response = client.get("/users", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/users", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_conditional_get_without_cache(client, app):
+    """Test ETags are checked even when nothing is cached."""
+    configure_response_cache("none", maxsize=0)
+    etag = client.get("/users").headers["ETag"]
+    assert client.get("/users", headers={"If-None-Match": etag}).status_code == 304
+    assert app.calls == 2
+
+
+def test_commit_invalidates(client, app):
+    """Test a commit touching the table invalidates the cached response."""
+    assert client.get("/users").json["count"] == 0
+
+    _add_user("rolled-back@example.com", commit=False)
+    assert client.get("/users").json["count"] == 0
+    assert app.calls == 1
+
+    _add_user("new@example.com")
+    assert client.get("/users").json["count"] == 1
+    assert app.calls == 2
+
+
+def test_key_includes_query_args_and_role(client, app):
+    """Test responses are cached per query string and role."""
+    client.get("/users", query_string={"page": 1})
+    client.get("/users", query_string={"page": 2})
+    client.get("/users", headers={"X-Role": "admin"})
+    client.get("/users", headers={"X-Role": "staff"})
+    client.get("/users", headers={"X-Role": "admin"})
+    assert app.calls == 4
+
+
+def test_errors_are_not_cached(client, app):
+    """Test only successful responses are cached."""
+    client.get("/users", query_string={"fail": 1})
+    response = client.get("/users", query_string={"fail": 1})
+    assert response.status_code == 500
+    assert "ETag" not in response.headers
+    assert app.calls == 2
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Test entries and generations are visible to other processes' backends."""
+    path = str(tmp_path / "cache.db")
+    worker_a = SQLiteBackend(path, maxsize=2)
+    worker_b = SQLiteBackend(path, maxsize=2)
+
+    worker_a.set("key", CachedResponse(b"{}", "application/json", '"e"'), ttl=60)
+    assert worker_b.get("key") == CachedResponse(b"{}", "application/json", '"e"')
+
+    worker_a.bump({"user"})
+    assert worker_b.generation("user") == 1
+
+    worker_a.set("expired", CachedResponse(b"", "", '"x"'), ttl=-1)
+    assert worker_b.get("expired") is None
+    for key in ("a", "b", "c"):
+        worker_a.set(key, CachedResponse(b"", "", '"x"'), ttl=60)
+    assert sum(worker_b.get(key) is not None for key in ("key", "a", "b", "c")) == 2
+
+
+def test_sqlite_backend_via_config(tmp_path, app):
+    """Test the SQLite backend is selected by configuration."""
+    configure_response_cache("sqlite", maxsize=10, path=str(tmp_path / "cache.db"))
+    client = app.test_client()
+    client.get("/users")
+    client.get("/users")
+    assert app.calls == 1
+    with pytest.raises(ValueError):
+        configure_response_cache("sqlite", maxsize=10)
+
+
+def test_auto_backend_is_shared_with_several_workers(tmp_path):
+    """Test "auto" only keeps responses per worker when there is one worker."""
+    configure_response_cache("auto", maxsize=10, workers=1)
+    assert isinstance(response_cache.response_cache_backend, MemoryBackend)
+    configure_response_cache("auto", maxsize=10, path=str(tmp_path / "cache.db"), workers=4)
+    assert isinstance(response_cache.response_cache_backend, SQLiteBackend)
+    with pytest.raises(ValueError):
+        configure_response_cache("auto", maxsize=10, workers=4)
+
+
+def test_bulk_upload_invalidates_order_list(client, staff_token):
+    """Test Core writes marked as changes invalidate cached order lists."""
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {staff_token}"
+    assert client.get("/api/v1/orders").json["data"] == []
+    order = {"items": [{"sku": "A", "quantity": 1, "unit_price_cents": 100}]}
+    assert client.post("/api/v1/orders/bulk", json=[order]).status_code == 201
+    assert len(client.get("/api/v1/orders").json["data"]) == 1
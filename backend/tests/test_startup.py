@@ -0,0 +1,89 @@
+"""Tests for application startup and worker boot."""
+
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+from benchmarks.startup import (
+    _run_python,
+    import_profile,
+    measure_cold_boot,
+    measure_forked_boot,
+    parse_importtime,
+)
+from bestellsystem import db
+
+# Generous limits that only catch gross regressions, such as a heavy import
+# or a database connection during startup
+COLD_BOOT_BUDGET_MS = 5000
+FORKED_BOOT_BUDGET_MS = 1000
+
+
+def test_parse_importtime():
+    """Test the -X importtime report is parsed."""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _json\n"
+        "import time:      2500 |       2620 | json\n"
+    )
+    entries = parse_importtime(output)
+    assert [(e.module, e.self_ms, e.cumulative_ms) for e in entries] == [
+        ("_json", 0.12, 0.12),
+        ("json", 2.5, 2.62),
+    ]
+
+
+def test_importing_models_does_not_load_app_or_engine():
+    """Test models can be imported without the app factory or an engine."""
+    script = (
+        "import json, sys; import bestellsystem.models; from bestellsystem import db; "
+        "print(json.dumps({'app': 'bestellsystem.app' in sys.modules, "
+        "'engine': db._engine is not None}))"
+    )
+    assert json.loads(_run_python(["-c", script]).stdout) == {"app": False, "engine": False}
+
+    modules = {entry.module for entry in import_profile("bestellsystem.models")}
+    assert "bestellsystem.orders.routes" not in modules
+    assert "cProfile" not in modules
+
+
+def test_worker_boot_time(record_property):
+    """Test a worker boots within budget, with and without preloading."""
+    cold = measure_cold_boot()
+    forked = measure_forked_boot()
+    record_property("cold_boot_ms", round(cold["import_ms"] + cold["create_app_ms"], 1))
+    record_property("forked_boot_ms", round(forked, 1))
+
+    assert cold["import_ms"] + cold["create_app_ms"] < COLD_BOOT_BUDGET_MS
+    assert 0 <= forked < FORKED_BOOT_BUDGET_MS
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+def test_forked_child_does_not_reuse_parent_connections(tmp_path, monkeypatch):
+    """Test a forked process opens its own connections."""
+    engine = db.create_db_engine(f"sqlite:///{tmp_path}/fork.db")
+    monkeypatch.setattr(db, "_engine", engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    parent_pool = engine.pool
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            ok = engine.pool is not parent_pool
+        except Exception:
+            ok = False
+        os.write(write_end, b"1" if ok else b"0")
+        os._exit(0)
+    os.close(write_end)
+    result = os.read(read_end, 1)
+    os.waitpid(pid, 0)
+    assert result == b"1"
+    assert engine.pool is parent_pool
+    assert parent_pool.checkedin() == 1
+    engine.dispose()
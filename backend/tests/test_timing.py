@@ -0,0 +1,96 @@
+"""Tests for request timing instrumentation."""
+
+import logging
+
+import pytest
+
+from bestellsystem.app import create_app
+from bestellsystem.utils.errors import ValidationError
+from bestellsystem.utils.logging import RequestContextFilter
+from bestellsystem.utils.timing import REQUEST_LATENCY, format_server_timing
+
+
+@pytest.fixture
+def app():
+    """Create application with Server-Timing enabled."""
+    app = create_app()
+    app.config.update({"TESTING": True, "SERVER_TIMING": True})
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return app.test_client()
+
+
+def _histogram_count(endpoint, status):
+    """Return the number of observations recorded for a label set."""
+    series = REQUEST_LATENCY.snapshot().get((endpoint, status))
+    return series["count"] if series else 0
+
+
+def test_server_timing_header(client):
+    """Test responses carry per-phase durations when enabled."""
+    response = client.get("/api/v1/health")
+    phases = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    assert phases == ["route", "handler", "serialize", "total"]
+
+
+def test_server_timing_disabled_by_default(app, client):
+    """Test the Server-Timing header is opt-in."""
+    app.config["SERVER_TIMING"] = False
+    response = client.get("/api/v1/health")
+    assert "Server-Timing" not in response.headers
+
+
+def test_request_id_generated_and_echoed(client):
+    """Test a request ID is generated, or taken from a valid request header."""
+    generated = client.get("/api/v1/health").headers["X-Request-ID"]
+    assert len(generated) == 32
+
+    response = client.get("/api/v1/health", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = client.get("/api/v1/health", headers={"X-Request-ID": "bad id!"})
+    assert response.headers["X-Request-ID"] != "bad id!"
+
+
+def test_latency_histogram_records_endpoint_and_status(client):
+    """Test requests are counted per endpoint and status code."""
+    before = _histogram_count("api_v1.health", "200")
+    client.get("/api/v1/health")
+    assert _histogram_count("api_v1.health", "200") == before + 1
+
+    before = _histogram_count("unmatched", "404")
+    client.get("/does-not-exist")
+    assert _histogram_count("unmatched", "404") == before + 1
+
+
+def test_error_phase_recorded(app, client):
+    """Test time spent after a failing view is reported as error phase."""
+
+    @app.route("/fail")
+    def fail():
+        raise ValidationError("bad")
+
+    from bestellsystem.utils.timing import _timed_view
+
+    app.view_functions["fail"] = _timed_view(fail)
+    response = client.get("/fail")
+    assert response.status_code == 400
+    assert "error;dur=" in response.headers["Server-Timing"]
+
+
+def test_request_context_filter_adds_request_id(app):
+    """Test log records inside a request carry the request ID."""
+    record = logging.LogRecord("test", logging.INFO, "test.py", 1, "msg", (), None)
+    with app.test_request_context("/api/v1/health", headers={"X-Request-ID": "req-1"}):
+        app.preprocess_request()
+        assert RequestContextFilter().filter(record)
+    assert record.request_id == "req-1"
+
+
+def test_format_server_timing():
+    """Test Server-Timing header formatting in milliseconds."""
+    assert format_server_timing({"db": 0.0015, "total": 0.01}) == "db;dur=1.50, total;dur=10.00"